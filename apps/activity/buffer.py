@@ -0,0 +1,98 @@
+"""
+Per-process buffer of activity events.
+
+Signal handlers only append a row to a list. The rows are written with one
+``bulk_create`` when the request is done (``ActivityMiddleware``), after a
+Celery task ran, when ``ACTIVITY_BUFFER_SIZE`` events are waiting or once the
+oldest waited ``ACTIVITY_FLUSH_SECONDS``. With ``ACTIVITY_ASYNC_WRITES`` the
+rows are handed to the ``write_activity`` Celery task instead of being
+inserted by the process that buffered them.
+
+Whatever is left is flushed when the interpreter exits, which covers
+management commands and shells. Events still buffered when a process is
+killed are lost, the log records what happened and is never read back to
+decide anything.
+"""
+
+import atexit
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError
+from django.utils.dateparse import parse_datetime
+
+from .models import ActivityEvent
+
+logger = logging.getLogger(__name__)
+
+
+def period_of(moment):
+    return moment.date().replace(day=1)
+
+
+def write_rows(rows):
+    """Insert buffered rows, ``occurred_at`` may be a datetime or its ISO string"""
+    events = []
+    for row in rows:
+        occurred_at = row['occurred_at']
+        if isinstance(occurred_at, str):
+            occurred_at = parse_datetime(occurred_at)
+        events.append(ActivityEvent(**{**row, 'occurred_at': occurred_at}, period=period_of(occurred_at)))
+    return len(ActivityEvent.objects.bulk_create(events, batch_size=settings.ACTIVITY_BUFFER_SIZE))
+
+
+class ActivityBuffer:
+    """Rows waiting to be written, shared by the threads of a process"""
+
+    def __init__(self):
+        self.rows = []
+        self.oldest = None
+        self.lock = threading.Lock()
+
+    def add(self, row):
+        with self.lock:
+            if not self.rows:
+                self.oldest = time.monotonic()
+            self.rows.append(row)
+            due = (
+                len(self.rows) >= settings.ACTIVITY_BUFFER_SIZE
+                or time.monotonic() - self.oldest >= settings.ACTIVITY_FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def take(self):
+        with self.lock:
+            rows, self.rows, self.oldest = self.rows, [], None
+        return rows
+
+    def flush(self):
+        """Write what is waiting, returns the number of rows handed on"""
+        rows = self.take()
+        if not rows:
+            return 0
+        if settings.ACTIVITY_ASYNC_WRITES:
+            from .tasks import write_activity
+
+            try:
+                # Celery messages are plain JSON
+                write_activity.delay(json.loads(json.dumps(rows, cls=DjangoJSONEncoder)))
+            except Exception:
+                # Broker errors come in many types (kombu, redis, socket), none may fail the request
+                logger.exception("Could not queue %d activity events", len(rows))
+            return len(rows)
+        try:
+            write_rows(rows)
+        except (DatabaseError, OSError):
+            # Losing log rows must not fail the request that made the changes
+            logger.exception("Could not write %d activity events", len(rows))
+        return len(rows)
+
+
+buffer = ActivityBuffer()
+# Management commands and shells have no request or task to flush after
+atexit.register(buffer.flush)
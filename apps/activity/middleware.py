@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .buffer import buffer
+from .tracking import bind_request, unbind_request
+
+
+class ActivityMiddleware:
+    """
+    Attributes the changes made while handling a request to its user and
+    writes the buffered activity events once the response is ready.
+    """
+
+    def __init__(self, get_response):
+        if not settings.ACTIVITY_LOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = bind_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            unbind_request(token)
+            buffer.flush()
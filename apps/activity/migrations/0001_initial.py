@@ -0,0 +1,84 @@
+# Generated by Django 5.2.1 on 2026-10-19 14:03
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActivityEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.DateField(verbose_name="Period")),
+                ("occurred_at", models.DateTimeField(verbose_name="Occurred At")),
+                ("target", models.CharField(max_length=50, verbose_name="Target")),
+                ("object_id", models.PositiveBigIntegerField(verbose_name="Object ID")),
+                (
+                    "action",
+                    models.CharField(
+                        choices=[
+                            ("created", "Created"),
+                            ("updated", "Updated"),
+                            ("deleted", "Deleted"),
+                        ],
+                        max_length=10,
+                        verbose_name="Action",
+                    ),
+                ),
+                (
+                    "changes",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        verbose_name="Changes",
+                    ),
+                ),
+                (
+                    "actor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Actor",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Activity Event",
+                "verbose_name_plural": "Activity Events",
+                "indexes": [
+                    models.Index(
+                        fields=["target", "object_id", "occurred_at"],
+                        name="activity_ac_target_16f921_idx",
+                    ),
+                    models.Index(
+                        fields=["actor", "occurred_at"],
+                        name="activity_ac_actor_i_28fb60_idx",
+                    ),
+                    models.Index(
+                        fields=["period"], name="activity_ac_period_72f8f5_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class ActivityEvent(models.Model):
+    """
+    One change of a tracked object, see ``apps.activity.tracking``. Rows are
+    only ever inserted. Each is stamped with the month it falls in, a plain
+    indexed ``period`` column rather than a table partition, and expired
+    months are deleted in batches once older than ``ACTIVITY_RETENTION_DAYS``.
+    """
+    ACTION_CREATED = 'created'
+    ACTION_UPDATED = 'updated'
+    ACTION_DELETED = 'deleted'
+    ACTION_CHOICES = [
+        (ACTION_CREATED, _('Created')),
+        (ACTION_UPDATED, _('Updated')),
+        (ACTION_DELETED, _('Deleted')),
+    ]
+
+    # Month the event falls in, retention deletes by it through the index
+    period = models.DateField(verbose_name=_('Period'))
+    occurred_at = models.DateTimeField(verbose_name=_('Occurred At'))
+    # Model label of the changed object, e.g. ``audits.audittask``
+    target = models.CharField(max_length=50, verbose_name=_('Target'))
+    object_id = models.PositiveBigIntegerField(verbose_name=_('Object ID'))
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name=_('Action'))
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Actor'),
+    )
+    # ``{field: [old, new]}`` of the tracked fields that changed
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name=_('Changes'))
+
+    class Meta:
+        verbose_name = _('Activity Event')
+        verbose_name_plural = _('Activity Events')
+        indexes = [
+            models.Index(fields=['target', 'object_id', 'occurred_at']),
+            models.Index(fields=['actor', 'occurred_at']),
+            models.Index(fields=['period']),
+        ]
+
+    def __str__(self):
+        return f"{self.action} {self.target}:{self.object_id} @ {self.occurred_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,31 @@
+from rest_framework import serializers
+
+from .models import ActivityEvent
+
+
+class ActivityEventSerializer(serializers.ModelSerializer):
+    actor_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ActivityEvent
+        fields = ['id', 'occurred_at', 'target', 'object_id', 'action', 'actor', 'actor_name', 'changes']
+
+    def get_actor_name(self, obj):
+        if obj.actor is None:
+            return None
+        return obj.actor.get_full_name() or obj.actor.username
+
+
+class ActivityQuerySerializer(serializers.Serializer):
+    """Filters of the activity list, ``object_id`` needs ``target``"""
+
+    target = serializers.CharField(max_length=50, required=False)
+    object_id = serializers.IntegerField(min_value=1, required=False)
+    actor = serializers.IntegerField(min_value=1, required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if 'object_id' in attrs and 'target' not in attrs:
+            raise serializers.ValidationError({'target': 'Required with object_id.'})
+        return attrs
@@ -0,0 +1,41 @@
+
+from celery.signals import task_postrun
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import tracking
+from .buffer import buffer
+
+
+def connect_tracked_models():
+    for label, tracked in tracking.get_tracked().items():
+        post_init.connect(
+            lambda instance, tracked=tracked, **kwargs: tracking.remember(tracked, instance),
+            sender=tracked.model, weak=False, dispatch_uid=f'activity.init.{label}',
+        )
+        post_save.connect(
+            lambda instance, created=False, update_fields=None, tracked=tracked, **kwargs: tracking.saved(
+                tracked, instance, created, update_fields
+            ),
+            sender=tracked.model, weak=False, dispatch_uid=f'activity.save.{label}',
+        )
+        post_delete.connect(
+            lambda instance, tracked=tracked, **kwargs: tracking.deleted(tracked, instance),
+            sender=tracked.model, weak=False, dispatch_uid=f'activity.delete.{label}',
+        )
+
+
+def disconnect_tracked_models():
+    for label, tracked in tracking.get_tracked().items():
+        post_init.disconnect(sender=tracked.model, dispatch_uid=f'activity.init.{label}')
+        post_save.disconnect(sender=tracked.model, dispatch_uid=f'activity.save.{label}')
+        post_delete.disconnect(sender=tracked.model, dispatch_uid=f'activity.delete.{label}')
+
+
+if settings.ACTIVITY_LOG_ENABLED:
+    connect_tracked_models()
+
+
+@task_postrun.connect(weak=False, dispatch_uid='activity.flush.task')
+def flush_after_task(**kwargs):
+    buffer.flush()
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from .buffer import period_of, write_rows
+from .models import ActivityEvent
+
+
+@shared_task(ignore_result=True)
+def write_activity(rows):
+    write_rows(rows)
+
+
+@shared_task(ignore_result=True)
+def prune_activity(batch_size=5000):
+    # Deleted by month through the period index, an event is kept until its month is past the retention window
+    cutoff = period_of(timezone.now() - timedelta(days=settings.ACTIVITY_RETENTION_DAYS))
+    expired = ActivityEvent.objects.filter(period__lt=cutoff)
+    while True:
+        # Sliced querysets cannot be deleted, go through the primary keys
+        batch = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        ActivityEvent.objects.filter(pk__in=batch).delete()
@@ -0,0 +1,139 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient, APITestCase
+
+from apps.checklists.models import Checklist, ChecklistField, ChecklistResponse, ChecklistTemplate, FieldType
+from .buffer import buffer
+from .models import ActivityEvent
+from .signals import connect_tracked_models, disconnect_tracked_models
+from .tasks import prune_activity, write_activity
+from .tracking import get_tracked, record
+
+User = get_user_model()
+
+
+class ActivityLogTests(APITestCase):
+    def setUp(self):
+        buffer.take()
+        self.user = User.objects.create_user(
+            username='auditor', email='auditor@example.com', password='auditpass123', is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        template = ChecklistTemplate.objects.create(name='Template', category='Audit', created_by=self.user)
+        self.field = ChecklistField.objects.create(template=template, label='Control', field_type=FieldType.TEXT)
+        self.checklist = Checklist.objects.create(
+            template=template, name='Checklist', assigned_to=self.user, created_by=self.user
+        )
+        buffer.flush()
+
+    def update(self, text, is_completed=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/api/checklists/api/checklists/{self.checklist.pk}/update_responses/',
+                {'responses': [{'field_id': self.field.pk, 'value': {'text': text}, 'is_completed': is_completed}]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_are_buffered_and_queried(self):
+        """Test that saves are logged with their diff and actor and written with one insert"""
+        self.update('First')
+        self.update('Second', is_completed=True)
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+        self.assertLessEqual(len(queries), 1)
+
+        response_id = ChecklistResponse.objects.get().pk
+        response = self.client.get(
+            '/api/activity/', {'target': 'checklists.checklistresponse', 'object_id': response_id}
+        )
+        self.assertEqual(response.status_code, 200)
+        updated, created = response.data['results']
+        self.assertEqual(created['action'], 'created')
+        self.assertEqual(created['changes']['value'], [None, {'text': 'First'}])
+        self.assertEqual(updated['action'], 'updated')
+        self.assertEqual(
+            updated['changes'], {'value': [{'text': 'First'}, {'text': 'Second'}], 'is_completed': [False, True]}
+        )
+        self.assertEqual(updated['actor_name'], 'auditor')
+
+        # Soft deletes count as deletes, other users only see their own events
+        with self.captureOnCommitCallbacks(execute=True):
+            self.checklist.delete()
+        other = User.objects.create_user(username='other', email='other@example.com', password='x')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get('/api/activity/', {'actor': self.user.pk}).data['count'], 0)
+        self.assertTrue(ActivityEvent.objects.filter(target='checklists.checklist', action='deleted').exists())
+        self.assertEqual(self.client.get('/api/activity/', {'object_id': 1}).status_code, 400)
+
+    @override_settings(ACTIVITY_ASYNC_WRITES=True, ACTIVITY_BUFFER_SIZE=2)
+    def test_async_writes_and_retention(self):
+        """Test that a full buffer is handed to the writer task and expired periods are pruned"""
+        with mock.patch.object(write_activity, 'delay', side_effect=write_activity) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = ChecklistResponse.objects.create(checklist=self.checklist, field=self.field)
+            self.assertEqual(delay.call_count, 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                response.value = {'text': 'Changed'}
+                response.save()
+            self.assertEqual(delay.call_count, 1)
+        self.assertEqual(ActivityEvent.objects.filter(target='checklists.checklistresponse').count(), 2)
+
+        old = ActivityEvent.objects.first()
+        ActivityEvent.objects.filter(pk=old.pk).update(period=(timezone.now() - timedelta(days=800)).date())
+        prune_activity()
+        self.assertFalse(ActivityEvent.objects.filter(pk=old.pk).exists())
+        self.assertEqual(ActivityEvent.objects.count(), 1)
+
+    @override_settings(ACTIVITY_ASYNC_WRITES=True)
+    def test_broker_errors_are_logged(self):
+        """Test that a broker that cannot be reached loses the rows without failing the caller"""
+        with self.captureOnCommitCallbacks(execute=True):
+            ChecklistResponse.objects.create(checklist=self.checklist, field=self.field)
+        with mock.patch.object(write_activity, 'delay', side_effect=OperationalError('Connection refused')):
+            with self.assertLogs('apps.activity.buffer', 'ERROR'):
+                self.assertEqual(buffer.flush(), 1)
+
+    def test_tracking_adds_no_queries(self):
+        """Test that update_responses runs the same queries with and without the activity hooks"""
+        self.update('Warm up')
+        with CaptureQueriesContext(connection) as tracked:
+            self.update('Tracked')
+        disconnect_tracked_models()
+        try:
+            with CaptureQueriesContext(connection) as untracked:
+                self.update('Untracked')
+        finally:
+            connect_tracked_models()
+        # Signal handlers only append to the buffer, the one insert happens once the request is done
+        self.assertLessEqual(
+            len([query for query in tracked.captured_queries if 'activity_activityevent' not in query['sql']]),
+            len(untracked.captured_queries),
+        )
+
+    @override_settings(ACTIVITY_BUFFER_SIZE=10000, ACTIVITY_FLUSH_SECONDS=60)
+    def test_recording_stays_in_time_box(self):
+        """Test that recording and flushing many events runs no per event queries and stays fast"""
+        tracked = get_tracked()['checklists.checklist']
+        started = time.perf_counter()
+        with self.assertNumQueries(0), self.captureOnCommitCallbacks(execute=True):
+            for i in range(2000):
+                record(tracked, self.checklist, ActivityEvent.ACTION_UPDATED, {'name': ['Checklist', str(i)]})
+        recorded = time.perf_counter() - started
+        started = time.perf_counter()
+        self.assertEqual(buffer.flush(), 2000)
+        flushed = time.perf_counter() - started
+
+        # Generous bounds, they catch a query per event or a buffer that slows down as it grows
+        self.assertLess(recorded, 1)
+        self.assertLess(flushed, 3)
+        self.assertEqual(ActivityEvent.objects.filter(target='checklists.checklist', action='updated').count(), 2000)
@@ -0,0 +1,126 @@
+"""
+Change tracking for the activity log.
+
+``TRACKED_FIELDS`` lists the models whose changes are logged and the fields
+compared. ``post_init`` keeps the loaded values of those fields on the
+instance, ``post_save`` compares and, when something changed, buffers one
+row with the ``{field: [old, new]}`` diff and the user of the current
+request (``apps.activity.buffer``). Rows are buffered once the transaction
+commits, a rolled back change is not logged. ``update()`` and bulk writes
+send no signals and are not logged.
+
+The handlers do no queries, their cost on a save is a tuple of attribute
+reads and a comparison.
+"""
+
+import contextvars
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from .buffer import buffer
+from .models import ActivityEvent
+
+TRACKED_FIELDS = {
+    'audits.audit': ('title', 'status', 'scope', 'objectives', 'period_from', 'period_to', 'workflow'),
+    'audits.audittask': (
+        'task_name', 'assigned_to', 'due_date', 'task_status', 'priority', 'risk_level', 'completion_notes',
+    ),
+    'audits.auditevidence': ('title', 'description', 'evidence_type', 'is_verified', 'verified_by'),
+    'audits.auditfinding': ('title', 'severity', 'status', 'assigned_to', 'due_date', 'risk_level', 'is_deleted'),
+    'checklists.checklist': ('name', 'status', 'assigned_to', 'due_date', 'priority', 'is_deleted'),
+    'checklists.checklistresponse': ('value', 'is_completed', 'comments', 'is_deleted'),
+}
+
+# Stand-in for fields a deferred load left out, they are not compared
+MISSING = object()
+
+_request = contextvars.ContextVar('activity_request', default=None)
+
+
+def bind_request(request):
+    """Attribute changes to the user of ``request`` until the returned token is reset"""
+    return _request.set(request)
+
+
+def unbind_request(token):
+    _request.reset(token)
+
+
+def current_actor_id():
+    # Read at save time, DRF authenticates inside the view
+    user = getattr(_request.get(), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class TrackedModel:
+    """Compiled ``TRACKED_FIELDS`` entry of one model"""
+
+    def __init__(self, model, names):
+        self.model = model
+        self.label = model._meta.label_lower
+        self.names = names
+        self.attnames = tuple(model._meta.get_field(name).attname for name in names)
+
+    def values(self, instance):
+        data = instance.__dict__
+        # Containers are copied so changes made in place still show up as a diff
+        return tuple(
+            value.copy() if isinstance(value, (dict, list)) else value
+            for value in (data.get(attname, MISSING) for attname in self.attnames)
+        )
+
+    def diff(self, before, after, update_fields=None):
+        return {
+            name: [old, new]
+            for name, old, new in zip(self.names, before, after)
+            if old is not MISSING and new is not MISSING and old != new
+            and (update_fields is None or name in update_fields)
+        }
+
+
+def get_tracked():
+    return {
+        label: TrackedModel(apps.get_model(label), names) for label, names in TRACKED_FIELDS.items()
+    }
+
+
+def record(tracked, instance, action, changes):
+    row = {
+        'occurred_at': timezone.now(),
+        'target': tracked.label,
+        'object_id': instance.pk,
+        'action': action,
+        'actor_id': current_actor_id(),
+        'changes': changes,
+    }
+    transaction.on_commit(lambda: buffer.add(row))
+
+
+def remember(tracked, instance):
+    instance._activity_values = tracked.values(instance)
+
+
+def saved(tracked, instance, created, update_fields=None):
+    after = tracked.values(instance)
+    if created:
+        changes = {
+            name: [None, value] for name, value in zip(tracked.names, after)
+            if value is not MISSING and value not in (None, '', {}, [])
+        }
+        record(tracked, instance, ActivityEvent.ACTION_CREATED, changes)
+    else:
+        before = getattr(instance, '_activity_values', None) or (MISSING,) * len(after)
+        changes = tracked.diff(before, after, update_fields and set(update_fields))
+        if changes:
+            # Soft deletes are saves that set is_deleted
+            action = ActivityEvent.ACTION_DELETED if changes.get('is_deleted') == [False, True] else (
+                ActivityEvent.ACTION_UPDATED
+            )
+            record(tracked, instance, action, changes)
+    instance._activity_values = after
+
+
+def deleted(tracked, instance):
+    record(tracked, instance, ActivityEvent.ACTION_DELETED, {})
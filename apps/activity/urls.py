@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import ActivityEventListView
+
+urlpatterns = [
+    path("", ActivityEventListView.as_view(), name="activity-list"),
+]
@@ -0,0 +1,39 @@
+from rest_framework import permissions
+from rest_framework.generics import ListAPIView
+
+from .buffer import buffer
+from .models import ActivityEvent
+from .serializers import ActivityEventSerializer, ActivityQuerySerializer
+
+
+class ActivityEventListView(ListAPIView):
+    """
+    Activity log, newest first. Filter per object with ``target`` and
+    ``object_id`` or per user with ``actor``. Staff see every event, other
+    users only their own.
+    """
+    serializer_class = ActivityEventSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = []
+
+    def get_queryset(self):
+        params = ActivityQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+
+        # Changes this process made just now are part of the answer
+        buffer.flush()
+        queryset = ActivityEvent.objects.select_related('actor').order_by('-occurred_at', '-pk')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(actor=self.request.user)
+        if 'target' in filters:
+            queryset = queryset.filter(target=filters['target'])
+        if 'object_id' in filters:
+            queryset = queryset.filter(object_id=filters['object_id'])
+        if 'actor' in filters:
+            queryset = queryset.filter(actor_id=filters['actor'])
+        if 'since' in filters:
+            queryset = queryset.filter(occurred_at__gte=filters['since'])
+        if 'until' in filters:
+            queryset = queryset.filter(occurred_at__lt=filters['until'])
+        return queryset
@@ -0,0 +1,13 @@
+"""
+Who may open which audits.
+
+``AuditViewSet`` and the live audit socket filter with ``audit_access`` so
+their rules cannot drift apart.
+"""
+
+from django.db.models import Q
+
+
+def audit_access(user):
+    """Filter on ``Audit`` rows ``user`` may open, audits are open to every signed in user"""
+    return Q()
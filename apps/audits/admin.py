@@ -65,7 +65,7 @@ class AuditTaskAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'priority', 'risk_level', 'audit__audit_type', 'created_at',
-        'checklist__status'
+        'task_status'
     ]
     search_fields = [
         'task_name', 'description', 'audit__title', 'audit__reference_number',
@@ -0,0 +1,255 @@
+"""
+Team to audit assignment propagation.
+
+Assigning a team to an audit gives each active member (and the owner) a
+``TeamAuditGrant`` and puts them on ``Audit.assigned_users``. Members whose
+role is in ``TEAM_ASSIGNMENT_TASK_ROLES`` are also put on the assigned users
+of the audit's tasks and their checklists. Unassigning the team, removing a
+member or changing their role takes back what the team gave, users keep an
+assignment while another team still grants it or when they were assigned
+directly: ``TeamAuditGrant.owns_assignment`` records whether a team made the
+audit assignment, ``TeamTaskGrant`` which task and checklist links it made.
+
+``sync_team_audits`` diffs the wanted grants against the stored ones and
+writes the difference with set based inserts and deletes on the through
+tables, a sync costs a handful of queries whatever the number of members and
+audits.
+"""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.checklists.models import Checklist
+
+from .models import Audit, AuditTask, Team, TeamAuditGrant, TeamMember, TeamTaskGrant
+
+
+def add_links(descriptor, pairs):
+    """Insert ``(source id, user id)`` rows into the through table of a many-to-many field"""
+    through = descriptor.through
+    source, target = descriptor.field.m2m_field_name(), descriptor.field.m2m_reverse_field_name()
+    through.objects.bulk_create(
+        [through(**{f'{source}_id': source_id, f'{target}_id': user_id}) for source_id, user_id in pairs],
+        ignore_conflicts=True,
+    )
+    touch_sources(descriptor, {source_id for source_id, _user_id in pairs})
+
+
+def remove_links(descriptor, pairs):
+    through = descriptor.through
+    source, target = descriptor.field.m2m_field_name(), descriptor.field.m2m_reverse_field_name()
+    grouped = defaultdict(set)
+    for source_id, user_id in pairs:
+        grouped[source_id].add(user_id)
+    condition = Q()
+    for source_id, user_ids in grouped.items():
+        condition |= Q(**{f'{source}_id': source_id, f'{target}_id__in': user_ids})
+    if condition and through.objects.filter(condition).delete()[0]:
+        touch_sources(descriptor, set(grouped))
+
+
+def touch_sources(descriptor, source_ids):
+    """Move ``updated_at`` of the rows whose users changed, bulk writes send no ``m2m_changed``"""
+    model = descriptor.field.model
+    if source_ids and any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        model._base_manager.filter(pk__in=source_ids).update(updated_at=timezone.now())
+
+
+def team_roster(team):
+    """``{user id: task access}`` of the active members, the owner included"""
+    if team.is_deleted:
+        return {}
+    roles = set(settings.TEAM_ASSIGNMENT_TASK_ROLES)
+    roster = {
+        user_id: role in roles
+        for user_id, role in TeamMember.objects.filter(team=team, is_active=True).values_list('user_id', 'role')
+    }
+    roster.setdefault(team.owner_id, 'owner' in roles)
+    return roster
+
+
+def apply_task_links(pairs, add):
+    """
+    Add or remove ``(audit id, user id)`` pairs on every task of the audits
+    and their checklists. Adding records in a ``TeamTaskGrant`` which links
+    it made, removing takes back only those.
+    """
+    if not pairs:
+        return
+    users_by_audit = defaultdict(set)
+    for audit_id, user_id in pairs:
+        users_by_audit[audit_id].add(user_id)
+    users = {user_id for _audit_id, user_id in pairs}
+    if not add:
+        grants = [
+            grant for grant in TeamTaskGrant.objects.filter(
+                audit_task__audit_id__in=users_by_audit, user_id__in=users
+            ).values(
+                'pk', 'user_id', 'owns_task_link', 'owns_checklist_link', 'audit_task_id',
+                'audit_task__audit_id', 'audit_task__checklist_id',
+            )
+            if grant['user_id'] in users_by_audit[grant['audit_task__audit_id']]
+        ]
+        remove_links(AuditTask.assigned_users, [
+            (grant['audit_task_id'], grant['user_id']) for grant in grants if grant['owns_task_link']
+        ])
+        remove_links(Checklist.assigned_users, [
+            (grant['audit_task__checklist_id'], grant['user_id']) for grant in grants
+            if grant['owns_checklist_link'] and grant['audit_task__checklist_id']
+        ])
+        TeamTaskGrant.objects.filter(pk__in=[grant['pk'] for grant in grants]).delete()
+        return
+
+    task_pairs, checklist_of = [], {}
+    for task_id, audit_id, checklist_id in AuditTask.objects.filter(audit_id__in=users_by_audit).values_list(
+        'pk', 'audit_id', 'checklist_id'
+    ):
+        checklist_of[task_id] = checklist_id
+        task_pairs.extend((task_id, user_id) for user_id in users_by_audit[audit_id])
+    on_task = set(AuditTask.assigned_users.through.objects.filter(
+        audittask_id__in=checklist_of, user_id__in=users
+    ).values_list('audittask_id', 'user_id'))
+    on_checklist = set(Checklist.assigned_users.through.objects.filter(
+        checklist_id__in={checklist_id for checklist_id in checklist_of.values() if checklist_id}, user_id__in=users
+    ).values_list('checklist_id', 'user_id'))
+    # A grant already held keeps what it owns, another team's links stay that team's
+    TeamTaskGrant.objects.bulk_create(
+        [
+            TeamTaskGrant(
+                audit_task_id=task_id,
+                user_id=user_id,
+                owns_task_link=(task_id, user_id) not in on_task,
+                owns_checklist_link=(
+                    bool(checklist_of[task_id]) and (checklist_of[task_id], user_id) not in on_checklist
+                ),
+            )
+            for task_id, user_id in task_pairs
+        ],
+        ignore_conflicts=True,
+    )
+    add_links(AuditTask.assigned_users, [pair for pair in task_pairs if pair not in on_task])
+    add_links(Checklist.assigned_users, [
+        (checklist_of[task_id], user_id) for task_id, user_id in task_pairs
+        if checklist_of[task_id] and (checklist_of[task_id], user_id) not in on_checklist
+    ])
+
+
+def notify_joined(team, pairs):
+    from apps.notifications.models import Notification
+
+    audits = Audit.objects.only('pk', 'title', 'reference_number').in_bulk({audit_id for audit_id, _user_id in pairs})
+    Notification.objects.bulk_notify(
+        [
+            Notification(
+                user_id=user_id,
+                title=f"Assigned to audit {audits[audit_id].reference_number}",
+                message=f"You were assigned to audit '{audits[audit_id].title}' through team '{team.name}'.",
+                type='assignment',
+                metadata={'audit': audit_id, 'team': team.pk},
+            )
+            for audit_id, user_id in pairs
+        ]
+    )
+
+
+@transaction.atomic
+def sync_team_audits(team_id, audit_ids=None):
+    """
+    Bring the grants of a team on ``audit_ids`` (default: every audit it is
+    assigned to or still holds grants on) in line with its assignments and
+    members. Returns ``{"assigned": n, "unassigned": n}``, the number of
+    audit assignments added and taken back.
+    """
+    team = Team.all_objects.all_with_deleted().filter(pk=team_id).first()
+    if team is None:
+        return {'assigned': 0, 'unassigned': 0}
+    grants = TeamAuditGrant.objects.filter(team=team)
+    assigned = set(team.audits.values_list('pk', flat=True))
+    if audit_ids is None:
+        audit_ids = assigned | set(grants.values_list('audit_id', flat=True).distinct())
+    else:
+        audit_ids = set(audit_ids)
+        assigned &= audit_ids
+
+    roster = team_roster(team)
+    wanted = {(audit_id, user_id): access for audit_id in assigned for user_id, access in roster.items()}
+    current = {
+        (audit_id, user_id): (pk, access, owns)
+        for pk, audit_id, user_id, access, owns in grants.filter(audit_id__in=audit_ids).values_list(
+            'pk', 'audit_id', 'user_id', 'task_access', 'owns_assignment'
+        )
+    }
+    added = [key for key in wanted if key not in current]
+    removed = [key for key in current if key not in wanted]
+    regranted = [key for key in wanted if key in current and current[key][1] != wanted[key]]
+
+    joined, left = [], []
+    task_gained = [key for key in added if wanted[key]] + [key for key in regranted if wanted[key]]
+    task_lost = [key for key in removed if current[key][1]] + [key for key in regranted if not wanted[key]]
+
+    if added:
+        audits = {audit_id for audit_id, _user_id in added}
+        users = {user_id for _audit_id, user_id in added}
+        on_audit = set(
+            Audit.assigned_users.through.objects.filter(audit_id__in=audits, user_id__in=users).values_list(
+                'audit_id', 'user_id'
+            )
+        )
+        # Another team put the user there, this grant shares that ownership
+        owned = set(
+            TeamAuditGrant.objects.filter(
+                audit_id__in=audits, user_id__in=users, owns_assignment=True
+            ).values_list('audit_id', 'user_id')
+        )
+        TeamAuditGrant.objects.bulk_create(
+            TeamAuditGrant(
+                audit_id=audit_id,
+                team=team,
+                user_id=user_id,
+                task_access=wanted[(audit_id, user_id)],
+                owns_assignment=(audit_id, user_id) in owned or (audit_id, user_id) not in on_audit,
+            )
+            for audit_id, user_id in added
+        )
+        joined = [key for key in added if key not in on_audit]
+        add_links(Audit.assigned_users, joined)
+
+    for access in (True, False):
+        keys = [key for key in regranted if wanted[key] is access]
+        if keys:
+            TeamAuditGrant.objects.filter(pk__in=[current[key][0] for key in keys]).update(task_access=access)
+
+    if removed:
+        TeamAuditGrant.objects.filter(pk__in=[current[key][0] for key in removed]).delete()
+
+    if removed or task_lost:
+        pairs = set(removed) | set(task_lost)
+        remaining = defaultdict(bool)
+        for audit_id, user_id, access in TeamAuditGrant.objects.filter(
+            audit_id__in={audit_id for audit_id, _user_id in pairs},
+            user_id__in={user_id for _audit_id, user_id in pairs},
+        ).values_list('audit_id', 'user_id', 'task_access'):
+            remaining[(audit_id, user_id)] |= access
+        # Only assignments the teams made are taken back
+        left = [key for key in removed if current[key][2] and key not in remaining]
+        remove_links(Audit.assigned_users, left)
+        # Task links are owned link by link, see apply_task_links
+        task_lost = [key for key in task_lost if not remaining[key]]
+
+    apply_task_links(task_gained, add=True)
+    apply_task_links(task_lost, add=False)
+    changed_audits = {audit_id for audit_id, _user_id in joined + left}
+    if changed_audits:
+        Audit.objects.filter(pk__in=changed_audits).update(updated_at=timezone.now())
+    if joined:
+        notify_joined(team, joined)
+    return {'assigned': len(joined), 'unassigned': len(left)}
+
+
+def queue_team_sync(team_id):
+    """Sync a team once the transaction commits, when membership changes are final"""
+    transaction.on_commit(lambda: sync_team_audits(team_id))
@@ -0,0 +1,205 @@
+"""
+Deep copies of audits.
+
+``clone_audit`` copies an audit with its tasks, their checklists, the users
+assigned to each of them and the teams assigned to the audit, shifting the
+period and every due date by an offset. Rows are written with one
+``bulk_create`` per table and the new ids are mapped back to the copies, so
+the number of queries does not grow with the number of tasks. Prior
+responses can be copied as defaults: they keep their values but are not
+completed, the new audit starts from scratch.
+
+Bulk writes send no signals, what the save handlers would do (template
+snapshot pins, deadline entries, dashboard rollups, team grants) is done here
+for all copies at once. Large audits are cloned by ``clone_audit_job``, which
+reports progress through the Celery result backend.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from apps.checklists.logic import checklist_progress, get_compiled
+from apps.checklists.models import Checklist, ChecklistResponse, ChecklistTemplate
+from apps.checklists.rollups import mark_checklists_changed
+from apps.checklists.snapshots import current_snapshot
+
+from .assignments import add_links, sync_team_audits
+from .deadlines import schedule_new_deadlines
+from .models import Audit, AuditTask, Team, TeamAuditGrant, TeamTaskGrant
+
+AUDIT_ATTRIBUTES = ('title', 'audit_type', 'custom_audit_type_id', 'audit_item', 'scope', 'objectives', 'workflow_id')
+CHECKLIST_ATTRIBUTES = ('template_id', 'name', 'description', 'tags', 'priority')
+TASK_ATTRIBUTES = ('task_name', 'description', 'priority', 'control_area', 'risk_level')
+
+# Responses copied per insert
+RESPONSE_BATCH_SIZE = 1000
+
+
+def shifted(moment, offset):
+    return moment + offset if moment is not None else None
+
+
+def is_overdue(due_date, now):
+    return bool(due_date and due_date <= now)
+
+
+@transaction.atomic
+def clone_audit(audit, user, offset=timedelta(0), title=None, include_responses=False, include_assignments=True,
+                progress=None):
+    """
+    Copy ``audit`` as a new audit created by ``user`` and return it.
+    ``offset`` (a ``timedelta``) moves the period and due dates,
+    ``include_responses`` copies prior responses as uncompleted defaults and
+    ``include_assignments`` the assignees, assigned users and teams, without
+    them ``user`` is assigned everything. ``progress`` is called with
+    ``(stage, done, total)`` as the copy advances.
+    """
+    report = progress or (lambda stage, done, total: None)
+    now = timezone.now()
+
+    clone = Audit(
+        **{name: getattr(audit, name) for name in AUDIT_ATTRIBUTES},
+        period_from=audit.period_from + timedelta(days=offset.days),
+        period_to=audit.period_to + timedelta(days=offset.days),
+        created_by=user,
+    )
+    if title:
+        clone.title = title
+    # One regular save, it numbers the audit and sets its initial status
+    clone.save()
+
+    tasks = list(AuditTask.objects.filter(audit=audit).select_related('checklist').order_by('pk'))
+    report('tasks', 0, len(tasks))
+
+    snapshots = {
+        template.pk: current_snapshot(template).id
+        for template in ChecklistTemplate.all_objects.all_with_deleted().filter(
+            pk__in={task.checklist.template_id for task in tasks}
+        )
+    }
+    checklists = Checklist.objects.bulk_create([
+        Checklist(
+            **{name: getattr(task.checklist, name) for name in CHECKLIST_ATTRIBUTES},
+            template_snapshot_id=snapshots.get(task.checklist.template_id),
+            # Without the assignments everything starts with the user cloning
+            assigned_to_id=task.checklist.assigned_to_id if include_assignments else user.pk,
+            status='draft',
+            created_by=user,
+            due_date=shifted(task.checklist.due_date, offset),
+            is_overdue=is_overdue(shifted(task.checklist.due_date, offset), now),
+        )
+        for task in tasks
+    ])
+    checklist_ids = {task.checklist_id: checklist.pk for task, checklist in zip(tasks, checklists)}
+    copies = AuditTask.objects.bulk_create([
+        AuditTask(
+            **{name: getattr(task, name) for name in TASK_ATTRIBUTES},
+            audit=clone,
+            checklist_id=checklist_ids[task.checklist_id],
+            assigned_to_id=task.assigned_to_id if include_assignments else user.pk,
+            due_date=shifted(task.due_date, offset),
+            is_overdue=is_overdue(shifted(task.due_date, offset), now),
+            task_status='pending',
+            created_by=user,
+        )
+        for task in tasks
+    ])
+    task_ids = {task.pk: copy.pk for task, copy in zip(tasks, copies)}
+    report('tasks', len(tasks), len(tasks))
+
+    if include_responses:
+        copy_responses(checklist_ids, checklists, report)
+
+    if include_assignments:
+        copy_assignments(audit, clone, task_ids, checklist_ids)
+    else:
+        # What save() does for a new assignee
+        add_links(AuditTask.assigned_users, [(item.pk, user.pk) for item in copies])
+        add_links(Checklist.assigned_users, [(item.pk, user.pk) for item in checklists])
+
+    schedule_new_deadlines(Checklist._meta.label_lower, [(item.pk, item.due_date) for item in checklists])
+    schedule_new_deadlines(AuditTask._meta.label_lower, [(item.pk, item.due_date) for item in copies])
+    mark_checklists_changed([item.pk for item in checklists])
+    report('done', len(tasks), len(tasks))
+    return clone
+
+
+def copy_responses(checklist_ids, checklists, report):
+    """Copy the responses of the source checklists as uncompleted defaults and update the progress of the copies"""
+    rows = ChecklistResponse.objects.filter(
+        checklist_id__in=checklist_ids, field__is_deleted=False
+    ).values_list('checklist_id', 'field_id', 'value')
+    total = rows.count()
+    done = 0
+    batch = []
+    for checklist_id, field_id, value in rows.iterator(chunk_size=RESPONSE_BATCH_SIZE):
+        batch.append(ChecklistResponse(checklist_id=checklist_ids[checklist_id], field_id=field_id, value=value))
+        if len(batch) == RESPONSE_BATCH_SIZE:
+            done += len(ChecklistResponse.objects.bulk_create(batch))
+            batch = []
+            report('responses', done, total)
+    done += len(ChecklistResponse.objects.bulk_create(batch))
+    report('responses', done, total)
+
+    counts = {}
+    for checklist in checklists:
+        if get_compiled(checklist.template_id).rules:
+            # Responses to fields the rules hide do not count
+            counts[checklist.pk] = checklist_progress(checklist)[:2]
+    rest = [item.pk for item in checklists if item.pk not in counts]
+    if rest:
+        counts.update(
+            (checklist_id, (total, completed))
+            for checklist_id, total, completed in ChecklistResponse.objects.filter(checklist_id__in=rest)
+            .values('checklist_id')
+            .annotate(total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True)))
+            .values_list('checklist_id', 'total', 'completed')
+        )
+    changed = []
+    for checklist in checklists:
+        checklist.total_fields, checklist.completed_fields = counts.get(checklist.pk, (0, 0))
+        if checklist.total_fields:
+            # What save() derives from the counts
+            checklist.apply_derived_state()
+            changed.append(checklist)
+    Checklist.objects.bulk_update(changed, ['total_fields', 'completed_fields', 'completion_percentage'])
+
+def copy_assignments(audit, clone, task_ids, checklist_ids):
+    """Copy the assigned users and teams, team members get their grants the way a new assignment gives them"""
+    # Users a team put on the audit are put there again by the team, and the team owns that assignment
+    team_users = set(
+        TeamAuditGrant.objects.filter(audit=audit, owns_assignment=True).values_list('user_id', flat=True)
+    )
+    add_links(Audit.assigned_users, [
+        (clone.pk, user_id)
+        for user_id in audit.assigned_users.through.objects.filter(audit=audit).values_list('user_id', flat=True)
+        if user_id not in team_users
+    ])
+    # Likewise for the task and checklist links the teams made
+    team_links = TeamTaskGrant.objects.filter(audit_task__audit=audit)
+    team_task_links = set(team_links.filter(owns_task_link=True).values_list('audit_task_id', 'user_id'))
+    team_checklist_links = set(
+        team_links.filter(owns_checklist_link=True).values_list('audit_task__checklist_id', 'user_id')
+    )
+    add_links(AuditTask.assigned_users, [
+        (task_ids[task_id], user_id)
+        for task_id, user_id in AuditTask.assigned_users.through.objects.filter(
+            audittask_id__in=task_ids
+        ).values_list('audittask_id', 'user_id')
+        if (task_id, user_id) not in team_task_links
+    ])
+    add_links(Checklist.assigned_users, [
+        (checklist_ids[checklist_id], user_id)
+        for checklist_id, user_id in Checklist.assigned_users.through.objects.filter(
+            checklist_id__in=checklist_ids
+        ).values_list('checklist_id', 'user_id')
+        if (checklist_id, user_id) not in team_checklist_links
+    ])
+
+    team_ids = list(Team.audits.through.objects.filter(audit=audit).values_list('team_id', flat=True))
+    add_links(Team.audits, [(team_id, clone.pk) for team_id in team_ids])
+    for team_id in team_ids:
+        sync_team_audits(team_id, [clone.pk])
@@ -0,0 +1,306 @@
+"""
+Timer wheel for due dates of audit tasks, checklists and findings.
+
+Saving an object with a due date plans up to three ``ScheduledDeadline``
+entries: a reminder ``DEADLINE_REMINDER_LEAD_SECONDS`` before the due date,
+the overdue event at the due date and an escalation to the owner
+``DEADLINE_ESCALATION_AFTER_SECONDS`` later. Entries are rounded up to the
+minute, ``fire_due_deadlines`` reads only the buckets that are due, flips
+``is_overdue`` and writes the notifications in bulk.
+
+Entries are checked against the object when they fire, so a changed due date
+or a closed item simply makes older entries no-ops. Unfired entries stay in
+their bucket until a run picks them up, which makes catching up after
+downtime the normal path.
+
+The due date and status an object was loaded with are remembered on
+``post_init``, a save that leaves both alone plans nothing and costs no
+queries.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduledDeadline
+
+REMINDER = ScheduledDeadline.EVENT_REMINDER
+OVERDUE = ScheduledDeadline.EVENT_OVERDUE
+ESCALATION = ScheduledDeadline.EVENT_ESCALATION
+
+# Fields that decide the entries of each target
+STATE_FIELDS = {
+    'audits.audittask': ('due_date', 'task_status'),
+    'checklists.checklist': ('due_date', 'status'),
+    'audits.auditfinding': ('due_date', 'status'),
+}
+
+
+class DeadlineTarget:
+    """How the deadlines of one model are tracked"""
+
+    def __init__(self, model, open_filter, name_field, assignee_paths, escalation_paths, flagged=None):
+        self.model = model
+        self.label = model._meta.label_lower
+        self.open_filter = open_filter
+        self.name_field = name_field
+        self.assignee_paths = assignee_paths
+        self.escalation_paths = escalation_paths
+        # Called with the ids flagged overdue, ``update()`` sends no signals
+        self.flagged = flagged
+
+    def open_objects(self):
+        return self.model.objects.filter(self.open_filter)
+
+    def get_user_ids(self, ids, paths):
+        """``{pk: {user ids}}`` following ``paths``, one query per path"""
+        users = defaultdict(set)
+        for path in paths:
+            for pk, user_id in self.model.objects.filter(pk__in=ids).values_list('pk', path):
+                if user_id:
+                    users[pk].add(user_id)
+        return users
+
+
+def get_targets():
+    from apps.checklists.models import Checklist
+    from apps.checklists.rollups import mark_checklists_changed, mark_tasks_changed
+    from .models import AuditFinding, AuditTask
+
+    targets = [
+        DeadlineTarget(
+            AuditTask,
+            Q(task_status__in=AuditTask.OPEN_STATUSES),
+            'task_name',
+            ['assigned_to', 'assigned_users'],
+            ['audit__created_by'],
+            flagged=mark_tasks_changed,
+        ),
+        DeadlineTarget(
+            Checklist,
+            Q(status__in=Checklist.OPEN_STATUSES),
+            'name',
+            ['assigned_to', 'assigned_users'],
+            ['created_by'],
+            flagged=mark_checklists_changed,
+        ),
+        DeadlineTarget(
+            AuditFinding,
+            Q(status__in=AuditFinding.OPEN_STATUSES),
+            'title',
+            ['assigned_to'],
+            ['created_by'],
+        ),
+    ]
+    return {target.label: target for target in targets}
+
+
+def bucket_for(moment):
+    """The minute bucket of ``moment``, rounded up so nothing fires early"""
+    bucket = moment.replace(second=0, microsecond=0)
+    return bucket if bucket == moment else bucket + timedelta(minutes=1)
+
+
+def plan_events(due_date, now):
+    events = [
+        (OVERDUE, due_date),
+        (ESCALATION, due_date + timedelta(seconds=settings.DEADLINE_ESCALATION_AFTER_SECONDS)),
+    ]
+    if due_date > now:
+        events.append((REMINDER, max(now, due_date - timedelta(seconds=settings.DEADLINE_REMINDER_LEAD_SECONDS))))
+    # Fired entries older than the retention period are gone, do not plan them again
+    horizon = now - timedelta(days=settings.DEADLINE_RETENTION_DAYS)
+    return {event: bucket_for(moment) for event, moment in events if moment >= horizon}
+
+
+def remember_state(instance):
+    """Note the due date and status ``instance`` holds, unknown while unsaved or deferred"""
+    values = instance.__dict__
+    fields = STATE_FIELDS[instance._meta.label_lower]
+    known = instance.pk is not None and all(name in values for name in fields)
+    instance._deadline_state = tuple(values[name] for name in fields) if known else None
+
+
+def sync_entries(target, due_dates, now):
+    """
+    Make the pending entries of ``{pk: due date}`` match their plan, ``None``
+    plans nothing. Takes one read and at most one delete and one insert
+    whatever the number of objects, returns how many were replanned.
+    """
+    wanted = {pk: plan_events(due_date, now) if due_date else {} for pk, due_date in due_dates.items()}
+    entries = ScheduledDeadline.objects.filter(target=target.label, object_id__in=list(due_dates))
+    current = defaultdict(set)
+    for pk, event, due_at, bucket, fired_at in entries.values_list(
+        'object_id', 'event', 'due_at', 'bucket', 'fired_at'
+    ):
+        if fired_at is None:
+            current[pk].add((event, due_at, bucket))
+        elif due_at == due_dates[pk]:
+            # Events already fired for this due date are not repeated
+            wanted[pk].pop(event, None)
+
+    stale = [
+        pk for pk, due_date in due_dates.items()
+        if current[pk] != {(event, due_date, bucket) for event, bucket in wanted[pk].items()}
+    ]
+    if not stale:
+        return 0
+    entries.filter(object_id__in=stale, fired_at__isnull=True).delete()
+    ScheduledDeadline.objects.bulk_create(
+        ScheduledDeadline(target=target.label, object_id=pk, event=event, due_at=due_dates[pk], bucket=bucket)
+        for pk in stale
+        for event, bucket in wanted[pk].items()
+    )
+    return len(stale)
+
+
+def schedule_deadlines(instance, targets=None):
+    """Bring the pending entries of ``instance`` in line with its due date and status"""
+    target = (targets or get_targets()).get(instance._meta.label_lower)
+    if target is None or instance.pk is None:
+        return
+    loaded = getattr(instance, '_deadline_state', None)
+    if loaded is not None and loaded == tuple(getattr(instance, name) for name in STATE_FIELDS[target.label]):
+        return
+
+    due_date = instance.due_date
+    if due_date and not target.open_objects().filter(pk=instance.pk).exists():
+        due_date = None
+    sync_entries(target, {instance.pk: due_date}, timezone.now())
+    remember_state(instance)
+
+
+def schedule_new_deadlines(label, rows):
+    """Plan the entries of freshly inserted open objects from ``(pk, due date)`` rows with one insert"""
+    now = timezone.now()
+    ScheduledDeadline.objects.bulk_create(
+        ScheduledDeadline(target=label, object_id=pk, event=event, due_at=due_date, bucket=bucket)
+        for pk, due_date in rows
+        if due_date
+        for event, bucket in plan_events(due_date, now).items()
+    )
+
+
+def build_notification(target, obj, event, user_id, now):
+    from apps.notifications.models import Notification
+
+    kind = str(target.model._meta.verbose_name)
+    name = getattr(obj, target.name_field)
+    due = timezone.localtime(obj.due_date).strftime('%Y-%m-%d %H:%M')
+    if event == REMINDER:
+        title, message = f"Due soon: {name}", f"{kind} '{name}' is due on {due}."
+    elif event == OVERDUE:
+        title, message = f"Overdue: {name}", f"{kind} '{name}' was due on {due}."
+    else:
+        days = max((now - obj.due_date).days, 1)
+        title = f"Escalation: {name}"
+        message = f"{kind} '{name}' is overdue by {days} day{'s' if days != 1 else ''} (due {due})."
+    return Notification(
+        user_id=user_id,
+        title=title,
+        message=message,
+        type='deadline',
+        metadata={'target': target.label, 'id': obj.pk, 'event': event, 'due_date': obj.due_date.isoformat()},
+    )
+
+
+def fire_due_deadlines(now=None, batch_size=None):
+    """
+    Fire the entries of every bucket up to ``now``.
+
+    Returns ``{"entries": n, "notifications": n}``. Runs that overlap skip
+    each other's locked rows, an entry is marked fired in the same transaction
+    that writes its notifications.
+    """
+    from apps.notifications.models import Notification
+
+    now = now or timezone.now()
+    targets = get_targets()
+    with transaction.atomic():
+        entries = list(
+            ScheduledDeadline.objects.select_for_update(skip_locked=True)
+            .filter(fired_at__isnull=True, bucket__lte=now)
+            .order_by('bucket', 'pk')[: batch_size or settings.DEADLINE_BATCH_SIZE]
+        )
+        if not entries:
+            return {'entries': 0, 'notifications': 0}
+
+        by_target = defaultdict(list)
+        for entry in entries:
+            by_target[entry.target].append(entry)
+
+        notifications = []
+        for label, target_entries in by_target.items():
+            target = targets.get(label)
+            if target is None:
+                continue
+            objects = target.open_objects().only('pk', 'due_date', target.name_field).in_bulk(
+                {entry.object_id for entry in target_entries}
+            )
+            live = [
+                entry for entry in target_entries
+                if entry.object_id in objects
+                and objects[entry.object_id].due_date == entry.due_at
+                # A reminder caught up after the due date would only repeat the overdue event
+                and not (entry.event == REMINDER and entry.due_at <= now)
+            ]
+            if not live:
+                continue
+
+            overdue_ids = {entry.object_id for entry in live if entry.event != REMINDER}
+            flagged_ids = list(
+                target.model.objects.filter(pk__in=overdue_ids, is_overdue=False).values_list('pk', flat=True)
+            )
+            if flagged_ids:
+                target.model.objects.filter(pk__in=flagged_ids).update(is_overdue=True, updated_at=now)
+                if target.flagged:
+                    target.flagged(flagged_ids)
+
+            ids = {entry.object_id for entry in live}
+            assignees = target.get_user_ids(ids, target.assignee_paths)
+            escalation_ids = {entry.object_id for entry in live if entry.event == ESCALATION}
+            owners = target.get_user_ids(escalation_ids, target.escalation_paths) if escalation_ids else {}
+            for entry in live:
+                recipients = owners.get(entry.object_id, set()) if entry.event == ESCALATION else assignees[entry.object_id]
+                obj = objects[entry.object_id]
+                notifications.extend(build_notification(target, obj, entry.event, user_id, now) for user_id in recipients)
+
+        if notifications:
+            Notification.objects.bulk_notify(notifications)
+        ScheduledDeadline.objects.filter(pk__in=[entry.pk for entry in entries]).update(fired_at=now)
+    return {'entries': len(entries), 'notifications': len(notifications)}
+
+
+def rebuild_deadlines(batch_size=None):
+    """
+    Recompute ``is_overdue`` and plan entries for every open object with a due
+    date, ``batch_size`` objects at a time. Entries that are already due are
+    marked fired rather than sent, so a rebuild never floods users with
+    notifications about old deadlines.
+    """
+    now = timezone.now()
+    batch_size = batch_size or settings.DEADLINE_BATCH_SIZE
+    scheduled = 0
+    for target in get_targets().values():
+        target.model.objects.filter(is_overdue=True).exclude(target.open_filter & Q(due_date__lte=now)).update(
+            is_overdue=False
+        )
+        target.open_objects().filter(due_date__lte=now, is_overdue=False).update(is_overdue=True)
+        rows = target.open_objects().filter(due_date__isnull=False).order_by('pk').values_list('pk', 'due_date')
+        last_pk = 0
+        while True:
+            batch = dict(rows.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            sync_entries(target, batch, now)
+            scheduled += len(batch)
+            last_pk = max(batch)
+    ScheduledDeadline.objects.filter(fired_at__isnull=True, bucket__lte=now).update(fired_at=now)
+    # Flags changed with update(), let the dashboards recompute
+    from apps.checklists.rollups import queue_all_scopes
+    queue_all_scopes()
+    return scheduled
@@ -0,0 +1,179 @@
+"""
+Findings analytics cube.
+
+``FindingCubeCell`` holds the number of findings for every combination of
+severity, finding type, control area, risk level and status per month.
+Signals queue the month of every finding that changed in
+``FindingCubeChange`` and the ``compact_findings_cube`` task recounts just
+those months, so an analytics query reads a few hundred cells instead of
+every finding. Queued months are counted live from the findings until they
+are compacted, which keeps answers exact. Responses are cached per filter
+set under a version that moves with every change.
+
+The version lives in the cache, other processes only see it move when the
+cache is shared between them (Redis). With the per-process default cache
+answers can be as old as ``FINDINGS_CUBE_CACHE_TIMEOUT``, which is kept
+short for that case.
+"""
+
+import hashlib
+from datetime import date, datetime, time
+
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc, TruncMonth
+from django.utils import timezone
+
+from .models import AuditFinding, FindingCubeCell, FindingCubeChange
+
+DIMENSIONS = ('severity', 'finding_type', 'control_area', 'risk_level', 'status')
+INTERVALS = ('month', 'quarter', 'year')
+# Saves touching only other fields leave the cube alone
+CUBE_FIELDS = {*DIMENSIONS, 'is_deleted'}
+
+VERSION_KEY = 'findings_cube:version'
+
+
+def period_of(moment):
+    """First day of the month ``moment`` falls in"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def month_bounds(period):
+    start = timezone.make_aware(datetime.combine(period, time.min))
+    end = date(period.year + period.month // 12, period.month % 12 + 1, 1)
+    return start, timezone.make_aware(datetime.combine(end, time.min))
+
+
+def count_period(period):
+    """Live cells of one month, straight from the findings"""
+    start, end = month_bounds(period)
+    return [
+        FindingCubeCell(period=period, **row)
+        for row in AuditFinding.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values(*DIMENSIONS)
+        .annotate(count=Count('pk'))
+        .order_by()
+    ]
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def mark_periods_changed(periods):
+    now = timezone.now()
+    changes = [FindingCubeChange(period=period, changed_at=now) for period in set(periods) if period]
+    if changes:
+        FindingCubeChange.objects.bulk_create(
+            changes, update_conflicts=True, unique_fields=['period'], update_fields=['changed_at']
+        )
+        # Cached answers may include the old numbers
+        bump_version()
+
+
+def compact_periods(batch_size=100):
+    """Recount up to ``batch_size`` queued months, returns how many"""
+    changes = list(FindingCubeChange.objects.order_by('changed_at')[:batch_size])
+    for change in changes:
+        with transaction.atomic():
+            FindingCubeCell.objects.filter(period=change.period).delete()
+            FindingCubeCell.objects.bulk_create(count_period(change.period))
+            # Left in place when the month changed again while it was being counted
+            FindingCubeChange.objects.filter(pk=change.pk, changed_at=change.changed_at).delete()
+    return len(changes)
+
+
+def queue_all_periods():
+    """Queue every month with findings or cells, used by the nightly rebuild"""
+    periods = set(FindingCubeCell.objects.values_list('period', flat=True).distinct())
+    periods |= set(
+        AuditFinding.objects.annotate(period=TruncMonth('created_at', output_field=DateField()))
+        .values_list('period', flat=True)
+        .distinct()
+    )
+    mark_periods_changed(periods)
+    return len(periods)
+
+
+def query_cube(group_by, filters=None, interval=None, period_from=None, period_to=None):
+    """
+    Finding counts grouped by the ``group_by`` dimensions, and by ``period``
+    when an ``interval`` is given.
+
+    ``filters`` maps dimensions to the values to keep, ``period_from`` and
+    ``period_to`` are first days of months. Returns a list of dicts with the
+    grouped values and ``count``.
+    """
+    dimension_filter = {f'{dimension}__in': values for dimension, values in (filters or {}).items() if values}
+    dirty = [
+        period for period in FindingCubeChange.objects.values_list('period', flat=True)
+        if (not period_from or period >= period_from) and (not period_to or period <= period_to)
+    ]
+    keys = list(group_by)
+
+    cells = FindingCubeCell.objects.filter(**dimension_filter).exclude(period__in=dirty)
+    if period_from:
+        cells = cells.filter(period__gte=period_from)
+    if period_to:
+        cells = cells.filter(period__lte=period_to)
+    if interval:
+        cells = cells.annotate(period_bucket=Trunc('period', interval, output_field=DateField()))
+        keys.append('period_bucket')
+    sources = [(cells, Sum('count'))]
+
+    if dirty:
+        months = Q()
+        for period in dirty:
+            start, end = month_bounds(period)
+            months |= Q(created_at__gte=start, created_at__lt=end)
+        live = AuditFinding.objects.filter(months, **dimension_filter)
+        if interval:
+            live = live.annotate(period_bucket=Trunc('created_at', interval, output_field=DateField()))
+        sources.append((live, Count('pk')))
+
+    totals = {}
+    for queryset, total in sources:
+        if keys:
+            rows = queryset.values(*keys).annotate(total=total).order_by()
+        else:
+            rows = [queryset.aggregate(total=total)]
+        for row in rows:
+            key = tuple(row[k] for k in keys)
+            totals[key] = totals.get(key, 0) + (row['total'] or 0)
+
+    rows = []
+    for key, count in totals.items():
+        if not count:
+            continue
+        row = dict(zip(group_by, key))
+        if interval:
+            row['period'] = key[-1]
+        row['count'] = count
+        rows.append(row)
+    return rows
+
+
+def cached_query(params, compute):
+    """``compute()`` cached under the current cube version and ``params``"""
+    digest = hashlib.sha1(orjson.dumps(params, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    key = f'findings_cube:{get_version()}:{digest}'
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result, settings.FINDINGS_CUBE_CACHE_TIMEOUT)
+    return result
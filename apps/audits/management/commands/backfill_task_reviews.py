@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.audits.models import AuditTask
+from apps.audits.reviews import backfill_notes
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the review history kept in AuditTask.completion_notes into AuditReview rows and '
+        'review events. Run once after deploying structured reviews, reruns find nothing left to move.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        tasks = AuditTask.objects.filter(
+            Q(completion_notes__contains='Approved by') | Q(completion_notes__contains='Rejected by')
+        ).select_related('audit').order_by('pk')
+        written, last_pk = 0, 0
+        while True:
+            batch = list(tasks.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            written += backfill_notes(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {written} reviews'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.audits.deadlines import rebuild_deadlines
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute is_overdue and rebuild the deadline timer wheel for audit tasks, '
+        'checklists and findings. Run once after deploying the scheduler.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Objects planned per batch, defaults to DEADLINE_BATCH_SIZE')
+
+    def handle(self, *args, **options):
+        scheduled = rebuild_deadlines(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Scheduled deadlines for {scheduled} objects'))
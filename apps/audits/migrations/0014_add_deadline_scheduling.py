@@ -0,0 +1,106 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_is_overdue(apps, schema_editor):
+    AuditTask = apps.get_model("audits", "AuditTask")
+    AuditFinding = apps.get_model("audits", "AuditFinding")
+    now = timezone.now()
+    AuditTask.objects.filter(
+        due_date__lte=now, checklist__status__in=["draft", "in_progress"]
+    ).update(is_overdue=True)
+    AuditFinding.objects.filter(
+        due_date__lte=now, status__in=["open", "in_progress"], is_deleted=False
+    ).update(is_overdue=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0013_add_audit_item_field"),
+        ("checklists", "0004_checklist_is_overdue"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScheduledDeadline",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("target", models.CharField(max_length=50, verbose_name="Target")),
+                ("object_id", models.PositiveBigIntegerField(verbose_name="Object ID")),
+                (
+                    "event",
+                    models.CharField(
+                        choices=[
+                            ("reminder", "Reminder"),
+                            ("overdue", "Overdue"),
+                            ("escalation", "Escalation"),
+                        ],
+                        max_length=20,
+                        verbose_name="Event",
+                    ),
+                ),
+                ("due_at", models.DateTimeField(verbose_name="Due At")),
+                ("bucket", models.DateTimeField(verbose_name="Bucket")),
+                (
+                    "fired_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Fired At"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Scheduled Deadline",
+                "verbose_name_plural": "Scheduled Deadlines",
+            },
+        ),
+        migrations.AddField(
+            model_name="auditfinding",
+            name="is_overdue",
+            field=models.BooleanField(default=False, verbose_name="Is Overdue"),
+        ),
+        migrations.AddField(
+            model_name="audittask",
+            name="is_overdue",
+            field=models.BooleanField(default=False, verbose_name="Is Overdue"),
+        ),
+        migrations.AddIndex(
+            model_name="auditfinding",
+            index=models.Index(
+                fields=["is_overdue", "due_date"], name="audits_audi_is_over_8683c7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="audittask",
+            index=models.Index(
+                fields=["is_overdue", "due_date"], name="audits_audi_is_over_74abd5_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scheduleddeadline",
+            index=models.Index(
+                condition=models.Q(("fired_at__isnull", True)),
+                fields=["bucket"],
+                name="audits_deadline_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="scheduleddeadline",
+            index=models.Index(
+                fields=["target", "object_id"], name="audits_sche_target_07b9ed_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_overdue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:12
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def queue_periods(apps, schema_editor):
+    # The cells are filled by the next compaction, reads are live until then
+    AuditFinding = apps.get_model("audits", "AuditFinding")
+    FindingCubeChange = apps.get_model("audits", "FindingCubeChange")
+    now = timezone.now()
+    periods = (
+        AuditFinding.objects.filter(is_deleted=False)
+        .annotate(period=TruncMonth("created_at", output_field=models.DateField()))
+        .values_list("period", flat=True)
+        .distinct()
+    )
+    FindingCubeChange.objects.bulk_create(
+        [FindingCubeChange(period=period, changed_at=now) for period in periods]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0014_add_deadline_scheduling"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FindingCubeChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.DateField(unique=True, verbose_name="Period")),
+                ("changed_at", models.DateTimeField(verbose_name="Changed At")),
+            ],
+            options={
+                "verbose_name": "Finding Cube Change",
+                "verbose_name_plural": "Finding Cube Changes",
+            },
+        ),
+        migrations.CreateModel(
+            name="FindingCubeCell",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.DateField(verbose_name="Period")),
+                ("severity", models.CharField(max_length=20, verbose_name="Severity")),
+                (
+                    "finding_type",
+                    models.CharField(max_length=30, verbose_name="Finding Type"),
+                ),
+                (
+                    "control_area",
+                    models.CharField(
+                        blank=True, max_length=255, verbose_name="Control Area"
+                    ),
+                ),
+                (
+                    "risk_level",
+                    models.CharField(max_length=20, verbose_name="Risk Level"),
+                ),
+                ("status", models.CharField(max_length=20, verbose_name="Status")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Count")),
+            ],
+            options={
+                "verbose_name": "Finding Cube Cell",
+                "verbose_name_plural": "Finding Cube Cells",
+                "indexes": [
+                    models.Index(
+                        fields=["severity", "period"],
+                        name="audits_find_severit_9231aa_idx",
+                    ),
+                    models.Index(
+                        fields=["control_area", "period"],
+                        name="audits_find_control_99a977_idx",
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "period",
+                            "severity",
+                            "finding_type",
+                            "control_area",
+                            "risk_level",
+                            "status",
+                        ),
+                        name="audits_finding_cube_cell_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(queue_periods, migrations.RunPython.noop),
+    ]
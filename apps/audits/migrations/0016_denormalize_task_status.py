@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:16
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+CHECKLIST_STATUS_MAPPING = {
+    "draft": "pending",
+    "in_progress": "in_progress",
+    "completed": "completed",
+    "cancelled": "cancelled",
+    "on_hold": "on_hold",
+}
+
+
+def copy_checklist_state(apps, schema_editor):
+    AuditTask = apps.get_model("audits", "AuditTask")
+    Checklist = apps.get_model("checklists", "Checklist")
+    checklist = Checklist.objects.filter(pk=OuterRef("checklist_id"))
+    AuditTask.objects.update(completion_percentage=Subquery(checklist.values("completion_percentage")[:1]))
+    for checklist_status, task_status in CHECKLIST_STATUS_MAPPING.items():
+        AuditTask.objects.filter(checklist__status=checklist_status).update(task_status=task_status)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0015_add_finding_cube"),
+        ("checklists", "0005_dashboard_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audittask",
+            name="completion_percentage",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=0,
+                max_digits=5,
+                verbose_name="Completion Percentage",
+            ),
+        ),
+        migrations.AddField(
+            model_name="audittask",
+            name="task_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("in_progress", "In Progress"),
+                    ("completed", "Completed"),
+                    ("cancelled", "Cancelled"),
+                    ("on_hold", "On Hold"),
+                ],
+                default="pending",
+                max_length=20,
+                verbose_name="Task Status",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="audittask",
+            index=models.Index(
+                fields=["audit", "task_status"], name="audits_audi_audit_i_ce8aff_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="audittask",
+            index=models.Index(
+                fields=["assigned_to", "task_status", "due_date"],
+                name="audits_audi_assigne_8fa30c_idx",
+            ),
+        ),
+        migrations.RunPython(copy_checklist_state, migrations.RunPython.noop),
+    ]
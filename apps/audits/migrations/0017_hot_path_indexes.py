@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0016_denormalize_task_status"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="audit",
+            index=models.Index(fields=["status"], name="audits_audi_status_2432b1_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="audit",
+            index=models.Index(
+                fields=["period_from", "period_to"],
+                name="audits_audi_period__e4e076_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditevidence",
+            index=models.Index(
+                fields=["audit_task", "is_verified"],
+                name="audits_audi_audit_t_d9cfed_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditfinding",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["audit", "status", "severity"],
+                name="audits_finding_audit_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="audittask",
+            index=models.Index(
+                fields=["audit", "-created_at"], name="audits_audi_audit_i_e9ad0c_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="team",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["name"],
+                name="audits_team_alive_idx",
+            ),
+        ),
+    ]
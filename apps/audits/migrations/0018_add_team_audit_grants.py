@@ -0,0 +1,136 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0017_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TeamAuditGrant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "task_access",
+                    models.BooleanField(default=False, verbose_name="Task Access"),
+                ),
+                (
+                    "owns_assignment",
+                    models.BooleanField(default=False, verbose_name="Owns Assignment"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created At"),
+                ),
+                (
+                    "audit",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="team_grants",
+                        to="audits.audit",
+                        verbose_name="Audit",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="audit_grants",
+                        to="audits.team",
+                        verbose_name="Team",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="team_audit_grants",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Team Audit Grant",
+                "verbose_name_plural": "Team Audit Grants",
+                "indexes": [
+                    models.Index(
+                        fields=["audit", "user"], name="audits_team_audit_i_d6d991_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("audit", "team", "user"),
+                        name="audits_team_grant_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="TeamTaskGrant",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "owns_task_link",
+                    models.BooleanField(default=False, verbose_name="Owns Task Link"),
+                ),
+                (
+                    "owns_checklist_link",
+                    models.BooleanField(
+                        default=False, verbose_name="Owns Checklist Link"
+                    ),
+                ),
+                (
+                    "audit_task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="team_grants",
+                        to="audits.audittask",
+                        verbose_name="Audit Task",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="team_task_grants",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="User",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Team Task Grant",
+                "verbose_name_plural": "Team Task Grants",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("audit_task", "user"),
+                        name="audits_team_task_grant_unique",
+                    )
+                ],
+            },
+        ),
+    ]
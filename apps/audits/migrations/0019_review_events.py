@@ -0,0 +1,104 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("audits", "0018_add_team_audit_grants"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditReviewEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "event",
+                    models.CharField(
+                        choices=[
+                            ("submitted", "Submitted"),
+                            ("approved", "Approved"),
+                            ("rejected", "Rejected"),
+                        ],
+                        max_length=20,
+                        verbose_name="Event",
+                    ),
+                ),
+                (
+                    "actor_name",
+                    models.CharField(
+                        blank=True, max_length=150, verbose_name="Actor Name"
+                    ),
+                ),
+                (
+                    "occurred_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now, verbose_name="Occurred At"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Audit Review Event",
+                "verbose_name_plural": "Audit Review Events",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="auditreview",
+            index=models.Index(
+                fields=["audit_task", "status"], name="audits_audi_audit_t_5d3020_idx"
+            ),
+        ),
+        migrations.AddField(
+            model_name="auditreviewevent",
+            name="actor",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Actor",
+            ),
+        ),
+        migrations.AddField(
+            model_name="auditreviewevent",
+            name="audit_task",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="review_events",
+                to="audits.audittask",
+                verbose_name="Audit Task",
+            ),
+        ),
+        migrations.AddField(
+            model_name="auditreviewevent",
+            name="review",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="events",
+                to="audits.auditreview",
+                verbose_name="Review",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditreviewevent",
+            index=models.Index(
+                fields=["audit_task", "occurred_at"],
+                name="audits_audi_audit_t_c425f7_idx",
+            ),
+        ),
+    ]
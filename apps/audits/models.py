@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.user.models import User
 from apps.utils.models import SoftDeleteModel
@@ -118,7 +119,7 @@ class Audit(models.Model):
             return {'total': 0, 'completed': 0, 'percentage': 0}
         
         total_tasks = tasks.count()
-        completed_tasks = tasks.filter(checklist__status='completed').count()
+        completed_tasks = tasks.filter(task_status='completed').count()
         percentage = (completed_tasks / total_tasks) * 100 if total_tasks > 0 else 0
         
         return {
@@ -127,6 +128,25 @@ class Audit(models.Model):
             'percentage': round(percentage, 2)
         }
 
+    @staticmethod
+    def task_count_annotations():
+        """Per-status task counts, annotated so list views avoid a query per audit"""
+        return {
+            'tasks_total': models.Count('audit_tasks', distinct=True),
+            'tasks_pending': models.Count(
+                'audit_tasks', filter=models.Q(audit_tasks__task_status='pending'), distinct=True
+            ),
+            'tasks_in_progress': models.Count(
+                'audit_tasks', filter=models.Q(audit_tasks__task_status='in_progress'), distinct=True
+            ),
+            'tasks_completed': models.Count(
+                'audit_tasks', filter=models.Q(audit_tasks__task_status='completed'), distinct=True
+            ),
+            'tasks_overdue': models.Count(
+                'audit_tasks', filter=models.Q(audit_tasks__is_overdue=True), distinct=True
+            ),
+        }
+
     def save(self, *args, **kwargs):
         if not self.reference_number:
             # Get the latest audit number
@@ -188,6 +208,10 @@ class Audit(models.Model):
         ordering = ['-created_at']
         verbose_name = _('Audit')
         verbose_name_plural = _('Audits')
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['period_from', 'period_to']),
+        ]
 
 
 class AuditTask(models.Model):
@@ -201,6 +225,16 @@ class AuditTask(models.Model):
         ('cancelled', _('Cancelled')),
         ('on_hold', _('On Hold')),
     ]
+    # Task status for each checklist status, anything else counts as pending
+    CHECKLIST_STATUS_MAPPING = {
+        'draft': 'pending',
+        'in_progress': 'in_progress',
+        'completed': 'completed',
+        'cancelled': 'cancelled',
+        'on_hold': 'on_hold'
+    }
+    # Statuses in which a passed due date makes the task overdue
+    OPEN_STATUSES = ('pending', 'in_progress')
     
     TASK_PRIORITY_CHOICES = [
         ('low', _('Low')),
@@ -244,8 +278,22 @@ class AuditTask(models.Model):
         help_text=_('Multiple users can be assigned to work on this task')
     )
     due_date = models.DateTimeField(null=True, blank=True, verbose_name=_('Due Date'))
+    # Kept current by save() and the deadline scheduler (apps.audits.deadlines)
+    is_overdue = models.BooleanField(default=False, verbose_name=_('Is Overdue'))
     
-    # Status tracking
+    # Status tracking, copied from the linked checklist by save() and its post_save signal
+    task_status = models.CharField(
+        max_length=20,
+        choices=TASK_STATUS_CHOICES,
+        default='pending',
+        verbose_name=_('Task Status')
+    )
+    completion_percentage = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        default=0,
+        verbose_name=_('Completion Percentage')
+    )
     priority = models.CharField(
         max_length=20,
         choices=TASK_PRIORITY_CHOICES,
@@ -291,24 +339,38 @@ class AuditTask(models.Model):
         verbose_name = _('Audit Task')
         verbose_name_plural = _('Audit Tasks')
         unique_together = ['audit', 'checklist']
-
+        indexes = [
+            models.Index(fields=['is_overdue', 'due_date']),
+            models.Index(fields=['audit', 'task_status']),
+            models.Index(fields=['assigned_to', 'task_status', 'due_date']),
+            models.Index(fields=['audit', '-created_at']),
+        ]
+    
     def __str__(self):
         return f"{self.audit.reference_number} - {self.task_name}"
-
+    
+    def apply_checklist_state(self, checklist):
+        """Copy status, progress and completion time from ``checklist``, returns whether anything changed"""
+        from django.utils import timezone
+        before = (self.task_status, self.completion_percentage, self.completed_at, self.is_overdue)
+        self.task_status = self.CHECKLIST_STATUS_MAPPING.get(checklist.status, 'pending')
+        self.completion_percentage = checklist.completion_percentage
+        if self.task_status == 'completed':
+            self.completed_at = self.completed_at or checklist.completed_at or timezone.now()
+        else:
+            self.completed_at = None
+        self.is_overdue = bool(
+            self.due_date and self.task_status in self.OPEN_STATUSES and self.due_date <= timezone.now()
+        )
+        return before != (self.task_status, self.completion_percentage, self.completed_at, self.is_overdue)
+    
     def save(self, *args, **kwargs):
-        # Sync status with checklist
-        if self.checklist_id:
+        # Sync status with checklist, using the cached relation when it is loaded
+        from apps.checklists.models import Checklist
+        if self.checklist_id and kwargs.get('update_fields') is None:
             try:
-                from apps.checklists.models import Checklist
-                checklist = Checklist.objects.get(id=self.checklist_id)
-                
-                # Update completion status based on checklist
-                if checklist.status == 'completed' and not self.completed_at:
-                    from django.utils import timezone
-                    self.completed_at = timezone.now()
-                elif checklist.status != 'completed':
-                    self.completed_at = None
-            except:
+                self.apply_checklist_state(self.checklist)
+            except Checklist.DoesNotExist:
                 pass  # Handle case where checklist doesn't exist yet
         
         super().save(*args, **kwargs)
@@ -325,25 +387,12 @@ class AuditTask(models.Model):
             AuditTask.objects.filter(pk=self.pk).update(assigned_to=self.assigned_to)
 
     def get_task_status(self):
-        """Get task status based on checklist status"""
-        if not self.checklist:
-            return 'pending'
-        
-        status_mapping = {
-            'draft': 'pending',
-            'in_progress': 'in_progress',
-            'completed': 'completed',
-            'cancelled': 'cancelled',
-            'on_hold': 'on_hold'
-        }
-        
-        return status_mapping.get(self.checklist.status, 'pending')
+        """Get task status, kept in sync with the checklist status"""
+        return self.task_status
     
     def get_completion_percentage(self):
-        """Get completion percentage from linked checklist"""
-        if self.checklist:
-            return self.checklist.get_progress_percentage()
-        return 0
+        """Get completion percentage of the linked checklist as integer"""
+        return int(self.completion_percentage)
 
 
 class AuditEvidence(models.Model):
@@ -419,6 +468,9 @@ class AuditEvidence(models.Model):
         ordering = ['-collected_at']
         verbose_name = _('Audit Evidence')
         verbose_name_plural = _('Audit Evidence')
+        indexes = [
+            models.Index(fields=['audit_task', 'is_verified']),
+        ]
 
     def __str__(self):
         return f"{self.audit_task.task_name} - {self.title}"
@@ -547,10 +599,16 @@ class AuditReview(SoftDeleteModel):
         verbose_name=_('Is Final Approval')
     )
     
+    # Review cycles still waiting for a decision
+    OPEN_STATUSES = ('pending', 'in_review')
+    
     class Meta:
         ordering = ['-requested_at']
         verbose_name = _('Audit Review')
         verbose_name_plural = _('Audit Reviews')
+        indexes = [
+            models.Index(fields=['audit_task', 'status']),
+        ]
     
     def __str__(self):
         item = self.audit_task or self.audit_evidence or self.audit
@@ -619,6 +677,46 @@ class AuditReview(SoftDeleteModel):
             self.audit_evidence.save()
 
 
+class AuditReviewEvent(models.Model):
+    """
+    One state change of a review, see ``apps.audits.reviews``. Rows are only
+    ever inserted, the review history of a task is read from them in order.
+    """
+    EVENT_SUBMITTED = 'submitted'
+    EVENT_APPROVED = 'approved'
+    EVENT_REJECTED = 'rejected'
+    EVENT_CHOICES = [
+        (EVENT_SUBMITTED, _('Submitted')),
+        (EVENT_APPROVED, _('Approved')),
+        (EVENT_REJECTED, _('Rejected')),
+    ]
+
+    review = models.ForeignKey(
+        AuditReview, on_delete=models.CASCADE, related_name='events', verbose_name=_('Review')
+    )
+    # Copied from the review so a task's history is one index range
+    audit_task = models.ForeignKey(
+        'AuditTask', on_delete=models.CASCADE, related_name='review_events', verbose_name=_('Audit Task')
+    )
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES, verbose_name=_('Event'))
+    actor = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name=_('Actor')
+    )
+    # Only set when the actor is not a known user, e.g. for history backfilled from notes
+    actor_name = models.CharField(max_length=150, blank=True, verbose_name=_('Actor Name'))
+    occurred_at = models.DateTimeField(default=timezone.now, verbose_name=_('Occurred At'))
+
+    class Meta:
+        verbose_name = _('Audit Review Event')
+        verbose_name_plural = _('Audit Review Events')
+        indexes = [
+            models.Index(fields=['audit_task', 'occurred_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event} review {self.review_id} @ {self.occurred_at:%Y-%m-%d %H:%M}"
+
+
 class ReviewComment(SoftDeleteModel):
     """Comments on reviews for discussion"""
     
@@ -743,6 +841,8 @@ class AuditFinding(SoftDeleteModel):
         ('closed', _('Closed')),
         ('not_applicable', _('Not Applicable')),
     ]
+    # Statuses in which a passed due date makes the finding overdue
+    OPEN_STATUSES = ('open', 'in_progress')
     
     # Basic finding information
     title = models.CharField(max_length=255, verbose_name=_('Finding Title'))
@@ -816,6 +916,8 @@ class AuditFinding(SoftDeleteModel):
         blank=True,
         verbose_name=_('Due Date')
     )
+    # Kept current by save() and the deadline scheduler (apps.audits.deadlines)
+    is_overdue = models.BooleanField(default=False, verbose_name=_('Is Overdue'))
     
     # Tracking
     created_by = models.ForeignKey(
@@ -829,9 +931,27 @@ class AuditFinding(SoftDeleteModel):
         ordering = ['-created_at']
         verbose_name = _('Audit Finding')
         verbose_name_plural = _('Audit Findings')
+        indexes = [
+            models.Index(fields=['is_overdue', 'due_date']),
+            models.Index(
+                fields=['audit', 'status', 'severity'],
+                condition=models.Q(is_deleted=False),
+                name='audits_finding_audit_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.audit.reference_number} - {self.title}"
+    
+    def save(self, *args, **kwargs):
+        from django.utils import timezone
+        self.is_overdue = bool(
+            self.due_date and self.status in self.OPEN_STATUSES and self.due_date <= timezone.now()
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'due_date'} & set(update_fields):
+            kwargs['update_fields'] = [*update_fields, 'is_overdue']
+        super().save(*args, **kwargs)
 
 
 class Team(SoftDeleteModel):
@@ -913,6 +1033,9 @@ class Team(SoftDeleteModel):
         indexes = [
             models.Index(fields=['type', 'is_active']),
             models.Index(fields=['owner', 'is_active']),
+            models.Index(
+                fields=['name'], condition=models.Q(is_deleted=False), name='audits_team_alive_idx'
+            ),
         ]
     
     def __str__(self):
@@ -920,10 +1043,8 @@ class Team(SoftDeleteModel):
     
     def get_all_members(self):
         """Get all team members including the owner"""
-        member_ids = list(self.members.values_list('id', flat=True))
-        if self.owner_id not in member_ids:
-            member_ids.append(self.owner_id)
-        return User.objects.filter(id__in=member_ids)
+        from .team_cache import team_member_ids
+        return User.objects.filter(id__in=team_member_ids(self.pk) | {self.owner_id})
     
     def add_member(self, user, role='member', added_by=None):
         """Add a user to the team with specified role"""
@@ -943,23 +1064,24 @@ class Team(SoftDeleteModel):
     
     def get_member_count(self):
         """Get total number of team members including owner"""
-        return self.members.count() + (1 if self.owner else 0)
+        from .team_cache import team_member_ids
+        return len(team_member_ids(self.pk)) + (1 if self.owner_id else 0)
     
     def is_member(self, user):
         """Check if a user is a member of this team or the owner"""
-        return user == self.owner or self.members.filter(id=user.id).exists()
+        from .team_cache import team_member_ids
+        return user.pk is not None and (user.pk == self.owner_id or user.pk in team_member_ids(self.pk))
     
     def can_manage(self, user):
         """Check if a user can manage this team"""
-        if user == self.owner:
+        from .team_cache import managed_team_ids
+        if user.pk is None:
+            return False
+        if user.pk == self.owner_id:
             return True
         
         # Check if user is a team manager
-        return TeamMember.objects.filter(
-            team=self,
-            user=user,
-            role__in=['manager', 'admin']
-        ).exists()
+        return self.pk in managed_team_ids(user.pk)
 
 
 class TeamMember(models.Model):
@@ -1069,3 +1191,153 @@ class TeamMember(models.Model):
             self.can_manage_team = False
         
         super().save(*args, **kwargs)
+
+
+class TeamAuditGrant(models.Model):
+    """
+    A member's access to an audit through one of their teams, see
+    ``apps.audits.assignments``.
+
+    ``owns_assignment`` is set when team assignment is what put the user on
+    ``Audit.assigned_users``, so unassigning the team leaves users who were
+    assigned directly where they are.
+    """
+    audit = models.ForeignKey(
+        Audit, on_delete=models.CASCADE, related_name='team_grants', verbose_name=_('Audit')
+    )
+    team = models.ForeignKey(
+        Team, on_delete=models.CASCADE, related_name='audit_grants', verbose_name=_('Team')
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='team_audit_grants', verbose_name=_('User')
+    )
+    # The member's role also puts them on the audit's tasks and checklists
+    task_access = models.BooleanField(default=False, verbose_name=_('Task Access'))
+    owns_assignment = models.BooleanField(default=False, verbose_name=_('Owns Assignment'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+
+    class Meta:
+        verbose_name = _('Team Audit Grant')
+        verbose_name_plural = _('Team Audit Grants')
+        constraints = [
+            models.UniqueConstraint(fields=['audit', 'team', 'user'], name='audits_team_grant_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['audit', 'user']),
+        ]
+
+    def __str__(self):
+        return f"{self.team_id} -> {self.audit_id}: {self.user_id}"
+
+
+class TeamTaskGrant(models.Model):
+    """
+    The task and checklist links team grants gave a user on one task, see
+    ``apps.audits.assignments``.
+
+    The ``owns_*`` flags are set when the team grant made the link, so taking
+    the grant back leaves links the user had beforehand, assigned directly.
+    """
+    audit_task = models.ForeignKey(
+        AuditTask, on_delete=models.CASCADE, related_name='team_grants', verbose_name=_('Audit Task')
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='team_task_grants', verbose_name=_('User')
+    )
+    owns_task_link = models.BooleanField(default=False, verbose_name=_('Owns Task Link'))
+    owns_checklist_link = models.BooleanField(default=False, verbose_name=_('Owns Checklist Link'))
+
+    class Meta:
+        verbose_name = _('Team Task Grant')
+        verbose_name_plural = _('Team Task Grants')
+        constraints = [
+            models.UniqueConstraint(fields=['audit_task', 'user'], name='audits_team_task_grant_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.audit_task_id}: {self.user_id}"
+
+
+class ScheduledDeadline(models.Model):
+    """
+    One pending deadline event in the timer wheel, see ``apps.audits.deadlines``.
+
+    Entries sit in per-minute buckets so each scheduler run only reads the
+    buckets that came due since the last one.
+    """
+    EVENT_REMINDER = 'reminder'
+    EVENT_OVERDUE = 'overdue'
+    EVENT_ESCALATION = 'escalation'
+    EVENT_CHOICES = [
+        (EVENT_REMINDER, _('Reminder')),
+        (EVENT_OVERDUE, _('Overdue')),
+        (EVENT_ESCALATION, _('Escalation')),
+    ]
+
+    # Model label of the tracked object, e.g. ``audits.audittask``
+    target = models.CharField(max_length=50, verbose_name=_('Target'))
+    object_id = models.PositiveBigIntegerField(verbose_name=_('Object ID'))
+    event = models.CharField(max_length=20, choices=EVENT_CHOICES, verbose_name=_('Event'))
+    # Due date the entry was planned from, entries for an older due date are stale
+    due_at = models.DateTimeField(verbose_name=_('Due At'))
+    bucket = models.DateTimeField(verbose_name=_('Bucket'))
+    fired_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Fired At'))
+
+    class Meta:
+        verbose_name = _('Scheduled Deadline')
+        verbose_name_plural = _('Scheduled Deadlines')
+        indexes = [
+            models.Index(
+                fields=['bucket'], condition=models.Q(fired_at__isnull=True), name='audits_deadline_pending_idx'
+            ),
+            models.Index(fields=['target', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.target}:{self.object_id} @ {self.bucket:%Y-%m-%d %H:%M}"
+
+
+class FindingCubeCell(models.Model):
+    """
+    Number of findings for one combination of dimensions in one month, see
+    ``apps.audits.findings_cube``.
+    """
+    # First day of the month the findings were raised in
+    period = models.DateField(verbose_name=_('Period'))
+    severity = models.CharField(max_length=20, verbose_name=_('Severity'))
+    finding_type = models.CharField(max_length=30, verbose_name=_('Finding Type'))
+    control_area = models.CharField(max_length=255, blank=True, verbose_name=_('Control Area'))
+    risk_level = models.CharField(max_length=20, verbose_name=_('Risk Level'))
+    status = models.CharField(max_length=20, verbose_name=_('Status'))
+    count = models.PositiveIntegerField(default=0, verbose_name=_('Count'))
+
+    class Meta:
+        verbose_name = _('Finding Cube Cell')
+        verbose_name_plural = _('Finding Cube Cells')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['period', 'severity', 'finding_type', 'control_area', 'risk_level', 'status'],
+                name='audits_finding_cube_cell_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['severity', 'period']),
+            models.Index(fields=['control_area', 'period']),
+        ]
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} {self.severity}/{self.control_area or '-'}/{self.status}: {self.count}"
+
+
+class FindingCubeChange(models.Model):
+    """A month whose cube cells are out of date, queued by signals and cleared by compaction"""
+
+    period = models.DateField(unique=True, verbose_name=_('Period'))
+    changed_at = models.DateTimeField(verbose_name=_('Changed At'))
+
+    class Meta:
+        verbose_name = _('Finding Cube Change')
+        verbose_name_plural = _('Finding Cube Changes')
+
+    def __str__(self):
+        return f"{self.period:%Y-%m} changed {self.changed_at}"
@@ -0,0 +1,169 @@
+"""
+Review history of audit tasks.
+
+Submitting a task for review opens an ``AuditReview`` (one per review
+cycle), approving or rejecting it records the decision on that row. Every
+state change also appends an ``AuditReviewEvent``: a small row that is never
+updated, indexed on ``(audit_task, occurred_at)``, so the history of a task
+is a single range read however many cycles it went through.
+
+History kept in ``AuditTask.completion_notes`` by earlier versions is moved
+into these tables by ``backfill_notes`` (the ``backfill_task_reviews``
+command).
+"""
+
+import re
+
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from apps.user.models import User
+
+from .models import AuditReview, AuditReviewEvent, AuditTask
+
+# Review status a decision leaves the review in
+DECISIONS = {
+    AuditReviewEvent.EVENT_APPROVED: 'approved',
+    AuditReviewEvent.EVENT_REJECTED: 'rejected',
+}
+
+# Lines the review actions used to append to ``completion_notes``
+NOTE_PATTERN = re.compile(r'^(Approved|Rejected) by (.+?):(.*)$')
+
+
+def display_name(user):
+    return user.get_full_name() or user.username
+
+
+@transaction.atomic
+def request_review(task, user, reviewer=None):
+    """Open a review cycle for ``task``, the reviewer defaults to the creator of the audit"""
+    review = AuditReview.objects.create(
+        audit_task=task,
+        audit_id=task.audit_id,
+        review_type='task',
+        reviewer=reviewer or task.audit.created_by,
+        requested_by=user,
+    )
+    AuditReviewEvent.objects.create(
+        review=review, audit_task=task, event=AuditReviewEvent.EVENT_SUBMITTED, actor=user
+    )
+    return review
+
+
+@transaction.atomic
+def record_decision(task, user, event, comments=''):
+    """Approve or reject the open review of ``task``, a review is opened when none is"""
+    now = timezone.now()
+    review = AuditReview.objects.select_for_update().filter(
+        audit_task=task, status__in=AuditReview.OPEN_STATUSES
+    ).order_by('-requested_at', '-pk').first()
+    if review is None:
+        review = AuditReview(audit_task=task, audit_id=task.audit_id, review_type='task', requested_by=user)
+    review.reviewer = user
+    review.status = DECISIONS[event]
+    review.comments = comments
+    review.reviewed_at = now
+    review.save()
+    AuditReviewEvent.objects.create(review=review, audit_task=task, event=event, actor=user, occurred_at=now)
+    return review
+
+
+def review_history(task):
+    """State changes of the task's reviews, oldest first"""
+    events = AuditReviewEvent.objects.filter(audit_task=task).select_related('review', 'actor').order_by(
+        'occurred_at', 'pk'
+    )
+    history = []
+    for event in events:
+        actor = display_name(event.actor) if event.actor else event.actor_name
+        entry = {
+            'review_id': event.review_id,
+            'action': event.event,
+            'actor': actor,
+            'comments': event.review.comments if event.event in DECISIONS else '',
+            'timestamp': event.occurred_at.isoformat(),
+        }
+        entry['details'] = f"{event.get_event_display()} by {actor}"
+        if entry['comments']:
+            entry['details'] += f": {entry['comments']}"
+        history.append(entry)
+    return history
+
+
+def parse_notes(notes):
+    """``(decisions, remaining notes)``, decisions are ``(event, name, comments)`` in note order"""
+    decisions, remaining = [], []
+    for line in notes.split('\n'):
+        match = NOTE_PATTERN.match(line.strip())
+        if match:
+            action, name, comments = match.groups()
+            decisions.append((action.lower(), name.strip(), comments.strip()))
+        else:
+            remaining.append(line)
+    return decisions, '\n'.join(remaining).strip()
+
+
+def match_users(names):
+    """``{name: user id}`` for names that are a username or a full name"""
+    users = User.objects.annotate(full_name=Concat('first_name', Value(' '), 'last_name')).filter(
+        Q(username__in=names) | Q(full_name__in=names)
+    ).values_list('pk', 'username', 'full_name')
+    matched = {}
+    for pk, username, full_name in users:
+        matched.setdefault(full_name, pk)
+        matched[username] = pk
+    return matched
+
+
+@transaction.atomic
+def backfill_notes(tasks):
+    """
+    Turn the review lines in the notes of ``tasks`` into reviews and events
+    and take them out of the notes. The notes carry no times, entries are
+    stamped with the task's ``updated_at`` like the old history was.
+    Returns the number of reviews written.
+    """
+    parsed = []
+    for task in tasks:
+        decisions, remaining = parse_notes(task.completion_notes)
+        if decisions:
+            parsed.append((task, decisions, remaining))
+    users = match_users({name for _task, decisions, _remaining in parsed for _event, name, _comments in decisions})
+
+    reviews, events = [], []
+    for task, decisions, remaining in parsed:
+        for event, name, comments in decisions:
+            actor_id = users.get(name)
+            reviews.append(AuditReview(
+                audit_task=task,
+                audit_id=task.audit_id,
+                review_type='task',
+                status=DECISIONS[event],
+                reviewer_id=actor_id or task.audit.created_by_id,
+                requested_by_id=actor_id or task.audit.created_by_id,
+                comments=comments,
+                reviewed_at=task.updated_at,
+            ))
+            events.append(AuditReviewEvent(
+                audit_task=task,
+                event=event,
+                actor_id=actor_id,
+                actor_name='' if actor_id else name,
+                occurred_at=task.updated_at,
+            ))
+        task.completion_notes = remaining
+
+    AuditReview.objects.bulk_create(reviews)
+    for review in reviews:
+        # auto_now_add stamped the insert time, the review happened back then
+        review.requested_at = review.reviewed_at
+    AuditReview.objects.bulk_update(reviews, ['requested_at'])
+    for review, event in zip(reviews, events):
+        event.review = review
+    AuditReviewEvent.objects.bulk_create(events)
+    # bulk_update leaves updated_at alone, the tasks were not edited
+    AuditTask.objects.bulk_update([task for task, _decisions, _remaining in parsed], ['completion_notes'])
+    return len(reviews)
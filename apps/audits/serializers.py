@@ -3,7 +3,10 @@ from django.contrib.auth import get_user_model
 from .models import Audit, AuditType, CustomAuditType, AuditTask, AuditEvidence, AuditFinding, Team, TeamMember
 from apps.checklists.models import ChecklistTemplate, Checklist
 from apps.checklists.serializers import ChecklistDetailSerializer, ChecklistTemplateDetailSerializer
-from django.utils import timezone
+from apps.utils.serializers import SparseFieldsetSerializerMixin
+from .findings_cube import DIMENSIONS, INTERVALS
+from .assignments import queue_team_sync
+from .team_cache import forget_team_graph, visible_team_ids
 
 User = get_user_model()
 
@@ -78,17 +81,15 @@ class AuditTaskCreateSerializer(serializers.ModelSerializer):
             tags=[audit.reference_number, 'audit', 'task']
         )
         
-        # Create initial responses for all template fields
-        for field in template.fields.all():
-            from apps.checklists.models import ChecklistResponse
-            ChecklistResponse.objects.create(
-                checklist=checklist,
-                field=field,
-                value={}
-            )
-        
-        # Update checklist progress
-        checklist.update_progress()
+        # Create initial responses for all template fields, progress is updated once at the end
+        with checklist.deferred_progress():
+            for field in template.fields.all():
+                from apps.checklists.models import ChecklistResponse
+                ChecklistResponse.objects.create(
+                    checklist=checklist,
+                    field=field,
+                    value={}
+                )
         
         # Increment template usage
         template.increment_usage()
@@ -101,7 +102,7 @@ class AuditTaskCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class AuditTaskDetailSerializer(serializers.ModelSerializer):
+class AuditTaskDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Detailed serializer for audit tasks"""
     checklist = ChecklistDetailSerializer(read_only=True)
     assigned_to_name = serializers.SerializerMethodField()
@@ -115,13 +116,13 @@ class AuditTaskDetailSerializer(serializers.ModelSerializer):
         model = AuditTask
         fields = [
             'id', 'audit_id', 'task_name', 'description', 'assigned_to', 'assigned_to_name',
-            'assigned_users', 'assigned_users_details', 'due_date', 'priority', 'control_area', 'risk_level',
-            'created_by', 'created_by_name', 'created_at', 'updated_at',
+            'assigned_users', 'assigned_users_details', 'due_date', 'is_overdue', 'priority', 'control_area',
+            'risk_level', 'created_by', 'created_by_name', 'created_at', 'updated_at',
             'completed_at', 'completion_notes', 'checklist',
             'task_status', 'completion_percentage', 'evidence_count'
         ]
         read_only_fields = [
-            'id', 'created_by', 'created_at', 'updated_at', 'completed_at'
+            'id', 'created_by', 'created_at', 'updated_at', 'completed_at', 'is_overdue'
         ]
         extra_kwargs = {
             'task_name': {'required': False},
@@ -186,10 +187,12 @@ class AuditTaskDetailSerializer(serializers.ModelSerializer):
         return obj.get_completion_percentage()
     
     def get_evidence_count(self, obj):
+        if hasattr(obj, 'evidence_total'):
+            return obj.evidence_total
         return obj.evidence.count()
 
 
-class AuditTaskListSerializer(serializers.ModelSerializer):
+class AuditTaskListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """List serializer for audit tasks"""
     assigned_to_name = serializers.SerializerMethodField()
     task_status = serializers.SerializerMethodField()
@@ -200,10 +203,13 @@ class AuditTaskListSerializer(serializers.ModelSerializer):
         model = AuditTask
         fields = [
             'id', 'task_name', 'description', 'assigned_to_name',
-            'due_date', 'priority', 'control_area', 'risk_level',
+            'due_date', 'is_overdue', 'priority', 'control_area', 'risk_level',
             'task_status', 'completion_percentage', 'template_name',
             'created_at', 'updated_at'
         ]
+        expandable_fields = {
+            'checklist': ('apps.checklists.serializers.ChecklistListSerializer', {}),
+        }
     
     def get_assigned_to_name(self, obj):
         if obj.assigned_to:
@@ -274,9 +280,9 @@ class AuditFindingSerializer(serializers.ModelSerializer):
         model = AuditFinding
         fields = [
             'id', 'audit_task', 'audit_task_name', 'title', 'description', 
-            'severity', 'category', 'status', 'created_by', 'created_at', 'updated_at'
+            'severity', 'category', 'status', 'is_overdue', 'created_by', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at']
+        read_only_fields = ['created_by', 'created_at', 'updated_at', 'is_overdue']
     
     def get_audit_task_name(self, obj):
         return obj.audit_task.task_name if obj.audit_task else ''
@@ -286,7 +292,7 @@ class AuditFindingSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class AuditSerializer(serializers.ModelSerializer):
+class AuditSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     created_by_name = serializers.SerializerMethodField()
     assigned_users_details = serializers.SerializerMethodField()
     workflow_name = serializers.SerializerMethodField()
@@ -307,6 +313,9 @@ class AuditSerializer(serializers.ModelSerializer):
             'task_progress', 'tasks_summary'
         ]
         read_only_fields = ['reference_number', 'created_by', 'created_at', 'updated_at']
+        expandable_fields = {
+            'tasks': (AuditTaskListSerializer, {'source': 'audit_tasks', 'many': True}),
+        }
 
     def get_created_by_name(self, obj):
         if not obj.created_by:
@@ -331,20 +340,32 @@ class AuditSerializer(serializers.ModelSerializer):
     
     def get_task_progress(self, obj):
         """Get task completion progress"""
+        if hasattr(obj, 'tasks_total'):
+            total, completed = obj.tasks_total, obj.tasks_completed
+            return {
+                'total': total,
+                'completed': completed,
+                'percentage': round((completed / total) * 100, 2) if total else 0
+            }
         return obj.get_task_progress()
     
     def get_tasks_summary(self, obj):
         """Get summary of audit tasks"""
+        if hasattr(obj, 'tasks_total'):
+            return {
+                'total': obj.tasks_total,
+                'pending': obj.tasks_pending,
+                'in_progress': obj.tasks_in_progress,
+                'completed': obj.tasks_completed,
+                'overdue': obj.tasks_overdue
+            }
         tasks = obj.audit_tasks.all()
         return {
             'total': tasks.count(),
-            'pending': tasks.filter(checklist__status='draft').count(),
-            'in_progress': tasks.filter(checklist__status='in_progress').count(),
-            'completed': tasks.filter(checklist__status='completed').count(),
-            'overdue': tasks.filter(
-                due_date__lt=timezone.now(),
-                checklist__status__in=['draft', 'in_progress']
-            ).count() if hasattr(timezone, 'now') else 0
+            'pending': tasks.filter(task_status='pending').count(),
+            'in_progress': tasks.filter(task_status='in_progress').count(),
+            'completed': tasks.filter(task_status='completed').count(),
+            'overdue': tasks.filter(is_overdue=True).count()
         }
 
     def validate(self, data):
@@ -430,7 +451,7 @@ class TeamMemberSerializer(serializers.ModelSerializer):
         return ''
 
 
-class TeamListSerializer(serializers.ModelSerializer):
+class TeamListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for team list view (minimal data)"""
     owner_name = serializers.SerializerMethodField()
     member_count = serializers.SerializerMethodField()
@@ -452,6 +473,8 @@ class TeamListSerializer(serializers.ModelSerializer):
     
     def get_member_count(self, obj):
         """Get total member count including owner"""
+        if hasattr(obj, 'member_total'):
+            return obj.member_total + (1 if obj.owner_id else 0)
         return obj.get_member_count()
     
     def get_type_display(self, obj):
@@ -459,7 +482,7 @@ class TeamListSerializer(serializers.ModelSerializer):
         return obj.get_type_display()
 
 
-class TeamDetailSerializer(serializers.ModelSerializer):
+class TeamDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer for detailed team view"""
     owner_details = serializers.SerializerMethodField()
     members_details = TeamMemberSerializer(source='team_memberships', many=True, read_only=True)
@@ -487,6 +510,8 @@ class TeamDetailSerializer(serializers.ModelSerializer):
     
     def get_member_count(self, obj):
         """Get total member count including owner"""
+        if hasattr(obj, 'member_total'):
+            return obj.member_total + (1 if obj.owner_id else 0)
         return obj.get_member_count()
     
     def get_type_display(self, obj):
@@ -501,6 +526,8 @@ class TeamDetailSerializer(serializers.ModelSerializer):
     
     def get_audit_count(self, obj):
         """Get number of audits assigned to this team"""
+        if hasattr(obj, 'audit_total'):
+            return obj.audit_total
         return obj.audits.count()
 
 
@@ -595,6 +622,9 @@ class TeamCreateUpdateSerializer(serializers.ModelSerializer):
             team_members.append(team_member)
         
         TeamMember.objects.bulk_create(team_members, ignore_conflicts=True)
+        # bulk_create() sends no signals
+        forget_team_graph()
+        queue_team_sync(team.pk)
 
 
 class TeamMemberCreateUpdateSerializer(serializers.ModelSerializer):
@@ -631,4 +661,88 @@ class TeamMemberCreateUpdateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         """Create team member"""
         validated_data['added_by'] = self.context['request'].user
-        return super().create(validated_data) 
\ No newline at end of file
+        return super().create(validated_data) 
+
+
+class CommaSeparatedField(serializers.Field):
+    """Query parameter with comma separated values, e.g. ``?severity=high,critical``"""
+
+    def __init__(self, choices=None, **kwargs):
+        self.choices = choices
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        # JSON bodies may send a list instead
+        items = data if isinstance(data, list) else str(data).split(',')
+        values = [str(value).strip() for value in items if str(value).strip()]
+        if self.choices is not None:
+            invalid = [value for value in values if value not in self.choices]
+            if invalid:
+                raise serializers.ValidationError(f"Invalid values: {', '.join(invalid)}")
+        return values
+
+
+class AssignmentQuerySerializer(serializers.Serializer):
+    """Parameters of the assignee recommendation and auto-assign endpoints"""
+
+    team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all(), required=False)
+    roles = CommaSeparatedField(
+        choices=[value for value, _label in TeamMember.ROLE_CHOICES] + ['owner'], required=False
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+    task_ids = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    def validate_team(self, value):
+        user = self.context['request'].user
+        if not user.is_superuser and value.pk not in visible_team_ids(user.pk):
+            raise serializers.ValidationError('Team not found.')
+        return value
+
+
+class AuditCloneSerializer(serializers.Serializer):
+    """Options of the audit clone endpoint, the offset is given in days or as the new period start"""
+
+    title = serializers.CharField(max_length=255, required=False)
+    offset_days = serializers.IntegerField(required=False)
+    period_from = serializers.DateField(required=False)
+    include_responses = serializers.BooleanField(default=False)
+    include_assignments = serializers.BooleanField(default=True)
+    background = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if 'offset_days' in attrs and 'period_from' in attrs:
+            raise serializers.ValidationError('Give either offset_days or period_from.')
+        period_from = attrs.pop('period_from', None)
+        if period_from is not None:
+            attrs['offset_days'] = (period_from - self.context['audit'].period_from).days
+        attrs.setdefault('offset_days', 0)
+        return attrs
+
+
+class FindingAnalyticsQuerySerializer(serializers.Serializer):
+    """Query parameters of the findings analytics endpoints"""
+
+    group_by = CommaSeparatedField(choices=DIMENSIONS, required=False)
+    interval = serializers.ChoiceField(choices=INTERVALS, default='month')
+    period_from = serializers.DateField(input_formats=['%Y-%m', '%Y-%m-%d'], required=False)
+    period_to = serializers.DateField(input_formats=['%Y-%m', '%Y-%m-%d'], required=False)
+    severity = CommaSeparatedField(choices=[value for value, _label in AuditFinding.SEVERITY_CHOICES], required=False)
+    finding_type = CommaSeparatedField(
+        choices=[value for value, _label in AuditFinding.FINDING_TYPE_CHOICES], required=False
+    )
+    control_area = CommaSeparatedField(required=False)
+    risk_level = CommaSeparatedField(
+        choices=[value for value, _label in AuditFinding._meta.get_field('risk_level').choices], required=False
+    )
+    status = CommaSeparatedField(choices=[value for value, _label in AuditFinding.STATUS_CHOICES], required=False)
+
+    def validate_period_from(self, value):
+        return value.replace(day=1)
+
+    def validate_period_to(self, value):
+        return value.replace(day=1)
+
+    def validate(self, attrs):
+        if attrs.get('period_from') and attrs.get('period_to') and attrs['period_from'] > attrs['period_to']:
+            raise serializers.ValidationError({'period_to': 'Must not be before period_from.'})
+        return attrs
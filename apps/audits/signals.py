@@ -0,0 +1,143 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.checklists.models import Checklist
+from apps.checklists.rollups import mark_changed
+
+from .assignments import queue_team_sync, sync_team_audits
+from .deadlines import get_targets, remember_state, schedule_deadlines
+from .findings_cube import CUBE_FIELDS, mark_periods_changed, period_of
+from .models import AuditFinding, AuditTask, Team, TeamMember
+from .team_cache import forget_team_graph
+
+DEADLINE_FIELDS = {'due_date', 'status', 'task_status'}
+
+
+def deadline_fields_changed(update_fields):
+    return update_fields is None or bool(DEADLINE_FIELDS & set(update_fields))
+
+
+@receiver(post_init, sender=AuditTask, dispatch_uid="audits.deadlines.task_init")
+@receiver(post_init, sender=AuditFinding, dispatch_uid="audits.deadlines.finding_init")
+@receiver(post_init, sender=Checklist, dispatch_uid="audits.deadlines.checklist_init")
+def remember_deadline_state(sender, instance, **kwargs):
+    remember_state(instance)
+
+
+@receiver(post_save, sender=AuditTask, dispatch_uid="audits.deadlines.task")
+@receiver(post_save, sender=AuditFinding, dispatch_uid="audits.deadlines.finding")
+def schedule_object_deadlines(sender, instance, update_fields=None, **kwargs):
+    if deadline_fields_changed(update_fields):
+        schedule_deadlines(instance)
+
+
+# Checklist fields an audit task copies or schedules from
+TASK_SYNC_FIELDS = {'status', 'completion_percentage', 'completed_at'}
+
+
+@receiver(post_save, sender=Checklist, dispatch_uid="audits.deadlines.checklist")
+def schedule_checklist_deadlines(sender, instance, update_fields=None, **kwargs):
+    targets = get_targets()
+    if deadline_fields_changed(update_fields):
+        schedule_deadlines(instance, targets)
+    if update_fields is not None and not (TASK_SYNC_FIELDS | DEADLINE_FIELDS) & set(update_fields):
+        return
+
+    # An audit task mirrors the status and progress of its checklist
+    task = AuditTask.objects.filter(checklist=instance).only(
+        'pk', 'audit_id', 'assigned_to_id', 'due_date', 'task_status', 'completion_percentage', 'completed_at',
+        'is_overdue',
+    ).first()
+    if task is None:
+        return
+    # Remaining fields count towards the assignee's workload
+    mark_changed([('workload', task.assigned_to_id)])
+    if task.apply_checklist_state(instance):
+        AuditTask.objects.filter(pk=task.pk).update(
+            task_status=task.task_status,
+            completion_percentage=task.completion_percentage,
+            completed_at=task.completed_at,
+            is_overdue=task.is_overdue,
+            updated_at=timezone.now(),
+        )
+    if deadline_fields_changed(update_fields):
+        schedule_deadlines(task, targets)
+
+
+@receiver(post_init, sender=AuditTask, dispatch_uid="audits.rollups.init")
+def remember_rollup_audit(sender, instance, **kwargs):
+    instance._rollup_audit_id = instance.__dict__.get('audit_id')
+    instance._rollup_assignee_id = instance.__dict__.get('assigned_to_id')
+
+
+@receiver(post_save, sender=AuditTask, dispatch_uid="audits.rollups.save")
+@receiver(post_delete, sender=AuditTask, dispatch_uid="audits.rollups.delete")
+def queue_task_rollups(sender, instance, **kwargs):
+    mark_changed([
+        ('audit', instance._rollup_audit_id),
+        ('audit', instance.audit_id),
+        ('workload', instance._rollup_assignee_id),
+        ('workload', instance.assigned_to_id),
+    ])
+    instance._rollup_audit_id = instance.audit_id
+    instance._rollup_assignee_id = instance.assigned_to_id
+
+
+@receiver(post_save, sender=AuditFinding, dispatch_uid="audits.findings_cube.save")
+@receiver(post_delete, sender=AuditFinding, dispatch_uid="audits.findings_cube.delete")
+def queue_finding_cube(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not CUBE_FIELDS & set(update_fields):
+        return
+    mark_periods_changed([period_of(instance.created_at)])
+
+
+@receiver(post_init, sender=Team, dispatch_uid="audits.team_cache.init")
+def remember_team_owner(sender, instance, **kwargs):
+    instance._graph_owner_id = instance.__dict__.get('owner_id')
+    instance._graph_deleted = instance.__dict__.get('is_deleted')
+
+
+@receiver(post_save, sender=Team, dispatch_uid="audits.team_cache.team")
+def forget_team_owner(sender, instance, created=False, **kwargs):
+    # Owners see and manage their teams, other team edits leave the graph alone
+    if created or instance.owner_id != instance._graph_owner_id:
+        forget_team_graph()
+    # The owner is on the roster and a deleted team grants nothing
+    if not created and (
+        instance.owner_id != instance._graph_owner_id or instance.is_deleted != instance._graph_deleted
+    ):
+        queue_team_sync(instance.pk)
+    instance._graph_owner_id = instance.owner_id
+    instance._graph_deleted = instance.is_deleted
+
+
+@receiver(post_save, sender=TeamMember, dispatch_uid="audits.team_cache.member_save")
+@receiver(post_delete, sender=TeamMember, dispatch_uid="audits.team_cache.member_delete")
+def forget_team_members(sender, instance, **kwargs):
+    forget_team_graph()
+    queue_team_sync(instance.team_id)
+
+
+@receiver(m2m_changed, sender=Team.members.through, dispatch_uid="audits.team_cache.members")
+def forget_team_members_m2m(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        forget_team_graph()
+
+
+@receiver(m2m_changed, sender=Team.audits.through, dispatch_uid="audits.assignments.audits")
+def propagate_team_audits(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Grant or take back a team's members when ``Team.audits`` changes, from either side"""
+    if action == 'pre_clear':
+        related = instance.assigned_teams if reverse else instance.audits
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_pks', set())
+    elif action not in ('post_add', 'post_remove'):
+        return
+    if reverse:
+        for team_id in pk_set:
+            sync_team_audits(team_id, [instance.pk])
+    else:
+        sync_team_audits(instance.pk, pk_set)
@@ -0,0 +1,51 @@
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from datetime import timedelta
+
+from .cloning import clone_audit
+from .deadlines import fire_due_deadlines
+from .findings_cube import compact_periods, queue_all_periods
+from .models import Audit, ScheduledDeadline
+
+
+@shared_task(ignore_result=True)
+def fire_deadlines():
+    # Catch up bucket by bucket after downtime, every batch commits on its own
+    while fire_due_deadlines()['entries'] >= settings.DEADLINE_BATCH_SIZE:
+        pass
+
+    cutoff = timezone.now() - timedelta(days=settings.DEADLINE_RETENTION_DAYS)
+    ScheduledDeadline.objects.filter(fired_at__lt=cutoff).delete()
+
+
+@shared_task(ignore_result=True)
+def compact_findings_cube(batch_size=100):
+    # A month is a single grouped count, a few batches clear any backlog
+    for _ in range(10):
+        if compact_periods(batch_size) < batch_size:
+            break
+
+
+@shared_task(ignore_result=True)
+def rebuild_findings_cube():
+    queue_all_periods()
+    compact_findings_cube()
+
+
+def clone_job_key(job_id):
+    """Cache key of the id of the user who started a clone job"""
+    return f'audits:clone_job:{job_id}'
+
+
+@shared_task(bind=True)
+def clone_audit_job(self, audit_id, user_id, offset_days=0, **options):
+    """Clone an audit in the background, progress is readable as the ``PROGRESS`` state of the job"""
+    def progress(stage, done, total):
+        self.update_state(state='PROGRESS', meta={'stage': stage, 'done': done, 'total': total})
+
+    audit = Audit.objects.get(pk=audit_id)
+    user = get_user_model().objects.get(pk=user_id)
+    clone = clone_audit(audit, user, offset=timedelta(days=offset_days), progress=progress, **options)
+    return {'audit': clone.pk, 'reference_number': clone.reference_number}
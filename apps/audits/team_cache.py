@@ -0,0 +1,85 @@
+"""
+Team membership graph kept in the cache.
+
+Every user gets the ids of the teams they can see (owned or active
+membership) and manage (owned or an active manager/admin role), every team
+the ids of its active members. Querysets filter on ``id__in`` the cached set
+and permission checks become set lookups. Entries are keyed under a version
+that membership changes and owner changes move, so a change never needs to
+know whose entries it affects.
+
+The version lives in the cache, a per process cache such as the default
+LocMemCache only sees the bumps made in its own process. Other workers keep
+their sets until ``TEAM_CACHE_TIMEOUT`` runs out, which is why it defaults to
+a few seconds unless ``CACHE_REDIS_URL`` configures a shared cache.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Team, TeamMember
+
+MANAGER_ROLES = ('manager', 'admin')
+
+VERSION_KEY = 'teams:graph:version'
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, 1, None)
+
+
+def forget_team_graph():
+    """Drop every cached set, called whenever a membership or an owner changes"""
+    bump_version()
+    # Again once committed, so a set rebuilt from the old rows meanwhile is not kept
+    transaction.on_commit(bump_version)
+
+
+def get_user_teams(user_id):
+    """``{"visible": {team ids}, "managed": {team ids}}`` of a user"""
+    key = f'teams:{get_version()}:user:{user_id}'
+    teams = cache.get(key)
+    if teams is None:
+        owned = set(Team.all_objects.all_with_deleted().filter(owner_id=user_id).values_list('pk', flat=True))
+        visible, managed = set(owned), set(owned)
+        for team_id, role in TeamMember.objects.filter(user_id=user_id, is_active=True).values_list(
+            'team_id', 'role'
+        ):
+            visible.add(team_id)
+            if role in MANAGER_ROLES:
+                managed.add(team_id)
+        teams = {'visible': frozenset(visible), 'managed': frozenset(managed)}
+        cache.set(key, teams, settings.TEAM_CACHE_TIMEOUT)
+    return teams
+
+
+def visible_team_ids(user_id):
+    return get_user_teams(user_id)['visible']
+
+
+def managed_team_ids(user_id):
+    return get_user_teams(user_id)['managed']
+
+
+def team_member_ids(team_id):
+    """Ids of the users with an active membership in the team, the owner is not included"""
+    key = f'teams:{get_version()}:members:{team_id}'
+    member_ids = cache.get(key)
+    if member_ids is None:
+        member_ids = frozenset(
+            TeamMember.objects.filter(team_id=team_id, is_active=True).values_list('user_id', flat=True)
+        )
+        cache.set(key, member_ids, settings.TEAM_CACHE_TIMEOUT)
+    return member_ids
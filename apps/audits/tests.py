@@ -1,3 +1,912 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+
+from apps.checklists.models import Checklist, ChecklistField, ChecklistResponse, ChecklistTemplate, FieldType
+from apps.checklists.rollups import compact_rollups
+from apps.notifications.models import Notification
+from .deadlines import fire_due_deadlines, rebuild_deadlines
+from .tasks import clone_audit_job
+from .findings_cube import compact_periods
+from .models import Audit, AuditFinding, AuditReview, AuditReviewEvent, AuditTask, FindingCubeCell, FindingCubeChange, ScheduledDeadline, Team, TeamTaskGrant
+
+User = get_user_model()
+
+
+class AuditAPITestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='auditor',
+            email='auditor@example.com',
+            password='auditpass123',
+            is_staff=True
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.template = ChecklistTemplate.objects.create(
+            name='Audit Template',
+            category='Audit',
+            created_by=self.user
+        )
+        ChecklistField.objects.create(
+            template=self.template,
+            label='Control',
+            field_type=FieldType.TEXT,
+            order=1
+        )
+
+    def create_audit(self, statuses=('draft',), **kwargs):
+        defaults = {
+            'title': 'Test Audit',
+            'scope': 'Scope',
+            'objectives': 'Objectives',
+            'period_from': date.today(),
+            'period_to': date.today() + timedelta(days=30),
+            'created_by': self.user,
+        }
+        defaults.update(kwargs)
+        audit = Audit.objects.create(**defaults)
+        for index, checklist_status in enumerate(statuses):
+            checklist = Checklist.objects.create(
+                template=self.template,
+                name=f'Checklist {index}',
+                status=checklist_status,
+                assigned_to=self.user,
+                created_by=self.user
+            )
+            AuditTask.objects.create(
+                audit=audit,
+                checklist=checklist,
+                task_name=f'Task {index}',
+                due_date=timezone.now() - timedelta(days=1),
+                created_by=self.user
+            )
+        return audit
+
+
+class AuditSparseFieldsetTests(AuditAPITestMixin, APITestCase):
+    def test_list_returns_requested_fields_only(self):
+        """Test that ?fields= limits the serialized audit fields"""
+        self.create_audit()
+        response = self.client.get('/api/audits/audits/', {'fields': 'id,title,tasks_summary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'tasks_summary'})
+
+    def test_omit_removes_fields(self):
+        """Test that ?omit= drops fields from the full representation"""
+        self.create_audit()
+        response = self.client.get('/api/audits/audits/', {'omit': 'task_progress,tasks_summary'})
+        audit = response.data['results'][0]
+        self.assertNotIn('task_progress', audit)
+        self.assertNotIn('tasks_summary', audit)
+        self.assertIn('reference_number', audit)
+
+    def test_annotated_summary_matches_model(self):
+        """Test that annotated task counts match the per-object computation"""
+        audit = self.create_audit(statuses=('draft', 'in_progress', 'completed', 'completed'))
+        response = self.client.get('/api/audits/audits/')
+        data = response.data['results'][0]
+        self.assertEqual(data['task_progress'], audit.get_task_progress())
+        self.assertEqual(data['tasks_summary'], {
+            'total': 4, 'pending': 1, 'in_progress': 1, 'completed': 2, 'overdue': 2
+        })
+
+    def test_list_query_count_is_constant(self):
+        """Test that listing audits does not issue queries per audit"""
+        self.create_audit()
+        with CaptureQueriesContext(connection) as single:
+            self.client.get('/api/audits/audits/')
+        for _ in range(5):
+            self.create_audit(statuses=('draft', 'completed'))
+        with CaptureQueriesContext(connection) as many:
+            self.client.get('/api/audits/audits/')
+        self.assertEqual(len(single), len(many))
+
+    def test_skipped_fields_cost_no_queries(self):
+        """Test that leaving out relation fields skips their joins and prefetches"""
+        self.create_audit(statuses=('draft', 'completed'))
+        with CaptureQueriesContext(connection) as full:
+            self.client.get('/api/audits/audits/')
+        with CaptureQueriesContext(connection) as sparse:
+            self.client.get('/api/audits/audits/', {'fields': 'id,title'})
+        self.assertLess(len(sparse), len(full))
+        self.assertFalse(any('audits_audittask' in query['sql'] for query in sparse.captured_queries))
+
+    def test_expand_tasks(self):
+        """Test that ?expand=tasks nests the audit's tasks"""
+        self.create_audit(statuses=('draft', 'completed'))
+        response = self.client.get('/api/audits/audits/', {'fields': 'id', 'expand': 'tasks'})
+        audit = response.data['results'][0]
+        self.assertEqual(set(audit), {'id', 'tasks'})
+        self.assertEqual(len(audit['tasks']), 2)
+
+    def test_writes_ignore_sparse_params(self):
+        """Test that ?fields= does not restrict validation on create"""
+        response = self.client.post('/api/audits/audits/?fields=id', {
+            'title': 'Created',
+            'audit_type': 'internal',
+            'scope': 'Scope',
+            'objectives': 'Objectives',
+            'period_from': str(date.today()),
+            'period_to': str(date.today() + timedelta(days=1)),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('reference_number', response.data)
+
+
+class AuditTaskConditionalRequestTests(AuditAPITestMixin, APITestCase):
+    def test_task_etag_follows_checklist(self):
+        """Test that a task's ETag changes when its checklist changes"""
+        task = self.create_audit().audit_tasks.get()
+        url = f'/api/audits/audit-tasks/{task.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        task.checklist.status = 'completed'
+        task.checklist.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_not_modified_list_skips_serialization(self):
+        """Test that a 304 list response only runs the validator query"""
+        self.create_audit(statuses=('draft', 'completed'))
+        url = '/api/audits/audit-tasks/'
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+
+
+class AuditTaskStatusSyncTests(AuditAPITestMixin, APITestCase):
+    def test_status_and_progress_follow_checklist(self):
+        """Test that task_status and completion_percentage are copied from the checklist"""
+        audit = self.create_audit(statuses=('draft',))
+        task = audit.audit_tasks.get()
+        self.assertEqual((task.task_status, task.completion_percentage, task.is_overdue), ('pending', 0, True))
+
+        checklist = task.checklist
+        checklist.total_fields, checklist.completed_fields = 4, 1
+        checklist.save(update_fields=['total_fields', 'completed_fields', 'completion_percentage', 'updated_at'])
+        task.refresh_from_db()
+        self.assertEqual((task.task_status, task.completion_percentage), ('pending', 25))
+
+        checklist.status = 'completed'
+        checklist.save()
+        task.refresh_from_db()
+        self.assertEqual(task.task_status, 'completed')
+        self.assertIsNotNone(task.completed_at)
+        self.assertFalse(task.is_overdue)
+
+    def test_status_filter_skips_checklist_join(self):
+        """Test that ?status= filters on the stored task status"""
+        audit = self.create_audit(statuses=('draft', 'in_progress', 'completed'))
+        url = '/api/audits/audit-tasks/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'audit': audit.id, 'status': 'in_progress', 'fields': 'id,task_status'})
+        self.assertEqual([row['task_status'] for row in response.data['results']], ['in_progress'])
+        self.assertFalse(any('checklists_checklist' in query['sql'] for query in queries.captured_queries))
+
+        # Checklist status names still work
+        response = self.client.get(url, {'audit': audit.id, 'status': 'draft'})
+        self.assertEqual([row['task_status'] for row in response.data['results']], ['pending'])
+
+
+@override_settings(DEADLINE_REMINDER_LEAD_SECONDS=3600, DEADLINE_ESCALATION_AFTER_SECONDS=86400)
+class DeadlineSchedulerTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.assignee = User.objects.create_user(
+            username='assignee', email='assignee@example.com', password='auditpass123'
+        )
+        self.audit = self.create_audit(statuses=())
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Checklist', assigned_to=self.assignee, created_by=self.user
+        )
+        self.due = timezone.now() + timedelta(hours=3)
+        self.task = AuditTask.objects.create(
+            audit=self.audit, checklist=self.checklist, task_name='Cash count',
+            assigned_to=self.assignee, due_date=self.due, created_by=self.user
+        )
+
+    def events(self, user):
+        return list(
+            Notification.objects.filter(user=user, type='deadline', metadata__target='audits.audittask')
+            .order_by('pk').values_list('metadata__event', flat=True)
+        )
+
+    def test_entries_fire_in_their_buckets(self):
+        """Test reminder, overdue and escalation each fire once in their own bucket"""
+        entries = ScheduledDeadline.objects.filter(target='audits.audittask', object_id=self.task.pk)
+        self.assertEqual(
+            {entry.event: entry.bucket.second for entry in entries},
+            {'reminder': 0, 'overdue': 0, 'escalation': 0}
+        )
+
+        fire_due_deadlines(now=self.due - timedelta(hours=2, minutes=59))
+        self.assertEqual(self.events(self.assignee), [])
+        fire_due_deadlines(now=self.due - timedelta(minutes=59))
+        self.assertEqual(self.events(self.assignee), ['reminder'])
+
+        fire_due_deadlines(now=self.due + timedelta(minutes=1))
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.is_overdue)
+        self.assertEqual(self.events(self.assignee), ['reminder', 'overdue'])
+
+        fire_due_deadlines(now=self.due + timedelta(days=1, minutes=1))
+        self.assertEqual(self.events(self.user), ['escalation'])
+        # Running again is a no-op
+        self.assertEqual(fire_due_deadlines(now=self.due + timedelta(days=2))['entries'], 0)
+
+        # Re-saving the task does not plan the fired events again
+        self.task.save()
+        self.assertFalse(ScheduledDeadline.objects.filter(fired_at__isnull=True).exists())
+
+    def test_catch_up_after_downtime(self):
+        """Test a late run fires overdue and escalation but drops the stale reminder"""
+        result = fire_due_deadlines(now=self.due + timedelta(days=3))
+        self.assertEqual(result['entries'], 3)
+        self.assertEqual(self.events(self.assignee), ['overdue'])
+        self.assertEqual(self.events(self.user), ['escalation'])
+        self.assertTrue(AuditTask.objects.get(pk=self.task.pk).is_overdue)
+
+    def test_changed_or_closed_items_do_not_fire(self):
+        """Test that moving the due date replans entries and closed items stay quiet"""
+        new_due = self.due + timedelta(days=7)
+        self.task.due_date = new_due
+        self.task.save()
+        self.assertEqual(
+            set(ScheduledDeadline.objects.filter(target='audits.audittask').values_list('due_at', flat=True)),
+            {new_due}
+        )
+
+        self.checklist.status = 'completed'
+        self.checklist.save()
+        fire_due_deadlines(now=new_due + timedelta(days=3))
+        self.assertEqual(Notification.objects.filter(type='deadline').count(), 0)
+        self.assertFalse(AuditTask.objects.get(pk=self.task.pk).is_overdue)
+
+    def test_unchanged_saves_plan_nothing(self):
+        """Test that saves leaving the due date and status alone skip the scheduler"""
+        task = AuditTask.objects.get(pk=self.task.pk)
+        task.task_name = 'Renamed'
+        with CaptureQueriesContext(connection) as queries:
+            task.save()
+        self.assertFalse(any('audits_scheduleddeadline' in query['sql'] for query in queries.captured_queries))
+
+        task.due_date = self.due + timedelta(days=1)
+        task.save()
+        self.assertEqual(
+            set(ScheduledDeadline.objects.filter(object_id=task.pk).values_list('due_at', flat=True)),
+            {task.due_date}
+        )
+
+    def test_rebuild_in_batches(self):
+        """Test that a rebuild plans every open object whatever the batch size"""
+        checklist = Checklist.objects.create(
+            template=self.template, name='Inventory', assigned_to=self.assignee, created_by=self.user
+        )
+        other = AuditTask.objects.create(
+            audit=self.audit, checklist=checklist, task_name='Inventory', assigned_to=self.assignee,
+            due_date=self.due, created_by=self.user
+        )
+        ScheduledDeadline.objects.all().delete()
+        self.assertEqual(rebuild_deadlines(batch_size=1), 2)
+        for task in (self.task, other):
+            self.assertEqual(
+                set(ScheduledDeadline.objects.filter(target='audits.audittask', object_id=task.pk)
+                    .values_list('event', flat=True)),
+                {'reminder', 'overdue', 'escalation'}
+            )
+
+    def test_overdue_flag_and_filter(self):
+        """Test that past due tasks are flagged on save and filterable"""
+        self.assertFalse(self.task.is_overdue)
+        overdue = self.create_audit(statuses=('draft', 'completed'))
+        self.assertEqual(
+            list(AuditTask.objects.filter(audit=overdue, is_overdue=True).values_list('task_name', flat=True)),
+            ['Task 0']
+        )
+        response = self.client.get('/api/audits/audit-tasks/', {'is_overdue': 'true'})
+        self.assertEqual([task['task_name'] for task in response.data['results']], ['Task 0'])
+
+        # Reopening the checklist flags its task again
+        task = AuditTask.objects.get(audit=overdue, task_name='Task 1')
+        task.checklist.status = 'in_progress'
+        task.checklist.save()
+        task.refresh_from_db()
+        self.assertTrue(task.is_overdue)
+
+
+class AuditDashboardTests(AuditAPITestMixin, APITestCase):
+    def test_task_summary_reads_rollup(self):
+        """Test that the task summary is served from the audit rollup once compacted"""
+        audit = self.create_audit(statuses=('draft', 'in_progress', 'completed', 'on_hold'))
+        url = f'/api/audits/audits/{audit.id}/task_summary/'
+        live = self.client.get(url).data
+        compact_rollups()
+        response = self.client.get(url)
+        self.assertEqual(response.data, live)
+        self.assertEqual(response.data['progress'], {'total': 4, 'completed': 1, 'percentage': 25.0})
+        self.assertEqual(
+            response.data['breakdown']['by_status'],
+            {'pending': 1, 'in_progress': 1, 'completed': 1, 'on_hold': 1}
+        )
+        self.assertEqual(response.data['breakdown']['overdue_count'], 2)
+
+        task = audit.audit_tasks.get(task_name='Task 0')
+        task.priority = 'high'
+        task.save()
+        response = self.client.get(url)
+        self.assertEqual(response.data['breakdown']['by_priority'], {'medium': 3, 'high': 1})
+
+    def test_team_statistics(self):
+        """Test that team statistics come from a single aggregate"""
+        member = User.objects.create_user(username='member', email='member@example.com', password='auditpass123')
+        Team.objects.create(name='Owned', type='audit', owner=self.user, created_by=self.user)
+        joined = Team.objects.create(name='Joined', type='review', owner=member, created_by=member, is_active=False)
+        joined.add_member(self.user)
+        Team.objects.create(name='Hidden', type='audit', owner=member, created_by=member)
+
+        # The first request caches the user's team ids
+        self.client.get('/api/audits/teams/statistics/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/audits/teams/statistics/')
+        self.assertEqual(response.data, {
+            'total_teams': 2,
+            'teams_by_type': {'Audit Team': 1, 'Review Team': 1},
+            'owned_teams': 1,
+            'member_teams': 1,
+            'active_teams': 1,
+        })
+
+
+class TeamMembershipCacheTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='auditpass123')
+        self.team = Team.objects.create(name='Field Team', type='audit', owner=self.other, created_by=self.other)
+
+    def test_checks_follow_membership_changes(self):
+        """Test that membership and management checks are cached and invalidated"""
+        self.assertFalse(self.team.is_member(self.user))
+        self.assertFalse(self.team.can_manage(self.user))
+        with self.assertNumQueries(0):
+            self.assertFalse(self.team.is_member(self.user))
+            self.assertFalse(self.team.can_manage(self.user))
+            self.assertTrue(self.team.can_manage(self.other))
+
+        membership, _created = self.team.add_member(self.user, added_by=self.other)
+        self.assertTrue(self.team.is_member(self.user))
+        self.assertFalse(self.team.can_manage(self.user))
+        self.assertEqual(set(self.team.get_all_members()), {self.user, self.other})
+
+        membership.role = 'manager'
+        membership.save()
+        self.assertTrue(self.team.can_manage(self.user))
+
+        membership.delete()
+        self.assertFalse(self.team.is_member(self.user))
+        self.assertFalse(self.team.can_manage(self.user))
+
+        # Handing over ownership moves visibility and management with it
+        self.assertEqual(self.client.get('/api/audits/teams/').data['count'], 0)
+        self.team.owner = self.user
+        self.team.save()
+        self.assertTrue(self.team.can_manage(self.user))
+        self.assertEqual(self.client.get('/api/audits/teams/').data['count'], 1)
+
+    def test_inactive_memberships_grant_nothing(self):
+        """Test that deactivated members leave member lists, counts and management checks"""
+        membership, _created = self.team.add_member(self.user, role='manager', added_by=self.other)
+        self.assertTrue(self.team.can_manage(self.user))
+        membership.is_active = False
+        membership.save()
+
+        self.assertFalse(self.team.is_member(self.user))
+        self.assertFalse(self.team.can_manage(self.user))
+        self.assertEqual(set(self.team.get_all_members()), {self.other})
+        self.assertEqual(self.team.get_member_count(), 1)
+        other_client = APIClient()
+        other_client.force_authenticate(user=self.other)
+        response = other_client.get(f'/api/audits/teams/{self.team.pk}/')
+        self.assertEqual(response.data['member_count'], 1)
+
+    def test_list_and_detail_counts(self):
+        """Test that team lists read the cached ids and annotated counts"""
+        self.team.add_member(self.user, added_by=self.other)
+        self.team.audits.add(self.create_audit(statuses=()))
+        for index in range(3):
+            owner = User.objects.create_user(
+                username=f'owner{index}', email=f'owner{index}@example.com', password='auditpass123'
+            )
+            team = Team.objects.create(name=f'Team {index}', type='review', owner=owner, created_by=owner)
+            team.add_member(self.user, added_by=owner)
+            team.add_member(self.other, added_by=owner)
+
+        url = '/api/audits/teams/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            {team['name']: team['member_count'] for team in response.data['results']},
+            {'Field Team': 2, 'Team 0': 3, 'Team 1': 3, 'Team 2': 3},
+        )
+        self.assertFalse(any('SELECT DISTINCT' in query['sql'] for query in queries.captured_queries))
+        self.assertLessEqual(len(queries), 3)
+
+        response = self.client.get(f'{url}{self.team.pk}/')
+        self.assertEqual((response.data['member_count'], response.data['audit_count']), (2, 1))
+
+        other_client = APIClient()
+        other_client.force_authenticate(user=User.objects.get(username='owner0'))
+        self.assertEqual(other_client.get(f'{url}{self.team.pk}/').status_code, 404)
+
+
+class TeamAssignmentTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.team = Team.objects.create(name='Field Team', type='audit', owner=self.user, created_by=self.user)
+        self.members = {}
+        for role in ('member', 'lead', 'manager'):
+            user = User.objects.create_user(username=role, email=f'{role}@example.com', password='auditpass123')
+            self.team.add_member(user, role=role)
+            self.members[role] = user
+        self.audits = [self.create_audit(statuses=('draft', 'in_progress')) for _index in range(3)]
+
+    def assigned(self, audit):
+        return set(audit.assigned_users.values_list('username', flat=True))
+
+    def task_assigned(self, audit):
+        return set(
+            AuditTask.assigned_users.through.objects.filter(audittask__audit=audit).values_list(
+                'user__username', flat=True
+            ).distinct()
+        )
+
+    def test_assign_and_unassign_propagate(self):
+        """Test that assigning a team fans its members out to the audits and tasks in bulk"""
+        direct = self.members['manager']
+        self.audits[0].assigned_users.add(direct)
+        url = f'/api/audits/teams/{self.team.pk}/assign_to_audit/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'audit_ids': [audit.pk for audit in self.audits]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # A fixed number of set based writes, whatever the team and audit sizes, the linked rows are touched once
+        self.assertLessEqual(len(queries), 28)
+
+        for audit in self.audits:
+            self.assertEqual(self.assigned(audit), {'auditor', 'member', 'lead', 'manager'})
+            # Only member and lead roles work on the tasks
+            self.assertEqual(self.task_assigned(audit), {'member', 'lead'})
+        self.assertEqual(Notification.objects.filter(type='assignment').count(), 11)
+        self.assertFalse(Notification.objects.filter(type='assignment', user=direct, metadata__audit=self.audits[0].pk))
+
+        response = self.client.delete(
+            f'/api/audits/teams/{self.team.pk}/unassign_from_audit/', {'audit_id': self.audits[0].pk}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        # The directly assigned manager stays
+        self.assertEqual(self.assigned(self.audits[0]), {'manager'})
+        self.assertEqual(self.task_assigned(self.audits[0]), set())
+        self.assertEqual(self.assigned(self.audits[1]), {'auditor', 'member', 'lead', 'manager'})
+
+        response = self.client.post(url, {'audit_ids': [self.audits[0].pk, 999999]}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_unassign_takes_back_only_team_links(self):
+        """Test that task links follow the grant that made them, whatever the audit assignment"""
+        audit = self.audits[0]
+        task = audit.audit_tasks.select_related('checklist').first()
+        audit.assigned_users.add(self.members['member'])
+        task.assigned_users.add(self.members['lead'])
+        task.checklist.assigned_users.add(self.members['lead'])
+
+        self.team.audits.add(audit)
+        self.assertEqual(self.task_assigned(audit), {'member', 'lead'})
+        self.team.audits.remove(audit)
+
+        # The directly assigned member stays on the audit but loses the tasks the team gave
+        self.assertEqual(self.assigned(audit), {'member'})
+        self.assertEqual(self.task_assigned(audit), {'lead'})
+        checklist_users = set(task.checklist.assigned_users.values_list('username', flat=True))
+        self.assertIn('lead', checklist_users)
+        self.assertNotIn('member', checklist_users)
+        self.assertFalse(TeamTaskGrant.objects.exists())
+
+    def test_membership_changes_follow(self):
+        """Test that later membership changes are applied to the team's audits"""
+        other = Team.objects.create(name='Other', type='review', owner=self.user, created_by=self.user)
+        other.add_member(self.members['member'], role='member')
+        self.team.audits.add(*self.audits[:2])
+        other.audits.add(self.audits[0])
+
+        newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com', password='x')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.add_member(newcomer)
+            self.team.remove_member(self.members['member'])
+            membership = self.team.team_memberships.get(user=self.members['lead'])
+            membership.role = 'manager'
+            membership.save()
+
+        # Still granted through the other team on the first audit only
+        self.assertEqual(self.assigned(self.audits[0]), {'auditor', 'newcomer', 'member', 'lead', 'manager'})
+        self.assertEqual(self.assigned(self.audits[1]), {'auditor', 'newcomer', 'lead', 'manager'})
+        self.assertEqual(self.task_assigned(self.audits[0]), {'newcomer', 'member'})
+        self.assertEqual(self.task_assigned(self.audits[1]), {'newcomer'})
+        self.assertEqual(self.assigned(self.audits[2]), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.delete()
+        self.assertEqual(self.assigned(self.audits[1]), set())
+        self.assertEqual(self.assigned(self.audits[0]), {'auditor', 'member'})
+
+
+class AuditCloneTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.field = self.template.fields.get()
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='x')
+        self.direct = User.objects.create_user(username='direct', email='direct@example.com', password='x')
+        self.team = Team.objects.create(name='Field Team', type='audit', owner=self.user, created_by=self.user)
+        self.team.add_member(self.member, role='member')
+
+    def create_source(self, tasks):
+        audit = self.create_audit(statuses=('completed',) * tasks)
+        audit.assigned_users.add(self.direct)
+        self.team.audits.add(audit)
+        for task in audit.audit_tasks.select_related('checklist'):
+            ChecklistResponse.objects.create(
+                checklist=task.checklist, field=self.field, value={'text': 'Prior answer'}, is_completed=True
+            )
+        return audit
+
+    def test_clone_copies_and_shifts(self):
+        """Test that a clone copies tasks, defaults and assignments with a fixed number of queries"""
+        small = self.create_source(2)
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.post(f'/api/audits/audits/{small.pk}/clone/', {'offset_days': 7}, format='json')
+        audit = self.create_source(10)
+        url = f'/api/audits/audits/{audit.pk}/clone/'
+        period_from = audit.period_from + timedelta(days=365)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url, {'period_from': period_from.isoformat(), 'include_responses': True}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        # The copy is set based, more tasks do not mean more queries
+        self.assertLessEqual(len(queries), len(small_queries) + 5)
+
+        clone = Audit.objects.get(pk=response.data['id'])
+        self.assertNotEqual(clone.reference_number, audit.reference_number)
+        self.assertEqual(clone.period_from, period_from)
+        self.assertEqual(clone.audit_tasks.count(), 10)
+        source_due = dict(audit.audit_tasks.values_list('task_name', 'due_date'))
+        for task in clone.audit_tasks.select_related('checklist'):
+            self.assertEqual(task.due_date, source_due[task.task_name] + timedelta(days=365))
+            self.assertEqual(task.task_status, 'pending')
+            self.assertFalse(task.is_overdue)
+            self.assertEqual(task.checklist.status, 'draft')
+            self.assertEqual(task.checklist.total_fields, 1)
+            self.assertEqual(task.checklist.completed_fields, 0)
+            self.assertEqual(task.checklist.completion_percentage, 0)
+            self.assertIsNotNone(task.checklist.template_snapshot_id)
+            response = task.checklist.responses.get()
+            self.assertEqual(response.value, {'text': 'Prior answer'})
+            self.assertFalse(response.is_completed)
+            self.assertEqual(set(task.assigned_users.values_list('username', flat=True)), {'member'})
+            self.assertEqual(set(task.checklist.assigned_users.values_list('username', flat=True)), {'auditor', 'member'})
+
+        self.assertEqual(set(clone.assigned_users.values_list('username', flat=True)), {'auditor', 'direct', 'member'})
+        self.assertTrue(self.team.audits.filter(pk=clone.pk).exists())
+        self.assertTrue(clone.team_grants.filter(user=self.member, owns_assignment=True).exists())
+        task_ids = list(clone.audit_tasks.values_list('pk', flat=True))
+        self.assertEqual(
+            ScheduledDeadline.objects.filter(target='audits.audittask', object_id__in=task_ids).count(), 30
+        )
+        # The source is untouched
+        self.assertEqual(audit.audit_tasks.filter(task_status='completed').count(), 10)
+
+    def test_clone_job_reports_progress(self):
+        """Test that the background job clones without responses and returns the new audit"""
+        audit = self.create_source(3)
+        with mock.patch.object(clone_audit_job, 'update_state') as update_state:
+            result = clone_audit_job.apply(args=(audit.pk, self.user.pk, 30), kwargs={'title': 'Next year'})
+        self.assertTrue(result.successful(), result.result)
+
+        clone = Audit.objects.get(pk=result.result['audit'])
+        self.assertEqual(clone.title, 'Next year')
+        self.assertEqual(clone.audit_tasks.count(), 3)
+        self.assertFalse(ChecklistResponse.objects.filter(checklist__audit_task__audit=clone).exists())
+        stages = [call.kwargs['meta']['stage'] for call in update_state.call_args_list]
+        self.assertEqual((stages[0], stages[-1]), ('tasks', 'done'))
+
+        response = self.client.post(
+            f'/api/audits/audits/{audit.pk}/clone/', {'offset_days': 1, 'period_from': '2030-01-01'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_clone_job_is_private_to_its_starter(self):
+        """Test that only the user who started a background clone reads its state"""
+        audit = self.create_source(1)
+        with mock.patch.object(clone_audit_job, 'apply_async') as apply_async:
+            apply_async.side_effect = lambda args, kwargs, task_id: mock.Mock(id=task_id, state='PENDING')
+            response = self.client.post(
+                f'/api/audits/audits/{audit.pk}/clone/', {'background': True}, format='json'
+            )
+        self.assertEqual(response.status_code, 202)
+        url = f'/api/audits/audits/clone_jobs/{response.data["job_id"]}/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.client.force_authenticate(user=self.direct)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_clone_without_assignments(self):
+        """Test that a clone without assignments is assigned to the user cloning it"""
+        audit = self.create_source(2)
+        for task in audit.audit_tasks.select_related('checklist'):
+            task.assigned_to = task.checklist.assigned_to = self.member
+            task.checklist.save()
+            task.save()
+        response = self.client.post(
+            f'/api/audits/audits/{audit.pk}/clone/', {'include_assignments': False}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        for task in AuditTask.objects.filter(audit_id=response.data['id']).select_related('checklist'):
+            self.assertEqual(task.assigned_to_id, self.user.pk)
+            self.assertEqual(task.checklist.assigned_to_id, self.user.pk)
+            self.assertEqual(list(task.assigned_users.values_list('pk', flat=True)), [self.user.pk])
+
+
+class TaskReviewHistoryTests(AuditAPITestMixin, APITestCase):
+    def test_review_actions_write_history(self):
+        """Test that review actions write review rows and events instead of growing the task notes"""
+        task = self.create_audit(statuses=('completed',)).audit_tasks.get()
+        url = f'/api/audits/audit-tasks/{task.pk}'
+        reviewer = User.objects.create_user(username='reviewer', email='reviewer@example.com', password='x')
+
+        response = self.client.post(f'{url}/submit_for_review/', {'reviewer': reviewer.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AuditReview.objects.get(pk=response.data['review_id']).reviewer, reviewer)
+        self.client.post(f'{url}/reject/', {'reason': 'Missing evidence'}, format='json')
+        self.client.post(f'{url}/approve/', {'notes': 'Looks good'}, format='json')
+
+        task.refresh_from_db()
+        self.assertEqual(task.completion_notes, '')
+        # The rejection closed the submitted review, the approval opened its own
+        self.assertEqual(
+            list(AuditReview.objects.filter(audit_task=task).order_by('pk').values_list('status', flat=True)),
+            ['rejected', 'approved'],
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'{url}/reviews/')
+        history = response.data['review_history']
+        self.assertEqual([entry['action'] for entry in history], ['submitted', 'rejected', 'approved'])
+        self.assertEqual(history[1]['details'], 'Rejected by auditor: Missing evidence')
+        self.assertEqual(history[2]['comments'], 'Looks good')
+        self.assertEqual(len([query for query in queries if 'audits_auditreviewevent' in query['sql']]), 1)
+
+    def test_backfill_notes(self):
+        """Test that the backfill moves review lines out of the notes once"""
+        task = self.create_audit().audit_tasks.get()
+        notes = 'Checked on site\n\nApproved by auditor: Fine\n\nRejected by Former Employee: Redo'
+        AuditTask.objects.filter(pk=task.pk).update(completion_notes=notes)
+
+        call_command('backfill_task_reviews', stdout=StringIO())
+        call_command('backfill_task_reviews', stdout=StringIO())
+
+        task.refresh_from_db()
+        self.assertEqual(task.completion_notes, 'Checked on site')
+        events = list(AuditReviewEvent.objects.filter(audit_task=task).order_by('occurred_at', 'pk'))
+        self.assertEqual([(event.event, event.actor, event.actor_name) for event in events], [
+            ('approved', self.user, ''),
+            ('rejected', None, 'Former Employee'),
+        ])
+        self.assertEqual(events[1].review.comments, 'Redo')
+        self.assertEqual(events[1].review.requested_at, task.updated_at)
+
+
+class WorkloadAssignmentTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.team = Team.objects.create(name='Field Team', type='audit', owner=self.user, created_by=self.user)
+        self.members = {}
+        for name in ('busy', 'light', 'idle'):
+            user = User.objects.create_user(username=name, email=f'{name}@example.com', password='auditpass123')
+            self.team.add_member(user)
+            self.members[name] = user
+        self.audit = self.create_audit(statuses=('draft', 'draft', 'in_progress', 'draft'))
+
+    def assign(self, task_name, user, **fields):
+        task = self.audit.audit_tasks.get(task_name=task_name)
+        for name, value in {'assigned_to': user, **fields}.items():
+            setattr(task, name, value)
+        task.save()
+
+    def test_recommendations_read_workload_rollups(self):
+        """Test that candidates are ranked by their maintained workload"""
+        self.assign('Task 0', self.members['busy'], priority='critical', risk_level='high')
+        self.assign('Task 1', self.members['busy'])
+        self.assign('Task 2', self.members['light'], priority='low', risk_level='low')
+        url = f'/api/audits/audits/{self.audit.pk}/recommend_assignees/?team={self.team.pk}&roles=member'
+
+        live = self.client.get(url).data['recommendations']
+        self.assertEqual([row['username'] for row in live], ['idle', 'light', 'busy'])
+        self.assertEqual(live[2]['open_tasks'], 2)
+        self.assertEqual(live[2]['overdue'], 2)
+
+        compact_rollups()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.data['recommendations'], live)
+        # Only the idle member, who never had a task and so has no rollup, is counted live
+        task_queries = [query['sql'] for query in queries.captured_queries if 'audits_audittask' in query['sql']]
+        self.assertEqual(len(task_queries), 1)
+        self.assertIn(f'IN ({self.members["idle"].pk})', task_queries[0])
+
+        # Closing a task lightens the load again
+        checklist = self.audit.audit_tasks.get(task_name='Task 0').checklist
+        checklist.status = 'completed'
+        checklist.save()
+        busy = self.client.get(url).data['recommendations'][2]
+        self.assertEqual((busy['username'], busy['open_tasks']), ('busy', 1))
+
+        response = self.client.get(f'/api/audits/audits/{self.audit.pk}/recommend_assignees/?roles=guest')
+        self.assertEqual(response.status_code, 400)
+
+    def test_auto_assign_balances_tasks(self):
+        """Test that auto-assign spreads unassigned tasks least loaded first"""
+        self.assign('Task 0', self.members['busy'], priority='critical', risk_level='critical')
+        response = self.client.post(
+            f'/api/audits/audits/{self.audit.pk}/auto_assign/',
+            {'team': self.team.pk, 'roles': ['member']},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        assigned = {row['task']: row['user'] for row in response.data['assignments']}
+        self.assertEqual(len(assigned), 3)
+        self.assertNotIn(self.members['busy'].pk, assigned.values())
+        for task in AuditTask.objects.filter(pk__in=assigned).select_related('checklist'):
+            self.assertEqual(task.assigned_to_id, assigned[task.pk])
+            self.assertEqual(task.checklist.assigned_to_id, assigned[task.pk])
+            self.assertTrue(task.assigned_users.filter(pk=assigned[task.pk]).exists())
+        loads = {row['username']: row['open_tasks'] for row in response.data['workloads']}
+        # Ties go to the lower user id
+        self.assertEqual(loads, {'busy': 1, 'light': 2, 'idle': 1})
+
+        response = self.client.post(
+            f'/api/audits/audits/{self.audit.pk}/bulk_create_tasks/',
+            {
+                'templates': [{'template_id': self.template.pk, 'task_name': 'New'}],
+                'auto_assign': {'team': self.team.pk},
+            },
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['assignments']), 1)
+        self.assertEqual(response.data['created_tasks'][0]['assigned_to'], response.data['assignments'][0]['user'])
+
+
+    def test_auto_assign_replaces_previous_assignee(self):
+        """Test that reassigning explicit tasks takes the previous assignee off the task and checklist"""
+        self.assign('Task 0', self.members['busy'])
+        task = self.audit.audit_tasks.select_related('checklist').get(task_name='Task 0')
+        task.checklist.assigned_to = self.members['busy']
+        task.checklist.save()
+        response = self.client.post(
+            f'/api/audits/audits/{self.audit.pk}/auto_assign/',
+            {'team': self.team.pk, 'roles': ['member'], 'task_ids': [task.pk]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        assignee = response.data['assignments'][0]['user']
+        self.assertNotEqual(assignee, self.members['busy'].pk)
+        self.assertEqual(list(task.assigned_users.values_list('pk', flat=True)), [assignee])
+        self.assertNotIn(self.members['busy'].pk, task.checklist.assigned_users.values_list('pk', flat=True))
+
+
+class FindingAnalyticsTests(AuditAPITestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.audit = self.create_audit(statuses=())
+        for severity, control_area, finding_status in [
+            ('high', 'Access', 'open'),
+            ('high', 'Access', 'closed'),
+            ('high', 'Change', 'open'),
+            ('low', 'Access', 'open'),
+        ]:
+            self.add_finding(severity, control_area, finding_status)
+
+    def add_finding(self, severity, control_area, finding_status='open'):
+        return AuditFinding.objects.create(
+            title=f'{severity} {control_area}',
+            description='Found',
+            severity=severity,
+            finding_type='control_deficiency',
+            control_area=control_area,
+            status=finding_status,
+            audit=self.audit,
+            created_by=self.user,
+        )
+
+    def test_cube_counts_live_and_compacted(self):
+        """Test that counts agree before and after compaction and follow edits"""
+        url = '/api/audits/finding-analytics/'
+        params = {'group_by': 'severity,control_area'}
+        live = self.client.get(url, params).data
+        self.assertEqual(live['total'], 4)
+        self.assertEqual(live['results'][0], {'severity': 'high', 'control_area': 'Access', 'count': 2})
+
+        compact_periods()
+        self.assertFalse(FindingCubeChange.objects.exists())
+        self.assertEqual(FindingCubeCell.objects.count(), 4)
+        cache.clear()
+        self.assertEqual(self.client.get(url, params).data, live)
+
+        # Drill into high severity access findings by status
+        response = self.client.get(url, {'group_by': 'status', 'severity': 'high', 'control_area': 'Access'})
+        self.assertEqual(response.data['results'], [{'status': 'closed', 'count': 1}, {'status': 'open', 'count': 1}])
+
+        finding = AuditFinding.objects.get(severity='low')
+        finding.severity = 'critical'
+        finding.save()
+        response = self.client.get(url, {'group_by': 'severity'})
+        self.assertEqual(
+            response.data['results'], [{'severity': 'high', 'count': 3}, {'severity': 'critical', 'count': 1}]
+        )
+
+        finding.delete()
+        compact_periods()
+        response = self.client.get(url, {'group_by': 'severity'})
+        self.assertEqual(response.data['total'], 3)
+
+    def test_trends_and_cached_answers(self):
+        """Test the time series and that repeated queries are served from the cache"""
+        compact_periods()
+        url = '/api/audits/finding-analytics/trends/'
+        response = self.client.get(url, {'interval': 'quarter', 'group_by': 'severity'})
+        today = timezone.localdate()
+        quarter = date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+        self.assertEqual(response.data['results'], [
+            {'severity': 'high', 'period': quarter, 'count': 3},
+            {'severity': 'low', 'period': quarter, 'count': 1},
+        ])
+
+        with self.assertNumQueries(0):
+            self.client.get(url, {'interval': 'quarter', 'group_by': 'severity'})
+
+        # A new finding moves the cache version
+        self.add_finding('low', 'Change')
+        response = self.client.get(url, {'interval': 'year'})
+        self.assertEqual(response.data['results'], [{'period': today.replace(month=1, day=1), 'count': 5}])
+
+    def test_staff_only(self):
+        """Test that users who are not staff cannot read counts spanning every audit"""
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/audits/finding-analytics/').status_code, 403)
+        self.assertEqual(self.client.get('/api/audits/finding-analytics/trends/').status_code, 403)
+
+    def test_invalid_parameters(self):
+        """Test that unknown dimensions and values are rejected"""
+        url = '/api/audits/finding-analytics/'
+        self.assertEqual(self.client.get(url, {'group_by': 'title'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'severity': 'urgent'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'period_from': '2025-06', 'period_to': '2025-01'}).status_code, 400)
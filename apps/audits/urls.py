@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AuditViewSet, CustomAuditTypeViewSet, AuditTaskViewSet,
     TeamViewSet, TeamListCreateView, TeamDetailView,
-    TeamMemberListCreateView, TeamMemberDetailView
+    TeamMemberListCreateView, TeamMemberDetailView, FindingAnalyticsViewSet
 )
 
 router = DefaultRouter()
@@ -11,6 +11,7 @@ router.register('audits', AuditViewSet, basename='audit')
 router.register('audit-types', CustomAuditTypeViewSet, basename='audit-type')
 router.register('audit-tasks', AuditTaskViewSet, basename='audit-task')
 router.register('teams', TeamViewSet, basename='team')
+router.register('finding-analytics', FindingAnalyticsViewSet, basename='finding-analytics')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -3,21 +3,36 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Count
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Count, Exists, OuterRef
 from django.shortcuts import get_object_or_404
-from .models import Audit, AuditType, CustomAuditType, AuditTask, AuditEvidence, Team, TeamMember
+from .models import Audit, AuditType, CustomAuditType, AuditTask, AuditEvidence, AuditReviewEvent, Team, TeamMember
+from .access import audit_access
+from .findings_cube import DIMENSIONS, cached_query, query_cube
+from . import workload
+from .reviews import record_decision, request_review, review_history
+from .team_cache import visible_team_ids
 from .serializers import (
     AuditSerializer, CustomAuditTypeSerializer, AuditTaskCreateSerializer,
     AuditTaskDetailSerializer, AuditTaskListSerializer, AuditEvidenceSerializer,
     TeamListSerializer, TeamCreateUpdateSerializer, TeamDetailSerializer,
-    TeamMemberCreateUpdateSerializer, TeamMemberSerializer
+    TeamMemberCreateUpdateSerializer, TeamMemberSerializer, FindingAnalyticsQuerySerializer,
+    AssignmentQuerySerializer, AuditCloneSerializer
 )
+from .cloning import clone_audit
+from .tasks import clone_audit_job, clone_job_key
 from apps.checklists.models import ChecklistTemplate
+from apps.checklists.rollups import get_rollup
 from apps.checklists.serializers import ChecklistTemplateListSerializer
+from apps.utils.views import ConditionalRequestMixin, SparseFieldsetMixin
 from workflows.models import Workflow
 import logging
+import uuid
 from django.utils import timezone
-from rest_framework.exceptions import PermissionDenied
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.generics import ListCreateAPIView, RetrieveUpdateDestroyAPIView
 
 logger = logging.getLogger(__name__)
@@ -54,10 +69,23 @@ class CustomAuditTypeViewSet(viewsets.ModelViewSet):
         instance.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-class AuditViewSet(viewsets.ModelViewSet):
+class AuditViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Audit.objects.all()
     serializer_class = AuditSerializer
     permission_classes = [permissions.IsAuthenticated]
+    sparse_select_related = {
+        'created_by_name': ['created_by'],
+        'workflow_name': ['workflow'],
+    }
+    sparse_prefetch_related = {
+        'assigned_users': ['assigned_users'],
+        'assigned_users_details': ['assigned_users'],
+        'tasks': ['audit_tasks__checklist__template', 'audit_tasks__assigned_to'],
+    }
+    sparse_annotations = {
+        'task_progress': Audit.task_count_annotations,
+        'tasks_summary': Audit.task_count_annotations,
+    }
 
     def create(self, request, *args, **kwargs):
         """
@@ -80,7 +108,7 @@ class AuditViewSet(viewsets.ModelViewSet):
         """
         Filter audits based on query parameters
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().filter(audit_access(self.request.user))
         
         # Filter by audit type
         audit_type = self.request.query_params.get('audit_type', None)
@@ -193,6 +221,45 @@ class AuditViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(audit)
         return Response(serializer.data)
 
+    @action(detail=True, methods=['post'])
+    def clone(self, request, pk=None):
+        """
+        Copy the audit with its tasks, checklists and assignments, due dates
+        moved by ``offset_days`` or to the new ``period_from``. Large audits,
+        or any with ``background``, are cloned by a job whose progress is
+        read from ``clone_jobs/<job id>/``.
+        """
+        audit = self.get_object()
+        serializer = AuditCloneSerializer(data=request.data, context={'audit': audit, 'request': request})
+        serializer.is_valid(raise_exception=True)
+        options = dict(serializer.validated_data)
+        offset_days = options.pop('offset_days')
+
+        if options.pop('background') or audit.audit_tasks.count() > settings.AUDIT_CLONE_SYNC_MAX_TASKS:
+            job_id = str(uuid.uuid4())
+            # Recorded before the job can run, only the user who started it reads its progress
+            cache.set(clone_job_key(job_id), request.user.pk, settings.AUDIT_CLONE_JOB_TIMEOUT)
+            job = clone_audit_job.apply_async((audit.pk, request.user.pk, offset_days), options, task_id=job_id)
+            return Response({'job_id': job.id, 'state': job.state}, status=status.HTTP_202_ACCEPTED)
+
+        clone = clone_audit(audit, request.user, offset=timedelta(days=offset_days), **options)
+        return Response(self.get_serializer(clone).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path=r'clone_jobs/(?P<job_id>[^/.]+)')
+    def clone_job(self, request, job_id=None):
+        """State of a background clone, with its progress while running and the new audit once done"""
+        if cache.get(clone_job_key(job_id)) != request.user.pk:
+            raise NotFound()
+        job = clone_audit_job.AsyncResult(job_id)
+        data = {'job_id': job_id, 'state': job.state}
+        if job.state == 'PROGRESS':
+            data['progress'] = job.info
+        elif job.successful():
+            data['result'] = job.result
+        elif job.failed():
+            data['error'] = str(job.result)
+        return Response(data)
+
     # ======================== AUDIT TASK MANAGEMENT ========================
 
     @action(detail=True, methods=['get', 'post'])
@@ -246,43 +313,30 @@ class AuditViewSet(viewsets.ModelViewSet):
         Get task summary and progress for audit
         """
         audit = self.get_object()
-        progress = audit.get_task_progress()
+        rollup = get_rollup('audit', audit.pk)
+        total = rollup['total']
+        progress = {
+            'total': total,
+            'completed': rollup['completed'],
+            'percentage': round(rollup['completed'] / total * 100, 2) if total else 0
+        }
         
-        # Get task breakdown by status
-        tasks = audit.audit_tasks.select_related('checklist').all()
         task_breakdown = {
-            'by_status': {},
-            'by_priority': {},
-            'by_risk_level': {},
-            'overdue_count': 0,
+            'by_status': rollup['by_status'],
+            'by_priority': rollup['by_priority'],
+            'by_risk_level': rollup['by_risk_level'],
+            'overdue_count': rollup['overdue'],
             'recent_activity': []
         }
         
-        # Count by status
-        for task in tasks:
-            task_status = task.get_task_status()
-            task_breakdown['by_status'][task_status] = task_breakdown['by_status'].get(task_status, 0) + 1
-            
-            # Count by priority
-            priority = task.priority
-            task_breakdown['by_priority'][priority] = task_breakdown['by_priority'].get(priority, 0) + 1
-            
-            # Count by risk level
-            risk = task.risk_level
-            task_breakdown['by_risk_level'][risk] = task_breakdown['by_risk_level'].get(risk, 0) + 1
-            
-            # Check if overdue
-            if task.due_date and task.due_date < timezone.now() and task_status not in ['completed']:
-                task_breakdown['overdue_count'] += 1
-        
         # Get recent activity (last 5 updated tasks)
-        recent_tasks = tasks.order_by('-updated_at')[:5]
+        recent_tasks = audit.audit_tasks.select_related('checklist', 'checklist__template').order_by('-updated_at')[:5]
         task_breakdown['recent_activity'] = AuditTaskListSerializer(recent_tasks, many=True).data
         
         return Response({
             'progress': progress,
             'breakdown': task_breakdown,
-            'total_tasks': len(tasks)
+            'total_tasks': total
         })
 
     @action(detail=True, methods=['post'])
@@ -299,6 +353,12 @@ class AuditViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # ``auto_assign``: true or {"team": id, "roles": [...]}, spreads unassigned new tasks by workload
+        assign_options = request.data.get('auto_assign')
+        assign_params = None
+        if assign_options:
+            assign_params = self.get_assignment_params(assign_options if isinstance(assign_options, dict) else {})
+        
         created_tasks = []
         errors = []
         
@@ -309,8 +369,7 @@ class AuditViewSet(viewsets.ModelViewSet):
                     context={'audit': audit, 'request': request}
                 )
                 if serializer.is_valid():
-                    task = serializer.save()
-                    created_tasks.append(AuditTaskDetailSerializer(task).data)
+                    created_tasks.append(serializer.save())
                 else:
                     errors.append({
                         'template_id': config.get('template_id'),
@@ -322,29 +381,133 @@ class AuditViewSet(viewsets.ModelViewSet):
                     'errors': str(e)
                 })
         
-        return Response({
-            'created_tasks': created_tasks,
+        assignments = {}
+        if assign_params is not None and created_tasks:
+            candidates = self.get_assignment_candidates(audit, assign_params)
+            assignments = workload.auto_assign(
+                AuditTask.objects.filter(pk__in=[task.pk for task in created_tasks], assigned_to__isnull=True),
+                candidates,
+            )
+            if assignments:
+                # Serialize the tasks as assigned
+                tasks = AuditTask.objects.in_bulk([task.pk for task in created_tasks])
+                created_tasks = [tasks[task.pk] for task in created_tasks]
+        
+        response = {
+            'created_tasks': [AuditTaskDetailSerializer(task).data for task in created_tasks],
             'errors': errors,
             'summary': {
                 'total_requested': len(template_configs),
                 'created': len(created_tasks),
                 'failed': len(errors)
             }
-        }, status=status.HTTP_201_CREATED if created_tasks else status.HTTP_400_BAD_REQUEST)
+        }
+        if assign_params is not None:
+            response['assignments'] = [{'task': task_id, 'user': user_id} for task_id, user_id in assignments.items()]
+        return Response(response, status=status.HTTP_201_CREATED if created_tasks else status.HTTP_400_BAD_REQUEST)
+
+    def get_assignment_params(self, data):
+        serializer = AssignmentQuerySerializer(data=data, context={'request': self.request})
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def get_assignment_candidates(self, audit, params):
+        """Members of the requested team with the requested roles, otherwise the users assigned to the audit"""
+        if params.get('team'):
+            return workload.get_candidates(params['team'], params.get('roles'))
+        return list(audit.assigned_users.values_list('pk', flat=True))
 
+    def with_user_names(self, rows):
+        users = {
+            user['pk']: user
+            for user in get_user_model().objects.filter(pk__in=[row['user'] for row in rows]).values(
+                'pk', 'username', 'first_name', 'last_name'
+            )
+        }
+        for row in rows:
+            user = users.get(row['user'], {})
+            row['username'] = user.get('username', '')
+            row['full_name'] = f"{user.get('first_name', '')} {user.get('last_name', '')}".strip()
+        return rows
 
-class AuditTaskViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def recommend_assignees(self, request, pk=None):
+        """
+        Candidates ranked by open workload, least loaded first.
+        ``?team=<id>&roles=member,lead&limit=5``, without a team the users
+        assigned to the audit are ranked.
+        """
+        audit = self.get_object()
+        params = self.get_assignment_params(request.query_params)
+        candidates = self.get_assignment_candidates(audit, params)
+        ranked = workload.recommend(candidates, limit=params['limit'])
+        return Response({'recommendations': self.with_user_names(ranked)})
+
+    @action(detail=True, methods=['post'])
+    def auto_assign(self, request, pk=None):
+        """
+        Balance tasks across the candidates by workload. ``task_ids``
+        defaults to the open tasks of the audit nobody is assigned to.
+        """
+        audit = self.get_object()
+        params = self.get_assignment_params(request.data)
+        candidates = self.get_assignment_candidates(audit, params)
+        if not candidates:
+            return Response(
+                {'detail': 'No candidates to assign tasks to'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        tasks = audit.audit_tasks.filter(task_status__in=AuditTask.OPEN_STATUSES)
+        if 'task_ids' in params:
+            tasks = tasks.filter(pk__in=params['task_ids'])
+        else:
+            tasks = tasks.filter(assigned_to__isnull=True)
+        assignments = workload.auto_assign(tasks, candidates)
+        return Response({
+            'assignments': [{'task': task_id, 'user': user_id} for task_id, user_id in assignments.items()],
+            'workloads': self.with_user_names(workload.recommend(candidates)),
+        })
+
+
+class AuditTaskViewSet(ConditionalRequestMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing individual audit tasks
     """
     queryset = AuditTask.objects.all()
     permission_classes = [permissions.IsAuthenticated]
+    # The detail view nests the linked checklist, list rows carry their own status and progress
+    conditional_fields = ('updated_at', 'checklist__updated_at')
+    sparse_select_related = {
+        'assigned_to_name': ['assigned_to'],
+        'created_by_name': ['created_by'],
+        'template_name': ['checklist__template'],
+        'checklist': [
+            'checklist__template__created_by', 'checklist__template__frozen_by',
+            'checklist__assigned_to', 'checklist__created_by',
+        ],
+    }
+    sparse_prefetch_related = {
+        'assigned_users': ['assigned_users'],
+        'assigned_users_details': ['assigned_users'],
+        'checklist': [
+            'checklist__assigned_users', 'checklist__template__fields',
+            'checklist__responses__field', 'checklist__responses__responded_by',
+        ],
+    }
+    sparse_annotations = {
+        'evidence_count': lambda: {'evidence_total': Count('evidence', distinct=True)},
+    }
     
     def get_serializer_class(self):
         if self.action in ['list']:
             return AuditTaskListSerializer
         return AuditTaskDetailSerializer
     
+    def list(self, request, *args, **kwargs):
+        self.conditional_fields = ('updated_at',)
+        return super().list(request, *args, **kwargs)
+    
     def get_queryset(self):
         queryset = super().get_queryset()
         
@@ -358,17 +521,23 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
         if assigned_to:
             queryset = queryset.filter(assigned_to_id=assigned_to)
         
-        # Filter by status
+        # Filter by status, checklist status names such as 'draft' are still accepted
         task_status = self.request.query_params.get('status')
         if task_status:
-            queryset = queryset.filter(checklist__status=task_status)
+            task_status = AuditTask.CHECKLIST_STATUS_MAPPING.get(task_status, task_status)
+            queryset = queryset.filter(task_status=task_status)
         
         # Filter by priority
         priority = self.request.query_params.get('priority')
         if priority:
             queryset = queryset.filter(priority=priority)
         
-        return queryset.select_related('audit', 'checklist', 'assigned_to', 'created_by')
+        # Filter by the overdue flag kept by the deadline scheduler
+        is_overdue = self.request.query_params.get('is_overdue')
+        if is_overdue in ('true', 'false'):
+            queryset = queryset.filter(is_overdue=is_overdue == 'true')
+        
+        return queryset
     
     def update(self, request, *args, **kwargs):
         """Handle both full and partial updates"""
@@ -464,18 +633,24 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        reviewer = None
+        if request.data.get('reviewer'):
+            reviewer = get_object_or_404(get_user_model(), pk=request.data['reviewer'])
+        
         # Update checklist status to under_review if that status exists
         try:
             from apps.checklists.models import Checklist
             task.checklist.status = 'under_review'
             task.checklist.save()
+            review = request_review(task, request.user, reviewer)
             
             # Log the review submission
             logger.info(f"Task {task.id} submitted for review by user {request.user.id}")
             
             return Response({
                 'detail': 'Task submitted for review successfully',
-                'status': task.checklist.status
+                'status': task.checklist.status,
+                'review_id': review.pk
             })
         except Exception as e:
             logger.error(f"Error submitting task for review: {e}")
@@ -499,8 +674,8 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
         # Update task completion
         if not task.completed_at:
             task.completed_at = timezone.now()
-        task.completion_notes += f"\n\nApproved by {request.user.get_full_name() or request.user.username}: {notes}"
         task.save()
+        record_decision(task, request.user, AuditReviewEvent.EVENT_APPROVED, notes)
         
         logger.info(f"Task {task.id} approved by user {request.user.id}")
         
@@ -529,10 +704,9 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
         task.checklist.status = 'in_progress'
         task.checklist.save()
         
-        # Add rejection notes
-        task.completion_notes += f"\n\nRejected by {request.user.get_full_name() or request.user.username}: {reason}"
         task.completed_at = None  # Clear completion timestamp
         task.save()
+        record_decision(task, request.user, AuditReviewEvent.EVENT_REJECTED, reason)
         
         logger.info(f"Task {task.id} rejected by user {request.user.id}")
         
@@ -550,22 +724,10 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
         """
         task = self.get_object()
         
-        # Parse completion notes to extract review history
-        review_history = []
-        if task.completion_notes:
-            lines = task.completion_notes.split('\n')
-            for line in lines:
-                if 'Approved by' in line or 'Rejected by' in line:
-                    review_history.append({
-                        'action': 'approved' if 'Approved by' in line else 'rejected',
-                        'details': line.strip(),
-                        'timestamp': task.updated_at.isoformat() if task.updated_at else None
-                    })
-        
         return Response({
             'task_id': task.id,
             'current_status': task.checklist.status,
-            'review_history': review_history,
+            'review_history': review_history(task),
             'completion_notes': task.completion_notes
         })
 
@@ -637,7 +799,25 @@ class AuditTaskViewSet(viewsets.ModelViewSet):
         return Response(report_data)
 
 # Team Views
-class TeamListCreateView(ListCreateAPIView):
+class TeamFieldsetMixin(SparseFieldsetMixin):
+    """Related data needed by the team serializers, loaded only for rendered fields"""
+    sparse_select_related = {
+        'owner_name': ['owner'],
+        'owner_details': ['owner__picture'],
+        'created_by_name': ['created_by'],
+    }
+    sparse_prefetch_related = {
+        'members_details': ['team_memberships__user__picture', 'team_memberships__added_by'],
+    }
+    sparse_annotations = {
+        'member_count': lambda: {
+            'member_total': Count('team_memberships', filter=Q(team_memberships__is_active=True), distinct=True)
+        },
+        'audit_count': lambda: {'audit_total': Count('audits', distinct=True)},
+    }
+
+
+class TeamListCreateView(TeamFieldsetMixin, ListCreateAPIView):
     """
     List all teams or create a new team
     """
@@ -656,10 +836,7 @@ class TeamListCreateView(ListCreateAPIView):
             return Team.objects.all()
         
         # Users can see teams they own or are members of
-        return Team.objects.filter(
-            Q(owner=user) | 
-            Q(team_memberships__user=user, team_memberships__is_active=True)
-        ).distinct()
+        return Team.objects.filter(id__in=visible_team_ids(user.pk))
     
     def get_serializer_class(self):
         """Use different serializers for list and create"""
@@ -668,7 +845,7 @@ class TeamListCreateView(ListCreateAPIView):
         return TeamCreateUpdateSerializer
 
 
-class TeamDetailView(RetrieveUpdateDestroyAPIView):
+class TeamDetailView(TeamFieldsetMixin, RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update or delete a team
     """
@@ -684,10 +861,7 @@ class TeamDetailView(RetrieveUpdateDestroyAPIView):
             return Team.objects.all()
         
         # Users can access teams they own or are members of
-        return Team.objects.filter(
-            Q(owner=user) | 
-            Q(team_memberships__user=user, team_memberships__is_active=True)
-        ).distinct()
+        return Team.objects.filter(id__in=visible_team_ids(user.pk))
     
     def get_serializer_class(self):
         """Use different serializers for different actions"""
@@ -778,7 +952,7 @@ class TeamMemberDetailView(RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(TeamFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for team management with additional actions
     """
@@ -797,10 +971,7 @@ class TeamViewSet(viewsets.ModelViewSet):
             return Team.objects.all()
         
         # Users can see teams they own or are members of
-        return Team.objects.filter(
-            Q(owner=user) | 
-            Q(team_memberships__user=user, team_memberships__is_active=True)
-        ).distinct()
+        return Team.objects.filter(id__in=visible_team_ids(user.pk))
     
     def get_serializer_class(self):
         """Use different serializers for different actions"""
@@ -865,13 +1036,32 @@ class TeamViewSet(viewsets.ModelViewSet):
         serializer = TeamMemberSerializer(members, many=True)
         return Response(serializer.data)
     
+    def get_requested_audits(self, request):
+        """Audits named by ``audit_id`` or an ``audit_ids`` list, ``None`` when none were given"""
+        audit_ids = request.data.get('audit_ids')
+        if audit_ids is None:
+            audit_id = request.data.get('audit_id')
+            audit_ids = [audit_id] if audit_id else []
+        if not isinstance(audit_ids, list) or not audit_ids:
+            return None, None
+        audits = list(Audit.objects.filter(id__in=audit_ids).only('pk'))
+        if len(audits) != len(set(map(str, audit_ids))):
+            return audits, Response(
+                {'error': 'Audit not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return audits, None
+    
     @action(detail=True, methods=['post'])
     def assign_to_audit(self, request, pk=None):
-        """Assign team to an audit"""
+        """
+        Assign team to one audit (``audit_id``) or several (``audit_ids``).
+        Members are added to the audits and, by role, to their tasks.
+        """
         team = self.get_object()
-        audit_id = request.data.get('audit_id')
         
-        if not audit_id:
+        audits, error = self.get_requested_audits(request)
+        if audits is None:
             return Response(
                 {'error': 'audit_id is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -884,23 +1074,20 @@ class TeamViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        try:
-            audit = Audit.objects.get(id=audit_id)
-            team.audits.add(audit)
-            return Response({'message': 'Team assigned to audit successfully'}, status=status.HTTP_200_OK)
-        except Audit.DoesNotExist:
-            return Response(
-                {'error': 'Audit not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        if error:
+            return error
+        
+        # Propagated to the members by the m2m_changed handler in signals.py
+        team.audits.add(*audits)
+        return Response({'message': 'Team assigned to audit successfully'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['delete'])
     def unassign_from_audit(self, request, pk=None):
-        """Unassign team from an audit"""
+        """Unassign team from one audit (``audit_id``) or several (``audit_ids``)"""
         team = self.get_object()
-        audit_id = request.data.get('audit_id')
         
-        if not audit_id:
+        audits, error = self.get_requested_audits(request)
+        if audits is None:
             return Response(
                 {'error': 'audit_id is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
@@ -913,24 +1100,19 @@ class TeamViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        try:
-            audit = Audit.objects.get(id=audit_id)
-            team.audits.remove(audit)
-            return Response({'message': 'Team unassigned from audit successfully'}, status=status.HTTP_200_OK)
-        except Audit.DoesNotExist:
-            return Response(
-                {'error': 'Audit not found'}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
+        if error:
+            return error
+        
+        team.audits.remove(*audits)
+        return Response({'message': 'Team unassigned from audit successfully'}, status=status.HTTP_200_OK)
     
     @action(detail=False, methods=['get'])
     def my_teams(self, request):
         """Get teams where the current user is owner or member"""
         user = request.user
-        teams = Team.objects.filter(
-            Q(owner=user) | 
-            Q(team_memberships__user=user, team_memberships__is_active=True)
-        ).distinct()
+        teams = Team.objects.filter(id__in=visible_team_ids(user.pk)).select_related('owner').annotate(
+            member_total=Count('team_memberships', filter=Q(team_memberships__is_active=True))
+        )
         
         serializer = TeamListSerializer(teams, many=True)
         return Response(serializer.data)
@@ -943,18 +1125,94 @@ class TeamViewSet(viewsets.ModelViewSet):
         # Get teams the user can see
         teams = self.get_queryset()
         
-        stats = {
-            'total_teams': teams.count(),
-            'teams_by_type': {},
-            'owned_teams': teams.filter(owner=user).count(),
-            'member_teams': teams.filter(team_memberships__user=user, team_memberships__is_active=True).count(),
-            'active_teams': teams.filter(is_active=True).count(),
+        # One aggregate query instead of one count per number
+        type_counts = {
+            f'type_{value}': Count('pk', filter=Q(type=value)) for value, _label in Team.TEAM_TYPE_CHOICES
         }
+        counts = teams.annotate(
+            is_member=Exists(TeamMember.objects.filter(team=OuterRef('pk'), user=user, is_active=True))
+        ).aggregate(
+            total_teams=Count('pk'),
+            owned_teams=Count('pk', filter=Q(owner=user)),
+            member_teams=Count('pk', filter=Q(is_member=True)),
+            active_teams=Count('pk', filter=Q(is_active=True)),
+            **type_counts
+        )
         
-        # Teams by type
-        type_counts = teams.values('type').annotate(count=Count('type'))
-        for item in type_counts:
-            team_type = dict(Team.TEAM_TYPE_CHOICES).get(item['type'], item['type'])
-            stats['teams_by_type'][team_type] = item['count']
+        stats = {
+            'total_teams': counts['total_teams'],
+            'teams_by_type': {
+                str(label): counts[f'type_{value}']
+                for value, label in Team.TEAM_TYPE_CHOICES if counts[f'type_{value}']
+            },
+            'owned_teams': counts['owned_teams'],
+            'member_teams': counts['member_teams'],
+            'active_teams': counts['active_teams'],
+        }
         
         return Response(stats)
+
+
+class FindingAnalyticsViewSet(viewsets.ViewSet):
+    """
+    Finding counts served from the findings cube (``apps.audits.findings_cube``).
+
+    ``?group_by=severity,control_area`` picks the dimensions, dimension
+    parameters such as ``?severity=high,critical`` filter and
+    ``?period_from=2025-01&period_to=2025-06`` limit the months. Drill down by
+    filtering on a row's values and grouping by the next dimension.
+
+    Cube cells add up findings across every audit and cannot be narrowed to
+    the audits one user works on, so the analytics are for staff only.
+    """
+    permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
+
+    def get_query(self, request, default_group_by):
+        serializer = FindingAnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        query = serializer.validated_data
+        return {
+            'group_by': query.get('group_by', default_group_by),
+            'filters': {dimension: query[dimension] for dimension in DIMENSIONS if query.get(dimension)},
+            'interval': query['interval'],
+            'period_from': query.get('period_from'),
+            'period_to': query.get('period_to'),
+        }
+
+    def list(self, request):
+        """Counts per combination of the grouped dimensions"""
+        query = self.get_query(request, ['severity', 'control_area'])
+
+        def compute():
+            rows = query_cube(
+                query['group_by'], query['filters'], period_from=query['period_from'], period_to=query['period_to']
+            )
+            rows.sort(key=lambda row: (-row['count'], *(row[key] for key in query['group_by'])))
+            return {
+                'group_by': query['group_by'],
+                'filters': query['filters'],
+                'total': sum(row['count'] for row in rows),
+                'results': rows,
+            }
+
+        return Response(cached_query({'view': 'cube', **query}, compute))
+
+    @action(detail=False, methods=['get'])
+    def trends(self, request):
+        """Counts per ``interval`` (month, quarter or year), optionally split by dimensions"""
+        query = self.get_query(request, [])
+
+        def compute():
+            rows = query_cube(
+                query['group_by'], query['filters'], interval=query['interval'],
+                period_from=query['period_from'], period_to=query['period_to'],
+            )
+            rows.sort(key=lambda row: (row['period'], *(row[key] for key in query['group_by'])))
+            return {
+                'group_by': query['group_by'],
+                'filters': query['filters'],
+                'interval': query['interval'],
+                'results': rows,
+            }
+
+        return Response(cached_query({'view': 'trends', **query}, compute))
@@ -0,0 +1,178 @@
+"""
+Workload aware task assignment.
+
+A user's load is the weighted sum of their open audit tasks: each task
+weighs by priority scaled by risk level, plus the checklist fields still to
+fill in and extra weight for tasks due soon or overdue. Loads are kept as
+``workload`` dashboard rollups (``apps.checklists.rollups``), so ranking the
+members of a team reads one row per member instead of scanning their tasks.
+
+``recommend`` ranks candidates by load, ``auto_assign`` spreads a set of
+tasks over them, heaviest task first to whoever is least loaded.
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.checklists.models import Checklist
+from apps.checklists.rollups import get_rollups, mark_changed, mark_checklists_changed
+
+from .assignments import add_links, remove_links
+from .models import AuditTask, TeamMember, TeamTaskGrant
+
+PRIORITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 5}
+RISK_FACTORS = {'low': 1.0, 'medium': 1.25, 'high': 1.5, 'critical': 2.0}
+FIELD_WEIGHT = 0.1
+DUE_SOON_WEIGHT = 1
+OVERDUE_WEIGHT = 2
+
+
+def task_weight(priority, risk_level):
+    return PRIORITY_WEIGHTS.get(priority, 2) * RISK_FACTORS.get(risk_level, 1.25)
+
+
+def compute_workloads(user_ids):
+    """``{user id: workload}`` straight from the open tasks of the users"""
+    workloads = {
+        user_id: {'open_tasks': 0, 'remaining_fields': 0, 'due_soon': 0, 'overdue': 0, 'load': 0.0}
+        for user_id in user_ids
+    }
+    due_soon = timezone.now() + timedelta(days=settings.WORKLOAD_DUE_SOON_DAYS)
+    rows = AuditTask.objects.filter(
+        assigned_to_id__in=workloads, task_status__in=AuditTask.OPEN_STATUSES
+    ).values_list(
+        'assigned_to_id', 'priority', 'risk_level', 'due_date', 'is_overdue',
+        'checklist__total_fields', 'checklist__completed_fields',
+    )
+    for user_id, priority, risk_level, due_date, is_overdue, total_fields, completed_fields in rows:
+        workload = workloads[user_id]
+        remaining = max((total_fields or 0) - (completed_fields or 0), 0)
+        workload['open_tasks'] += 1
+        workload['remaining_fields'] += remaining
+        load = task_weight(priority, risk_level) + remaining * FIELD_WEIGHT
+        if is_overdue:
+            workload['overdue'] += 1
+            load += OVERDUE_WEIGHT
+        elif due_date and due_date <= due_soon:
+            workload['due_soon'] += 1
+            load += DUE_SOON_WEIGHT
+        workload['load'] += load
+    for workload in workloads.values():
+        workload['load'] = round(workload['load'], 2)
+    return workloads
+
+
+def compute_workload(user_id):
+    return compute_workloads([user_id])[user_id]
+
+
+def get_workloads(user_ids):
+    return get_rollups('workload', user_ids, compute_many=compute_workloads)
+
+
+def get_candidates(team, roles=None):
+    """Ids of the active members of ``team`` with one of ``roles``, ``owner`` stands for the owner"""
+    members = TeamMember.objects.filter(team=team, is_active=True)
+    if roles:
+        members = members.filter(role__in=roles)
+    candidates = list(members.values_list('user_id', flat=True))
+    if (not roles or 'owner' in roles) and team.owner_id not in candidates:
+        candidates.append(team.owner_id)
+    return candidates
+
+
+def recommend(user_ids, limit=None):
+    """Candidates with their workload, least loaded first"""
+    workloads = get_workloads(user_ids)
+    ranked = sorted(
+        ({'user': user_id, **workload} for user_id, workload in workloads.items()),
+        key=lambda row: (row['load'], row['open_tasks'], row['user']),
+    )
+    return ranked[:limit] if limit else ranked
+
+
+def plan_assignments(tasks, user_ids):
+    """
+    ``{task id: user id}`` balancing ``tasks`` (``(pk, priority, risk_level)``
+    tuples) over the users, heaviest task first to the least loaded user.
+    """
+    if not user_ids:
+        return {}
+    heap = [(workload['load'], user_id) for user_id, workload in get_workloads(user_ids).items()]
+    heapq.heapify(heap)
+    plan = {}
+    for pk, priority, risk_level in sorted(tasks, key=lambda task: (-task_weight(task[1], task[2]), task[0])):
+        load, user_id = heapq.heappop(heap)
+        plan[pk] = user_id
+        heapq.heappush(heap, (load + task_weight(priority, risk_level), user_id))
+    return plan
+
+
+@transaction.atomic
+def auto_assign(tasks, user_ids):
+    """
+    Assign ``tasks`` (an ``AuditTask`` queryset) across ``user_ids`` and their
+    checklists with one update per user. Previous assignees are taken off the
+    assigned users unless a team grant put them there. Returns the
+    ``{task id: user id}`` plan.
+    """
+    rows = list(tasks.values_list(
+        'pk', 'priority', 'risk_level', 'checklist_id', 'assigned_to_id', 'audit_id', 'checklist__assigned_to_id'
+    ))
+    plan = plan_assignments([row[:3] for row in rows], user_ids)
+    if not plan:
+        return plan
+    replace_assignees(rows, plan)
+
+    by_user = defaultdict(list)
+    checklists = {}
+    for pk, _priority, _risk_level, checklist_id, _assigned_to_id, _audit_id, _checklist_assignee in rows:
+        by_user[plan[pk]].append(pk)
+        if checklist_id:
+            checklists[pk] = checklist_id
+    # Dashboards of the previous checklist assignees change as well
+    mark_checklists_changed(list(checklists.values()))
+    now = timezone.now()
+    for user_id, task_ids in by_user.items():
+        AuditTask.objects.filter(pk__in=task_ids).update(assigned_to_id=user_id, updated_at=now)
+        Checklist.objects.filter(pk__in=[checklists[pk] for pk in task_ids if pk in checklists]).update(
+            assigned_to_id=user_id, updated_at=now
+        )
+    add_links(AuditTask.assigned_users, plan.items())
+    add_links(Checklist.assigned_users, [(checklists[pk], user_id) for pk, user_id in plan.items() if pk in checklists])
+
+    # update() sends no signals, queue the rollups of everyone involved
+    mark_changed(
+        [('workload', user_id) for user_id in {*plan.values(), *(row[4] for row in rows)}]
+        + [('audit', row[5]) for row in rows]
+    )
+    mark_checklists_changed(list(checklists.values()))
+    return plan
+
+
+def replace_assignees(rows, plan):
+    """Take the previous assignees of reassigned ``auto_assign`` rows off the task and checklist assigned users"""
+    task_pairs, checklist_pairs = set(), set()
+    for pk, _priority, _risk_level, checklist_id, assigned_to_id, _audit_id, checklist_assignee in rows:
+        if assigned_to_id and assigned_to_id != plan[pk]:
+            task_pairs.add((pk, assigned_to_id))
+        if checklist_id and checklist_assignee and checklist_assignee != plan[pk]:
+            checklist_pairs.add((checklist_id, checklist_assignee))
+    if not task_pairs and not checklist_pairs:
+        return
+    # Links a team made stay until the team's grant is taken back
+    for task_id, checklist_id, user_id, owns_task, owns_checklist in TeamTaskGrant.objects.filter(
+        audit_task_id__in={pk for pk, *_rest in rows},
+        user_id__in={user_id for _pk, user_id in task_pairs | checklist_pairs},
+    ).values_list('audit_task_id', 'audit_task__checklist_id', 'user_id', 'owns_task_link', 'owns_checklist_link'):
+        if owns_task:
+            task_pairs.discard((task_id, user_id))
+        if owns_checklist:
+            checklist_pairs.discard((checklist_id, user_id))
+    remove_links(AuditTask.assigned_users, task_pairs)
+    remove_links(Checklist.assigned_users, checklist_pairs)
@@ -0,0 +1,32 @@
+"""
+Who may open which checklists and read which comments.
+
+The REST views, the offline sync and the live sockets filter with these
+helpers so their rules cannot drift apart. Staff see everything. Other users
+see the checklists assigned to them, created by them or built from their
+templates. Internal comments are for the people running a checklist, its
+creator and the owner of its template, and for their authors.
+"""
+
+from django.db.models import Q
+
+
+def checklist_access(user):
+    """Filter on ``Checklist`` rows ``user`` may open"""
+    if user.is_staff:
+        return Q()
+    return Q(assigned_to=user) | Q(created_by=user) | Q(template__created_by=user)
+
+
+def internal_access(user, prefix=''):
+    """Filter on ``Checklist`` rows whose internal comments ``user`` may read, ``prefix`` is the path to them"""
+    if user.is_staff:
+        return Q()
+    return Q(**{f'{prefix}created_by': user}) | Q(**{f'{prefix}template__created_by': user})
+
+
+def comment_access(user):
+    """Filter on ``ChecklistComment`` rows ``user`` may read on a checklist they can open"""
+    if user.is_staff:
+        return Q()
+    return Q(is_internal=False) | Q(author=user) | internal_access(user, 'checklist__')
@@ -5,3 +5,6 @@ class ChecklistsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.checklists"
     verbose_name = "Checklists"
+
+    def ready(self):
+        from . import signals  # noqa: F401
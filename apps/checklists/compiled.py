@@ -0,0 +1,73 @@
+"""
+Objects compiled from a template's fields, kept in process.
+
+Conditional logic graphs (``apps.checklists.logic``) and response validators
+(``apps.checklists.validators``) are built from the fields of a template once
+and reused until one of its fields changes. They hold closures and compiled
+regexes, so they live in a per-process LRU keyed by ``(template id,
+version)`` and only the version counter is shared through the cache.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Compiled templates kept per process and per kind
+COMPILED_CACHE_SIZE = 128
+
+
+def version_key(template_id):
+    return f'checklists:template:{template_id}:fields'
+
+
+def get_version(template_id):
+    key = version_key(template_id)
+    version = cache.get(key)
+    if version is None:
+        # Compiled objects outlive the cache, a lost counter must not restart at a version they hold
+        version = time.time_ns()
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(template_id):
+    try:
+        cache.incr(version_key(template_id))
+    except ValueError:
+        cache.add(version_key(template_id), time.time_ns(), None)
+
+
+def forget_template_fields(template_id):
+    """Recompile the template on next use, called whenever one of its fields changes"""
+    bump_version(template_id)
+    # Again once committed, so an object compiled from the old rows meanwhile is not kept
+    transaction.on_commit(lambda: bump_version(template_id))
+
+
+class CompiledCache:
+    """LRU of ``build(template_id, version)`` results for the current version of each template"""
+
+    def __init__(self, build, size=COMPILED_CACHE_SIZE):
+        self.build = build
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, template_id):
+        key = (template_id, get_version(template_id))
+        with self.lock:
+            compiled = self.entries.get(key)
+            if compiled is not None:
+                self.entries.move_to_end(key)
+                return compiled
+
+        compiled = self.build(*key)
+        with self.lock:
+            self.entries[key] = compiled
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return compiled
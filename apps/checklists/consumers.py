@@ -0,0 +1,140 @@
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+
+from .access import checklist_access, internal_access
+from .live import audit_group, checklist_group
+from .models import Checklist
+
+
+class LiveEventsConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Streams the live events of one group to a websocket.
+
+    Incoming events are buffered per row and flushed at most once every
+    ``LIVE_COALESCE_SECONDS``, so a burst of edits to the same response reaches
+    the client as its latest state. The buffer is bounded by
+    ``LIVE_MAX_PENDING_EVENTS``; a socket that cannot keep up gets a single
+    ``resync`` message and is expected to refetch over the REST API.
+
+    Internal comments only reach users who may read them on the REST API,
+    ``get_group_name`` sets ``internal_checklists`` to the checklists whose
+    internal comments the user reads, ``None`` for all of them.
+    """
+
+    internal_checklists = frozenset()
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user_id = user.pk
+        self.group_name = await self.get_group_name(user)
+        if self.group_name is None:
+            await self.close(code=4403)
+            return
+
+        self.pending = {}
+        self.overflowed = False
+        self.wakeup = asyncio.Event()
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.flusher = asyncio.ensure_future(self.flush_events())
+
+    async def disconnect(self, code):
+        flusher = getattr(self, "flusher", None)
+        if flusher is not None:
+            flusher.cancel()
+        if getattr(self, "group_name", None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def dispatch(self, message):
+        # Event fan-out never touches the database, skip the per-message thread
+        # hop Channels makes to close stale connections before each handler
+        if message["type"] == "live.events":
+            await self.live_events(message)
+        else:
+            await super().dispatch(message)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get("type") == "ping":
+            await self.send_json({"type": "pong"})
+
+    async def live_events(self, message):
+        if self.overflowed:
+            return
+        events = message["events"]
+        if self.internal_checklists is not None:
+            events = {key: event for key, event in events.items() if self.may_read(event)}
+        self.pending.update(events)
+        if len(self.pending) > settings.LIVE_MAX_PENDING_EVENTS:
+            self.pending.clear()
+            self.overflowed = True
+        self.wakeup.set()
+
+    def may_read(self, event):
+        return (
+            event["type"] != "comment"
+            or not event["is_internal"]
+            or event["author"] == self.user_id
+            or event["checklist"] in self.internal_checklists
+        )
+
+    async def flush_events(self):
+        while True:
+            await self.wakeup.wait()
+            if settings.LIVE_COALESCE_SECONDS:
+                await asyncio.sleep(settings.LIVE_COALESCE_SECONDS)
+            self.wakeup.clear()
+            events, self.pending = list(self.pending.values()), {}
+            if self.overflowed:
+                self.overflowed = False
+                await self.send_json({"type": "resync"})
+            elif events:
+                # Events keep arriving and coalescing while this send is in flight
+                await self.send_json({"type": "events", "events": events})
+
+    async def get_group_name(self, user):
+        raise NotImplementedError
+
+
+class ChecklistLiveConsumer(LiveEventsConsumer):
+    """Response, progress and comment events of one checklist"""
+
+    @database_sync_to_async
+    def get_group_name(self, user):
+        checklist_id = self.scope["url_route"]["kwargs"]["checklist_id"]
+        checklists = Checklist.objects.filter(checklist_access(user), pk=checklist_id)
+        if not checklists.exists():
+            return None
+        if user.is_staff:
+            self.internal_checklists = None
+        elif checklists.filter(internal_access(user)).exists():
+            self.internal_checklists = frozenset([checklist_id])
+        return checklist_group(checklist_id)
+
+
+class AuditLiveConsumer(LiveEventsConsumer):
+    """Progress and comment events of every checklist in one audit"""
+
+    @database_sync_to_async
+    def get_group_name(self, user):
+        from apps.audits.access import audit_access
+        from apps.audits.models import Audit
+
+        audit_id = self.scope["url_route"]["kwargs"]["audit_id"]
+        if not Audit.objects.filter(audit_access(user), pk=audit_id).exists():
+            return None
+        if user.is_staff:
+            self.internal_checklists = None
+        else:
+            # Checklists added to the audit later keep their internal comments hidden until reconnecting
+            self.internal_checklists = frozenset(
+                Checklist.objects.filter(internal_access(user), audit_task__audit_id=audit_id).values_list(
+                    'pk', flat=True
+                )
+            )
+        return audit_group(audit_id)
@@ -0,0 +1,111 @@
+"""
+Bulk editing of template fields.
+
+The template builder saves whole field lists at once. These helpers write
+them with set based queries: ``create_fields`` and ``copy_fields`` insert
+with one ``bulk_create``, ``sync_fields`` diffs the submitted list against
+the stored fields by ``id`` and only inserts, updates or deletes what
+changed, and
+``reorder_fields`` moves any number of fields with one ``bulk_update``.
+Bulk writes send no signals, so each helper bumps the template's field
+version itself (``apps.checklists.compiled``).
+"""
+
+from django.db import transaction
+from django.utils import timezone
+
+from .compiled import forget_template_fields
+from .logic import remap_logic
+from .models import ChecklistField
+
+# Definition of a field, what a copy takes over and a diff compares
+FIELD_ATTRIBUTES = (
+    'label', 'field_type', 'help_text', 'placeholder', 'is_required', 'is_readonly', 'default_value', 'options',
+    'min_length', 'max_length', 'min_value', 'max_value', 'order', 'css_class', 'conditional_logic',
+)
+
+
+def create_fields(template, fields_data):
+    """Insert ``fields_data`` (validated field dicts) into ``template``, returns the new fields"""
+    fields = ChecklistField.objects.bulk_create(
+        [ChecklistField(template=template, **{**data, 'id': None}) for data in fields_data]
+    )
+    forget_template_fields(template.pk)
+    return fields
+
+
+@transaction.atomic
+def copy_fields(source, target):
+    """Copy the fields of ``source`` into ``target``, rules are pointed at the copies"""
+    originals = list(source.fields.all())
+    copies = ChecklistField.objects.bulk_create(
+        [
+            ChecklistField(template=target, **{name: getattr(field, name) for name in FIELD_ATTRIBUTES})
+            for field in originals
+        ]
+    )
+    field_ids = {original.pk: copy.pk for original, copy in zip(originals, copies)}
+    remapped = []
+    for copy in copies:
+        if copy.conditional_logic:
+            copy.conditional_logic = remap_logic(copy.conditional_logic, field_ids)
+            remapped.append(copy)
+    ChecklistField.objects.bulk_update(remapped, ['conditional_logic'])
+    forget_template_fields(target.pk)
+    return copies
+
+
+@transaction.atomic
+def sync_fields(template, fields_data):
+    """
+    Make the fields of ``template`` match ``fields_data``. Submitted fields
+    are matched to stored ones by ``id`` only, so fields keep their ids (and
+    responses) across edits while a field sent without one is always new and
+    never takes over the answers of a field it replaced. Returns
+    ``{"created": n, "updated": n, "deleted": n}``.
+    """
+    existing = {field.pk: field for field in template.fields.all()}
+    matched, created, updated = set(), [], []
+    now = timezone.now()
+
+    for data in fields_data:
+        field = existing.get(data.get('id'))
+        if field is None or field.pk in matched:
+            created.append(data)
+            continue
+        matched.add(field.pk)
+        changed = False
+        for name in FIELD_ATTRIBUTES:
+            if name in data and getattr(field, name) != data[name]:
+                setattr(field, name, data[name])
+                changed = True
+        if changed:
+            field.updated_at = now
+            updated.append(field)
+
+    deleted = [pk for pk in existing if pk not in matched]
+    if deleted:
+        ChecklistField.objects.filter(pk__in=deleted).delete()
+    if updated:
+        ChecklistField.objects.bulk_update(updated, [*FIELD_ATTRIBUTES, 'updated_at'])
+    if created:
+        create_fields(template, created)
+    forget_template_fields(template.pk)
+    return {'created': len(created), 'updated': len(updated), 'deleted': len(deleted)}
+
+
+@transaction.atomic
+def reorder_fields(fields, orders):
+    """Set ``order`` of ``fields`` from ``{field id: order}`` with one update, returns the fields moved"""
+    now = timezone.now()
+    moved = []
+    for field in fields:
+        order = orders.get(field.pk)
+        if order is not None:
+            field.order = order
+            field.updated_at = now
+            moved.append(field)
+    ChecklistField.objects.bulk_update(moved, ['order', 'updated_at'])
+    for template_id in {field.template_id for field in moved}:
+        forget_template_fields(template_id)
+    return moved
@@ -0,0 +1,149 @@
+"""
+Event publisher for live checklist collaboration.
+
+Changes are pushed to the ``checklist.<id>`` group and progress and comment
+events also to the ``audit.<id>`` group of the audit the checklist belongs to.
+Events published inside a transaction are held until it commits and sent as
+one message per group, keeping only the latest event per row, so a bulk
+response update costs a single ``group_send`` rather than one per response.
+"""
+
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Event types also delivered to subscribers of the checklist's audit
+AUDIT_EVENT_TYPES = {"progress", "comment"}
+
+_local = threading.local()
+
+
+def checklist_group(checklist_id):
+    return f"checklist.{checklist_id}"
+
+
+def audit_group(audit_id):
+    return f"audit.{audit_id}"
+
+
+def response_event(response):
+    return f"response:{response.checklist_id}:{response.field_id}", {
+        "type": "response",
+        "checklist": response.checklist_id,
+        "id": response.pk,
+        "field": response.field_id,
+        "value": response.value,
+        "is_completed": response.is_completed,
+        "responded_by": response.responded_by_id,
+        "is_deleted": response.is_deleted,
+        "updated_at": response.updated_at.isoformat(),
+    }
+
+
+def progress_event(checklist):
+    return f"progress:{checklist.pk}", {
+        "type": "progress",
+        "checklist": checklist.pk,
+        "status": checklist.status,
+        "total_fields": checklist.total_fields,
+        "completed_fields": checklist.completed_fields,
+        "completion_percentage": str(checklist.completion_percentage),
+        "updated_at": checklist.updated_at.isoformat(),
+    }
+
+
+def comment_event(comment):
+    return f"comment:{comment.pk}", {
+        "type": "comment",
+        "checklist": comment.checklist_id,
+        "id": comment.pk,
+        "author": comment.author_id,
+        "parent": comment.parent_id,
+        "content": comment.content,
+        "is_internal": comment.is_internal,
+        "is_deleted": comment.is_deleted,
+        "created_at": comment.created_at.isoformat(),
+    }
+
+
+def savepoints(connection):
+    # Blocks entered with savepoint=False are recorded as None and roll back with their parent
+    return {sid for sid in connection.savepoint_ids if sid is not None}
+
+
+class EventBatch:
+    """Events queued for delivery once the current transaction commits"""
+
+    def __init__(self, connection):
+        self.events = {}
+        self.savepoint_ids = savepoints(connection)
+
+    def add(self, checklist_id, key, event):
+        self.events.setdefault(checklist_id, {})[key] = event
+
+    def accepts(self, connection):
+        # One batch per savepoint so rolling one back discards exactly its events
+        if self.savepoint_ids != savepoints(connection):
+            return False
+        return any(callback is self for _sids, callback, _robust in connection.run_on_commit)
+
+    def __call__(self):
+        if getattr(_local, "batch", None) is self:
+            _local.batch = None
+        send_events(self.events)
+
+
+def publish(checklist_id, key, event):
+    """Queue ``event`` for the subscribers of ``checklist_id``, replacing earlier events with the same key"""
+    if not settings.LIVE_UPDATES_ENABLED:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        send_events({checklist_id: {key: event}})
+        return
+
+    batch = getattr(_local, "batch", None)
+    if batch is None or not batch.accepts(connection):
+        batch = _local.batch = EventBatch(connection)
+        transaction.on_commit(batch)
+    batch.add(checklist_id, key, event)
+
+
+def send_events(events):
+    """Send ``{checklist_id: {key: event}}`` to the checklist and audit groups"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or not events:
+        return
+
+    from apps.audits.models import AuditTask
+
+    audit_events = {
+        checklist_id: {key: event for key, event in checklist_events.items() if event["type"] in AUDIT_EVENT_TYPES}
+        for checklist_id, checklist_events in events.items()
+    }
+    audit_ids = {}
+    if any(audit_events.values()):
+        audit_ids = dict(
+            AuditTask.objects.filter(
+                checklist_id__in=[checklist_id for checklist_id, batch in audit_events.items() if batch]
+            ).values_list("checklist_id", "audit_id")
+        )
+
+    try:
+        for checklist_id, checklist_events in events.items():
+            async_to_sync(channel_layer.group_send)(
+                checklist_group(checklist_id), {"type": "live.events", "events": checklist_events}
+            )
+            if checklist_id in audit_ids:
+                async_to_sync(channel_layer.group_send)(
+                    audit_group(audit_ids[checklist_id]), {"type": "live.events", "events": audit_events[checklist_id]}
+                )
+    except Exception:
+        # Live updates are best effort, never fail the write that triggered them
+        logger.exception("Failed to publish live checklist events")
@@ -0,0 +1,416 @@
+"""
+Conditional logic of checklist fields.
+
+``ChecklistField.conditional_logic`` holds one rule per field::
+
+    {
+        "action": "show",            # "show", "hide" or "require"
+        "logic": "all",              # "all" or "any" of the conditions
+        "conditions": [
+            {"field": 12, "operator": "equals", "value": "yes"},
+            {"logic": "any", "conditions": [...]},
+        ],
+    }
+
+Conditions point at another field of the template by id (``field``) or, in
+nested template payloads where fields have no ids yet, by ``field_order``.
+A hidden field reads as empty in the conditions of others and is never
+required, so hiding cascades down the dependency graph.
+
+A template compiles once per version into predicates and a topologically
+ordered dependency graph, cycles are rejected when the template is saved.
+Evaluating a checklist is one pass over its responses, the field states are
+then kept in the cache so a single response change re-evaluates only the
+fields downstream of it. ``Checklist.update_progress`` counts responses of
+visible fields only.
+
+Cached states carry the ``updated_at`` of the checklist they were computed
+for. Every write that goes through ``update_progress`` or touches the
+checklist moves it, so states a write elsewhere made stale are evaluated
+again in full instead of being patched. ``update_progress`` locks the
+checklist row, concurrent saves patch one after the other.
+"""
+
+import logging
+import operator
+from collections import defaultdict, deque, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+from django.utils.translation import gettext_lazy as _
+
+from .compiled import CompiledCache
+from .models import ChecklistField, ChecklistResponse
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('show', 'hide', 'require')
+EMPTY = (None, False)
+VISIBLE = (True, False)
+
+Rule = namedtuple('Rule', 'action predicate deps')
+
+
+def answer_of(value):
+    """The comparable part of a response value, ``{"text": "a"}`` reads as ``"a"``"""
+    if not isinstance(value, dict):
+        return value
+    if 'value' in value:
+        return value['value']
+    if len(value) == 1:
+        return next(iter(value.values()))
+    return value or None
+
+
+def is_empty(answer):
+    return answer is None or answer in ('', [], {})
+
+
+def to_number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def equals(answer, expected):
+    # Multi select answers are lists, they equal any of their options
+    if isinstance(answer, list):
+        return expected in answer
+    return answer == expected
+
+
+def contains(answer, expected):
+    if isinstance(answer, str):
+        return isinstance(expected, str) and expected.lower() in answer.lower()
+    if isinstance(answer, list):
+        return expected in answer
+    return False
+
+
+def one_of(answer, expected):
+    if isinstance(answer, list):
+        return any(item in expected for item in answer)
+    return answer in expected
+
+
+def compare(test):
+    def check(answer, expected):
+        answer = to_number(answer)
+        return answer is not None and test(answer, to_number(expected))
+    return check
+
+
+# name -> test(answer, expected)
+VALUE_OPERATORS = {
+    'equals': equals,
+    'not_equals': lambda answer, expected: not equals(answer, expected),
+    'contains': contains,
+    'not_contains': lambda answer, expected: not contains(answer, expected),
+    'in': one_of,
+    'not_in': lambda answer, expected: not one_of(answer, expected),
+    'gt': compare(operator.gt),
+    'gte': compare(operator.ge),
+    'lt': compare(operator.lt),
+    'lte': compare(operator.le),
+    'is_empty': lambda answer, expected: is_empty(answer),
+    'is_not_empty': lambda answer, expected: not is_empty(answer),
+}
+
+# name -> test(is_completed)
+COMPLETION_OPERATORS = {
+    'is_completed': lambda done: done,
+    'is_not_completed': lambda done: not done,
+}
+
+
+def compile_condition(node, resolve, deps):
+    """A predicate over ``lookup(field key) -> (answer, is_completed)``"""
+    if not isinstance(node, dict):
+        raise ValidationError(_('Conditions must be JSON objects'))
+
+    if 'conditions' in node:
+        conditions = node['conditions']
+        if not isinstance(conditions, list) or not conditions:
+            raise ValidationError(_('"conditions" must be a non-empty list'))
+        combine = {'all': all, 'any': any}.get(node.get('logic', 'all'))
+        if combine is None:
+            raise ValidationError(_('"logic" must be "all" or "any"'))
+        predicates = [compile_condition(condition, resolve, deps) for condition in conditions]
+        return lambda lookup: combine(predicate(lookup) for predicate in predicates)
+
+    key = resolve(node)
+    deps.add(key)
+    name = node.get('operator', 'equals')
+    if name in COMPLETION_OPERATORS:
+        test = COMPLETION_OPERATORS[name]
+        return lambda lookup: test(lookup(key)[1])
+    if name not in VALUE_OPERATORS:
+        raise ValidationError(_('Unknown operator "%(operator)s"'), params={'operator': name})
+
+    expected = node.get('value')
+    if name in ('in', 'not_in') and not isinstance(expected, list):
+        raise ValidationError(_('"%(operator)s" needs a list value'), params={'operator': name})
+    if name in ('gt', 'gte', 'lt', 'lte') and to_number(expected) is None:
+        raise ValidationError(_('"%(operator)s" needs a numeric value'), params={'operator': name})
+    test = VALUE_OPERATORS[name]
+    return lambda lookup: test(lookup(key)[0], expected)
+
+
+def compile_rule(logic, resolve):
+    if not isinstance(logic, dict):
+        raise ValidationError(_('Conditional logic must be a JSON object'))
+    action = logic.get('action', 'show')
+    if action not in ACTIONS:
+        raise ValidationError(_('"action" must be one of: %(actions)s'), params={'actions': ', '.join(ACTIONS)})
+    if 'conditions' not in logic:
+        raise ValidationError(_('Conditional logic needs "conditions"'))
+    deps = set()
+    predicate = compile_condition(logic, resolve, deps)
+    return Rule(action, predicate, frozenset(deps))
+
+
+class CompiledLogic:
+    """
+    Rules of one template and their dependency graph.
+
+    ``fields`` are ``(key, order, label, is_required, conditional_logic)``
+    rows, ``key`` is the field id (or any other hashable for fields that are
+    not saved yet). Raises ``ValidationError`` for invalid rules and cycles.
+    """
+
+    def __init__(self, fields, version=None):
+        fields = list(fields)
+        self.version = version
+        self.required = {}
+        labels = {}
+        by_order = defaultdict(list)
+        for key, order, label, is_required, _logic in fields:
+            self.required[key] = bool(is_required)
+            labels[key] = label
+            by_order[order].append(key)
+
+        def resolve(node):
+            reference = node.get('field')
+            if isinstance(reference, int) and reference in self.required:
+                return reference
+            order = node.get('field_order')
+            if isinstance(order, int) and len(by_order.get(order, ())) == 1:
+                return by_order[order][0]
+            raise ValidationError(_('Conditions must refer to a field of the same template'))
+
+        self.rules = {}
+        errors = []
+        for key, _order, label, _required, logic in fields:
+            if not logic:
+                continue
+            try:
+                self.rules[key] = compile_rule(logic, resolve)
+            except ValidationError as error:
+                errors.extend(f'{label}: {message}' for message in error.messages)
+        if errors:
+            raise ValidationError(errors)
+
+        self.dependents = defaultdict(set)
+        for key, rule in self.rules.items():
+            for dep in rule.deps:
+                self.dependents[dep].add(key)
+        self.order = self.sort(labels)
+        self.position = {key: index for index, key in enumerate(self.order)}
+        self._downstream = {}
+
+    def sort(self, labels):
+        """Rule keys in dependency order (Kahn), a field's rule comes after the rules of what it reads"""
+        pending = {key: sum(1 for dep in rule.deps if dep in self.rules) for key, rule in self.rules.items()}
+        ready = deque(key for key, count in pending.items() if not count)
+        order = []
+        while ready:
+            key = ready.popleft()
+            order.append(key)
+            for dependent in self.dependents.get(key, ()):
+                pending[dependent] -= 1
+                if not pending[dependent]:
+                    ready.append(dependent)
+        if len(order) == len(self.rules):
+            return order
+
+        # Every unsorted rule reads another unsorted rule, walking those ends on a cycle
+        remaining = {key for key, count in pending.items() if count}
+        key, path, seen = next(iter(remaining)), [], {}
+        while key not in seen:
+            seen[key] = len(path)
+            path.append(key)
+            key = next(dep for dep in self.rules[key].deps if dep in remaining)
+        cycle = ' -> '.join(str(labels[key]) for key in path[seen[key]:] + [key])
+        raise ValidationError(_('Conditional logic has a cycle: %(cycle)s'), params={'cycle': cycle})
+
+    def state(self, key, states, answers):
+        """``(visible, required)`` of the field ``key``, the fields it reads are already in ``states``"""
+        rule = self.rules[key]
+        holds = rule.predicate(lambda dep: answers.get(dep, EMPTY) if states[dep][0] else EMPTY)
+        required = self.required[key]
+        if rule.action == 'show':
+            return holds, required and holds
+        if rule.action == 'hide':
+            return not holds, required and not holds
+        return True, required or holds
+
+    def evaluate(self, answers):
+        """``{field key: (visible, required)}`` from ``{field key: (answer, is_completed)}``"""
+        states = {key: (True, required) for key, required in self.required.items()}
+        for key in self.order:
+            states[key] = self.state(key, states, answers)
+        return states
+
+    def downstream(self, key):
+        """``(rule keys in evaluation order, field keys they read)`` affected by a change to ``key``"""
+        if key not in self._downstream:
+            affected, queue = set(), deque([key])
+            while queue:
+                for dependent in self.dependents.get(queue.popleft(), ()):
+                    if dependent not in affected:
+                        affected.add(dependent)
+                        queue.append(dependent)
+            ordered = sorted(affected, key=self.position.__getitem__)
+            reads = {dep for dependent in ordered for dep in self.rules[dependent].deps}
+            self._downstream[key] = (ordered, reads | {key})
+        return self._downstream[key]
+
+    def reevaluate(self, states, answers, key):
+        """Update ``states`` after the response to ``key`` changed, ``answers`` covers what the rules read"""
+        affected, _reads = self.downstream(key)
+        for dependent in affected:
+            states[dependent] = self.state(dependent, states, answers)
+        return affected
+
+
+def check_fields(fields):
+    """Compile ``fields`` (``CompiledLogic`` rows) only to raise their errors"""
+    CompiledLogic(fields)
+
+
+def template_rows(template_id):
+    return list(
+        ChecklistField.objects.filter(template_id=template_id).values_list(
+            'pk', 'order', 'label', 'is_required', 'conditional_logic'
+        )
+    )
+
+
+def compile_template(template_id, version):
+    rows = template_rows(template_id)
+    try:
+        return CompiledLogic(rows, version)
+    except ValidationError as error:
+        # Saved before rules were checked, evaluate the fields without them
+        logger.warning("Ignoring invalid conditional logic of template %s: %s", template_id, error.messages)
+        return CompiledLogic([(*row[:4], None) for row in rows], version)
+
+
+_compiled = CompiledCache(compile_template)
+
+
+def get_compiled(template_id):
+    return _compiled.get(template_id)
+
+
+# Checklist evaluation
+
+
+def state_key(checklist_id):
+    return f'checklists:logic:state:{checklist_id}'
+
+
+def load_answers(checklist_id, field_ids=None):
+    """``{field id: (answer, is_completed)}`` of the checklist's responses"""
+    responses = ChecklistResponse.objects.filter(checklist_id=checklist_id)
+    if field_ids is not None:
+        responses = responses.filter(field_id__in=field_ids)
+    return {
+        field_id: (answer_of(value), is_completed)
+        for field_id, value, is_completed in responses.values_list('field_id', 'value', 'is_completed')
+    }
+
+
+def cached_states(checklist):
+    """Cached states of ``checklist``, ``None`` unless they match its template version and ``updated_at``"""
+    entry = cache.get(state_key(checklist.pk))
+    if entry is None:
+        return None
+    version = (checklist.template_id, get_compiled(checklist.template_id).version)
+    if entry['version'] != version or entry['updated_at'] != checklist.updated_at:
+        return None
+    return entry['states']
+
+
+def store_states(checklist, states):
+    """Cache ``states`` as those of ``checklist`` at its current ``updated_at``"""
+    cache.set(
+        state_key(checklist.pk),
+        {
+            'version': (checklist.template_id, get_compiled(checklist.template_id).version),
+            'updated_at': checklist.updated_at,
+            'states': states,
+        },
+        settings.CHECKLIST_LOGIC_STATE_TIMEOUT,
+    )
+
+
+def evaluate_checklist(checklist, changed_field_id=None):
+    """
+    Field states of a checklist. With ``changed_field_id`` and cached states
+    that are still current, only the fields downstream of that response are
+    re-evaluated, anything else is a full pass. The result is not cached,
+    ``store_states`` does that.
+    """
+    compiled = get_compiled(checklist.template_id)
+    states = cached_states(checklist) if changed_field_id is not None else None
+    if states is None:
+        return compiled.evaluate(load_answers(checklist.pk))
+    _affected, reads = compiled.downstream(changed_field_id)
+    compiled.reevaluate(states, load_answers(checklist.pk, reads), changed_field_id)
+    return states
+
+
+def get_field_states(checklist):
+    """``{field id: (visible, required)}`` of the checklist's template fields"""
+    compiled = get_compiled(checklist.template_id)
+    if not compiled.rules:
+        return {key: (True, required) for key, required in compiled.required.items()}
+    states = cached_states(checklist)
+    if states is None:
+        states = evaluate_checklist(checklist)
+        store_states(checklist, states)
+    return states
+
+
+def checklist_progress(checklist, changed_field_id=None):
+    """
+    ``(total, completed, states)`` where responses to hidden fields are left
+    out, ``states`` is ``None`` for templates without rules
+    """
+    responses = ChecklistResponse.objects.filter(checklist_id=checklist.pk)
+    if not get_compiled(checklist.template_id).rules:
+        counts = responses.aggregate(total=Count('pk'), completed=Count('pk', filter=Q(is_completed=True)))
+        return counts['total'], counts['completed'], None
+    states = evaluate_checklist(checklist, changed_field_id)
+    # Read from the table every time, a cached copy would lose the saves of concurrent requests
+    completed = responses.values_list('field_id', 'is_completed')
+    visible = [is_completed for field_id, is_completed in completed if states.get(field_id, VISIBLE)[0]]
+    return len(visible), sum(visible), states
+
+
+def remap_logic(logic, field_ids):
+    """Copy of ``logic`` with its ``field`` references translated through ``{old id: new id}``"""
+    if isinstance(logic, list):
+        return [remap_logic(item, field_ids) for item in logic]
+    if not isinstance(logic, dict):
+        return logic
+    copy = {key: remap_logic(value, field_ids) for key, value in logic.items()}
+    if isinstance(copy.get('field'), int) and copy['field'] in field_ids:
+        copy['field'] = field_ids[copy['field']]
+    return copy
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_is_overdue(apps, schema_editor):
+    Checklist = apps.get_model("checklists", "Checklist")
+    Checklist.objects.filter(
+        due_date__lte=timezone.now(), status__in=["draft", "in_progress"]
+    ).update(is_overdue=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("checklists", "0003_make_assigned_to_nullable"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="checklist",
+            name="is_overdue",
+            field=models.BooleanField(default=False, verbose_name="Is Overdue"),
+        ),
+        migrations.AddIndex(
+            model_name="checklist",
+            index=models.Index(
+                fields=["is_overdue", "due_date"], name="checklists__is_over_a10171_idx"
+            ),
+        ),
+        migrations.RunPython(set_is_overdue, migrations.RunPython.noop),
+    ]
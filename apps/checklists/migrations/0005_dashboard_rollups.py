@@ -0,0 +1,101 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("checklists", "0004_checklist_is_overdue"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("template", "Template"),
+                            ("audit", "Audit"),
+                        ],
+                        max_length=20,
+                        verbose_name="Scope",
+                    ),
+                ),
+                ("scope_id", models.PositiveBigIntegerField(verbose_name="Scope ID")),
+                ("day", models.DateField(blank=True, null=True, verbose_name="Day")),
+                ("data", models.JSONField(default=dict, verbose_name="Data")),
+                (
+                    "computed_at",
+                    models.DateTimeField(auto_now=True, verbose_name="Computed At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Dashboard Rollup",
+                "verbose_name_plural": "Dashboard Rollups",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "scope_id", "day"),
+                        name="checklists_rollup_day_unique",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("day__isnull", True)),
+                        fields=("scope", "scope_id"),
+                        name="checklists_rollup_total_unique",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="DashboardRollupChange",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "scope",
+                    models.CharField(
+                        choices=[
+                            ("user", "User"),
+                            ("template", "Template"),
+                            ("audit", "Audit"),
+                        ],
+                        max_length=20,
+                        verbose_name="Scope",
+                    ),
+                ),
+                ("scope_id", models.PositiveBigIntegerField(verbose_name="Scope ID")),
+                ("changed_at", models.DateTimeField(verbose_name="Changed At")),
+            ],
+            options={
+                "verbose_name": "Dashboard Rollup Change",
+                "verbose_name_plural": "Dashboard Rollup Changes",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("scope", "scope_id"),
+                        name="checklists_rollup_change_unique",
+                    )
+                ],
+            },
+        ),
+    ]
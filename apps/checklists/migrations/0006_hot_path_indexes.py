@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("checklists", "0005_dashboard_rollups"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="checklist",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["assigned_to", "status", "due_date"],
+                name="checklists_assignee_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="checklistfield",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["template", "order"],
+                name="checklists_field_order_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="checklistresponse",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["checklist", "is_completed"],
+                name="checklists_response_done_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("checklists", "0006_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dashboardrollup",
+            name="scope",
+            field=models.CharField(
+                choices=[
+                    ("user", "User"),
+                    ("template", "Template"),
+                    ("audit", "Audit"),
+                    ("workload", "Workload"),
+                ],
+                max_length=20,
+                verbose_name="Scope",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="dashboardrollupchange",
+            name="scope",
+            field=models.CharField(
+                choices=[
+                    ("user", "User"),
+                    ("template", "Template"),
+                    ("audit", "Audit"),
+                    ("workload", "Workload"),
+                ],
+                max_length=20,
+                verbose_name="Scope",
+            ),
+        ),
+    ]
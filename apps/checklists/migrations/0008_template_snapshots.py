@@ -0,0 +1,78 @@
+# Generated by Django 5.2.1 on 2026-10-19 13:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("checklists", "0007_workload_rollup_scope"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChecklistTemplateSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.PositiveIntegerField(verbose_name="Version")),
+                (
+                    "content_hash",
+                    models.CharField(max_length=64, verbose_name="Content Hash"),
+                ),
+                ("data", models.JSONField(verbose_name="Data")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created At"),
+                ),
+                (
+                    "template",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="checklists.checklisttemplate",
+                        verbose_name="Template",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Checklist Template Snapshot",
+                "verbose_name_plural": "Checklist Template Snapshots",
+                "ordering": ["template", "-version"],
+            },
+        ),
+        migrations.AddField(
+            model_name="checklist",
+            name="template_snapshot",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="checklists",
+                to="checklists.checklisttemplatesnapshot",
+                verbose_name="Template Snapshot",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="checklisttemplatesnapshot",
+            index=models.Index(
+                fields=["template", "content_hash"],
+                name="checklists__templat_61b1ac_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="checklisttemplatesnapshot",
+            constraint=models.UniqueConstraint(
+                fields=("template", "version"),
+                name="checklists_snapshot_version_unique",
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from contextlib import contextmanager
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -79,6 +81,8 @@ class ChecklistTemplate(SoftDeleteModel):
             from django.utils import timezone
             self.frozen_at = timezone.now()
             self.save(update_fields=['is_frozen', 'frozen_by', 'frozen_at'])
+            from .snapshots import current_snapshot
+            current_snapshot(self)
     
     def unfreeze(self):
         """Unfreeze the template to allow modifications"""
@@ -153,6 +157,11 @@ class ChecklistField(SoftDeleteModel):
         ordering = ['order', 'created_at']
         verbose_name = _('Checklist Field')
         verbose_name_plural = _('Checklist Fields')
+        indexes = [
+            models.Index(
+                fields=['template', 'order'], condition=models.Q(is_deleted=False), name='checklists_field_order_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.template.name} - {self.label}"
@@ -166,6 +175,35 @@ class ChecklistField(SoftDeleteModel):
                 raise ValidationError(_('Options must be a list'))
 
 
+class ChecklistTemplateSnapshot(models.Model):
+    """Immutable serialized form of a template and its fields, see ``apps.checklists.snapshots``"""
+    
+    template = models.ForeignKey(
+        ChecklistTemplate,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name=_('Template')
+    )
+    version = models.PositiveIntegerField(verbose_name=_('Version'))
+    content_hash = models.CharField(max_length=64, verbose_name=_('Content Hash'))
+    data = models.JSONField(verbose_name=_('Data'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Created At'))
+    
+    class Meta:
+        ordering = ['template', '-version']
+        verbose_name = _('Checklist Template Snapshot')
+        verbose_name_plural = _('Checklist Template Snapshots')
+        constraints = [
+            models.UniqueConstraint(fields=['template', 'version'], name='checklists_snapshot_version_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['template', 'content_hash']),
+        ]
+    
+    def __str__(self):
+        return f"{self.template_id} v{self.version}"
+
+
 class Checklist(SoftDeleteModel):
     """Individual checklist instance created from a template"""
     
@@ -175,6 +213,15 @@ class Checklist(SoftDeleteModel):
         related_name='checklists',
         verbose_name=_('Template')
     )
+    # Version of the template the checklist was created from
+    template_snapshot = models.ForeignKey(
+        ChecklistTemplateSnapshot,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='checklists',
+        verbose_name=_('Template Snapshot')
+    )
     
     # Checklist metadata
     name = models.CharField(max_length=255, verbose_name=_('Checklist Name'))
@@ -188,6 +235,8 @@ class Checklist(SoftDeleteModel):
         ('cancelled', _('Cancelled')),
         ('on_hold', _('On Hold')),
     ]
+    # Statuses in which a passed due date makes the checklist overdue
+    OPEN_STATUSES = ('draft', 'in_progress')
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -222,6 +271,8 @@ class Checklist(SoftDeleteModel):
     # Dates
     due_date = models.DateTimeField(null=True, blank=True, verbose_name=_('Due Date'))
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Completed At'))
+    # Kept current by save() and the deadline scheduler (apps.audits.deadlines)
+    is_overdue = models.BooleanField(default=False, verbose_name=_('Is Overdue'))
     
     # Progress tracking
     total_fields = models.PositiveIntegerField(default=0, verbose_name=_('Total Fields'))
@@ -248,11 +299,22 @@ class Checklist(SoftDeleteModel):
         ordering = ['-created_at']
         verbose_name = _('Checklist')
         verbose_name_plural = _('Checklists')
+        indexes = [
+            models.Index(fields=['is_overdue', 'due_date']),
+            # Soft deleted rows are never listed, the partial index leaves them out
+            models.Index(
+                fields=['assigned_to', 'status', 'due_date'],
+                condition=models.Q(is_deleted=False),
+                name='checklists_assignee_status_idx',
+            ),
+        ]
     
     def __str__(self):
         return self.name
     
-    def save(self, *args, **kwargs):
+    def apply_derived_state(self):
+        """Set completion percentage, completed_at and is_overdue from the other fields, as saving does"""
+        from django.utils import timezone
         # Calculate completion percentage
         if self.total_fields > 0:
             self.completion_percentage = (self.completed_fields / self.total_fields) * 100
@@ -261,11 +323,25 @@ class Checklist(SoftDeleteModel):
         
         # Set completed_at if status is completed
         if self.status == 'completed' and not self.completed_at:
-            from django.utils import timezone
             self.completed_at = timezone.now()
         elif self.status != 'completed':
             self.completed_at = None
         
+        self.is_overdue = bool(
+            self.due_date and self.status in self.OPEN_STATUSES and self.due_date <= timezone.now()
+        )
+    
+    def save(self, *args, **kwargs):
+        self.apply_derived_state()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'status', 'due_date'} & set(update_fields):
+            kwargs['update_fields'] = [*update_fields, 'is_overdue']
+        
+        # Pin the template version the checklist is created from
+        if self._state.adding and self.template_snapshot_id is None and self.template_id:
+            from .snapshots import current_snapshot
+            self.template_snapshot_id = current_snapshot(self.template).id
+        
         super().save(*args, **kwargs)
         
         # Sync single assignment to multiple assignments after save
@@ -279,14 +355,35 @@ class Checklist(SoftDeleteModel):
             # Update without triggering save recursion
             Checklist.objects.filter(pk=self.pk).update(assigned_to=self.assigned_to)
     
-    def update_progress(self):
-        """Update progress based on completed responses"""
-        total = self.responses.count()
-        completed = self.responses.filter(is_completed=True).count()
-        
-        self.total_fields = total
-        self.completed_fields = completed
-        self.save(update_fields=['total_fields', 'completed_fields', 'completion_percentage'])
+    def update_progress(self, changed_field_id=None):
+        """Update progress based on completed responses to visible fields"""
+        from .logic import checklist_progress, store_states
+        # No savepoint, the lock is held until the caller's transaction ends
+        with transaction.atomic(savepoint=False):
+            # Concurrent updates queue up on the row, each one patches the field states the one before stored
+            self.updated_at = Checklist.all_objects.all_with_deleted().select_for_update().values_list(
+                'updated_at', flat=True
+            ).get(pk=self.pk)
+            total, completed, states = checklist_progress(self, changed_field_id)
+            
+            self.total_fields = total
+            self.completed_fields = completed
+            self.save(update_fields=['total_fields', 'completed_fields', 'completion_percentage', 'updated_at'])
+            if states is not None:
+                store_states(self, states)
+    
+    @contextmanager
+    def deferred_progress(self):
+        """
+        Hold back the progress updates of responses saved on this instance
+        inside the block, progress is updated once when it exits
+        """
+        changed = self._progress_changes = set()
+        try:
+            yield
+        finally:
+            del self._progress_changes
+        self.update_progress(changed_field_id=next(iter(changed)) if len(changed) == 1 else None)
     
     def get_progress_percentage(self):
         """Get completion percentage as integer"""
@@ -337,6 +434,13 @@ class ChecklistResponse(SoftDeleteModel):
         ordering = ['field__order', 'created_at']
         verbose_name = _('Checklist Response')
         verbose_name_plural = _('Checklist Responses')
+        indexes = [
+            models.Index(
+                fields=['checklist', 'is_completed'],
+                condition=models.Q(is_deleted=False),
+                name='checklists_response_done_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.checklist.name} - {self.field.label}"
@@ -351,8 +455,12 @@ class ChecklistResponse(SoftDeleteModel):
         
         super().save(*args, **kwargs)
         
-        # Update checklist progress
-        self.checklist.update_progress()
+        # Update checklist progress, inside Checklist.deferred_progress() once the block exits
+        changed = getattr(self.checklist, '_progress_changes', None)
+        if changed is not None:
+            changed.add(self.field_id)
+        else:
+            self.checklist.update_progress(changed_field_id=self.field_id)
 
 
 class ChecklistComment(SoftDeleteModel):
@@ -426,3 +534,52 @@ class ChecklistAttachment(SoftDeleteModel):
     
     def __str__(self):
         return f"{self.checklist.name} - {self.original_name}"
+
+
+class DashboardRollup(models.Model):
+    """Precomputed dashboard numbers for one scope, see ``apps.checklists.rollups``"""
+    
+    SCOPE_CHOICES = [
+        ('user', _('User')),
+        ('template', _('Template')),
+        ('audit', _('Audit')),
+        ('workload', _('Workload')),
+    ]
+    
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, verbose_name=_('Scope'))
+    scope_id = models.PositiveBigIntegerField(verbose_name=_('Scope ID'))
+    # Empty for the running total, otherwise the numbers as of the end of that day
+    day = models.DateField(null=True, blank=True, verbose_name=_('Day'))
+    data = models.JSONField(default=dict, verbose_name=_('Data'))
+    computed_at = models.DateTimeField(auto_now=True, verbose_name=_('Computed At'))
+    
+    class Meta:
+        verbose_name = _('Dashboard Rollup')
+        verbose_name_plural = _('Dashboard Rollups')
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id', 'day'], name='checklists_rollup_day_unique'),
+            models.UniqueConstraint(
+                fields=['scope', 'scope_id'], condition=models.Q(day__isnull=True), name='checklists_rollup_total_unique'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.day or 'total'}"
+
+
+class DashboardRollupChange(models.Model):
+    """A scope whose rollup is out of date, queued by signals and cleared by compaction"""
+    
+    scope = models.CharField(max_length=20, choices=DashboardRollup.SCOPE_CHOICES, verbose_name=_('Scope'))
+    scope_id = models.PositiveBigIntegerField(verbose_name=_('Scope ID'))
+    changed_at = models.DateTimeField(verbose_name=_('Changed At'))
+    
+    class Meta:
+        verbose_name = _('Dashboard Rollup Change')
+        verbose_name_plural = _('Dashboard Rollup Changes')
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id'], name='checklists_rollup_change_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} changed {self.changed_at}"
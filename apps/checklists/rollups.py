@@ -0,0 +1,228 @@
+"""
+Materialized dashboard numbers.
+
+Each dashboard scope (a user's checklists, a template's usage, an audit's
+tasks, a user's open task load) has a ``DashboardRollup`` total row plus one
+row per day it changed. Signals do not recompute anything, they upsert a
+``DashboardRollupChange`` for every scope a write touched. The
+``compact_dashboard_rollups`` task recomputes just those scopes, so reading
+a dashboard costs one indexed lookup whatever the data volume. Scopes with
+queued changes are computed live until the next compaction, so dashboards
+never show stale numbers.
+"""
+
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import Checklist, DashboardRollup, DashboardRollupChange
+
+logger = logging.getLogger(__name__)
+
+# Checklist fields that feed a rollup, saves touching only others are ignored
+CHECKLIST_FIELDS = {
+    'status', 'is_overdue', 'completed_at', 'assigned_to', 'created_by', 'template', 'is_deleted', 'due_date'
+}
+
+
+def seconds(duration):
+    return duration.total_seconds() if duration else None
+
+
+def compute_user(user_id):
+    """Numbers behind ``ChecklistViewSet.dashboard_stats``"""
+    stats = Checklist.objects.filter(Q(assigned_to_id=user_id) | Q(created_by_id=user_id)).aggregate(
+        total_checklists=Count('pk'),
+        completed=Count('pk', filter=Q(status='completed')),
+        in_progress=Count('pk', filter=Q(status='in_progress')),
+        overdue=Count('pk', filter=Q(is_overdue=True)),
+        average_completion=Avg(
+            F('completed_at') - F('created_at'), filter=Q(status='completed', completed_at__isnull=False)
+        ),
+    )
+    stats['average_completion_seconds'] = seconds(stats.pop('average_completion'))
+    return stats
+
+
+def compute_template(template_id):
+    """Numbers behind ``ChecklistTemplateViewSet.usage_stats``"""
+    stats = Checklist.objects.filter(template_id=template_id).aggregate(
+        active_checklists=Count('pk'),
+        completed_checklists=Count('pk', filter=Q(status='completed')),
+        in_progress_checklists=Count('pk', filter=Q(status='in_progress')),
+        started_checklists=Count('pk', filter=~Q(status='draft')),
+        timed_completions=Count('pk', filter=Q(status='completed', completed_at__isnull=False)),
+        average_completion=Avg(
+            F('completed_at') - F('created_at'), filter=Q(status='completed', completed_at__isnull=False)
+        ),
+    )
+    stats['average_completion_seconds'] = seconds(stats.pop('average_completion'))
+    return stats
+
+
+def compute_audit(audit_id):
+    """Numbers behind ``AuditViewSet.task_summary``"""
+    from apps.audits.models import AuditTask
+
+    stats = {'total': 0, 'completed': 0, 'overdue': 0, 'by_status': {}, 'by_priority': {}, 'by_risk_level': {}}
+    rows = (
+        AuditTask.objects.filter(audit_id=audit_id)
+        .values_list('task_status', 'priority', 'risk_level', 'is_overdue')
+        .annotate(count=Count('pk'))
+        .order_by()
+    )
+    for task_status, priority, risk_level, is_overdue, count in rows:
+        for key, value in (('by_status', task_status), ('by_priority', priority), ('by_risk_level', risk_level)):
+            stats[key][value] = stats[key].get(value, 0) + count
+        stats['total'] += count
+        stats['completed'] += count if task_status == 'completed' else 0
+        stats['overdue'] += count if is_overdue else 0
+    return stats
+
+
+def compute_workload(user_id):
+    """Open task load of a user, see ``apps.audits.workload``"""
+    from apps.audits.workload import compute_workload
+
+    return compute_workload(user_id)
+
+
+COMPUTE = {
+    'user': compute_user,
+    'template': compute_template,
+    'audit': compute_audit,
+    'workload': compute_workload,
+}
+
+
+def get_rollup(scope, scope_id):
+    """The rollup of a scope, computed live while it has queued changes"""
+    row = (
+        DashboardRollup.objects.filter(scope=scope, scope_id=scope_id, day__isnull=True)
+        .annotate(
+            stale=Exists(DashboardRollupChange.objects.filter(scope=OuterRef('scope'), scope_id=OuterRef('scope_id')))
+        )
+        .values_list('data', 'stale')
+        .first()
+    )
+    if row is not None and not row[1]:
+        return row[0]
+    return COMPUTE[scope](scope_id)
+
+
+def get_rollups(scope, scope_ids, compute_many=None):
+    """
+    ``{scope id: data}`` for many scopes of one kind with one query, scopes
+    with queued changes or no rollup yet are computed live, by
+    ``compute_many(ids)`` when given.
+    """
+    scope_ids = set(scope_ids)
+    rollups = dict(
+        DashboardRollup.objects.filter(scope=scope, scope_id__in=scope_ids, day__isnull=True)
+        .exclude(Exists(DashboardRollupChange.objects.filter(scope=OuterRef('scope'), scope_id=OuterRef('scope_id'))))
+        .values_list('scope_id', 'data')
+    )
+    missing = scope_ids - set(rollups)
+    if missing:
+        if compute_many:
+            rollups.update(compute_many(missing))
+        else:
+            rollups.update({scope_id: COMPUTE[scope](scope_id) for scope_id in missing})
+    return rollups
+
+
+def mark_changed(scopes):
+    """Queue ``(scope, scope_id)`` pairs for the next compaction"""
+    changes = [
+        DashboardRollupChange(scope=scope, scope_id=scope_id, changed_at=timezone.now())
+        for scope, scope_id in set(scopes)
+        if scope_id is not None
+    ]
+    if changes:
+        DashboardRollupChange.objects.bulk_create(
+            changes, update_conflicts=True, unique_fields=['scope', 'scope_id'], update_fields=['changed_at']
+        )
+
+
+def checklist_scopes(values):
+    """Scopes of a checklist from its ``assigned_to_id``, ``created_by_id`` and ``template_id``"""
+    return {
+        ('user', values.get('assigned_to_id')),
+        ('user', values.get('created_by_id')),
+        ('template', values.get('template_id')),
+    }
+
+
+def mark_checklists_changed(checklist_ids):
+    """Queue the scopes of checklists changed with ``update()``, which sends no signals"""
+    from apps.audits.models import AuditTask
+
+    scopes = set()
+    for values in Checklist.all_objects.all_with_deleted().filter(pk__in=checklist_ids).values(
+        'assigned_to_id', 'created_by_id', 'template_id'
+    ):
+        scopes |= checklist_scopes(values)
+    for audit_id, assigned_to_id in AuditTask.objects.filter(checklist_id__in=checklist_ids).values_list(
+        'audit_id', 'assigned_to_id'
+    ):
+        scopes |= {('audit', audit_id), ('workload', assigned_to_id)}
+    mark_changed(scopes)
+
+
+def mark_tasks_changed(task_ids):
+    from apps.audits.models import AuditTask
+
+    scopes = set()
+    for audit_id, assigned_to_id in AuditTask.objects.filter(pk__in=task_ids).values_list('audit_id', 'assigned_to_id'):
+        scopes |= {('audit', audit_id), ('workload', assigned_to_id)}
+    mark_changed(scopes)
+
+
+def store_rollup(scope, scope_id, data, day):
+    for row_day in (None, day):
+        try:
+            with transaction.atomic():
+                DashboardRollup.objects.update_or_create(
+                    scope=scope, scope_id=scope_id, day=row_day, defaults={'data': data}
+                )
+        except IntegrityError:
+            # A concurrent compaction created the row first, its numbers are as fresh
+            logger.info("Rollup %s:%s for %s written concurrently", scope, scope_id, row_day)
+
+
+def compact_rollups(batch_size=500):
+    """Recompute the rollups of up to ``batch_size`` changed scopes, returns how many"""
+    changes = list(DashboardRollupChange.objects.order_by('changed_at')[:batch_size])
+    today = timezone.localdate()
+    for change in changes:
+        store_rollup(change.scope, change.scope_id, COMPUTE[change.scope](change.scope_id), today)
+        # Left in place when the scope changed again while it was being computed
+        DashboardRollupChange.objects.filter(pk=change.pk, changed_at=change.changed_at).delete()
+    return len(changes)
+
+
+def queue_all_scopes():
+    """Queue every scope, used by the nightly rebuild to correct any drift"""
+    from apps.audits.models import Audit, AuditTask
+
+    scopes = set()
+    for values in Checklist.objects.values('assigned_to_id', 'created_by_id', 'template_id').distinct():
+        scopes |= checklist_scopes(values)
+    scopes |= {('audit', audit_id) for audit_id in Audit.objects.values_list('pk', flat=True)}
+    # Due soon counts move with time, so every loaded user is recomputed
+    scopes |= {
+        ('workload', user_id)
+        for user_id in AuditTask.objects.filter(task_status__in=AuditTask.OPEN_STATUSES)
+        .values_list('assigned_to_id', flat=True)
+        .distinct()
+    }
+    scopes |= {
+        ('workload', user_id)
+        for user_id in DashboardRollup.objects.filter(scope='workload', day__isnull=True).values_list(
+            'scope_id', flat=True
+        )
+    }
+    mark_changed(scopes)
+    return len(scopes)
@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .consumers import AuditLiveConsumer, ChecklistLiveConsumer
+
+websocket_urlpatterns = [
+    path("ws/checklists/<int:checklist_id>/", ChecklistLiveConsumer.as_asgi()),
+    path("ws/audits/<int:audit_id>/", AuditLiveConsumer.as_asgi()),
+]
@@ -1,11 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.files.uploadedfile import UploadedFile
 import os
 import mimetypes
 
+from apps.utils.serializers import SparseFieldsetSerializerMixin
+from .access import comment_access
+from .editing import create_fields, sync_fields
+from .logic import check_fields, get_field_states, template_rows
+from .snapshots import current_snapshot, get_data as get_snapshot_data, get_head as get_snapshot_head
+from .validators import get_validator, get_validators
 from .models import (
     ChecklistTemplate, ChecklistField, Checklist, ChecklistResponse,
     ChecklistComment, ChecklistAttachment, FieldType
@@ -102,12 +110,48 @@ class ChecklistFieldSerializer(serializers.ModelSerializer):
                 'conditional_logic': _('Conditional logic must be a JSON object')
             })
         
+        # Rules of an existing field are checked against the rest of its template
+        if self.instance is not None and self.instance.pk:
+            rows = [
+                row if row[0] != self.instance.pk else (
+                    row[0],
+                    attrs.get('order', row[1]),
+                    attrs.get('label', row[2]),
+                    attrs.get('is_required', row[3]),
+                    attrs.get('conditional_logic', row[4]),
+                )
+                for row in template_rows(self.instance.template_id)
+            ]
+            validate_logic(rows)
+        
         return attrs
 
 
+def field_rows(fields_data, keep_ids=False):
+    """Logic rows of submitted fields, those without a stored id are referenced by ``field_order``"""
+    return [
+        ((keep_ids and data.get('id')) or ('new', index), data.get('order', 0), data.get('label', ''),
+         data.get('is_required', False), data.get('conditional_logic'))
+        for index, data in enumerate(fields_data)
+    ]
+
+
+def validate_logic(rows):
+    """Raise the rule and cycle errors of a template's fields as serializer errors"""
+    try:
+        check_fields(rows)
+    except DjangoValidationError as error:
+        raise serializers.ValidationError({'conditional_logic': error.messages})
+
+
+class ChecklistFieldWriteSerializer(ChecklistFieldSerializer):
+    """Field of a nested template write, ``id`` matches it to a stored field on updates"""
+    id = serializers.IntegerField(required=False)
+
+
 class ChecklistTemplateCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating checklist templates"""
-    fields = ChecklistFieldSerializer(many=True, required=False)
+    fields = ChecklistFieldWriteSerializer(many=True, required=False)
     field_count = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
@@ -135,8 +179,10 @@ class ChecklistTemplateCreateSerializer(serializers.ModelSerializer):
         if len(orders) != len(set(orders)):
             raise serializers.ValidationError(_('Field orders must be unique'))
         
+        validate_logic(field_rows(value, keep_ids=self.instance is not None))
         return value
     
+    @transaction.atomic
     def create(self, validated_data):
         fields_data = validated_data.pop('fields', [])
         validated_data['created_by'] = self.context['request'].user
@@ -144,11 +190,11 @@ class ChecklistTemplateCreateSerializer(serializers.ModelSerializer):
         template = ChecklistTemplate.objects.create(**validated_data)
         
         # Create fields
-        for field_data in fields_data:
-            ChecklistField.objects.create(template=template, **field_data)
+        create_fields(template, fields_data)
         
         return template
     
+    @transaction.atomic
     def update(self, instance, validated_data):
         # Don't allow updates if template is frozen
         if instance.is_frozen:
@@ -161,21 +207,17 @@ class ChecklistTemplateCreateSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         
-        # Update fields if provided
+        # Update fields if provided, only what changed is written
         if fields_data is not None:
-            # Delete existing fields
-            instance.fields.all().delete()
-            
-            # Create new fields
-            for field_data in fields_data:
-                ChecklistField.objects.create(template=instance, **field_data)
+            sync_fields(instance, fields_data)
         
         return instance
 
 
-class ChecklistTemplateDetailSerializer(serializers.ModelSerializer):
-    """Detailed serializer for checklist templates"""
-    fields = ChecklistFieldSerializer(many=True, read_only=True)
+class ChecklistTemplateDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """Detailed serializer for checklist templates, fields come from the cached template snapshot"""
+    fields = serializers.SerializerMethodField(method_name='get_snapshot_fields')
+    snapshot = serializers.SerializerMethodField()
     created_by = UserSimpleSerializer(read_only=True)
     frozen_by = UserSimpleSerializer(read_only=True)
     can_edit = serializers.SerializerMethodField()
@@ -188,7 +230,7 @@ class ChecklistTemplateDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'category', 'is_active', 'is_frozen',
             'created_by', 'frozen_by', 'frozen_at', 'usage_count', 'field_count',
-            'fields', 'can_edit', 'can_delete', 'usage_stats', 'created_at', 'updated_at'
+            'fields', 'snapshot', 'can_edit', 'can_delete', 'usage_stats', 'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'created_by', 'frozen_by', 'frozen_at', 'usage_count',
@@ -217,8 +259,28 @@ class ChecklistTemplateDetailSerializer(serializers.ModelSerializer):
             return obj.checklists.filter(is_deleted=False).count() == 0
         return False
     
+    def get_snapshot_head(self, obj):
+        """Snapshot pinned by the checklist being rendered (``pinned_snapshot_id``), else the current one"""
+        heads = self.__dict__.setdefault('_snapshot_heads', {})
+        pinned = getattr(obj, 'pinned_snapshot_id', None)
+        if (obj.pk, pinned) not in heads:
+            heads[(obj.pk, pinned)] = (pinned and get_snapshot_head(pinned)) or current_snapshot(obj)
+        return heads[(obj.pk, pinned)]
+    
+    def get_snapshot(self, obj):
+        head = self.get_snapshot_head(obj)
+        return {'version': head.version, 'hash': head.content_hash}
+    
+    def get_snapshot_fields(self, obj):
+        head = self.get_snapshot_head(obj)
+        # The client already holds this snapshot
+        request = self.context.get('request')
+        if request is not None and request.query_params.get('snapshot') == head.content_hash:
+            return None
+        return get_snapshot_data(head.id)['fields']
+    
     def get_field_count(self, obj):
-        return obj.fields.count()
+        return len(get_snapshot_data(self.get_snapshot_head(obj).id)['fields'])
     
     def get_usage_stats(self, obj):
         checklists = obj.checklists.filter(is_deleted=False)
@@ -229,7 +291,7 @@ class ChecklistTemplateDetailSerializer(serializers.ModelSerializer):
         }
 
 
-class ChecklistTemplateListSerializer(serializers.ModelSerializer):
+class ChecklistTemplateListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """List serializer for checklist templates"""
     created_by = UserSimpleSerializer(read_only=True)
     field_count = serializers.SerializerMethodField()
@@ -246,9 +308,13 @@ class ChecklistTemplateListSerializer(serializers.ModelSerializer):
         ]
     
     def get_field_count(self, obj):
+        if hasattr(obj, 'field_total'):
+            return obj.field_total
         return obj.fields.count()
     
     def get_last_used(self, obj):
+        if hasattr(obj, 'last_used_at'):
+            return obj.last_used_at
         last_checklist = obj.checklists.filter(is_deleted=False).order_by('-created_at').first()
         return last_checklist.created_at if last_checklist else None
 
@@ -273,55 +339,13 @@ class ChecklistResponseSerializer(serializers.ModelSerializer):
     
     def get_is_valid_response(self, obj):
         """Check if the response value is valid for the field type"""
-        if not obj.value:
-            return not obj.field.is_required
-        
-        field_type = obj.field.field_type
-        value = obj.value
-        
-        try:
-            if field_type == FieldType.NUMBER:
-                num_val = float(value.get('number', 0))
-                if obj.field.min_value and num_val < obj.field.min_value:
-                    return False
-                if obj.field.max_value and num_val > obj.field.max_value:
-                    return False
-            
-            elif field_type in [FieldType.TEXT, FieldType.TEXTAREA]:
-                text_val = str(value.get('text', ''))
-                if obj.field.min_length and len(text_val) < obj.field.min_length:
-                    return False
-                if obj.field.max_length and len(text_val) > obj.field.max_length:
-                    return False
-            
-            elif field_type in [FieldType.SELECT, FieldType.RADIO]:
-                selected = value.get('selected')
-                if selected:
-                    valid_options = [opt['value'] for opt in obj.field.options]
-                    return selected in valid_options
-                return not obj.field.is_required
-            
-            elif field_type == FieldType.MULTI_SELECT:
-                selected = value.get('selected', [])
-                if selected:
-                    valid_options = [opt['value'] for opt in obj.field.options]
-                    return all(sel in valid_options for sel in selected)
-                return not obj.field.is_required
-            
-            return True
-            
-        except (ValueError, TypeError, KeyError):
-            return False
+        return get_validator(obj.field).is_valid(obj.value)
     
     def validate_field_id(self, value):
         """Validate field belongs to the checklist"""
         checklist = self.context.get('checklist')
-        if checklist:
-            try:
-                field = ChecklistField.objects.get(id=value, template=checklist.template)
-                return value
-            except ChecklistField.DoesNotExist:
-                raise serializers.ValidationError(_('Field does not belong to this checklist template'))
+        if checklist and value not in get_validators(checklist.template_id):
+            raise serializers.ValidationError(_('Field does not belong to this checklist template'))
         return value
     
     def validate(self, attrs):
@@ -330,44 +354,21 @@ class ChecklistResponseSerializer(serializers.ModelSerializer):
         is_completed = attrs.get('is_completed', False)
         
         if field_id:
-            try:
-                field = ChecklistField.objects.get(id=field_id)
-                
-                # Validate required fields
-                if field.is_required and is_completed and not value:
-                    raise serializers.ValidationError({
-                        'value': _('Value is required for required fields')
-                    })
-                
-                # Validate value format based on field type
-                if value and is_completed:
-                    field_type = field.field_type
-                    
-                    if field_type == FieldType.EMAIL:
-                        email_val = value.get('email', '')
-                        if email_val:
-                            from django.core.validators import validate_email
-                            try:
-                                validate_email(email_val)
-                            except:
-                                raise serializers.ValidationError({
-                                    'value': _('Invalid email format')
-                                })
-                    
-                    elif field_type == FieldType.URL:
-                        url_val = value.get('url', '')
-                        if url_val:
-                            from django.core.validators import URLValidator
-                            validator = URLValidator()
-                            try:
-                                validator(url_val)
-                            except:
-                                raise serializers.ValidationError({
-                                    'value': _('Invalid URL format')
-                                })
-                
-            except ChecklistField.DoesNotExist:
-                pass  # Will be caught by field_id validation
+            checklist = self.context.get('checklist')
+            is_required = None
+            if checklist is not None:
+                validator = get_validators(checklist.template_id).get(field_id)
+                # Conditional logic may hide or require the field
+                if validator is not None:
+                    is_required = get_field_states(checklist).get(field_id, (True, validator.is_required))[1]
+            else:
+                field = ChecklistField.objects.filter(id=field_id).first()
+                validator = get_validator(field) if field else None  # Else caught by field_id validation
+            
+            if validator is not None:
+                errors = validator.errors(value, is_completed, is_required)
+                if errors:
+                    raise serializers.ValidationError({'value': errors})
         
         return attrs
     
@@ -444,7 +445,7 @@ class ChecklistCreateSerializer(serializers.ModelSerializer):
         return checklist
 
 
-class ChecklistDetailSerializer(serializers.ModelSerializer):
+class ChecklistDetailSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Detailed serializer for checklists"""
     template = ChecklistTemplateDetailSerializer(read_only=True)
     assigned_to = UserSimpleSerializer(read_only=True)
@@ -452,7 +453,7 @@ class ChecklistDetailSerializer(serializers.ModelSerializer):
     created_by = UserSimpleSerializer(read_only=True)
     responses = ChecklistResponseSerializer(many=True, read_only=True)
     response_count = serializers.SerializerMethodField()
-    overdue = serializers.SerializerMethodField()
+    overdue = serializers.BooleanField(source='is_overdue', read_only=True)
     time_remaining = serializers.SerializerMethodField()
     can_edit = serializers.SerializerMethodField()
     
@@ -470,14 +471,15 @@ class ChecklistDetailSerializer(serializers.ModelSerializer):
             'completed_at', 'created_at', 'updated_at'
         ]
     
+    def to_representation(self, instance):
+        # The nested template renders the version the checklist was created from
+        if instance.template_snapshot_id:
+            instance.template.pinned_snapshot_id = instance.template_snapshot_id
+        return super().to_representation(instance)
+    
     def get_response_count(self, obj):
         return obj.responses.count()
     
-    def get_overdue(self, obj):
-        if obj.due_date and obj.status not in ['completed', 'cancelled']:
-            return timezone.now() > obj.due_date
-        return False
-    
     def get_time_remaining(self, obj):
         if obj.due_date and obj.status not in ['completed', 'cancelled']:
             delta = obj.due_date - timezone.now()
@@ -552,13 +554,13 @@ class ChecklistUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class ChecklistListSerializer(serializers.ModelSerializer):
+class ChecklistListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """List serializer for checklists"""
     template_name = serializers.CharField(source='template.name', read_only=True)
     template_category = serializers.CharField(source='template.category', read_only=True)
     assigned_to = UserSimpleSerializer(read_only=True)
     created_by = UserSimpleSerializer(read_only=True)
-    overdue = serializers.SerializerMethodField()
+    overdue = serializers.BooleanField(source='is_overdue', read_only=True)
     last_activity = serializers.SerializerMethodField()
     
     class Meta:
@@ -571,13 +573,14 @@ class ChecklistListSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id', 'completion_percentage', 'created_at', 'updated_at'
         ]
-    
-    def get_overdue(self, obj):
-        if obj.due_date and obj.status not in ['completed', 'cancelled']:
-            return timezone.now() > obj.due_date
-        return False
+        expandable_fields = {
+            'template': (ChecklistTemplateListSerializer, {}),
+            'assigned_users': (UserSimpleSerializer, {'many': True}),
+        }
     
     def get_last_activity(self, obj):
+        if hasattr(obj, 'last_response_at'):
+            return obj.last_response_at or obj.updated_at
         last_response = obj.responses.order_by('-updated_at').first()
         return last_response.updated_at if last_response else obj.updated_at
 
@@ -598,9 +601,13 @@ class ChecklistCommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
     
     def get_replies(self, obj):
-        if obj.replies.exists():
+        replies = obj.replies.all()
+        request = self.context.get('request')
+        if request is not None:
+            replies = replies.filter(comment_access(request.user))
+        if replies.exists():
             return ChecklistCommentSerializer(
-                obj.replies.all(),
+                replies,
                 many=True,
                 context=self.context
             ).data
@@ -729,21 +736,14 @@ class ChecklistTemplateFieldsAddSerializer(serializers.Serializer):
         if template.is_frozen:
             raise serializers.ValidationError(_('Cannot add fields to frozen template'))
         
+        validate_logic(template_rows(template.pk) + field_rows(attrs['fields']))
         return attrs
     
     def save(self):
         template = self.context['template']
         fields_data = self.validated_data['fields']
         
-        created_fields = []
-        for field_data in fields_data:
-            field = ChecklistField.objects.create(
-                template=template,
-                **field_data
-            )
-            created_fields.append(field)
-        
-        return created_fields
+        return create_fields(template, fields_data)
 
 
 class ChecklistExportSerializer(serializers.Serializer):
@@ -813,4 +813,90 @@ class ChecklistBulkUpdateSerializer(serializers.Serializer):
                 return value
             except User.DoesNotExist:
                 raise serializers.ValidationError(_('Assigned user not found'))
-        return value 
\ No newline at end of file
+        return value 
+
+
+class ChecklistSyncSerializer(serializers.ModelSerializer):
+    """Flat checklist representation used by the offline sync endpoint"""
+
+    class Meta:
+        model = Checklist
+        fields = [
+            'id', 'template', 'name', 'description', 'status', 'priority',
+            'assigned_to', 'assigned_users', 'created_by', 'due_date', 'completed_at',
+            'total_fields', 'completed_fields', 'completion_percentage', 'tags',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ChecklistFieldSyncSerializer(ChecklistFieldSerializer):
+    """Template field definition with its template id for offline clients"""
+
+    class Meta(ChecklistFieldSerializer.Meta):
+        fields = ['template'] + ChecklistFieldSerializer.Meta.fields
+        read_only_fields = fields
+
+
+class ChecklistResponseSyncSerializer(serializers.ModelSerializer):
+    """Flat response representation used by the offline sync endpoint"""
+
+    class Meta:
+        model = ChecklistResponse
+        fields = [
+            'id', 'checklist', 'field', 'value', 'is_completed', 'responded_by',
+            'responded_at', 'comments', 'internal_notes', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ChecklistCommentSyncSerializer(serializers.ModelSerializer):
+    """Flat comment representation used by the offline sync endpoint"""
+
+    class Meta:
+        model = ChecklistComment
+        fields = [
+            'id', 'checklist', 'author', 'parent', 'content', 'is_internal',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ChecklistAttachmentSyncSerializer(ChecklistAttachmentSerializer):
+    """Attachment metadata used by the offline sync endpoint, files are fetched separately"""
+    uploaded_by = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta(ChecklistAttachmentSerializer.Meta):
+        fields = [
+            'id', 'checklist', 'file_url', 'original_name', 'description',
+            'file_size', 'mime_type', 'uploaded_by', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class ChecklistSyncEditSerializer(serializers.Serializer):
+    """A response edit made offline, with the values the client started from"""
+    EDITABLE_FIELDS = ('value', 'is_completed', 'comments', 'internal_notes')
+
+    checklist_id = serializers.IntegerField()
+    field_id = serializers.IntegerField()
+    changes = serializers.DictField()
+    base = serializers.DictField(required=False, default=dict)
+    client_id = serializers.CharField(required=False, allow_blank=True, max_length=100)
+
+    def validate_changes(self, value):
+        if not value:
+            raise serializers.ValidationError(_('At least one change is required'))
+        unknown = set(value) - set(self.EDITABLE_FIELDS)
+        if unknown:
+            raise serializers.ValidationError(
+                _('Fields cannot be edited offline: %(fields)s') % {'fields': ', '.join(sorted(unknown))}
+            )
+        if 'value' in value and not isinstance(value['value'], dict):
+            raise serializers.ValidationError({'value': _('Must be an object')})
+        if 'is_completed' in value and not isinstance(value['is_completed'], bool):
+            raise serializers.ValidationError({'is_completed': _('Must be a boolean')})
+        for name in ('comments', 'internal_notes'):
+            if name in value and not isinstance(value[name], str):
+                raise serializers.ValidationError({name: _('Must be a string')})
+        return value
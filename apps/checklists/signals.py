@@ -0,0 +1,78 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .live import comment_event, progress_event, publish, response_event
+from .compiled import forget_template_fields
+from .models import Checklist, ChecklistComment, ChecklistField, ChecklistResponse, ChecklistTemplate
+from .snapshots import TEMPLATE_ATTRIBUTES
+from .rollups import CHECKLIST_FIELDS, checklist_scopes, mark_changed
+
+
+@receiver(post_save, sender=ChecklistResponse, dispatch_uid="checklists.live.response")
+def publish_response(sender, instance, **kwargs):
+    publish(instance.checklist_id, *response_event(instance))
+
+
+@receiver(post_save, sender=Checklist, dispatch_uid="checklists.live.progress")
+def publish_progress(sender, instance, **kwargs):
+    publish(instance.pk, *progress_event(instance))
+
+
+@receiver(post_save, sender=ChecklistComment, dispatch_uid="checklists.live.comment")
+def publish_comment(sender, instance, **kwargs):
+    publish(instance.checklist_id, *comment_event(instance))
+
+
+@receiver(m2m_changed, sender=Checklist.assigned_users.through, dispatch_uid="checklists.assigned_users.touch")
+def touch_assigned_checklists(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Assigned users are part of the representation, move ``updated_at`` so validators and sync see the change"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_checklists = set(instance.assigned_checklists_multi.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        checklist_ids = {instance.pk}
+    elif action == 'post_clear':
+        checklist_ids = instance.__dict__.pop('_cleared_checklists', set())
+    else:
+        checklist_ids = pk_set
+    if checklist_ids:
+        Checklist.all_objects.all_with_deleted().filter(pk__in=checklist_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_init, sender=Checklist, dispatch_uid="checklists.rollups.init")
+def remember_rollup_scopes(sender, instance, **kwargs):
+    # Read from __dict__ so deferred fields are never loaded here
+    instance._rollup_scopes = checklist_scopes(instance.__dict__)
+
+
+@receiver(post_save, sender=Checklist, dispatch_uid="checklists.rollups.save")
+@receiver(post_delete, sender=Checklist, dispatch_uid="checklists.rollups.delete")
+def queue_checklist_rollups(sender, instance, update_fields=None, **kwargs):
+    from apps.audits.models import AuditTask
+
+    if update_fields is not None and not CHECKLIST_FIELDS & set(update_fields):
+        return
+    # Old scopes too, a reassigned checklist leaves its previous user's numbers
+    scopes = instance._rollup_scopes | checklist_scopes(instance.__dict__)
+    scopes |= {
+        ('audit', audit_id)
+        for audit_id in AuditTask.objects.filter(checklist_id=instance.pk).values_list('audit_id', flat=True)
+    }
+    mark_changed(scopes)
+    instance._rollup_scopes = checklist_scopes(instance.__dict__)
+
+
+@receiver(post_save, sender=ChecklistField, dispatch_uid="checklists.compiled.save")
+@receiver(post_delete, sender=ChecklistField, dispatch_uid="checklists.compiled.delete")
+def recompile_template(sender, instance, **kwargs):
+    forget_template_fields(instance.template_id)
+
+
+@receiver(post_save, sender=ChecklistTemplate, dispatch_uid="checklists.compiled.template")
+def resnapshot_template(sender, instance, created=False, update_fields=None, **kwargs):
+    # Snapshots embed these attributes, usage counters and freezing leave them alone
+    if not created and (update_fields is None or set(TEMPLATE_ATTRIBUTES) & set(update_fields)):
+        forget_template_fields(instance.pk)
@@ -0,0 +1,117 @@
+"""
+Immutable, content hashed snapshots of checklist templates.
+
+A snapshot is the serialized template with its fields as the detail
+endpoints render them, stored once per distinct content and numbered per
+template. The snapshot of the current fields is found through the template's
+field version (``apps.checklists.compiled``), it is taken on first use after
+an edit and on freeze. Checklists pin the snapshot they were created from.
+
+Snapshot data never changes, so it is cached without invalidation and the
+detail endpoints embed it instead of serializing every field again. Clients
+that hold a copy send its hash back with ``?snapshot=`` and get the hash
+without the fields.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Max
+
+from .compiled import get_version
+from .models import ChecklistField, ChecklistTemplate, ChecklistTemplateSnapshot
+
+SnapshotHead = namedtuple('SnapshotHead', 'id version content_hash')
+
+TEMPLATE_ATTRIBUTES = ('id', 'name', 'description', 'category')
+
+
+def build_data(template):
+    from .serializers import ChecklistFieldSerializer
+
+    fields = ChecklistField.objects.filter(template_id=template.pk)
+    data = {
+        'template': {name: getattr(template, name) for name in TEMPLATE_ATTRIBUTES},
+        'fields': ChecklistFieldSerializer(fields, many=True).data,
+    }
+    # Plain JSON types, as the data reads back from the database
+    return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+
+def content_hash(data):
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+@transaction.atomic
+def take_snapshot(template):
+    """The snapshot of the template's current content, stored under a new version when it is new"""
+    data = build_data(template)
+    digest = content_hash(data)
+    # Serializes version numbering per template
+    ChecklistTemplate.all_objects.all_with_deleted().select_for_update().filter(pk=template.pk).first()
+    snapshots = ChecklistTemplateSnapshot.objects.filter(template_id=template.pk)
+    snapshot = snapshots.filter(content_hash=digest).order_by('-version').first()
+    if snapshot is None:
+        last = snapshots.aggregate(last=Max('version'))['last'] or 0
+        snapshot = ChecklistTemplateSnapshot.objects.create(
+            template_id=template.pk, version=last + 1, content_hash=digest, data=data
+        )
+    remember({
+        data_key(snapshot.pk): snapshot.data,
+        f'{data_key(snapshot.pk)}:head': (snapshot.pk, snapshot.version, snapshot.content_hash),
+    })
+    return snapshot
+
+
+def remember(entries):
+    """Cache ``entries`` once committed, a rolled back snapshot must not be found later"""
+    transaction.on_commit(lambda: cache.set_many(entries, settings.TEMPLATE_SNAPSHOT_TIMEOUT))
+
+
+def head_key(template_id):
+    return f'checklists:template:{template_id}:snapshot:{get_version(template_id)}'
+
+
+def data_key(snapshot_id):
+    return f'checklists:snapshot:{snapshot_id}'
+
+
+def current_snapshot(template):
+    """``SnapshotHead`` of the template's current fields"""
+    key = head_key(template.pk)
+    head = cache.get(key)
+    if head is None:
+        snapshot = take_snapshot(template)
+        head = SnapshotHead(snapshot.pk, snapshot.version, snapshot.content_hash)
+        remember({key: tuple(head)})
+    return SnapshotHead(*head)
+
+
+def get_head(snapshot_id):
+    """``SnapshotHead`` of a stored snapshot, ``None`` when it is gone"""
+    key = f'{data_key(snapshot_id)}:head'
+    head = cache.get(key)
+    if head is None:
+        head = ChecklistTemplateSnapshot.objects.filter(pk=snapshot_id).values_list(
+            'pk', 'version', 'content_hash'
+        ).first()
+        if head is None:
+            return None
+        remember({key: head})
+    return SnapshotHead(*head)
+
+
+def get_data(snapshot_id):
+    """Stored data of a snapshot, read from the cache"""
+    key = data_key(snapshot_id)
+    data = cache.get(key)
+    if data is None:
+        data = ChecklistTemplateSnapshot.objects.values_list('data', flat=True).get(pk=snapshot_id)
+        remember({key: data})
+    return data
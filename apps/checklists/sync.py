@@ -0,0 +1,340 @@
+"""
+Delta sync for checklists completed offline.
+
+A sync token carries an ``(updated_at, id)`` watermark per entity. Pulling
+with a token returns only the rows changed after it, soft-deleted rows as
+tombstones, so a reconnecting client downloads what changed instead of every
+checklist it holds. Pushing applies a batch of offline response edits, merging
+them field by field against the values the client started from.
+
+The token also lists the checklists the client holds. A checklist assigned
+since the last pull may have rows older than the watermarks, so its rows are
+walked from the start in a catch-up pass of their own before it joins the
+regular delta. A checklist that is no longer assigned is sent as a tombstone,
+along with the fields of templates the client no longer needs.
+"""
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+
+from .access import comment_access
+from .live import publish, response_event
+from .logic import get_field_states
+from .models import Checklist, ChecklistAttachment, ChecklistComment, ChecklistField, ChecklistResponse
+from .serializers import (
+    ChecklistAttachmentSyncSerializer, ChecklistCommentSyncSerializer, ChecklistFieldSyncSerializer,
+    ChecklistResponseSyncSerializer, ChecklistSyncEditSerializer, ChecklistSyncSerializer
+)
+from .validators import get_validators, response_errors
+
+TOKEN_SALT = 'apps.checklists.sync'
+TOKEN_VERSION = 2
+
+# Entity name -> (model, serializer class, column tying a row to a checklist or, for fields, a template)
+ENTITIES = {
+    'checklists': (Checklist, ChecklistSyncSerializer, 'id'),
+    'fields': (ChecklistField, ChecklistFieldSyncSerializer, 'template_id'),
+    'responses': (ChecklistResponse, ChecklistResponseSyncSerializer, 'checklist_id'),
+    'comments': (ChecklistComment, ChecklistCommentSyncSerializer, 'checklist_id'),
+    'attachments': (ChecklistAttachment, ChecklistAttachmentSyncSerializer, 'checklist_id'),
+}
+
+
+class SyncTokenError(Exception):
+    pass
+
+
+def get_sync_checklists(user):
+    """Checklists assigned to ``user``, including soft-deleted ones"""
+    return Checklist.all_objects.all_with_deleted().filter(
+        Q(assigned_to=user) | Q(assigned_users=user)
+    ).distinct()
+
+
+def get_entities(user, checklist_ids, template_ids):
+    """Entity name -> (queryset of the given checklists' rows including tombstones, serializer class)"""
+    entities = {}
+    for name, (model, serializer_class, column) in ENTITIES.items():
+        queryset = model.all_objects.all_with_deleted().filter(**{
+            f'{column}__in': template_ids if column == 'template_id' else checklist_ids
+        })
+        if model is Checklist:
+            queryset = queryset.prefetch_related('assigned_users')
+        elif model is ChecklistComment:
+            queryset = queryset.filter(comment_access(user))
+        entities[name] = (queryset, serializer_class)
+    return entities
+
+
+def encode_token(user, state):
+    return signing.dumps({'v': TOKEN_VERSION, 'u': user.pk, **state}, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(user, token):
+    """
+    Return the state stored in ``token``: per-entity watermarks ``w``, the
+    checklists the client holds ``k``, the checklists being caught up ``p``
+    and the watermarks of the catch-up pass ``pw``
+    """
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise SyncTokenError(_('Invalid sync token'))
+    if payload.get('v') != TOKEN_VERSION or payload.get('u') != user.pk:
+        raise SyncTokenError(_('Sync token was issued for another client, run a full sync'))
+
+    return {
+        'w': parse_watermarks(payload.get('w', {})),
+        'k': set(payload.get('k', [])),
+        'p': set(payload.get('p', [])),
+        'pw': parse_watermarks(payload.get('pw', {})),
+    }
+
+
+def parse_watermarks(raw):
+    return {name: (parse_datetime(updated_at), pk) for name, (updated_at, pk) in raw.items()}
+
+
+def format_watermark(rows, watermark):
+    """Watermark after ``rows``, the previous one when no rows were read"""
+    if rows:
+        return [rows[-1].updated_at.isoformat(), rows[-1].pk]
+    if watermark is not None:
+        return [watermark[0].isoformat(), watermark[1]]
+    return None
+
+
+def read_page(queryset, watermark, limit):
+    """
+    Up to ``limit`` rows after ``watermark`` in ``(updated_at, id)`` order and
+    whether more follow. Without a watermark tombstones are skipped.
+    """
+    if watermark is None:
+        queryset = queryset.filter(is_deleted=False)
+    else:
+        updated_at, pk = watermark
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+    if limit <= 0:
+        return [], queryset.exists()
+    rows = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+    return rows[:limit], len(rows) > limit
+
+
+def pull_changes(user, token=None, limit=None, context=None):
+    """
+    Rows changed since ``token`` for every entity, at most ``limit`` per entity.
+
+    Without a token the full current state is returned and tombstones are
+    skipped. ``has_more`` tells the client to pull again with the new token.
+    """
+    limit = limit or settings.CHECKLIST_SYNC_PAGE_SIZE
+    visible = dict(get_sync_checklists(user).values_list('id', 'template_id'))
+    if token:
+        state = decode_token(user, token)
+    else:
+        # A full sync walks every row, so the client holds all current checklists once it completes
+        state = {'w': {}, 'k': set(visible), 'p': set(), 'pw': {}}
+
+    held = state['k'] | state['p']
+    dropped = held - set(visible)
+    known = state['k'] & set(visible)
+    waiting = set(visible) - held
+    if state['p']:
+        # Checklists assigned during a catch-up pass wait for the next one, the pass is past their older rows
+        pending = state['p'] & set(visible)
+    else:
+        pending, waiting = waiting, set()
+    known_templates = {visible[pk] for pk in known}
+    pending_templates = {visible[pk] for pk in pending} - known_templates
+
+    regular = get_entities(user, known, known_templates)
+    catch_up = get_entities(user, pending, pending_templates)
+    datetime_field = serializers.DateTimeField()
+    changes, watermarks, catch_up_watermarks = {}, {}, {}
+    has_more = catch_up_more = False
+    for name in ENTITIES:
+        queryset, serializer_class = regular[name]
+        watermark = state['w'].get(name)
+        rows, more = read_page(queryset, watermark, limit)
+        has_more |= more
+        watermarks[name] = format_watermark(rows, watermark)
+
+        if pending:
+            queryset = catch_up[name][0]
+            # Caught up rows share the page with the regular ones
+            extra, more = read_page(queryset, state['pw'].get(name), limit - len(rows))
+            catch_up_more |= more
+            catch_up_watermarks[name] = format_watermark(extra, state['pw'].get(name))
+            rows = rows + extra
+
+        alive = [row for row in rows if not row.is_deleted]
+        serialized = dict(zip(
+            (row.pk for row in alive),
+            serializer_class(alive, many=True, context=context or {}).data,
+        ))
+        changes[name] = [
+            serialized[row.pk] if not row.is_deleted else tombstone(row.pk, row.updated_at, datetime_field)
+            for row in rows
+        ]
+
+    if dropped:
+        now = timezone.now()
+        changes['checklists'] += [tombstone(pk, now, datetime_field) for pk in sorted(dropped)]
+        dropped_templates = set(
+            Checklist.all_objects.all_with_deleted().filter(id__in=dropped).values_list('template_id', flat=True)
+        ) - known_templates - pending_templates
+        changes['fields'] += [
+            tombstone(pk, now, datetime_field)
+            for pk in ChecklistField.all_objects.all_with_deleted().filter(
+                template_id__in=dropped_templates
+            ).order_by('id').values_list('id', flat=True)
+        ]
+
+    if pending and not catch_up_more:
+        # Caught up, later changes arrive through the regular watermarks
+        known, pending, catch_up_watermarks = known | pending, set(), {}
+    next_state = {
+        'w': {name: watermark for name, watermark in watermarks.items() if watermark},
+        'k': sorted(known),
+        'p': sorted(pending),
+        'pw': {name: watermark for name, watermark in catch_up_watermarks.items() if watermark},
+    }
+    return {
+        'token': encode_token(user, next_state),
+        'has_more': has_more or catch_up_more or bool(waiting),
+        'changes': changes,
+    }
+
+
+def tombstone(pk, updated_at, datetime_field):
+    return {'id': pk, 'is_deleted': True, 'updated_at': datetime_field.to_representation(updated_at)}
+
+
+@transaction.atomic
+def apply_edits(user, edits, context=None):
+    """
+    Apply validated ``ChecklistSyncEditSerializer`` edits made offline.
+
+    A changed value conflicts when the server copy no longer matches the
+    ``base`` value the client edited and differs from the client's value;
+    conflicting values keep the server copy and are reported back, the rest of
+    the edit is still applied. Edits without a ``base`` entry overwrite. The
+    merged response must pass the template's field validators like an online
+    save, otherwise the edit is rejected. A response another request inserts
+    meanwhile is overwritten rather than failing the sync.
+    """
+    checklists = {
+        checklist.pk: checklist
+        for checklist in get_sync_checklists(user).filter(
+            id__in={edit['checklist_id'] for edit in edits}, is_deleted=False
+        )
+    }
+    template_fields = set(
+        ChecklistField.objects.filter(
+            template_id__in={checklist.template_id for checklist in checklists.values()}
+        ).values_list('template_id', 'id')
+    )
+    responses = {
+        (response.checklist_id, response.field_id): response
+        for response in ChecklistResponse.all_objects.all_with_deleted().select_for_update().filter(
+            checklist_id__in=checklists, field_id__in={edit['field_id'] for edit in edits}
+        )
+    }
+
+    now = timezone.now()
+    created, updated, applied, conflicts, rejected = {}, {}, [], [], []
+    for edit in edits:
+        checklist = checklists.get(edit['checklist_id'])
+        if checklist is None:
+            rejected.append({**_edit_key(edit), 'error': _('Checklist is not assigned to you')})
+            continue
+        if (checklist.template_id, edit['field_id']) not in template_fields:
+            rejected.append({**_edit_key(edit), 'error': _('Field does not belong to this checklist template')})
+            continue
+
+        key = (checklist.pk, edit['field_id'])
+        response = responses.get(key)
+        if response is None:
+            response = responses[key] = ChecklistResponse(checklist=checklist, field_id=edit['field_id'])
+
+        base, merged, field_conflicts = edit.get('base', {}), {}, {}
+        for name, value in edit['changes'].items():
+            current = getattr(response, name)
+            if name in base and current != base[name] and current != value:
+                field_conflicts[name] = {'base': base[name], 'client': value, 'server': current}
+            else:
+                merged[name] = value
+
+        # Offline values pass the same validators as online ones
+        validator = get_validators(checklist.template_id).get(edit['field_id'])
+        if validator is not None and merged:
+            is_required = get_field_states(checklist).get(edit['field_id'], (True, validator.is_required))[1]
+            messages = response_errors(
+                validator,
+                merged.get('value', response.value),
+                merged.get('is_completed', response.is_completed),
+                is_required,
+            )
+            if messages:
+                rejected.append({**_edit_key(edit), 'error': ' '.join(str(message) for message in messages)})
+                continue
+
+        for name, value in merged.items():
+            setattr(response, name, value)
+        if merged and response.is_deleted:
+            response.is_deleted, response.deleted_at, response.deleted_by = False, None, None
+
+        if merged:
+            response.responded_by = user
+            response.updated_at = now
+            (updated if response.pk else created)[key] = response
+            applied.append(key)
+        if field_conflicts:
+            conflicts.append((key, {**_edit_key(edit), 'fields': field_conflicts}))
+
+    for response in [*created.values(), *updated.values()]:
+        # Mirrors ChecklistResponse.save(), which bulk writes bypass
+        if response.is_completed and not response.responded_at:
+            response.responded_at = now
+        elif not response.is_completed:
+            response.responded_at = None
+
+    written = [
+        *ChecklistSyncEditSerializer.EDITABLE_FIELDS, 'responded_by', 'responded_at', 'updated_at',
+        'is_deleted', 'deleted_at', 'deleted_by',
+    ]
+    # The row lock does not cover responses that did not exist yet, one inserted since is overwritten
+    ChecklistResponse.objects.bulk_create(
+        created.values(), update_conflicts=True, unique_fields=['checklist', 'field'], update_fields=written
+    )
+    ChecklistResponse.objects.bulk_update(updated.values(), written)
+    for response in [*created.values(), *updated.values()]:
+        # Bulk writes skip post_save, publish the live events here
+        publish(response.checklist_id, *response_event(response))
+    for checklist_id in {checklist_id for checklist_id, _field_id in [*created, *updated]}:
+        checklists[checklist_id].update_progress()
+
+    def serialize(key):
+        response = responses[key]
+        if response.pk is None:
+            return None
+        return ChecklistResponseSyncSerializer(response, context=context or {}).data
+
+    return {
+        'applied': [serialize(key) for key in dict.fromkeys(applied)],
+        'conflicts': [{**conflict, 'server': serialize(key)} for key, conflict in conflicts],
+        'rejected': rejected,
+    }
+
+
+def _edit_key(edit):
+    key = {'checklist_id': edit['checklist_id'], 'field_id': edit['field_id']}
+    if edit.get('client_id'):
+        key['client_id'] = edit['client_id']
+    return key
@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from .rollups import compact_rollups, queue_all_scopes
+
+
+@shared_task(ignore_result=True)
+def compact_dashboard_rollups(batch_size=500):
+    # Work through the backlog, changes queued meanwhile wait for the next run
+    for _ in range(20):
+        if compact_rollups(batch_size) < batch_size:
+            break
+
+
+@shared_task(ignore_result=True)
+def rebuild_dashboard_rollups():
+    queue_all_scopes()
+    compact_dashboard_rollups()
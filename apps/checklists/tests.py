@@ -1,4 +1,9 @@
-from django.test import TestCase
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
@@ -6,11 +11,19 @@ from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from datetime import datetime, timedelta
+from unittest import mock
 
 from .models import (
     ChecklistTemplate, ChecklistField, Checklist, ChecklistResponse,
-    FieldType
+    ChecklistComment, DashboardRollup, DashboardRollupChange, FieldType
 )
+from .compiled import forget_template_fields
+from .logic import CompiledLogic, get_compiled, get_field_states
+from .rollups import compact_rollups, compute_user, get_rollup
+from .serializers import ChecklistResponseSerializer, ChecklistTemplateCreateSerializer
+from .validators import get_validators
+from apps.audits.models import Audit, AuditTask
+from audit.asgi import application
 
 User = get_user_model()
 
@@ -387,3 +400,784 @@ class ChecklistAPITests(APITestCase):
         template_ids = [t['id'] for t in response.data['results']]
         self.assertIn(self.template.id, template_ids)
         self.assertNotIn(private_template.id, template_ids)
+
+
+class ChecklistSyncTests(APITestCase):
+    url = '/api/checklists/api/checklists/sync/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='tablet', email='tablet@example.com', password='testpass123')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.template = ChecklistTemplate.objects.create(name='Site Visit', created_by=self.other)
+        self.fields = [
+            ChecklistField.objects.create(
+                template=self.template, label=f'Field {i}', field_type=FieldType.TEXT, order=i
+            )
+            for i in range(3)
+        ]
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Assigned', assigned_to=self.user, created_by=self.other
+        )
+        Checklist.objects.create(
+            template=self.template, name='Not mine', assigned_to=self.other, created_by=self.other
+        )
+
+    def pull(self, token=None):
+        response = self.client.get(self.url, {'token': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def push(self, *edits):
+        response = self.client.post(self.url, {'responses': list(edits)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_initial_pull_returns_assigned_checklists(self):
+        """Test that a pull without a token returns the user's checklists and their fields"""
+        data = self.pull()
+        self.assertEqual([row['id'] for row in data['changes']['checklists']], [self.checklist.id])
+        self.assertEqual(len(data['changes']['fields']), 3)
+        self.assertFalse(data['has_more'])
+
+    def test_incremental_pull_returns_only_changes(self):
+        """Test that pulling with a token returns rows changed since, including tombstones"""
+        ChecklistComment.objects.create(checklist=self.checklist, author=self.other, content='Hello')
+        token = self.pull()['token']
+        self.assertEqual(self.pull(token)['changes']['fields'], [])
+
+        self.push({'checklist_id': self.checklist.id, 'field_id': self.fields[0].id,
+                   'changes': {'value': {'text': 'ok'}, 'is_completed': True}})
+        ChecklistComment.objects.all().delete()
+        changes = self.pull(token)['changes']
+
+        self.assertEqual(changes['fields'], [])
+        self.assertEqual([row['field'] for row in changes['responses']], [self.fields[0].id])
+        self.assertEqual(changes['checklists'][0]['completed_fields'], 1)
+        self.assertTrue(changes['comments'][0]['is_deleted'])
+
+    def test_pull_pages_with_has_more(self):
+        """Test that a limited pull continues from the returned token"""
+        first = self.client.get(self.url, {'limit': 2}).data
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['changes']['fields']), 2)
+        second = self.client.get(self.url, {'limit': 2, 'token': first['token']}).data
+        self.assertEqual([row['id'] for row in second['changes']['fields']], [self.fields[2].id])
+
+    def test_newly_assigned_checklist_is_sent_in_full(self):
+        """Test that a checklist assigned after the last pull arrives with its older rows"""
+        other = Checklist.objects.get(name='Not mine')
+        ChecklistResponse.objects.create(checklist=other, field=self.fields[0], value={'text': 'earlier'})
+        ChecklistComment.objects.create(checklist=other, author=self.other, content='Earlier')
+        token = self.pull()['token']
+        # Rows newer than the watermarks, the assignment itself touches only the link table
+        ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.fields[1], value={'text': 'later'}
+        )
+        other.assigned_users.add(self.user)
+
+        data = self.pull(token)
+        self.assertFalse(data['has_more'])
+        self.assertIn(other.id, [row['id'] for row in data['changes']['checklists']])
+        self.assertEqual(
+            sorted(row['checklist'] for row in data['changes']['responses']), sorted([self.checklist.id, other.id])
+        )
+        self.assertEqual([row['content'] for row in data['changes']['comments']], ['Earlier'])
+        # Once caught up the checklist is part of the regular delta
+        self.assertEqual(self.pull(data['token'])['changes']['responses'], [])
+
+    def test_unassigned_checklist_sends_tombstone(self):
+        """Test that a checklist the user lost is removed from the client along with its template's fields"""
+        token = self.pull()['token']
+        self.checklist.assigned_to = self.other
+        self.checklist.save()
+        self.checklist.assigned_users.remove(self.user)
+
+        changes = self.pull(token)['changes']
+        self.assertEqual(changes['checklists'], [
+            {'id': self.checklist.id, 'is_deleted': True, 'updated_at': changes['checklists'][0]['updated_at']}
+        ])
+        self.assertEqual(
+            sorted(row['id'] for row in changes['fields'] if row.get('is_deleted')),
+            [field.id for field in self.fields],
+        )
+
+    def test_invalid_token(self):
+        """Test that a tampered token is rejected"""
+        response = self.client.get(self.url, {'token': 'not-a-token'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_push_merges_non_conflicting_fields(self):
+        """Test that conflicting values keep the server copy while other changes apply"""
+        ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.fields[0], value={'text': 'server'}, comments='old'
+        )
+        data = self.push({
+            'checklist_id': self.checklist.id,
+            'field_id': self.fields[0].id,
+            'changes': {'value': {'text': 'tablet'}, 'comments': 'new'},
+            'base': {'value': {'text': 'original'}, 'comments': 'old'},
+            'client_id': 'edit-1',
+        })
+
+        response = ChecklistResponse.objects.get(checklist=self.checklist, field=self.fields[0])
+        self.assertEqual(response.value, {'text': 'server'})
+        self.assertEqual(response.comments, 'new')
+        self.assertEqual(data['conflicts'][0]['client_id'], 'edit-1')
+        self.assertEqual(data['conflicts'][0]['fields']['value']['server'], {'text': 'server'})
+        self.assertEqual(len(data['applied']), 1)
+
+    def test_push_validates_values(self):
+        """Test that offline values the field validators refuse are rejected and not stored"""
+        field = ChecklistField.objects.create(
+            template=self.template, label='Count', field_type=FieldType.NUMBER, order=10, max_value=10
+        )
+        data = self.push(
+            {'checklist_id': self.checklist.id, 'field_id': field.id,
+             'changes': {'value': {'number': 50}, 'is_completed': True}, 'client_id': 'too-big'},
+            {'checklist_id': self.checklist.id, 'field_id': field.id,
+             'changes': {'value': {'number': 5}, 'is_completed': True}},
+        )
+        self.assertEqual([row['client_id'] for row in data['rejected']], ['too-big'])
+        self.assertEqual(ChecklistResponse.objects.get(field=field).value, {'number': 5})
+
+        response = self.client.post(self.url, {'responses': [
+            {'checklist_id': self.checklist.id, 'field_id': field.id, 'changes': {'value': 5}}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_push_survives_concurrent_insert(self):
+        """Test that a response inserted by another request after the rows were read is overwritten"""
+        now, raced = timezone.now, []
+
+        def insert_first():
+            # Runs once the sync has read the existing responses
+            if not raced:
+                raced.append(True)
+                ChecklistResponse.objects.bulk_create([
+                    ChecklistResponse(checklist=self.checklist, field=self.fields[0], value={'text': 'online'})
+                ])
+            return now()
+
+        with mock.patch('apps.checklists.sync.timezone.now', side_effect=insert_first):
+            data = self.push({'checklist_id': self.checklist.id, 'field_id': self.fields[0].id,
+                              'changes': {'value': {'text': 'offline'}}})
+        self.assertEqual(len(data['applied']), 1)
+        self.assertEqual(ChecklistResponse.objects.get(field=self.fields[0]).value, {'text': 'offline'})
+
+    def test_push_rejects_unassigned_checklist(self):
+        """Test that edits to checklists not assigned to the user are rejected"""
+        other = Checklist.objects.get(name='Not mine')
+        data = self.push({'checklist_id': other.id, 'field_id': self.fields[0].id, 'changes': {'comments': 'x'}})
+        self.assertEqual(len(data['rejected']), 1)
+        self.assertFalse(ChecklistResponse.objects.exists())
+
+
+class ChecklistConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='poller', email='poller@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.template = ChecklistTemplate.objects.create(name='Polling', created_by=self.user)
+        self.field = ChecklistField.objects.create(
+            template=self.template, label='Field', field_type=FieldType.TEXT, order=1
+        )
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Polled', assigned_to=self.user, created_by=self.user
+        )
+        self.url = f'/api/checklists/api/checklists/{self.checklist.id}/'
+
+    def test_detail_not_modified(self):
+        """Test that a matching If-None-Match returns 304 until the checklist changes"""
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.client.post(f'{self.url}submit_response/', {'field_id': self.field.id, 'value': {'text': 'x'}}, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_follows_language(self):
+        """Test that a representation in another language is not answered with 304"""
+        for url in (self.url, '/api/checklists/api/checklists/'):
+            etag = self.client.get(url, HTTP_ACCEPT_LANGUAGE='en')['ETag']
+            self.assertEqual(self.client.get(url, HTTP_ACCEPT_LANGUAGE='en', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            response = self.client.get(url, HTTP_ACCEPT_LANGUAGE='ar', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_detail_etag_follows_assigned_users(self):
+        """Test that adding or removing an assigned user changes the validators"""
+        other = User.objects.create_user(username='helper', email='helper@example.com', password='testpass123')
+        etag = self.client.get(self.url)['ETag']
+        self.checklist.assigned_users.add(other)
+        added = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(added.status_code, 200)
+        self.assertIn(other.id, [user['id'] for user in added.data['assigned_users']])
+
+        other.assigned_checklists_multi.clear()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=added['ETag']).status_code, 200)
+
+    def test_list_not_modified(self):
+        """Test that list polling gets 304 and sees new checklists"""
+        url = '/api/checklists/api/checklists/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'status': 'draft'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Checklist.objects.create(template=self.template, name='New', assigned_to=self.user, created_by=self.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_write_with_stale_if_match(self):
+        """Test that writes with an outdated If-Match fail with 412"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.patch(self.url, {'name': 'First'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.patch(self.url, {'name': 'Second'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.checklist.refresh_from_db()
+        self.assertEqual(self.checklist.name, 'First')
+
+        response = self.client.post(
+            f'{self.url}update_responses/', {'responses': []}, format='json', HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+
+
+@override_settings(
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    LIVE_COALESCE_SECONDS=0,
+)
+class ChecklistLiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='live', email='live@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.template = ChecklistTemplate.objects.create(name='Live', created_by=self.user)
+        self.fields = [
+            ChecklistField.objects.create(template=self.template, label=f'F{i}', field_type=FieldType.TEXT, order=i)
+            for i in range(2)
+        ]
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Shared', assigned_to=self.user, created_by=self.user
+        )
+        self.audit = Audit.objects.create(
+            title='Live audit', scope='Scope', objectives='Objectives',
+            period_from=timezone.now().date(), period_to=timezone.now().date(), created_by=self.user
+        )
+        AuditTask.objects.create(audit=self.audit, checklist=self.checklist, task_name='Task', created_by=self.user)
+
+    async def connect(self, path, token=True):
+        query = f'?token={self.token.key}' if token else ''
+        communicator = WebsocketCommunicator(application, path + query, headers=[(b'origin', b'http://testserver')])
+        connected, _ = await communicator.connect()
+        return communicator, connected
+
+    def edit_responses(self):
+        # Nested atomic so the events are batched like a real transaction
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            first = ChecklistResponse.objects.create(
+                checklist=self.checklist, field=self.fields[0], value={'text': 'a'}
+            )
+            first.value = {'text': 'b'}
+            first.save()
+            ChecklistResponse.objects.create(checklist=self.checklist, field=self.fields[1], value={'text': 'c'})
+
+    async def test_requires_authentication(self):
+        """Test that sockets without credentials are refused"""
+        communicator, connected = await self.connect(f'/ws/checklists/{self.checklist.id}/', token=False)
+        self.assertFalse(connected)
+
+    async def test_checklist_events_are_coalesced(self):
+        """Test that edits in one transaction arrive as one frame with the latest state per row"""
+        communicator, connected = await self.connect(f'/ws/checklists/{self.checklist.id}/')
+        self.assertTrue(connected)
+        await database_sync_to_async(self.edit_responses)()
+
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(message['type'], 'events')
+        responses = {event['field']: event for event in message['events'] if event['type'] == 'response'}
+        progress = [event for event in message['events'] if event['type'] == 'progress']
+        self.assertEqual(responses[self.fields[0].id]['value'], {'text': 'b'})
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(len(progress), 1)
+        self.assertEqual(progress[0]['total_fields'], 2)
+        await communicator.disconnect()
+
+    async def test_audit_group_receives_progress_only(self):
+        """Test that audit subscribers get progress but not individual responses"""
+        communicator, connected = await self.connect(f'/ws/audits/{self.audit.id}/')
+        self.assertTrue(connected)
+        await database_sync_to_async(self.edit_responses)()
+
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual({event['type'] for event in message['events']}, {'progress'})
+        await communicator.disconnect()
+
+    async def test_internal_comments_need_access(self):
+        """Test that assignees get public comments only and users the REST API refuses are turned away"""
+        assignee = await database_sync_to_async(User.objects.create_user)(
+            username='assignee', email='assignee@example.com', password='testpass123'
+        )
+        helper = await database_sync_to_async(User.objects.create_user)(
+            username='helper', email='helper@example.com', password='testpass123'
+        )
+
+        def share():
+            self.checklist.assigned_to = assignee
+            self.checklist.save()
+            self.checklist.assigned_users.add(helper)
+            Token.objects.create(user=helper)
+            return Token.objects.create(user=assignee)
+
+        self.token = await database_sync_to_async(share)()
+
+        def comment():
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                ChecklistComment.objects.create(
+                    checklist=self.checklist, author=self.user, content='Reviewers only', is_internal=True
+                )
+                ChecklistComment.objects.create(checklist=self.checklist, author=self.user, content='Everyone')
+
+        communicator, connected = await self.connect(f'/ws/checklists/{self.checklist.id}/')
+        self.assertTrue(connected)
+        await database_sync_to_async(comment)()
+        message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(
+            [event['content'] for event in message['events'] if event['type'] == 'comment'], ['Everyone']
+        )
+        await communicator.disconnect()
+
+        self.token = await database_sync_to_async(Token.objects.get)(user=helper)
+        communicator, connected = await self.connect(f'/ws/checklists/{self.checklist.id}/')
+        self.assertFalse(connected)
+
+    async def test_slow_socket_gets_resync(self):
+        """Test that overflowing the per-socket buffer sends a resync"""
+        with override_settings(LIVE_MAX_PENDING_EVENTS=1, LIVE_COALESCE_SECONDS=0.05):
+            communicator, connected = await self.connect(f'/ws/checklists/{self.checklist.id}/')
+            await database_sync_to_async(self.edit_responses)()
+            message = await communicator.receive_json_from(timeout=2)
+        self.assertEqual(message, {'type': 'resync'})
+        await communicator.disconnect()
+
+
+class DashboardRollupTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashboard', email='dashboard@example.com', password='testpass123')
+        self.other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.template = ChecklistTemplate.objects.create(name='Rollup', created_by=self.user)
+        for checklist_status in ('draft', 'in_progress', 'completed'):
+            Checklist.objects.create(
+                template=self.template, name=checklist_status, status=checklist_status,
+                assigned_to=self.user, created_by=self.user
+            )
+
+    def test_writes_queue_their_scopes(self):
+        """Test that saves queue the user and template scopes they touch"""
+        self.assertEqual(
+            set(DashboardRollupChange.objects.values_list('scope', 'scope_id')),
+            {('user', self.user.pk), ('template', self.template.pk)}
+        )
+        compact_rollups()
+        self.assertFalse(DashboardRollupChange.objects.exists())
+        self.assertEqual(DashboardRollup.objects.filter(day__isnull=True).count(), 2)
+        self.assertEqual(DashboardRollup.objects.filter(day=timezone.localdate()).count(), 2)
+
+        # Progress updates do not touch any rollup
+        Checklist.objects.first().update_progress()
+        self.assertFalse(DashboardRollupChange.objects.exists())
+
+        # Reassigning marks both the previous and the new assignee
+        checklist = Checklist.objects.get(name='draft')
+        checklist.assigned_to = self.other
+        checklist.save()
+        self.assertIn(('user', self.other.pk), set(DashboardRollupChange.objects.values_list('scope', 'scope_id')))
+        self.assertIn(('user', self.user.pk), set(DashboardRollupChange.objects.values_list('scope', 'scope_id')))
+
+    def test_dashboard_reads_rollup(self):
+        """Test that compacted dashboards match live numbers in constant queries"""
+        live = self.client.get('/api/checklists/api/checklists/dashboard_stats/').data
+        compact_rollups()
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/checklists/api/checklists/dashboard_stats/')
+        self.assertEqual(response.data['total_checklists'], 3)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual(response.data['in_progress'], 1)
+        self.assertEqual(
+            {key: value for key, value in response.data.items() if key != 'recent_activity'},
+            {key: value for key, value in live.items() if key != 'recent_activity'}
+        )
+
+        response = self.client.get(f'/api/checklists/api/templates/{self.template.id}/usage_stats/')
+        self.assertEqual(response.data['active_checklists'], 3)
+        self.assertEqual(response.data['completion_rate'], 50)
+
+    def test_pending_changes_fall_back_to_live(self):
+        """Test that a scope with queued changes is computed live"""
+        compact_rollups()
+        Checklist.objects.create(
+            template=self.template, name='new', status='completed', assigned_to=self.user, created_by=self.user
+        )
+        self.assertEqual(get_rollup('user', self.user.pk)['total_checklists'], 4)
+        self.assertEqual(
+            DashboardRollup.objects.get(scope='user', scope_id=self.user.pk, day__isnull=True).data['total_checklists'],
+            3
+        )
+        compact_rollups()
+        self.assertEqual(get_rollup('user', self.user.pk), compute_user(self.user.pk))
+
+
+class ConditionalLogicTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='logic', email='logic@example.com', password='testpass123')
+        self.template = ChecklistTemplate.objects.create(name='Logic', created_by=self.user)
+        self.audited = ChecklistField.objects.create(
+            template=self.template, label='Audited', field_type=FieldType.TEXT, order=1
+        )
+        self.details = ChecklistField.objects.create(
+            template=self.template, label='Details', field_type=FieldType.TEXT, order=2, is_required=True,
+            conditional_logic={'action': 'show', 'conditions': [
+                {'field': self.audited.id, 'operator': 'equals', 'value': 'yes'}
+            ]}
+        )
+        self.evidence = ChecklistField.objects.create(
+            template=self.template, label='Evidence', field_type=FieldType.TEXT, order=3,
+            conditional_logic={'action': 'show', 'conditions': [
+                {'field_order': 2, 'operator': 'is_not_empty'}
+            ]}
+        )
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Logic', assigned_to=self.user, created_by=self.user
+        )
+
+    def test_hidden_fields_are_left_out_of_progress(self):
+        """Test that hiding cascades and a changed response re-evaluates what depends on it"""
+        audited = ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.audited, value={'text': 'no'}, is_completed=True
+        )
+        for field in (self.details, self.evidence):
+            ChecklistResponse.objects.create(
+                checklist=self.checklist, field=field, value={'text': 'x'}, is_completed=True
+            )
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.total_fields, self.checklist.completed_fields), (1, 1))
+        self.assertEqual(get_field_states(self.checklist)[self.evidence.id], (False, False))
+
+        audited.value = {'text': 'yes'}
+        audited.save()
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.total_fields, self.checklist.completed_fields), (3, 3))
+        self.assertEqual(get_field_states(self.checklist)[self.details.id], (True, True))
+
+        # The incremental result matches a full pass
+        self.checklist.update_progress()
+        self.assertEqual((self.checklist.total_fields, self.checklist.completed_fields), (3, 3))
+
+    def test_concurrent_saves_keep_their_counts(self):
+        """Test that a completion written by another request is counted by the next incremental save"""
+        audited = ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.audited, value={'text': 'yes'}
+        )
+        details = ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.details, value={'text': 'x'}
+        )
+        # Written by a request whose cache update lost the race
+        ChecklistResponse.objects.filter(pk=details.pk).update(is_completed=True)
+
+        audited.is_completed = True
+        audited.save()
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.total_fields, self.checklist.completed_fields), (2, 2))
+
+    def test_stale_states_are_evaluated_again(self):
+        """Test that states cached before a write elsewhere are evaluated in full, not patched"""
+        ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.audited, value={'text': 'no'}, is_completed=True
+        )
+        ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.details, value={'text': 'x'}, is_completed=True
+        )
+        # Written by a path that touches the checklist but does not update progress
+        ChecklistResponse.objects.filter(field=self.audited).update(value={'text': 'yes'})
+        Checklist.objects.filter(pk=self.checklist.pk).update(updated_at=timezone.now())
+
+        ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.evidence, value={'text': 'y'}, is_completed=True
+        )
+        self.checklist.refresh_from_db()
+        self.assertEqual((self.checklist.total_fields, self.checklist.completed_fields), (3, 3))
+
+    def test_progress_reads_responses_once(self):
+        """Test that the progress endpoint costs the same number of queries whatever the field count"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = f'/api/checklists/api/checklists/{self.checklist.id}/progress/'
+        ChecklistResponse.objects.create(checklist=self.checklist, field=self.audited, value={'text': 'yes'})
+        # Compiled rules and field states are cached by the first request
+        client.get(url)
+        with CaptureQueriesContext(connection) as small:
+            client.get(url)
+
+        fields = ChecklistField.objects.bulk_create(
+            ChecklistField(template=self.template, label=f'F{i}', field_type=FieldType.TEXT, order=10 + i)
+            for i in range(50)
+        )
+        forget_template_fields(self.template.id)
+        ChecklistResponse.objects.bulk_create(
+            ChecklistResponse(checklist=self.checklist, field=field, value={'text': 'x'}, is_completed=True)
+            for field in fields
+        )
+        client.get(url)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get(url)
+        self.assertEqual(len(response.data['field_progress']), 53)
+        self.assertEqual(response.data['completed_fields'], 50)
+        self.assertEqual(len(large), len(small))
+
+    def test_large_template_and_cycles(self):
+        """Test that long dependency chains compile, re-evaluate downstream only and reject cycles"""
+        rows = [(1, 1, 'F1', False, {})] + [
+            (i, i, f'F{i}', True, {'conditions': [{'field': i - 1, 'operator': 'is_completed'}]})
+            for i in range(2, 601)
+        ]
+        compiled = CompiledLogic(rows)
+        states = compiled.evaluate({1: ('a', True), 2: ('b', True)})
+        self.assertEqual(states[3], (True, True))
+        self.assertEqual(states[4], (False, False))
+        self.assertEqual(states[600], (False, False))
+        affected, reads = compiled.downstream(300)
+        self.assertEqual(affected, list(range(301, 601)))
+        self.assertEqual(reads, set(range(300, 600)))
+
+        rows[0] = (1, 1, 'F1', False, {'conditions': [{'field': 600, 'operator': 'is_empty'}]})
+        with self.assertRaisesMessage(ValidationError, 'cycle'):
+            CompiledLogic(rows)
+
+        serializer = ChecklistTemplateCreateSerializer(data={'name': 'Cyclic', 'fields': [
+            {'label': 'A', 'field_type': 'text', 'order': 1,
+             'conditional_logic': {'conditions': [{'field_order': 2, 'operator': 'is_empty'}]}},
+            {'label': 'B', 'field_type': 'text', 'order': 2,
+             'conditional_logic': {'conditions': [{'field_order': 1, 'operator': 'is_empty'}]}},
+        ]})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('conditional_logic', serializer.errors['fields'])
+
+        # Compiled once per template version
+        compiled = get_compiled(self.template.id)
+        self.assertIs(get_compiled(self.template.id), compiled)
+        forget_template_fields(self.template.id)
+        self.assertIsNot(get_compiled(self.template.id), compiled)
+
+
+class ResponseValidatorTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='validator', email='validator@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.template = ChecklistTemplate.objects.create(name='Validated', created_by=self.user)
+        self.choice = ChecklistField.objects.create(
+            template=self.template, label='Choice', field_type=FieldType.SELECT, order=1,
+            options=[{'value': 'a', 'label': 'A'}, {'value': 'b', 'label': 'B'}]
+        )
+        self.score = ChecklistField.objects.create(
+            template=self.template, label='Score', field_type=FieldType.NUMBER, order=2, min_value=0, max_value=10
+        )
+        self.contact = ChecklistField.objects.create(
+            template=self.template, label='Contact', field_type=FieldType.EMAIL, order=3
+        )
+        self.notes = ChecklistField.objects.create(
+            template=self.template, label='Notes', field_type=FieldType.TEXT, order=4, is_required=True
+        )
+        self.checklist = Checklist.objects.create(
+            template=self.template, name='Validated', assigned_to=self.user, created_by=self.user
+        )
+
+    def test_validate_all_responses(self):
+        """Test that one call reports every invalid response and missing required field"""
+        for field, value in ((self.choice, {'selected': 'c'}), (self.score, {'number': 5}),
+                             (self.contact, {'email': 'not-an-email'})):
+            ChecklistResponse.objects.create(checklist=self.checklist, field=field, value=value, is_completed=True)
+
+        response = self.client.get(f'/api/checklists/api/checklists/{self.checklist.id}/validate_responses/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['checked'], 3)
+        self.assertFalse(response.data['valid'])
+        self.assertEqual(
+            {entry['field_id'] for entry in response.data['invalid']},
+            {self.choice.id, self.contact.id, self.notes.id}
+        )
+
+        # Compiled once per template version
+        get_validators(self.template.id)
+        with self.assertNumQueries(0):
+            get_validators(self.template.id)
+        self.score.max_value = 4
+        self.score.save()
+        self.assertEqual(get_validators(self.template.id)[self.score.id].max_value, 4)
+
+    def test_serializer_uses_compiled_validators(self):
+        """Test that the read and write sides share the field validators"""
+        serializer = ChecklistResponseSerializer(
+            data={'field_id': self.contact.id, 'value': {'email': 'nope'}, 'is_completed': True},
+            context={'checklist': self.checklist}
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('value', serializer.errors)
+
+        serializer = ChecklistResponseSerializer(
+            data={'field_id': self.notes.id, 'value': {}, 'is_completed': True}, context={'checklist': self.checklist}
+        )
+        self.assertFalse(serializer.is_valid())
+
+        response = ChecklistResponse.objects.create(
+            checklist=self.checklist, field=self.choice, value={'selected': 'b'}, is_completed=True
+        )
+        self.assertTrue(ChecklistResponseSerializer(response).data['is_valid_response'])
+        response.value = {'selected': 'z'}
+        self.assertFalse(ChecklistResponseSerializer(response).data['is_valid_response'])
+
+
+class TemplateSnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='snapshot', email='snapshot@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.template = ChecklistTemplate.objects.create(name='Snapshot', created_by=self.user)
+        self.field = ChecklistField.objects.create(
+            template=self.template, label='Original', field_type=FieldType.TEXT, order=1
+        )
+
+    def create_checklist(self, name):
+        return Checklist.objects.create(template=self.template, name=name, assigned_to=self.user, created_by=self.user)
+
+    def test_checklists_pin_their_snapshot(self):
+        """Test that checklists render the template version they were created from"""
+        before = self.create_checklist('Before')
+        self.field.label = 'Edited'
+        self.field.save()
+        after = self.create_checklist('After')
+        self.assertNotEqual(before.template_snapshot_id, after.template_snapshot_id)
+
+        url = '/api/checklists/api/checklists/{}/'
+        data = self.client.get(url.format(before.id)).data['template']
+        self.assertEqual((data['snapshot']['version'], data['fields'][0]['label']), (1, 'Original'))
+        data = self.client.get(url.format(after.id)).data['template']
+        self.assertEqual((data['snapshot']['version'], data['fields'][0]['label']), (2, 'Edited'))
+
+        # Clients holding the snapshot get its hash only
+        template_url = f'/api/checklists/api/templates/{self.template.id}/'
+        snapshot = self.client.get(template_url).data['snapshot']
+        data = self.client.get(template_url, {'snapshot': snapshot['hash']}).data
+        self.assertIsNone(data['fields'])
+        self.assertEqual(data['field_count'], 1)
+
+    def test_snapshots_are_content_hashed(self):
+        """Test that identical content maps to one snapshot and the endpoint honours If-None-Match"""
+        self.template.freeze(self.user)
+        self.assertEqual(self.template.snapshots.count(), 1)
+
+        url = f'/api/checklists/api/templates/{self.template.id}/snapshot/'
+        response = self.client.get(url)
+        self.assertEqual(response.data['data']['fields'][0]['label'], 'Original')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.template.unfreeze()
+        self.template.name = 'Renamed'
+        self.template.save()
+        self.assertEqual(self.client.get(url).data['version'], 2)
+        self.template.name = 'Snapshot'
+        self.template.save()
+        self.assertEqual(self.client.get(url).data['version'], 1)
+        self.assertEqual(self.client.get(url, {'version': 2}).data['data']['template']['name'], 'Renamed')
+
+
+class TemplateEditingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='builder', email='builder@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_update_only_writes_changed_fields(self):
+        """Test that template updates keep matched fields and their responses"""
+        response = self.client.post('/api/checklists/api/templates/', {'name': 'Builder', 'fields': [
+            {'label': f'F{i}', 'field_type': 'text', 'order': i} for i in range(1, 4)
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        template = ChecklistTemplate.objects.get(pk=response.data['id'])
+        first, second, third = template.fields.all()
+        checklist = Checklist.objects.create(
+            template=template, name='Filled', assigned_to=self.user, created_by=self.user
+        )
+        ChecklistResponse.objects.create(checklist=checklist, field=first, value={'text': 'kept'})
+
+        response = self.client.put(f'/api/checklists/api/templates/{template.id}/', {'name': 'Builder', 'fields': [
+            {'id': first.id, 'label': 'Renamed', 'field_type': 'text', 'order': 1},
+            {'id': second.id, 'label': 'F2', 'field_type': 'text', 'order': 2},
+            {'label': 'F4', 'field_type': 'text', 'order': 4},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(field.id, field.label) for field in template.fields.all()[:2]],
+            [(first.id, 'Renamed'), (second.id, 'F2')]
+        )
+        self.assertEqual(template.fields.count(), 3)
+        self.assertTrue(ChecklistField.all_objects.only_deleted().filter(pk=third.pk).exists())
+        self.assertEqual(checklist.responses.get().field_id, first.id)
+
+    def test_new_field_does_not_take_over_responses(self):
+        """Test that a field sent without an id at a removed field's order is inserted, not matched"""
+        response = self.client.post('/api/checklists/api/templates/', {'name': 'Builder', 'fields': [
+            {'label': f'F{i}', 'field_type': 'text', 'order': i} for i in range(1, 3)
+        ]}, format='json')
+        template = ChecklistTemplate.objects.get(pk=response.data['id'])
+        first, second = template.fields.all()
+        checklist = Checklist.objects.create(
+            template=template, name='Filled', assigned_to=self.user, created_by=self.user
+        )
+        ChecklistResponse.objects.create(checklist=checklist, field=second, value={'text': 'old answer'})
+
+        response = self.client.put(f'/api/checklists/api/templates/{template.id}/', {'name': 'Builder', 'fields': [
+            {'id': first.id, 'label': 'F1', 'field_type': 'text', 'order': 1},
+            {'label': 'Replacement', 'field_type': 'number', 'order': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        replacement = template.fields.get(order=2)
+        self.assertNotEqual(replacement.id, second.id)
+        self.assertEqual(replacement.label, 'Replacement')
+        self.assertFalse(ChecklistResponse.objects.filter(field=replacement).exists())
+        self.assertTrue(ChecklistField.all_objects.only_deleted().filter(pk=second.pk).exists())
+
+    def test_reorder_and_duplicate_in_bulk(self):
+        """Test that large templates are reordered and copied with a constant number of queries"""
+        template = ChecklistTemplate.objects.create(name='Large', created_by=self.user)
+        fields = ChecklistField.objects.bulk_create(
+            ChecklistField(template=template, label=f'F{i}', field_type=FieldType.TEXT, order=i) for i in range(400)
+        )
+        fields[1].conditional_logic = {'conditions': [{'field': fields[0].id, 'operator': 'is_not_empty'}]}
+        fields[1].save()
+
+        orders = [{'field_id': field.id, 'order': 400 - index} for index, field in enumerate(fields)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/checklists/api/fields/reorder/', {'field_orders': orders}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['fields']), 400)
+        self.assertLess(len(queries), 10)
+        self.assertEqual(ChecklistField.objects.get(pk=fields[0].id).order, 400)
+
+        response = self.client.post(f'/api/checklists/api/templates/{template.id}/duplicate/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        copy = ChecklistTemplate.objects.get(pk=response.data['template']['id'])
+        self.assertEqual(copy.fields.count(), 400)
+        copied = {field.label: field for field in copy.fields.all()}
+        self.assertEqual(copied['F1'].conditional_logic['conditions'][0]['field'], copied['F0'].id)
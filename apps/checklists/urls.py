@@ -73,6 +73,10 @@ urlpatterns = [
          ChecklistViewSet.as_view({'get': 'progress'}), 
          name='checklist-progress'),
     
+    path('api/checklists/<int:pk>/validate-responses/', 
+         ChecklistViewSet.as_view({'get': 'validate_responses'}), 
+         name='checklist-validate-responses'),
+    
     path('api/checklists/<int:pk>/comments/', 
          ChecklistViewSet.as_view({'get': 'comments', 'post': 'comments'}), 
          name='checklist-comments'),
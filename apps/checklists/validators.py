@@ -0,0 +1,182 @@
+"""
+Response validators compiled per template.
+
+Every field of a template compiles once per template version into a
+``FieldValidator``: option values as a frozenset, numeric and length bounds
+as plain numbers and shared email/URL validators. The same objects back the
+read side (``is_valid_response`` of serialized responses), the write side
+(``ChecklistResponseSerializer.validate``) and ``validate_checklist``, which
+checks every response of a checklist in one pass.
+"""
+
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator, URLValidator
+from django.utils.translation import gettext_lazy as _
+
+from .compiled import CompiledCache
+from .models import ChecklistField, ChecklistResponse, FieldType
+
+# Their regexes compile on first use and are shared by every field
+EMAIL_VALIDATOR = EmailValidator()
+URL_VALIDATOR = URLValidator()
+
+FIELD_COLUMNS = (
+    'pk', 'label', 'field_type', 'is_required', 'options', 'min_length', 'max_length', 'min_value', 'max_value'
+)
+
+
+def option_values(options):
+    values = set()
+    for option in options if isinstance(options, list) else ():
+        value = option.get('value') if isinstance(option, dict) else option
+        try:
+            values.add(value)
+        except TypeError:
+            continue
+    return frozenset(values)
+
+
+def to_bound(value):
+    return float(value) if value is not None else None
+
+
+class FieldValidator:
+    """Checks of one field, built from its definition"""
+
+    def __init__(self, pk, label, field_type, is_required, options, min_length, max_length, min_value, max_value):
+        self.pk = pk
+        self.label = label
+        self.field_type = field_type
+        self.is_required = is_required
+        self.options = option_values(options)
+        self.min_length = min_length
+        self.max_length = max_length
+        self.min_value = to_bound(min_value)
+        self.max_value = to_bound(max_value)
+
+    @classmethod
+    def from_field(cls, field):
+        return cls(*(getattr(field, column) for column in FIELD_COLUMNS))
+
+    def is_valid(self, value, is_required=None):
+        """Whether a stored value fits the field, mirrors what the form accepts"""
+        is_required = self.is_required if is_required is None else is_required
+        if not value:
+            return not is_required
+
+        try:
+            if self.field_type == FieldType.NUMBER:
+                number = float(value.get('number', 0))
+                if self.min_value is not None and number < self.min_value:
+                    return False
+                if self.max_value is not None and number > self.max_value:
+                    return False
+
+            elif self.field_type in (FieldType.TEXT, FieldType.TEXTAREA):
+                length = len(str(value.get('text', '')))
+                if self.min_length and length < self.min_length:
+                    return False
+                if self.max_length and length > self.max_length:
+                    return False
+
+            elif self.field_type in (FieldType.SELECT, FieldType.RADIO):
+                selected = value.get('selected')
+                if selected:
+                    return selected in self.options
+                return not is_required
+
+            elif self.field_type == FieldType.MULTI_SELECT:
+                selected = value.get('selected', [])
+                if selected:
+                    return all(item in self.options for item in selected)
+                return not is_required
+
+            return True
+
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return False
+
+    def errors(self, value, is_completed, is_required=None):
+        """Messages that keep a response from being saved, empty when it can be"""
+        is_required = self.is_required if is_required is None else is_required
+        if is_required and is_completed and not value:
+            return [_('Value is required for required fields')]
+        if not value or not is_completed or not isinstance(value, dict):
+            return []
+
+        if self.field_type == FieldType.EMAIL:
+            return self.check(EMAIL_VALIDATOR, value.get('email', ''), _('Invalid email format'))
+        if self.field_type == FieldType.URL:
+            return self.check(URL_VALIDATOR, value.get('url', ''), _('Invalid URL format'))
+        return []
+
+    @staticmethod
+    def check(validator, value, message):
+        if not value:
+            return []
+        try:
+            validator(value)
+        except (ValidationError, TypeError):
+            return [message]
+        return []
+
+
+def response_errors(validator, value, is_completed, is_required=None):
+    """Messages ``validate_checklist`` reports for a response, empty when it fits the field"""
+    messages = validator.errors(value, is_completed, is_required)
+    if not messages and is_completed and not validator.is_valid(value, is_required):
+        messages = [_('Value does not fit the field')]
+    return messages
+
+
+def compile_validators(template_id, version):
+    return {
+        row[0]: FieldValidator(*row)
+        for row in ChecklistField.objects.filter(template_id=template_id).values_list(*FIELD_COLUMNS)
+    }
+
+
+_validators = CompiledCache(compile_validators)
+
+
+def get_validators(template_id):
+    """``{field id: FieldValidator}`` of the template's current fields"""
+    return _validators.get(template_id)
+
+
+def get_validator(field):
+    return get_validators(field.template_id).get(field.pk) or FieldValidator.from_field(field)
+
+
+def validate_checklist(checklist):
+    """
+    Check every response of ``checklist`` and every visible required field
+    without one. Returns ``{"checked": n, "valid": bool, "invalid": [...]}``
+    where each invalid entry names the field and its messages.
+    """
+    from .logic import get_field_states
+
+    validators = get_validators(checklist.template_id)
+    states = get_field_states(checklist)
+    invalid = []
+    answered = set()
+    rows = ChecklistResponse.objects.filter(checklist_id=checklist.pk).values_list('field_id', 'value', 'is_completed')
+    for field_id, value, is_completed in rows:
+        answered.add(field_id)
+        validator = validators.get(field_id)
+        visible, is_required = states.get(field_id, (True, False))
+        if validator is None or not visible:
+            continue
+        messages = response_errors(validator, value, is_completed, is_required)
+        if messages:
+            invalid.append({'field_id': field_id, 'field_label': validator.label, 'errors': [str(m) for m in messages]})
+
+    for field_id, validator in validators.items():
+        visible, is_required = states.get(field_id, (True, validator.is_required))
+        if field_id not in answered and visible and is_required and validator.field_type != FieldType.SECTION:
+            invalid.append({
+                'field_id': field_id,
+                'field_label': validator.label,
+                'errors': [str(_('Value is required for required fields'))],
+            })
+    return {'checked': len(answered), 'valid': not invalid, 'invalid': invalid}
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
@@ -5,7 +6,8 @@ from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count, Avg, F
+from django.db import transaction
+from django.db.models import Q, Count, Max
 from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.http import HttpResponse, Http404
@@ -13,7 +15,7 @@ import mimetypes
 import os
 
 from .models import (
-    ChecklistTemplate, ChecklistField, Checklist, ChecklistResponse,
+    ChecklistTemplate, ChecklistField, Checklist,
     ChecklistComment, ChecklistAttachment, FieldType
 )
 from .serializers import (
@@ -22,14 +24,36 @@ from .serializers import (
     ChecklistCreateSerializer, ChecklistDetailSerializer, ChecklistListSerializer,
     ChecklistUpdateSerializer, ChecklistResponseSerializer, ChecklistCommentSerializer,
     ChecklistAttachmentSerializer, UserSimpleSerializer, FieldTypeChoicesSerializer,
-    ChecklistTemplateFieldsAddSerializer
+    ChecklistTemplateFieldsAddSerializer, ChecklistSyncEditSerializer
 )
+from .access import checklist_access, comment_access
+from .editing import copy_fields, reorder_fields
+from .logic import get_field_states
+from .rollups import get_rollup
+from .snapshots import SnapshotHead, current_snapshot, get_data as get_snapshot_data
+from .sync import SyncTokenError, apply_edits, pull_changes
+from .validators import validate_checklist
+from apps.utils.views import ConditionalRequestMixin, SparseFieldsetMixin
 
 
-class ChecklistTemplateViewSet(viewsets.ModelViewSet):
+class ChecklistTemplateViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for checklist templates"""
     queryset = ChecklistTemplate.objects.filter(is_deleted=False)
     permission_classes = [permissions.IsAuthenticated]
+    sparse_select_related = {
+        'created_by': ['created_by'],
+        'frozen_by': ['frozen_by'],
+        'can_edit': ['created_by'],
+        'can_delete': ['created_by'],
+    }
+    sparse_annotations = {
+        'field_count': lambda: {
+            'field_total': Count('fields', filter=Q(fields__is_deleted=False), distinct=True)
+        },
+        'last_used': lambda: {
+            'last_used_at': Max('checklists__created_at', filter=Q(checklists__is_deleted=False))
+        },
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'is_active', 'is_frozen', 'created_by']
     search_fields = ['name', 'description', 'category']
@@ -52,7 +76,7 @@ class ChecklistTemplateViewSet(viewsets.ModelViewSet):
                 Q(created_by=self.request.user) | Q(is_active=True)
             )
         
-        return queryset.select_related('created_by', 'frozen_by').prefetch_related('fields')
+        return queryset
     
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
@@ -124,6 +148,7 @@ class ChecklistTemplateViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def duplicate(self, request, pk=None):
         """Create a copy of an existing template"""
         original_template = self.get_object()
@@ -136,44 +161,52 @@ class ChecklistTemplateViewSet(viewsets.ModelViewSet):
             created_by=request.user
         )
         
-        # Copy fields
-        for field in original_template.fields.all():
-            ChecklistField.objects.create(
-                template=new_template,
-                label=field.label,
-                field_type=field.field_type,
-                help_text=field.help_text,
-                placeholder=field.placeholder,
-                is_required=field.is_required,
-                is_readonly=field.is_readonly,
-                default_value=field.default_value,
-                options=field.options,
-                min_length=field.min_length,
-                max_length=field.max_length,
-                min_value=field.min_value,
-                max_value=field.max_value,
-                order=field.order,
-                css_class=field.css_class,
-                conditional_logic=field.conditional_logic
-            )
+        # Copy fields, rules are pointed at the copies
+        copy_fields(original_template, new_template)
         
         return Response({
             'message': _('Template duplicated successfully'),
             'template': ChecklistTemplateDetailSerializer(new_template, context={'request': request}).data
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['get'])
+    def snapshot(self, request, pk=None):
+        """Get the current snapshot of the template, or an earlier one with ?version="""
+        template = self.get_object()
+        
+        version = request.query_params.get('version')
+        if version:
+            if not version.isdigit():
+                return Response({'error': _('version must be a number')}, status=status.HTTP_400_BAD_REQUEST)
+            row = template.snapshots.filter(version=int(version)).values_list('pk', 'version', 'content_hash').first()
+            if row is None:
+                raise Http404
+            head = SnapshotHead(*row)
+        else:
+            head = current_snapshot(template)
+        
+        # Snapshots never change, the hash is a strong validator
+        etag = f'"{head.content_hash}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({'version': head.version, 'hash': head.content_hash, 'data': get_snapshot_data(head.id)})
+        response['ETag'] = etag
+        return response
+    
     @action(detail=True, methods=['get'])
     def usage_stats(self, request, pk=None):
         """Get usage statistics for a template"""
         template = self.get_object()
         
         checklists = template.checklists.filter(is_deleted=False)
+        rollup = get_rollup('template', template.pk)
         
         stats = {
             'total_usage': template.usage_count,
-            'active_checklists': checklists.count(),
-            'completed_checklists': checklists.filter(status='completed').count(),
-            'in_progress_checklists': checklists.filter(status='in_progress').count(),
+            'active_checklists': rollup['active_checklists'],
+            'completed_checklists': rollup['completed_checklists'],
+            'in_progress_checklists': rollup['in_progress_checklists'],
             'average_completion_time': None,
             'completion_rate': 0,
             'recent_usage': checklists.order_by('-created_at')[:5].values(
@@ -181,19 +214,13 @@ class ChecklistTemplateViewSet(viewsets.ModelViewSet):
             )
         }
         
-        completed = checklists.filter(status='completed', completed_at__isnull=False)
-        if completed.exists():
-            # Calculate average completion time
-            avg_time = completed.aggregate(
-                avg_duration=Avg(F('completed_at') - F('created_at'))
-            )['avg_duration']
-            if avg_time:
-                stats['average_completion_time'] = avg_time.total_seconds() / 3600  # hours
+        if rollup['timed_completions']:
+            if rollup['average_completion_seconds']:
+                stats['average_completion_time'] = rollup['average_completion_seconds'] / 3600  # hours
                 
             # Calculate completion rate
-            total_started = checklists.exclude(status='draft').count()
-            if total_started > 0:
-                stats['completion_rate'] = (completed.count() / total_started) * 100
+            if rollup['started_checklists'] > 0:
+                stats['completion_rate'] = (rollup['timed_completions'] / rollup['started_checklists']) * 100
         
         return Response(stats)
     
@@ -253,12 +280,31 @@ class ChecklistTemplateViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ChecklistViewSet(viewsets.ModelViewSet):
+class ChecklistViewSet(ConditionalRequestMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for checklists"""
     queryset = Checklist.objects.filter(is_deleted=False)
     permission_classes = [permissions.IsAuthenticated]
+    # Responses bump the checklist through update_progress()
+    conditional_fields = ('updated_at', 'template__updated_at')
+    sparse_select_related = {
+        'template': ['template__created_by', 'template__frozen_by'],
+        'template_name': ['template'],
+        'template_category': ['template'],
+        'assigned_to': ['assigned_to'],
+        'created_by': ['created_by'],
+    }
+    sparse_prefetch_related = {
+        'assigned_users': ['assigned_users'],
+        'responses': ['responses__field', 'responses__responded_by'],
+        'response_count': ['responses'],
+    }
+    sparse_annotations = {
+        'last_activity': lambda: {
+            'last_response_at': Max('responses__updated_at', filter=Q(responses__is_deleted=False))
+        },
+    }
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'priority', 'assigned_to', 'created_by', 'template']
+    filterset_fields = ['status', 'priority', 'assigned_to', 'created_by', 'template', 'is_overdue']
     search_fields = ['name', 'description']
     ordering_fields = ['name', 'created_at', 'updated_at', 'due_date', 'completion_percentage']
     ordering = ['-created_at']
@@ -276,16 +322,7 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         
         # Filter by user access
-        if not self.request.user.is_staff:
-            queryset = queryset.filter(
-                Q(assigned_to=self.request.user) | 
-                Q(created_by=self.request.user) |
-                Q(template__created_by=self.request.user)
-            )
-        
-        return queryset.select_related(
-            'template', 'assigned_to', 'created_by'
-        ).prefetch_related('responses', 'responses__field')
+        return queryset.filter(checklist_access(self.request.user))
     
     def perform_create(self, serializer):
         checklist = serializer.save(created_by=self.request.user)
@@ -307,24 +344,23 @@ class ChecklistViewSet(viewsets.ModelViewSet):
             responses_data = request.data.get('responses', [])
             created_responses = []
             
-            for response_data in responses_data:
-                response_data['checklist'] = checklist.id
-                serializer = ChecklistResponseSerializer(
-                    data=response_data,
-                    context={'request': request, 'checklist': checklist}
-                )
-                
-                if serializer.is_valid():
-                    response = serializer.save(
-                        checklist=checklist,
-                        responded_by=request.user
+            # Progress is updated once for all responses
+            with checklist.deferred_progress():
+                for response_data in responses_data:
+                    response_data['checklist'] = checklist.id
+                    serializer = ChecklistResponseSerializer(
+                        data=response_data,
+                        context={'request': request, 'checklist': checklist}
                     )
-                    created_responses.append(response)
-                else:
-                    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Update checklist progress
-            checklist.update_progress()
+                    
+                    if serializer.is_valid():
+                        response = serializer.save(
+                            checklist=checklist,
+                            responded_by=request.user
+                        )
+                        created_responses.append(response)
+                    else:
+                        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
                 'message': _('Responses saved successfully'),
@@ -352,32 +388,29 @@ class ChecklistViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get or create response
-        response, created = ChecklistResponse.objects.get_or_create(
-            checklist=checklist,
-            field_id=field_id,
-            defaults={
-                'responded_by': request.user,
-                'value': request.data.get('value', {}),
-                'is_completed': request.data.get('is_completed', False),
-                'comments': request.data.get('comments', ''),
-                'internal_notes': request.data.get('internal_notes', '')
-            }
-        )
-        
-        if not created:
-            # Update existing response
-            response.value = request.data.get('value', response.value)
-            response.is_completed = request.data.get('is_completed', response.is_completed)
-            response.comments = request.data.get('comments', response.comments)
-            response.internal_notes = request.data.get('internal_notes', response.internal_notes)
-            response.responded_by = request.user
-            if request.data.get('is_completed'):
-                response.responded_at = timezone.now()
-            response.save()
-        
-        # Update checklist progress
-        checklist.update_progress()
+        # Get or create response, progress is updated once when the block exits
+        with checklist.deferred_progress():
+            response, created = checklist.responses.get_or_create(
+                field_id=field_id,
+                defaults={
+                    'responded_by': request.user,
+                    'value': request.data.get('value', {}),
+                    'is_completed': request.data.get('is_completed', False),
+                    'comments': request.data.get('comments', ''),
+                    'internal_notes': request.data.get('internal_notes', '')
+                }
+            )
+            
+            if not created:
+                # Update existing response
+                response.value = request.data.get('value', response.value)
+                response.is_completed = request.data.get('is_completed', response.is_completed)
+                response.comments = request.data.get('comments', response.comments)
+                response.internal_notes = request.data.get('internal_notes', response.internal_notes)
+                response.responded_by = request.user
+                if request.data.get('is_completed'):
+                    response.responded_at = timezone.now()
+                response.save()
         
         return Response({
             'message': _('Response submitted successfully'),
@@ -393,37 +426,35 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         
         updated_responses = []
         
-        for response_data in responses_data:
-            field_id = response_data.get('field_id')
-            if not field_id:
-                continue
+        # Progress is updated once for all responses
+        with checklist.deferred_progress():
+            for response_data in responses_data:
+                field_id = response_data.get('field_id')
+                if not field_id:
+                    continue
+                    
+                response, created = checklist.responses.get_or_create(
+                    field_id=field_id,
+                    defaults={
+                        'responded_by': request.user,
+                        'value': response_data.get('value', {}),
+                        'is_completed': response_data.get('is_completed', False),
+                        'comments': response_data.get('comments', ''),
+                        'internal_notes': response_data.get('internal_notes', '')
+                    }
+                )
                 
-            response, created = ChecklistResponse.objects.get_or_create(
-                checklist=checklist,
-                field_id=field_id,
-                defaults={
-                    'responded_by': request.user,
-                    'value': response_data.get('value', {}),
-                    'is_completed': response_data.get('is_completed', False),
-                    'comments': response_data.get('comments', ''),
-                    'internal_notes': response_data.get('internal_notes', '')
-                }
-            )
-            
-            if not created:
-                response.value = response_data.get('value', response.value)
-                response.is_completed = response_data.get('is_completed', response.is_completed)
-                response.comments = response_data.get('comments', response.comments)
-                response.internal_notes = response_data.get('internal_notes', response.internal_notes)
-                response.responded_by = request.user
-                if response_data.get('is_completed'):
-                    response.responded_at = timezone.now()
-                response.save()
-            
-            updated_responses.append(response)
-        
-        # Update checklist progress
-        checklist.update_progress()
+                if not created:
+                    response.value = response_data.get('value', response.value)
+                    response.is_completed = response_data.get('is_completed', response.is_completed)
+                    response.comments = response_data.get('comments', response.comments)
+                    response.internal_notes = response_data.get('internal_notes', response.internal_notes)
+                    response.responded_by = request.user
+                    if response_data.get('is_completed'):
+                        response.responded_at = timezone.now()
+                    response.save()
+                
+                updated_responses.append(response)
         
         return Response({
             'message': _('Responses updated successfully'),
@@ -464,19 +495,25 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         """Get detailed progress information"""
         checklist = self.get_object()
         
-        responses = checklist.responses.all()
-        total_fields = checklist.template.fields.filter(field_type__ne='section').count()
-        completed_responses = responses.filter(is_completed=True).count()
+        # Responses are loaded once, the counts and the per field rows are read from them
+        responses = list(checklist.responses.select_related('responded_by'))
+        responses_by_field = {response.field_id: response for response in responses}
+        fields = list(checklist.template.fields.all())
+        total_fields = sum(field.field_type != 'section' for field in fields)
+        completed_responses = sum(response.is_completed for response in responses)
         
-        # Field-by-field progress
+        # Field-by-field progress, visibility and required-ness follow the conditional logic
+        field_states = get_field_states(checklist)
         field_progress = []
-        for field in checklist.template.fields.all():
-            response = responses.filter(field=field).first()
+        for field in fields:
+            response = responses_by_field.get(field.id)
+            is_visible, is_required = field_states.get(field.id, (True, field.is_required))
             field_progress.append({
                 'field_id': field.id,
                 'field_label': field.label,
                 'field_type': field.field_type,
-                'is_required': field.is_required,
+                'is_visible': is_visible,
+                'is_required': is_required,
                 'is_completed': response.is_completed if response else False,
                 'has_response': bool(response),
                 'responded_at': response.responded_at if response else None,
@@ -489,19 +526,27 @@ class ChecklistViewSet(viewsets.ModelViewSet):
             'completion_percentage': checklist.get_progress_percentage(),
             'status': checklist.status,
             'field_progress': field_progress,
-            'last_activity': responses.order_by('-updated_at').first().updated_at if responses.exists() else None
+            'last_activity': max((response.updated_at for response in responses), default=None)
         }
         
         return Response(progress_data)
     
+    @action(detail=True, methods=['get'])
+    def validate_responses(self, request, pk=None):
+        """Validate every response of the checklist and report missing required fields"""
+        checklist = self.get_object()
+        return Response(validate_checklist(checklist))
+    
     @action(detail=True, methods=['get', 'post'])
     def comments(self, request, pk=None):
         """Get or create comments for checklist"""
         checklist = self.get_object()
         
         if request.method == 'GET':
-            comments = checklist.comments.filter(parent__isnull=True).order_by('-created_at')
-            serializer = ChecklistCommentSerializer(comments, many=True)
+            comments = checklist.comments.filter(comment_access(request.user), parent__isnull=True).order_by(
+                '-created_at'
+            )
+            serializer = ChecklistCommentSerializer(comments, many=True, context={'request': request})
             return Response(serializer.data)
         
         elif request.method == 'POST':
@@ -561,6 +606,33 @@ class ChecklistViewSet(viewsets.ModelViewSet):
             'checklist': ChecklistDetailSerializer(new_checklist, context={'request': request}).data
         }, status=status.HTTP_201_CREATED)
     
+    @action(detail=False, methods=['get', 'post'])
+    def sync(self, request):
+        """
+        Delta sync for offline clients.
+
+        GET returns the rows changed since ``?token=`` (everything when omitted)
+        together with the token for the next pull. POST applies a batch of
+        offline response edits and reports per-field conflicts.
+        """
+        if request.method == 'GET':
+            try:
+                limit = int(request.query_params.get('limit', settings.CHECKLIST_SYNC_PAGE_SIZE))
+            except ValueError:
+                return Response({'error': _('limit must be an integer')}, status=status.HTTP_400_BAD_REQUEST)
+            limit = max(1, min(limit, settings.CHECKLIST_SYNC_PAGE_SIZE))
+            try:
+                data = pull_changes(
+                    request.user, request.query_params.get('token'), limit, context={'request': request}
+                )
+            except SyncTokenError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(data)
+
+        serializer = ChecklistSyncEditSerializer(data=request.data.get('responses', []), many=True)
+        serializer.is_valid(raise_exception=True)
+        return Response(apply_edits(request.user, serializer.validated_data, context={'request': request}))
+
     @action(detail=False, methods=['get'])
     def my_checklists(self, request):
         """Get current user's checklists"""
@@ -577,15 +649,13 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         user_checklists = self.get_queryset().filter(
             Q(assigned_to=request.user) | Q(created_by=request.user)
         ).distinct()
+        rollup = get_rollup('user', request.user.pk)
         
         stats = {
-            'total_checklists': user_checklists.count(),
-            'completed': user_checklists.filter(status='completed').count(),
-            'in_progress': user_checklists.filter(status='in_progress').count(),
-            'overdue': user_checklists.filter(
-                due_date__lt=timezone.now(),
-                status__in=['draft', 'in_progress']
-            ).count(),
+            'total_checklists': rollup['total_checklists'],
+            'completed': rollup['completed'],
+            'in_progress': rollup['in_progress'],
+            'overdue': rollup['overdue'],
             'completion_rate': 0,
             'average_completion_time': None,
             'recent_activity': user_checklists.order_by('-updated_at')[:5].values(
@@ -596,14 +666,8 @@ class ChecklistViewSet(viewsets.ModelViewSet):
         if stats['total_checklists'] > 0:
             stats['completion_rate'] = (stats['completed'] / stats['total_checklists']) * 100
         
-        # Calculate average completion time
-        completed = user_checklists.filter(status='completed', completed_at__isnull=False)
-        if completed.exists():
-            avg_time = completed.aggregate(
-                avg_duration=Avg(F('completed_at') - F('created_at'))
-            )['avg_duration']
-            if avg_time:
-                stats['average_completion_time'] = avg_time.total_seconds() / 3600  # hours
+        if rollup['average_completion_seconds']:
+            stats['average_completion_time'] = rollup['average_completion_seconds'] / 3600  # hours
         
         return Response(stats)
     
@@ -675,23 +739,17 @@ class ChecklistFieldViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        updated_fields = []
-        
+        orders = {}
         for item in field_orders:
             field_id = item.get('field_id')
             order = item.get('order')
-            
-            if field_id and order is not None:
-                try:
-                    field = ChecklistField.objects.get(
-                        id=field_id,
-                        template__created_by=request.user
-                    )
-                    field.order = order
-                    field.save(update_fields=['order'])
-                    updated_fields.append(field)
-                except ChecklistField.DoesNotExist:
-                    continue
+            if field_id and order is not None and str(field_id).isdigit():
+                orders[int(field_id)] = order
+        
+        # One query to load and one to update, unknown or foreign fields are skipped
+        fields = ChecklistField.objects.filter(id__in=orders, template__created_by=request.user)
+        position = {field_id: index for index, field_id in enumerate(orders)}
+        updated_fields = sorted(reorder_fields(fields, orders), key=lambda field: position[field.pk])
         
         return Response({
             'message': _('Fields reordered successfully'),
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ["subject", "to_email", "status", "digest", "attempts", "next_attempt_at", "sent_at"]
+    list_filter = ["status", "digest"]
+    search_fields = ["to_email", "subject"]
+    readonly_fields = ["dedupe_key", "claimed_at", "sent_at", "created_at"]
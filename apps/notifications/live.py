@@ -0,0 +1,41 @@
+"""
+Delivery of new notifications to open server-sent event streams.
+
+Every stream joins the ``notifications.<user id>`` channel layer group, see
+``views.notification_stream``. Notifications are published once the creating
+transaction commits.
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def notification_group(user_id):
+    return f"notifications.{user_id}"
+
+
+def publish_notifications(notifications):
+    from .serializers import NotificationSerializer
+
+    messages = [
+        (notification.user_id, {"type": "notification", "notification": dict(NotificationSerializer(notification).data)})
+        for notification in notifications
+    ]
+    transaction.on_commit(lambda: send_messages(messages))
+
+
+def send_messages(messages):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        for user_id, message in messages:
+            async_to_sync(channel_layer.group_send)(notification_group(user_id), message)
+    except Exception:
+        # Streams are best effort, clients still see the notification on their next fetch
+        logger.exception("Failed to publish notifications")
@@ -3,6 +3,34 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 
 
+class NotificationManager(models.Manager):
+    def notify_users(self, users, title, message, type="info", metadata=None, batch_size=1000):
+        """
+        Send the same notification to many users with ``bulk_create``.
+
+        ``users`` may hold users or user ids. Bulk inserts skip ``post_save``,
+        so counters and open streams are updated here.
+        """
+        user_ids = dict.fromkeys(getattr(user, "pk", user) for user in users)
+        return self.bulk_notify(
+            [
+                self.model(user_id=user_id, title=title, message=message, type=type, metadata=metadata or {})
+                for user_id in user_ids
+            ],
+            batch_size=batch_size,
+        )
+
+    def bulk_notify(self, notifications, batch_size=1000):
+        """``bulk_create`` unsaved notifications, updating counters and open streams"""
+        from .live import publish_notifications
+        from .unread import forget_unread_counts
+
+        notifications = self.bulk_create(notifications, batch_size=batch_size)
+        forget_unread_counts({notification.user_id for notification in notifications})
+        publish_notifications(notifications)
+        return notifications
+
+
 class Notification(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notifications"
@@ -15,6 +43,8 @@ class Notification(models.Model):
     metadata = models.JSONField(default=dict, blank=True)
     type = models.CharField(max_length=50, default="info")
 
+    objects = NotificationManager()
+
     class Meta:
         indexes = [
             models.Index(fields=["user", "read"]),
@@ -26,3 +56,57 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"{self.title} ({'read' if self.read else 'unread'})"
+
+
+class OutboundEmail(models.Model):
+    """
+    Email waiting in the outbox, see ``apps.notifications.outbox``.
+
+    Rows are written instead of talking SMTP in the request and sent in
+    batches by the ``drain_email_outbox`` task.
+    """
+
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_SKIPPED = "skipped"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _("Pending")),
+        (STATUS_SENDING, _("Sending")),
+        (STATUS_SENT, _("Sent")),
+        (STATUS_FAILED, _("Failed")),
+        (STATUS_SKIPPED, _("Skipped")),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="outbound_emails",
+    )
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    # Hash of recipient, subject and body used to drop repeats
+    dedupe_key = models.CharField(max_length=64, db_index=True)
+    # Held for the user's next digest instead of being sent on its own
+    digest = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
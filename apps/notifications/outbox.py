@@ -0,0 +1,169 @@
+"""
+Email outbox.
+
+``queue_email`` stores a message and returns, ``drain_outbox`` (run by the
+``drain_email_outbox`` beat task) sends whatever is due over a single SMTP
+connection. Identical messages queued within ``EMAIL_OUTBOX_DEDUPE_SECONDS``
+are dropped, failed messages are retried with exponential backoff and
+digestible messages for users with ``email_digest`` are merged into one
+email per user every ``EMAIL_DIGEST_SECONDS``.
+"""
+
+import hashlib
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def get_dedupe_key(to_email, subject, body):
+    return hashlib.sha256("\0".join([to_email.lower(), subject, body]).encode()).hexdigest()
+
+
+def queue_email(to_email, subject, body, user=None, html_body="", from_email=None, digestible=False):
+    """
+    Put a message in the outbox, returns the queued row or ``None`` when an
+    identical message was queued within the dedupe window.
+    """
+    now = timezone.now()
+    dedupe_key = get_dedupe_key(to_email, subject, body)
+    window = now - timedelta(seconds=settings.EMAIL_OUTBOX_DEDUPE_SECONDS)
+    if OutboundEmail.objects.filter(dedupe_key=dedupe_key, created_at__gte=window).exclude(
+        status=OutboundEmail.STATUS_FAILED
+    ).exists():
+        return None
+
+    digest = digestible and user is not None and user.email_digest
+    return OutboundEmail.objects.create(
+        user=user,
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        dedupe_key=dedupe_key,
+        digest=digest,
+        next_attempt_at=now + timedelta(seconds=settings.EMAIL_DIGEST_SECONDS) if digest else now,
+    )
+
+
+def claim_due(now, batch_size):
+    """Mark up to ``batch_size`` due messages as sending and return them"""
+    stale = now - timedelta(seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT)
+    due = Q(status=OutboundEmail.STATUS_PENDING, next_attempt_at__lte=now) | Q(
+        # Claimed by a worker that died before recording the outcome
+        status=OutboundEmail.STATUS_SENDING,
+        claimed_at__lt=stale,
+    )
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True).filter(due).order_by("next_attempt_at", "pk")[
+                :batch_size
+            ]
+        )
+        # Any due digest entry releases everything pending for that user
+        digest_users = {email.user_id for email in emails if email.digest}
+        if digest_users:
+            claimed = {email.pk for email in emails}
+            emails += list(
+                OutboundEmail.objects.select_for_update(skip_locked=True)
+                .filter(user_id__in=digest_users, digest=True, status=OutboundEmail.STATUS_PENDING)
+                .exclude(pk__in=claimed)
+            )
+        OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status=OutboundEmail.STATUS_SENDING, claimed_at=now
+        )
+    return emails
+
+
+def build_messages(emails, connection):
+    """Pairs of ``(rows, message)``, digest rows are merged per user"""
+    messages = []
+    singles = [email for email in emails if not email.digest]
+    digests = sorted((email for email in emails if email.digest), key=lambda email: (email.user_id, email.pk))
+    for email in singles:
+        message = EmailMultiAlternatives(
+            email.subject, email.body, email.from_email, [email.to_email], connection=connection
+        )
+        if email.html_body:
+            message.attach_alternative(email.html_body, "text/html")
+        messages.append(([email], message))
+    for _user_id, group in groupby(digests, key=lambda email: email.user_id):
+        group = list(group)
+        if len(group) == 1:
+            body = group[0].body
+            subject = group[0].subject
+        else:
+            subject = f"{len(group)} new notifications"
+            body = "\n\n".join(f"{email.subject}\n{'-' * len(email.subject)}\n{email.body}" for email in group)
+        messages.append(
+            (group, EmailMultiAlternatives(subject, body, group[0].from_email, [group[-1].to_email], connection=connection))
+        )
+    return messages
+
+
+def record_failure(emails, now, error):
+    for email in emails:
+        email.attempts += 1
+        email.last_error = str(error)[:1000]
+        if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            email.status = OutboundEmail.STATUS_FAILED
+        else:
+            email.status = OutboundEmail.STATUS_PENDING
+            email.next_attempt_at = now + timedelta(
+                seconds=settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (email.attempts - 1)
+            )
+
+
+def drain_outbox(batch_size=None):
+    """Send due messages over one connection, returns ``{"sent": n, "failed": n}``"""
+    now = timezone.now()
+    emails = claim_due(now, batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not emails:
+        return {"sent": 0, "failed": 0}
+
+    connection = get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        connection.open()
+    except Exception as exc:
+        logger.error("Could not open the email connection: %s", exc)
+        record_failure(emails, now, exc)
+        failed = len(emails)
+    else:
+        try:
+            for rows, message in build_messages(emails, connection):
+                try:
+                    message.send()
+                except Exception as exc:
+                    logger.warning("Failed to send outbox email to %s: %s", rows[0].to_email, exc)
+                    record_failure(rows, now, exc)
+                    failed += len(rows)
+                    # The server may have dropped us, start the rest on a fresh connection
+                    connection.close()
+                    try:
+                        connection.open()
+                    except Exception:
+                        pass
+                else:
+                    for email in rows:
+                        email.status = OutboundEmail.STATUS_SENT
+                        email.sent_at = timezone.now()
+                        email.attempts += 1
+                    sent += len(rows)
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ["status", "attempts", "next_attempt_at", "sent_at", "last_error"], batch_size=500
+    )
+    return {"sent": sent, "failed": failed}
@@ -6,3 +6,21 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = "__all__"
+
+
+class NotificationBulkCreateSerializer(serializers.Serializer):
+    user_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=10000)
+    title = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+    type = serializers.CharField(max_length=50, default="info")
+    metadata = serializers.JSONField(default=dict)
+
+    def validate_user_ids(self, value):
+        from django.contrib.auth import get_user_model
+
+        user_ids = set(value)
+        found = set(get_user_model().objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        missing = sorted(user_ids - found)
+        if missing:
+            raise serializers.ValidationError(f"Unknown users: {missing[:20]}")
+        return list(dict.fromkeys(value))
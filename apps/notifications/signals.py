@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .live import publish_notifications
+from .models import Notification
+from .unread import adjust_unread_count
+
+
+@receiver(post_save, sender=Notification, dispatch_uid="notifications.created")
+def notification_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if not instance.read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, 1))
+    publish_notifications([instance])
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid="notifications.deleted")
+def notification_deleted(sender, instance, **kwargs):
+    if not instance.read:
+        transaction.on_commit(lambda: adjust_unread_count(instance.user_id, -1))
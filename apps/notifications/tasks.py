@@ -1,24 +1,43 @@
-from datetime import timezone, timedelta
+from datetime import timedelta
 from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
 from .models import Notification
+from .unread import forget_unread_counts
 
 
 @shared_task
 def mark_all_notifications_read(user_id, batch_size=5000):
     qs = Notification.objects.filter(user_id=user_id, read=False)
-    while qs.exists():
-        batch = qs[:batch_size]
-        batch.update(read=True, read_at=timezone.now())
+    while True:
+        # Sliced querysets cannot be updated, go through the primary keys
+        batch = list(qs.values_list("pk", flat=True)[:batch_size])
+        if not batch:
+            break
+        Notification.objects.filter(pk__in=batch).update(read=True, read_at=timezone.now())
+    forget_unread_counts([user_id])
 
 
 @shared_task
 def delete_old_notifications(batch_size=2500):
     one_year_ago = timezone.now() - timedelta(days=365)
     while True:
-        old_qs = Notification.objects.filter(created_at__lt=one_year_ago, read=True)[
-            :batch_size
-        ]
-        count = old_qs.count()
-        if not count:
+        old_ids = list(
+            Notification.objects.filter(created_at__lt=one_year_ago, read=True).values_list("pk", flat=True)[
+                :batch_size
+            ]
+        )
+        if not old_ids:
+            break
+        Notification.objects.filter(pk__in=old_ids).delete()
+
+
+@shared_task(ignore_result=True)
+def drain_email_outbox():
+    from .outbox import drain_outbox
+
+    # Keep draining while full batches come back, the next beat picks up the rest
+    for _ in range(10):
+        result = drain_outbox()
+        if result["sent"] + result["failed"] < settings.EMAIL_OUTBOX_BATCH_SIZE:
             break
-        old_qs.delete()
@@ -1,3 +1,205 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from .live import notification_group
+from .models import Notification, OutboundEmail
+from .outbox import drain_outbox, queue_email
+from .serializers import NotificationSerializer
+from .unread import get_unread_count, unread_key
+
+User = get_user_model()
+
+
+class UnreadCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def notify(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Notification.objects.create(user=self.user, title='Hello', message='World', **kwargs)
+
+    def test_counter_rebuilt_on_miss_and_adjusted(self):
+        self.notify()
+        self.notify(read=True)
+        self.assertIsNone(cache.get(unread_key(self.user.pk)))
+        self.assertEqual(get_unread_count(self.user.pk), 1)
+
+        notification = self.notify()
+        self.assertEqual(cache.get(unread_key(self.user.pk)), 2)
+
+        response = self.client.post(reverse('notification-mark-read', args=[notification.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Marking an already read notification does not move the counter again
+        self.client.post(reverse('notification-mark-read', args=[notification.pk]))
+        self.assertEqual(cache.get(unread_key(self.user.pk)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.filter(read=False).first().delete()
+        self.assertEqual(cache.get(unread_key(self.user.pk)), 0)
+
+    def test_rebuild_racing_an_increment_is_not_kept(self):
+        """Test that a count taken before an unseen increment is not cached"""
+        self.notify()
+        stale_key = unread_key(self.user.pk)
+        # The increment lands while a rebuild is counting, before it stores its result
+        self.notify()
+        cache.add(stale_key, 1)
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+
+    def test_unread_count_endpoint(self):
+        self.notify()
+        self.notify()
+        url = reverse('notification-unread-count')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).data, {'unread_count': 2})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, {'unread_count': 2})
+
+        self.client.post(reverse('notification-mark-all-read-task'))
+        self.assertEqual(self.client.get(url).data, {'unread_count': 0})
+
+    def test_bulk_create(self):
+        others = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', password='testpass123')
+            for i in range(5)
+        ]
+        get_unread_count(others[0].pk)
+        url = reverse('notification-bulk-create')
+        payload = {'user_ids': [u.pk for u in others], 'title': 'Audit', 'message': 'Starts today', 'type': 'audit'}
+
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertNumQueries(2):
+            response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(Notification.objects.filter(type='audit').count(), 5)
+        self.assertEqual(get_unread_count(others[0].pk), 1)
+
+        payload['user_ids'] = [others[0].pk, 999999]
+        self.assertEqual(self.client.post(url, payload, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(NOTIFICATION_STREAM_KEEPALIVE_SECONDS=0.2, NOTIFICATION_STREAM_MAX_SECONDS=1)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='streamer', email='streamer@example.com', password='testpass123')
+        self.token = Token.objects.create(user=self.user)
+        self.seen = Notification.objects.create(user=self.user, title='Seen', message='Old')
+        self.missed = Notification.objects.create(user=self.user, title='Missed', message='While offline')
+
+    @staticmethod
+    def parse(chunk):
+        fields = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines() if not line.startswith(':'))
+        return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+    async def test_requires_authentication(self):
+        response = await AsyncClient().get(reverse('notification-stream'))
+        self.assertEqual(response.status_code, 401)
+
+    async def test_stream_replays_and_pushes(self):
+        response = await AsyncClient().get(
+            reverse('notification-stream'), {'token': self.token.key}, headers={'last-event-id': str(self.seen.pk)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+
+        self.assertEqual(self.parse(await anext(chunks)), ('unread', {'unread_count': 2}))
+        event, data = self.parse(await anext(chunks))
+        self.assertEqual((event, data['id']), ('notification', self.missed.pk))
+
+        pushed = await sync_to_async(Notification.objects.create)(user=self.user, title='New', message='Live')
+        await get_channel_layer().group_send(
+            notification_group(self.user.pk),
+            {'type': 'notification', 'notification': dict(NotificationSerializer(pushed).data)},
+        )
+        event, data = self.parse(await anext(chunks))
+        self.assertEqual((event, data['title']), ('notification', 'New'))
+        event, data = self.parse(await anext(chunks))
+        self.assertEqual(event, 'unread')
+
+        # Keepalives until the stream closes itself
+        rest = [chunk async for chunk in chunks]
+        self.assertTrue(rest)
+        self.assertTrue(all(chunk.startswith(b':') for chunk in rest))
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mailer', email='mailer@example.com', password='testpass123')
+
+    def test_drain_sends_batch_and_dedupes(self):
+        for i in range(3):
+            queue_email(f'user{i}@example.com', 'Reminder', f'Task {i} is due')
+        self.assertIsNone(queue_email('user0@example.com', 'Reminder', 'Task 0 is due'))
+        self.assertEqual(OutboundEmail.objects.count(), 3)
+
+        self.assertEqual(drain_outbox(), {'sent': 3, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT).exists())
+        # Nothing left to send
+        self.assertEqual(drain_outbox(), {'sent': 0, 'failed': 0})
+
+    @override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1',
+        EMAIL_PORT=9,
+        EMAIL_TIMEOUT=1,
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+        EMAIL_OUTBOX_RETRY_SECONDS=60,
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_failed_send_retries_with_backoff(self):
+        email = queue_email('user@example.com', 'Reminder', 'Task is due')
+        self.assertEqual(drain_outbox(), {'sent': 0, 'failed': 1})
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        # Not due yet
+        self.assertEqual(drain_outbox(), {'sent': 0, 'failed': 0})
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        drain_outbox()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_FAILED, 2))
+        self.assertTrue(email.last_error)
+
+    @override_settings(EMAIL_DIGEST_SECONDS=3600)
+    def test_digest_users_get_one_email(self):
+        self.user.email_digest = True
+        self.user.save()
+        queue_email(self.user.email, 'Task assigned', 'You were assigned A', user=self.user, digestible=True)
+        queue_email(self.user.email, 'Task assigned', 'You were assigned B', user=self.user, digestible=True)
+        queue_email(self.user.email, 'Login Notification', 'Hello', user=self.user)
+
+        # Only the non digest message is due
+        self.assertEqual(drain_outbox(), {'sent': 1, 'failed': 0})
+        self.assertEqual(mail.outbox[0].subject, 'Login Notification')
+
+        # The oldest entry coming due releases the whole digest
+        first = OutboundEmail.objects.filter(digest=True).earliest('pk')
+        OutboundEmail.objects.filter(pk=first.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain_outbox(), {'sent': 2, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[1].subject, '2 new notifications')
+        self.assertIn('You were assigned A', mail.outbox[1].body)
+        self.assertIn('You were assigned B', mail.outbox[1].body)
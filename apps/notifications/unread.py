@@ -0,0 +1,64 @@
+"""
+Per-user unread notification counters kept in the cache.
+
+Counters are adjusted in place when notifications are created, read or
+deleted and rebuilt from the ``(user, read)`` index on a miss. Bulk changes
+drop the counter instead of adjusting it, the next read rebuilds it.
+
+Each user's counter is keyed under a generation that dropping the counter
+replaces, and so does an adjustment that finds no counter. A rebuild that
+counted before such a change stores its result under the old generation,
+where nothing reads it, instead of caching a stale count until it expires.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def generation_key(user_id):
+    return f"notifications:unread:{user_id}:generation"
+
+
+def get_generation(user_id):
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        # Random, so a generation dropped earlier is never handed out again
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def unread_key(user_id):
+    return f"notifications:unread:{user_id}:{get_generation(user_id)}"
+
+
+def get_unread_count(user_id):
+    key = unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        from .models import Notification
+
+        count = Notification.objects.filter(user_id=user_id, read=False).count()
+        # add() so a counter another request rebuilt or adjusted meanwhile wins
+        cache.add(key, count, settings.NOTIFICATION_UNREAD_CACHE_TIMEOUT)
+    return count
+
+
+def adjust_unread_count(user_id, delta):
+    """Move a cached counter by ``delta``, uncached counters are left to be rebuilt"""
+    key = unread_key(user_id)
+    try:
+        count = cache.incr(key, delta)
+    except ValueError:
+        # A rebuild may be counting right now without this change
+        forget_unread_counts([user_id])
+        return
+    if count < 0:
+        forget_unread_counts([user_id])
+
+
+def forget_unread_counts(user_ids):
+    cache.delete_many([generation_key(user_id) for user_id in user_ids])
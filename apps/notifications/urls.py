@@ -4,6 +4,9 @@ from .views import (
     NotificationDeleteView,
     NotificationMarkReadView,
     NotificationMarkAllReadTaskView,
+    NotificationUnreadCountView,
+    NotificationBulkCreateView,
+    notification_stream,
 )
 
 urlpatterns = [
@@ -21,4 +24,11 @@ urlpatterns = [
         NotificationMarkAllReadTaskView.as_view(),
         name="notification-mark-all-read-task",
     ),
+    path(
+        "unread-count/",
+        NotificationUnreadCountView.as_view(),
+        name="notification-unread-count",
+    ),
+    path("stream/", notification_stream, name="notification-stream"),
+    path("bulk/", NotificationBulkCreateView.as_view(), name="notification-bulk-create"),
 ]
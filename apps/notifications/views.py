@@ -1,10 +1,20 @@
-from datetime import timezone
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from apps.utils.websocket import get_token_user
+from .live import notification_group
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NotificationBulkCreateSerializer, NotificationSerializer
 from .tasks import mark_all_notifications_read
+from .unread import adjust_unread_count, forget_unread_counts, get_unread_count
 
 
 class NotificationListView(generics.ListAPIView):
@@ -14,6 +24,12 @@ class NotificationListView(generics.ListAPIView):
         return Notification.objects.filter(user=self.request.user).order_by("-id")
 
 
+class NotificationUnreadCountView(APIView):
+
+    def get(self, request):
+        return Response({"unread_count": get_unread_count(request.user.pk)})
+
+
 class NotificationDeleteView(generics.DestroyAPIView):
     serializer_class = NotificationSerializer
 
@@ -24,14 +40,16 @@ class NotificationDeleteView(generics.DestroyAPIView):
 class NotificationMarkReadView(APIView):
 
     def post(self, request, pk):
-        notif = Notification.objects.filter(pk=pk, user=request.user).first()
-        if notif:
-            notif.read = True
-            notif.save()
-            return Response({"status": "marked as read"})
-        return Response(
-            {"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND
-        )
+        if not Notification.objects.filter(pk=pk, user=request.user).exists():
+            return Response(
+                {"error": "Notification not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        # Only the request that flips the flag moves the counter
+        if Notification.objects.filter(pk=pk, user=request.user, read=False).update(
+            read=True, read_at=timezone.now()
+        ):
+            adjust_unread_count(request.user.pk, -1)
+        return Response({"status": "marked as read"})
 
 
 class NotificationMarkAllReadTaskView(APIView):
@@ -43,6 +61,7 @@ class NotificationMarkAllReadTaskView(APIView):
             return Response({"status": "no unread notifications", "task": False})
         elif count <= 500:
             unread_qs.update(read=True, read_at=timezone.now())
+            forget_unread_counts([request.user.pk])
             return Response({"status": f"marked {count} as read in API", "task": False})
         else:
             mark_all_notifications_read.delay(request.user.id)
@@ -52,3 +71,94 @@ class NotificationMarkAllReadTaskView(APIView):
                     "task": True,
                 }
             )
+
+
+class NotificationBulkCreateView(APIView):
+    """Fan the same notification out to many users in a few INSERTs"""
+
+    def post(self, request):
+        if not (request.user.is_staff or request.user.has_perm("notifications.can_manage_notifications")):
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        serializer = NotificationBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        notifications = Notification.objects.notify_users(
+            data["user_ids"],
+            data["title"],
+            data["message"],
+            type=data["type"],
+            metadata=data["metadata"],
+        )
+        return Response({"created": len(notifications)}, status=status.HTTP_201_CREATED)
+
+
+async def get_stream_user(request):
+    # EventSource cannot send headers, so the token may also come as ?token=
+    header = request.headers.get("Authorization", "")
+    key = header[6:].strip() if header.startswith("Token ") else request.GET.get("token")
+    if key:
+        return await get_token_user(key)
+    return await request.auser()
+
+
+def format_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def notification_stream(request):
+    """
+    Server-sent events stream of the user's new notifications.
+
+    Sends the unread count on connect and with every notification, replays
+    notifications newer than ``Last-Event-ID`` after a reconnect and closes
+    after ``NOTIFICATION_STREAM_MAX_SECONDS`` so proxies recycle the socket.
+    Needs an ASGI server, under WSGI every open stream ties up a worker.
+    """
+    user = await get_stream_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    response = StreamingHttpResponse(
+        stream_events(user, int(last_event_id) if str(last_event_id or "").isdigit() else None),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def stream_events(user, last_event_id):
+    channel_layer = get_channel_layer()
+    channel = await channel_layer.new_channel()
+    group = notification_group(user.pk)
+    await channel_layer.group_add(group, channel)
+    unread_count = sync_to_async(get_unread_count)
+    try:
+        yield format_event("unread", {"unread_count": await unread_count(user.pk)})
+        if last_event_id is not None:
+            missed = await sync_to_async(list)(
+                Notification.objects.filter(user=user, pk__gt=last_event_id).order_by("pk")[:100]
+            )
+            for notification in missed:
+                yield format_event("notification", NotificationSerializer(notification).data, notification.pk)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.NOTIFICATION_STREAM_MAX_SECONDS
+        while loop.time() < deadline:
+            try:
+                message = await asyncio.wait_for(
+                    channel_layer.receive(channel), timeout=settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            notification = message["notification"]
+            yield format_event("notification", notification, notification["id"])
+            yield format_event("unread", {"unread_count": await unread_count(user.pk)})
+    finally:
+        await channel_layer.group_discard(group, channel)
@@ -12,7 +12,7 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.contrib import admin
 from django.template.response import TemplateResponse
-from apps.user.tasks import send_login_email
+from apps.user.tasks import queue_login_email
 from django.contrib.sessions.models import Session
 
 
@@ -104,12 +104,12 @@ class CustomUserAdmin(ImportExportModelAdmin, UserAdmin):
 
     actions = ["send_login_email_action"]
 
-    @admin.action(description="Send login email (Celery task)")
+    @admin.action(description="Send login email (outbox)")
     def send_login_email_action(self, request, queryset):
         for user in queryset:
-            send_login_email.delay(user.email, user.username)
+            queue_login_email(user.email, user.username, user=user)
         self.message_user(
-            request, f"Triggered login email task for {queryset.count()} user(s)."
+            request, f"Queued login email for {queryset.count()} user(s)."
         )
 
     def impersonate(self, obj):
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0004_user_picture"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="email_digest",
+            field=models.BooleanField(default=False),
+        ),
+    ]
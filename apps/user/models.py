@@ -30,6 +30,9 @@ class User(AbstractUser, SoftDeleteModel):
         help_text="Profile picture for the user (must be type='user').",
     )
 
+    # Collect notification emails into one periodic digest
+    email_digest = models.BooleanField(default=False)
+
     class Meta:
         permissions = [
             ("can_publish", "Can publish items"),
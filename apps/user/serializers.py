@@ -6,6 +6,7 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
 from .models import User
 from apps.files.models import UploadedFile
+from apps.utils.serializers import SparseFieldsetSerializerMixin
 
 
 class UploadedFileSerializer(serializers.ModelSerializer):
@@ -105,7 +106,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'username', 'email', 'first_name', 'last_name',
             'password', 'password_confirm', 'department', 'title', 
-            'language', 'is_active', 'is_staff'
+            'language', 'email_digest', 'is_active', 'is_staff'
         ]
         read_only_fields = ('id', 'username', 'email')
         extra_kwargs = {
@@ -182,7 +183,7 @@ class UserProfilePictureSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class UserSerializer(ModelSerializer):
+class UserSerializer(SparseFieldsetSerializerMixin, ModelSerializer):
     picture_url = serializers.SerializerMethodField()
     full_name = serializers.SerializerMethodField()
 
@@ -201,6 +202,7 @@ class UserSerializer(ModelSerializer):
             "department",
             "title",
             "language",
+            "email_digest",
             "picture_url",
             "date_joined",
             "last_login",
@@ -1,25 +1,26 @@
 from celery import shared_task
-from django.core.mail import send_mail
 from django.core import management
 import logging
 
+from apps.notifications.outbox import queue_email
+
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=20, ignore_result=True)
-def send_login_email(self, user_email, username):
-    logger.info(f"Sending login email to {user_email} for user {username}")
-    try:
-        send_mail(
-            subject="Login Notification",
-            message=f"Hello {username}, you have just logged in.",
-            from_email="no-reply@example.com",
-            recipient_list=[user_email],
-            fail_silently=False,  # Fail loudly so retry works
-        )
-    except Exception as exc:
-        logger.error(f"Error sending email to {user_email}: {exc}")
-        self.retry(exc=exc)
+@shared_task(ignore_result=True)
+def send_login_email(user_email, username):
+    # Kept for tasks already in the queue, new logins call queue_login_email
+    queue_login_email(user_email, username)
+
+
+def queue_login_email(user_email, username, user=None):
+    logger.info(f"Queueing login email to {user_email} for user {username}")
+    queue_email(
+        user_email,
+        "Login Notification",
+        f"Hello {username}, you have just logged in.",
+        user=user,
+    )
 
 
 @shared_task(
@@ -9,8 +9,8 @@ from django.shortcuts import get_object_or_404
 from apps.user.serializers import UserSerializer, UserCreateSerializer, UserUpdateSerializer
 from apps.utils.filters.include_exclude import IncludeExcludeFilterSet
 from apps.utils.pagination import SearchPagination
-from apps.utils.views import ListSearchSerializersView
-from apps.user.tasks import send_login_email
+from apps.utils.views import ListSearchSerializersView, SparseFieldsetMixin
+from apps.user.tasks import queue_login_email
 from .models import User
 from .serializers import UserProfilePictureSerializer
 
@@ -60,8 +60,8 @@ class AuthToken(ObtainAuthToken):
         user = serializer.validated_data["user"]
         token, created = Token.objects.get_or_create(user=user)
 
-        # Send email in background
-        send_login_email.delay(user.email, user.username)
+        # Queued in the outbox, sent in batches by drain_email_outbox
+        queue_login_email(user.email, user.username, user=user)
 
         permissions = {}
         for perm in user.get_all_permissions():
@@ -198,13 +198,14 @@ class DeleteUserView(DestroyAPIView):
         )
 
 
-class ListUsersView(ListSearchSerializersView):
+class ListUsersView(SparseFieldsetMixin, ListSearchSerializersView):
     """
     Returns a list of all users with search, include and exclude.
-    EXAMPLE: /users/?search=John&include=1,2l&exclude=3,4
+    EXAMPLE: /users/?search=John&include=1,2l&exclude=3,4&fields=id,full_name
     """
 
     serializer_class = UserSerializer
+    sparse_select_related = {"picture_url": ["picture"]}
     search_fields = ("first_name", "last_name", "email", "username")
     filterset_class = IncludeExcludeFilterSet
     ordering_fields = ("id", "is_active")
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class UtilsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.utils"
+
+    def ready(self):
+        from apps.utils.instrumentation import install_serializer_timing
+
+        install_serializer_timing()
@@ -0,0 +1,143 @@
+"""
+Lightweight per-request instrumentation.
+
+A ``RequestMetrics`` object is bound to the current context while a request
+(or any block wrapped in ``collect()``) is running.  Every database query is
+counted and timed through ``connection.execute_wrapper`` and the time spent in
+DRF ``serializer.data`` is measured by a patched property.  Everything here is
+plain counters and a list of SQL templates, so it is cheap enough to leave on
+in production; SQL fingerprinting only happens when a request blows its budget.
+"""
+
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+_IN_LIST_RE = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class RequestMetrics:
+    """Counters collected for a single request"""
+
+    __slots__ = (
+        "started",
+        "finished",
+        "query_count",
+        "db_time",
+        "serializer_time",
+        "serializer_depth",
+        "queries",
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.queries = []
+
+    @property
+    def total_time(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def top_queries(self, limit=5):
+        """Most repeated SQL fingerprints as ``[(count, fingerprint), ...]``"""
+        counts = Counter(fingerprint(sql) for sql in self.queries)
+        return [(count, sql) for sql, count in counts.most_common(limit)]
+
+    def server_timing(self):
+        """Value for the ``Server-Timing`` response header"""
+        return (
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.query_count} queries", '
+            f"ser;dur={self.serializer_time * 1000:.1f}, "
+            f"total;dur={self.total_time * 1000:.1f}"
+        )
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook that feeds a ``RequestMetrics`` instance"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics = self.metrics
+            metrics.db_time += time.perf_counter() - start
+            metrics.query_count += 1
+            metrics.queries.append(sql)
+
+
+def fingerprint(sql):
+    """Collapse literals and ``IN (...)`` lists so repeated queries group together"""
+    sql = _IN_LIST_RE.sub("(...)", sql)
+    sql = _LITERAL_RE.sub("?", sql)
+    return _WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def current_metrics():
+    """Return the ``RequestMetrics`` bound to the running request, if any"""
+    return _current.get()
+
+
+@contextmanager
+def collect():
+    """
+    Record queries and serializer time for the wrapped block.
+
+        with collect() as metrics:
+            client.get("/api/audits/audits/")
+        print(metrics.query_count)
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    recorder = QueryRecorder(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield metrics
+    finally:
+        metrics.finished = time.perf_counter()
+        _current.reset(token)
+
+
+def _timed_data(getter):
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializer_depth:
+            return getter(self)
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            metrics.serializer_time += time.perf_counter() - start
+            metrics.serializer_depth -= 1
+
+    data._request_metrics = True
+    return property(data)
+
+
+def install_serializer_timing():
+    """Time the outermost ``serializer.data`` access of each request"""
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        getter = cls.data.fget
+        if not getattr(getter, "_request_metrics", False):
+            cls.data = _timed_data(getter)
@@ -0,0 +1,49 @@
+"""
+Per-route request histograms exported in the Prometheus text format.
+
+Routes are labelled with the URL pattern (not the raw path) so the number of
+series stays bounded.  When running several worker processes set
+``PROMETHEUS_MULTIPROC_DIR`` so that prometheus_client aggregates across them.
+"""
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Histogram, generate_latest
+
+LABELS = ["method", "route"]
+
+REQUEST_DURATION = Histogram(
+    "audit_http_request_duration_seconds",
+    "Total time spent handling a request",
+    LABELS,
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_DURATION = Histogram(
+    "audit_http_request_db_seconds",
+    "Time spent in database queries per request",
+    LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+REQUEST_SERIALIZER_DURATION = Histogram(
+    "audit_http_request_serializer_seconds",
+    "Time spent in DRF serializers per request",
+    LABELS,
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+REQUEST_QUERIES = Histogram(
+    "audit_http_request_queries",
+    "Number of database queries per request",
+    LABELS,
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+def observe(method, route, metrics):
+    """Record a finished request's ``RequestMetrics`` against its route"""
+    REQUEST_DURATION.labels(method, route).observe(metrics.total_time)
+    REQUEST_DB_DURATION.labels(method, route).observe(metrics.db_time)
+    REQUEST_SERIALIZER_DURATION.labels(method, route).observe(metrics.serializer_time)
+    REQUEST_QUERIES.labels(method, route).observe(metrics.query_count)
+
+
+def render_latest():
+    """Return ``(body, content_type)`` for a Prometheus scrape"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
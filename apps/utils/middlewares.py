@@ -0,0 +1,64 @@
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from apps.utils import metrics as route_metrics
+from apps.utils.instrumentation import collect
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Counts queries, DB time, serializer time and total time for each request.
+
+    Adds a ``Server-Timing`` header, feeds the per-route Prometheus histograms
+    and logs the most repeated SQL when a request exceeds its query or time
+    budget.  Should sit near the top of ``MIDDLEWARE`` so the total covers the
+    rest of the stack.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect() as metrics:
+            response = self.get_response(request)
+
+        route = self.get_route(request)
+        route_metrics.observe(request.method, route, metrics)
+
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", True):
+            response["Server-Timing"] = metrics.server_timing()
+
+        query_budget = getattr(settings, "REQUEST_METRICS_QUERY_BUDGET", 50)
+        time_budget = getattr(settings, "REQUEST_METRICS_TIME_BUDGET_MS", 1000) / 1000
+        if metrics.query_count > query_budget or metrics.total_time > time_budget:
+            self.log_over_budget(request, route, metrics)
+
+        return response
+
+    @staticmethod
+    def get_route(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return "unmatched"
+        return match.route or match.view_name or "unknown"
+
+    @staticmethod
+    def log_over_budget(request, route, metrics):
+        top = metrics.top_queries(getattr(settings, "REQUEST_METRICS_TOP_QUERIES", 5))
+        logger.warning(
+            "Request over budget: %s %s (%s) %d queries, db %.1fms, serializer %.1fms, total %.1fms\n%s",
+            request.method,
+            request.path,
+            route,
+            metrics.query_count,
+            metrics.db_time * 1000,
+            metrics.serializer_time * 1000,
+            metrics.total_time * 1000,
+            "\n".join(f"  {count}x {sql}" for count, sql in top),
+        )
@@ -5,10 +5,13 @@ from django.conf import settings
 
 class SoftDeleteQuerySet(models.QuerySet):
     def delete(self, user=None):
+        now = timezone.now()
+        # Bump updated_at so the tombstones are picked up by delta syncs
         return super().update(
             is_deleted=True,
-            deleted_at=timezone.now(),
+            deleted_at=now,
             deleted_by=user.id if user else None,
+            updated_at=now,
         )
 
     def hard_delete(self):
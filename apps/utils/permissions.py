@@ -2,3 +2,13 @@ def is_translator(user):
     return user.is_active and (
         user.is_staff or user.has_perm("rosetta.change_translation")
     )
+
+
+def can_scrape_metrics(request):
+    """Staff users and hosts listed in ``METRICS_ALLOWED_IPS`` may read /metrics"""
+    from django.conf import settings
+
+    user = getattr(request, "user", None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    return request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", [])
@@ -0,0 +1,44 @@
+"""
+JSON renderer backed by orjson, falling back to DRF's stdlib renderer.
+
+Anything orjson cannot encode natively (Decimal, lazy translation strings,
+querysets, ...) goes through DRF's own ``JSONEncoder.default`` and datetimes
+are passed through to it as well, so responses are byte-for-byte what the
+stock ``JSONRenderer`` produces in compact mode.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in replacement for ``rest_framework.renderers.JSONRenderer``"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Indented output (browsable API, ?indent=) keeps the stdlib formatting
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Integers beyond 64 bits and other values orjson rejects
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same escaping as JSONRenderer so the output is safe inside <script>
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,94 @@
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+EXPAND_PARAM = "expand"
+
+
+def parse_field_list(value):
+    """Split a ``?fields=a,b`` style value into a set of names"""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+def get_sparse_params(request):
+    """
+    Return ``(fields, omit, expand)`` requested through the query string.
+
+    ``fields`` is ``None`` when the client did not restrict the field list.
+    Only read requests are shaped, writes always validate the full serializer.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set(), set()
+    params = request.query_params
+    fields = parse_field_list(params.get(FIELDS_PARAM)) or None
+    return fields, parse_field_list(params.get(OMIT_PARAM)), parse_field_list(params.get(EXPAND_PARAM))
+
+
+def select_field_names(names, expandable, fields, omit, expand):
+    """Apply ``fields``/``omit``/``expand`` to the ordered list of ``names``"""
+    selected = [name for name in names if name not in expandable]
+    selected += [name for name in expandable if name in expand]
+    if fields is not None:
+        selected = [name for name in selected if name in fields or name in expand]
+    return [name for name in selected if name not in omit]
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Lets clients shape the response with ``?fields=``, ``?omit=`` and ``?expand=``.
+
+    ``Meta.expandable_fields`` maps extra field names to ``(serializer, kwargs)``
+    pairs that are only rendered when listed in ``?expand=``; the serializer may
+    be given as a dotted path to avoid circular imports. Only the top level
+    serializer reads the query string, nested serializers render as declared.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_sparse_root():
+            return fields
+
+        request = self.context.get("request")
+        requested, omit, expand = get_sparse_params(request)
+        expandable = self.get_expandable_fields()
+        for name in expand:
+            if name in expandable and name not in fields:
+                fields[name] = self.build_expanded_field(*expandable[name])
+        if requested is None and not omit:
+            return fields
+
+        keep = select_field_names(list(fields), expandable, requested, omit, expand)
+        # Never drop every field, an unknown ?fields= value falls back to the id
+        if not keep and "id" in fields:
+            keep = ["id"]
+        return {name: fields[name] for name in keep}
+
+    def is_sparse_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    @classmethod
+    def get_expandable_fields(cls):
+        return getattr(cls.Meta, "expandable_fields", {})
+
+    @staticmethod
+    def build_expanded_field(serializer_class, kwargs=None):
+        if isinstance(serializer_class, str):
+            serializer_class = import_string(serializer_class)
+        return serializer_class(read_only=True, **(kwargs or {}))
+
+    @classmethod
+    def get_rendered_field_names(cls, request):
+        """Names of the fields a response to ``request`` will contain"""
+        names = getattr(cls.Meta, "fields", None)
+        if not isinstance(names, (list, tuple)):
+            names = list(cls(context={"request": None}).fields)
+        requested, omit, expand = get_sparse_params(request)
+        expandable = cls.get_expandable_fields()
+        return set(select_field_names(list(names), expandable, requested, omit, expand))
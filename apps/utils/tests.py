@@ -1,3 +1,217 @@
-from django.test import TestCase
+import json
+import tempfile
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+
+from apps.utils import parsers, renderers
+from apps.utils.instrumentation import collect, fingerprint
+from apps.utils.parsers import FastJSONParser
+from apps.utils.renderers import FastJSONRenderer
+
+User = get_user_model()
+
+
+class InstrumentationTests(TestCase):
+    def test_collect_counts_queries(self):
+        """Test that queries inside collect() are counted and timed"""
+        with collect() as metrics:
+            list(User.objects.all())
+            User.objects.filter(username='nobody').exists()
+        self.assertEqual(metrics.query_count, 2)
+        self.assertGreaterEqual(metrics.db_time, 0)
+        self.assertEqual(len(metrics.queries), 2)
+
+    def test_fingerprint_groups_literals(self):
+        """Test that fingerprints ignore literal values and IN list length"""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'"),
+            fingerprint("SELECT * FROM t WHERE id IN (%s, %s) AND name = 'y'"),
+        )
+
+
+class RequestMetricsMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='metrics', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test that API responses carry a Server-Timing header"""
+        response = self.client.get('/api/users/whoami/')
+        self.assertIn('Server-Timing', response)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(REQUEST_METRICS_QUERY_BUDGET=0)
+    def test_over_budget_request_is_logged(self):
+        """Test that requests over the query budget log their top queries"""
+        with self.assertLogs('apps.utils.middlewares', level='WARNING') as logs:
+            self.client.get('/api/users/whoami/')
+        self.assertIn('Request over budget', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    def test_metrics_endpoint(self):
+        """Test that /metrics exposes per-route histograms"""
+        self.client.get('/api/users/whoami/')
+        response = self.client.get('/metrics', REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'audit_http_request_duration_seconds', response.content)
+        self.assertIn(b'route="api/users/whoami/"', response.content)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_endpoint_forbidden(self):
+        """Test that non-staff clients outside the allow list are rejected"""
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_seed_and_run_benchmarks(self):
+        """Test that seeded data can be benchmarked and results are written as JSON"""
+        # The command's default field count, the budgets must hold at that size
+        call_command(
+            'seed_benchmark_data', users=3, teams=1, templates=1, fields_per_template=25,
+            audits=2, tasks_per_audit=2, notifications_per_user=1, translations=5, stdout=StringIO(),
+        )
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            # Query budgets are asserted, the command fails on an overrun
+            call_command('run_benchmarks', iterations=2, warmup=0, output=output.name, stdout=StringIO())
+            report = json.load(open(output.name))
+        self.assertEqual(report['dataset']['audits'], 2)
+        for name, result in report['results'].items():
+            self.assertEqual(result['status_codes'], {'200': 2}, name)
+            self.assertTrue(result['within_budget'], name)
+            self.assertIn('p95_ms', result)
+            self.assertGreater(result['queries'], 0)
+
+        # Wildcard host patterns are resolved to a name they accept
+        for hosts in (['*'], ['.example.com', 'localhost']):
+            with self.subTest(hosts=hosts), override_settings(ALLOWED_HOSTS=hosts), \
+                    tempfile.NamedTemporaryFile(suffix='.json') as output:
+                call_command(
+                    'run_benchmarks', iterations=1, warmup=0, only=['users.whoami'], output=output.name,
+                    stdout=StringIO(),
+                )
+                report = json.load(open(output.name))
+                self.assertEqual(report['results']['users.whoami']['status_codes'], {'200': 1})
+
+    def test_seeded_state_matches_saves(self):
+        """Test that seeded rows carry the derived state a regular save would give them"""
+        from apps.audits.models import Audit, AuditTask
+        from apps.checklists.models import DashboardRollup
+
+        call_command(
+            'seed_benchmark_data', users=3, teams=1, templates=1, fields_per_template=5,
+            audits=2, tasks_per_audit=3, notifications_per_user=1, translations=5, stdout=StringIO(),
+        )
+        for task in AuditTask.objects.select_related('checklist'):
+            checklist = task.checklist
+            self.assertEqual(checklist.total_fields, checklist.responses.count())
+            self.assertIsNotNone(checklist.template_snapshot_id)
+            expected = AuditTask(checklist=checklist, due_date=task.due_date)
+            expected.apply_checklist_state(checklist)
+            self.assertEqual(task.task_status, expected.task_status)
+            self.assertEqual(task.is_overdue, expected.is_overdue)
+        for audit in Audit.objects.all():
+            self.assertTrue(DashboardRollup.objects.filter(scope='audit', scope_id=audit.pk).exists())
+
+    def test_explain_queries(self):
+        """Test that replayed queries are explained, timed and full scans of large tables flagged"""
+        # The command's default field count, the budgets must hold at that size
+        call_command(
+            'seed_benchmark_data', users=3, teams=1, templates=1, fields_per_template=25,
+            audits=2, tasks_per_audit=2, notifications_per_user=1, translations=5, stdout=StringIO(),
+        )
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'explain_queries', repeat=1, min_rows=0, no_assert=True, output=output.name,
+                only=['checklists.list', 'audit_tasks.board'], stdout=StringIO(), stderr=StringIO(),
+            )
+            report = json.load(open(output.name))
+            # A compared run prints the earlier timings next to the new ones
+            stdout = StringIO()
+            call_command(
+                'explain_queries', repeat=1, no_assert=True, compare=output.name,
+                only=['checklists.list'], stdout=stdout, stderr=StringIO(),
+            )
+        self.assertIn('ms ->', stdout.getvalue())
+        board = report['results']['audit_tasks.board']
+        self.assertTrue(board)
+        self.assertFalse(any('audits_audittask' in query['full_scans'] for query in board))
+        # The unfiltered checklist list reads every checklist
+        self.assertTrue(any(query['full_scans'] for query in report['results']['checklists.list']))
+        with self.assertRaises(CommandError):
+            call_command(
+                'explain_queries', repeat=1, min_rows=0, only=['checklists.list'], stdout=StringIO(), stderr=StringIO()
+            )
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='sparse', email='sparse@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_fields_and_omit_on_user_list(self):
+        """Test that ?fields= and ?omit= shape the user list"""
+        response = self.client.get('/api/users/', {'fields': 'id,username,full_name', 'omit': 'full_name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data[0]), {'id', 'username'})
+
+    def test_unknown_fields_fall_back_to_id(self):
+        """Test that a ?fields= value matching nothing still returns ids"""
+        response = self.client.get('/api/users/', {'fields': 'nope'})
+        self.assertEqual(set(response.data[0]), {'id'})
+
+
+class FastJSONTests(SimpleTestCase):
+    payload = {
+        'completion_percentage': Decimal('66.67'),
+        'created_at': datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=dt_timezone.utc),
+        'due_date': datetime(2025, 1, 2).date(),
+        'label': gettext_lazy('Draft'),
+        'uuid': uuid.UUID(int=1),
+        'status_counts': {1: 2, 'text': 'caf\u00e9 \u2028'},
+        'items': ({'min_value': Decimal('0.50')}, None, True),
+    }
+
+    def test_render_matches_stdlib_renderer(self):
+        """Test that the orjson renderer output is identical to JSONRenderer"""
+        self.assertEqual(FastJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_render_without_orjson(self):
+        """Test that the renderer falls back to the stdlib encoder"""
+        with mock.patch.object(renderers, 'orjson', None):
+            rendered = FastJSONRenderer().render(self.payload)
+        self.assertEqual(json.loads(rendered)['created_at'], '2025-01-02T03:04:05.123456Z')
+
+    def test_render_large_integer(self):
+        """Test that values orjson rejects are still rendered"""
+        self.assertEqual(FastJSONRenderer().render({'n': 2 ** 70}), b'{"n":1180591620717411303424}')
+
+    def test_parse_round_trip(self):
+        """Test that the parser decodes what the renderer produces"""
+        body = FastJSONRenderer().render({'responses': [{'field_id': 1, 'value': 'caf\u00e9'}]})
+        self.assertEqual(
+            FastJSONParser().parse(BytesIO(body)),
+            {'responses': [{'field_id': 1, 'value': 'caf\u00e9'}]},
+        )
+
+    def test_parse_error(self):
+        """Test that invalid JSON raises ParseError with and without orjson"""
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a": NaN}'))
+        with mock.patch.object(parsers, 'orjson', None), self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a":'))
@@ -1,4 +1,17 @@
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.translation import get_language
 from rest_framework.generics import ListAPIView
+from rest_framework.permissions import SAFE_METHODS
+
+from apps.utils.exceptions import PreconditionFailed
+from apps.utils.metrics import render_latest
+from apps.utils.permissions import can_scrape_metrics
 
 # Create your views here.
 
@@ -14,3 +27,172 @@ class ListSearchSerializersView(ListAPIView):
         Returns a queryset of all users, excluding soft-deleted ones.
         """
         return self.serializer_class.Meta.model.objects.filter(is_deleted=False)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint with per-route request histograms"""
+    if not can_scrape_metrics(request):
+        return HttpResponseForbidden()
+    body, content_type = render_latest()
+    return HttpResponse(body, content_type=content_type)
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset counterpart of ``SparseFieldsetSerializerMixin``.
+
+    Joins, prefetches and annotations are declared per serializer field and
+    only applied when that field is going to be rendered, so columns the
+    client left out with ``?fields=``/``?omit=`` cost no queries::
+
+        sparse_select_related = {"created_by_name": ["created_by"]}
+        sparse_prefetch_related = {"assigned_users_details": ["assigned_users"]}
+        sparse_annotations = {"evidence_count": lambda: {"evidence_total": Count("evidence")}}
+    """
+
+    sparse_select_related = {}
+    sparse_prefetch_related = {}
+    sparse_annotations = {}
+    # Custom actions serialize their own payloads and load what they need
+    sparse_fieldset_actions = ("list", "retrieve")
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        action = getattr(self, "action", None)
+        if action is None:
+            # Plain generic views have no action, shape their GET responses only
+            if self.request.method != "GET":
+                return queryset
+        elif action not in self.sparse_fieldset_actions:
+            return queryset
+        return self.prune_queryset(queryset)
+
+    def get_rendered_field_names(self):
+        serializer_class = self.get_serializer_class()
+        if not hasattr(serializer_class, "get_rendered_field_names"):
+            return None
+        return serializer_class.get_rendered_field_names(self.request)
+
+    def prune_queryset(self, queryset):
+        rendered = self.get_rendered_field_names()
+
+        def wanted(mapping):
+            for name, values in mapping.items():
+                if rendered is None or name in rendered:
+                    yield from values
+
+        select = list(dict.fromkeys(wanted(self.sparse_select_related)))
+        if select:
+            queryset = queryset.select_related(*select)
+        prefetch = list(dict.fromkeys(wanted(self.sparse_prefetch_related)))
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        annotations = {}
+        for name, build in self.sparse_annotations.items():
+            if rendered is None or name in rendered:
+                annotations.update(build())
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        return queryset
+
+
+WRITE_PRECONDITION_HEADERS = ("HTTP_IF_MATCH", "HTTP_IF_UNMODIFIED_SINCE", "HTTP_IF_NONE_MATCH")
+
+
+class ConditionalRequestMixin:
+    """
+    ETag/Last-Modified validators for viewsets over models with ``updated_at``.
+
+    ``conditional_fields`` lists the timestamps a representation depends on,
+    including those of related rows rendered inline. Validators come from one
+    aggregate query, so list and retrieve requests answered with 304 load and
+    serialize nothing. The active language is part of the ETag, choice labels
+    are translated. Writes to a detail route honour ``If-Match`` and
+    ``If-Unmodified-Since`` and fail with 412 when the row changed meanwhile.
+    """
+
+    conditional_fields = ("updated_at",)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Keep the row locked from the precondition check until the write commits
+        if self.has_write_preconditions(request):
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    @staticmethod
+    def has_write_preconditions(request):
+        return request.method not in SAFE_METHODS and any(header in request.META for header in WRITE_PRECONDITION_HEADERS)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        # Filter backends only, the sparse fieldset joins and prefetches are not needed here
+        for backend in list(self.filter_backends):
+            queryset = backend().filter_queryset(request, queryset, self)
+        aggregates = queryset.order_by().aggregate(
+            _count=Count("pk", distinct=True),
+            **{f"_{index}": Max(field) for index, field in enumerate(self.conditional_fields)},
+        )
+        values = list(aggregates.values())
+        fmt = request.accepted_renderer.format if getattr(request, "accepted_renderer", None) else ""
+        etag = 'W/"%s"' % self.hash_validators(request.get_full_path(), request.user.pk, fmt, get_language(), *values)
+        return self.conditional_response(etag, self.latest(values[1:]), super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_object_validators()
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(*validators, super().retrieve, request, *args, **kwargs)
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.has_write_preconditions(self.request):
+            validators = self.get_object_validators(lock=True)
+            if validators and get_conditional_response(self.request, *validators) is not None:
+                raise PreconditionFailed()
+        return obj
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Hand the new validators back after a successful write to a detail route
+        if request.method not in SAFE_METHODS and 200 <= response.status_code < 300 and response.status_code != 204:
+            if self.kwargs.get(self.lookup_url_kwarg or self.lookup_field) is not None and not response.has_header("ETag"):
+                validators = self.get_object_validators()
+                if validators:
+                    self.set_validators(response, *validators)
+        return response
+
+    def get_object_validators(self, lock=False):
+        """Strong ``(etag, last_modified)`` of the object addressed by the URL, ``None`` when missing"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).order_by()
+        if lock:
+            queryset = queryset.select_for_update(of=("self",))
+        values = queryset.values_list("pk", *self.conditional_fields).first()
+        if values is None:
+            return None
+        # Labels are rendered in the active language, each one is a different representation
+        return '"%s"' % self.hash_validators(get_language(), *values), self.latest(values[1:])
+
+    def conditional_response(self, etag, last_modified, handler, request, *args, **kwargs):
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def set_validators(response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+
+    @staticmethod
+    def hash_validators(*values):
+        return hashlib.md5(repr(values).encode(), usedforsecurity=False).hexdigest()
+
+    @staticmethod
+    def latest(timestamps):
+        timestamps = [value for value in timestamps if value is not None]
+        return int(max(timestamps).timestamp()) if timestamps else None
@@ -0,0 +1,35 @@
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authtoken.models import Token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    try:
+        token = Token.objects.select_related("user").get(key=key)
+    except Token.DoesNotExist:
+        return AnonymousUser()
+    return token.user if token.user.is_active else AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates websockets with a DRF token passed as ``?token=``.
+
+    Browsers cannot set an Authorization header on websockets, connections
+    without a token keep the session user set by ``AuthMiddlewareStack``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        key = parse_qs(scope.get("query_string", b"").decode()).get("token")
+        if key:
+            scope = dict(scope, user=await get_token_user(key[0]))
+        return await super().__call__(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
@@ -0,0 +1,105 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from apps.checklists.models import Checklist, ChecklistField
+from apps.user.models import User
+from apps.utils import renderers
+from apps.utils.renderers import FastJSONRenderer
+from audit.management.hosts import request_host
+
+from .run_benchmarks import percentile
+
+# name -> API url rendered with ?page_size= to build a realistic payload
+PAYLOADS = {
+    "audits.list": "/api/audits/audits/?page_size={page_size}",
+    "audit_tasks.list": "/api/audits/audit-tasks/?page_size={page_size}",
+    "checklists.list": "/api/checklists/api/checklists/?page_size={page_size}",
+    "checklists.detail": "/api/checklists/api/checklists/{checklist}/",
+    "templates.list": "/api/checklists/api/templates/?page_size={page_size}",
+}
+
+
+class Command(BaseCommand):
+    help = "Compare JSON encode time of the stdlib and orjson renderers on the seeded dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=200)
+        parser.add_argument("--user", default="bench_admin", help="Username to fetch the payloads as")
+        parser.add_argument("--output", help="Write the JSON results to this file")
+
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError("orjson is not installed, FastJSONRenderer falls back to the stdlib encoder")
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' not found, run seed_benchmark_data first")
+
+        payloads = self.get_payloads(user, options["page_size"])
+        results = {}
+        for name, data in payloads.items():
+            results[name] = self.compare(data, options["iterations"])
+            result = results[name]
+            self.stdout.write(
+                f"{name:<22} {result['bytes']:>9} bytes  stdlib p50 {result['stdlib_p50_ms']:>8.3f}ms  "
+                f"orjson p50 {result['orjson_p50_ms']:>8.3f}ms  speedup {result['speedup']:>5.1f}x"
+            )
+
+        payload = json.dumps({"iterations": options["iterations"], "results": results}, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload)
+            self.stdout.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+    def get_payloads(self, user, page_size):
+        checklist = Checklist.objects.order_by("-total_fields").first()
+        if checklist is None:
+            raise CommandError("No checklists found, run seed_benchmark_data first")
+
+        client = APIClient(SERVER_NAME=request_host())
+        client.force_authenticate(user=user)
+        payloads = {}
+        for name, url in PAYLOADS.items():
+            response = client.get(url.format(page_size=page_size, checklist=checklist.pk))
+            if response.status_code != 200:
+                raise CommandError(f"{name} returned {response.status_code}")
+            payloads[name] = response.data
+
+        # Raw values() rows exercise the Decimal/datetime fallback path
+        payloads["fields.values"] = list(
+            ChecklistField.objects.values("id", "label", "field_type", "min_value", "max_value", "created_at")[
+                : page_size * 5
+            ]
+        )
+        return payloads
+
+    def compare(self, data, iterations):
+        stdlib, fast = JSONRenderer(), FastJSONRenderer()
+        expected = stdlib.render(data)
+        if fast.render(data) != expected:
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer")
+
+        timings = {"stdlib": [], "orjson": []}
+        for _ in range(iterations):
+            for key, renderer in (("stdlib", stdlib), ("orjson", fast)):
+                started = time.perf_counter()
+                renderer.render(data)
+                timings[key].append((time.perf_counter() - started) * 1000)
+
+        stdlib_p50 = percentile(timings["stdlib"], 50)
+        orjson_p50 = percentile(timings["orjson"], 50)
+        return {
+            "bytes": len(expected),
+            "stdlib_p50_ms": round(stdlib_p50, 3),
+            "stdlib_mean_ms": round(statistics.fmean(timings["stdlib"]), 3),
+            "orjson_p50_ms": round(orjson_p50, 3),
+            "orjson_mean_ms": round(statistics.fmean(timings["orjson"]), 3),
+            "speedup": round(stdlib_p50 / orjson_p50, 2) if orjson_p50 else None,
+        }
@@ -0,0 +1,211 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.audits.models import Audit
+from apps.checklists.models import Checklist
+from apps.user.models import User
+from apps.utils.instrumentation import fingerprint
+from audit.management.hosts import request_host
+
+# name -> url template, replayed as the benchmark user
+ENDPOINTS = {
+    "audits.list": "/api/audits/audits/",
+    "audits.by_status": "/api/audits/audits/?status=in_progress",
+    "audits.task_summary": "/api/audits/audits/{audit}/task_summary/",
+    "audit_tasks.by_audit": "/api/audits/audit-tasks/?audit={audit}",
+    "audit_tasks.board": "/api/audits/audit-tasks/?assigned_to={user}&status=in_progress",
+    "checklists.list": "/api/checklists/api/checklists/",
+    "checklists.mine": "/api/checklists/api/checklists/?assigned_to={user}&status=in_progress",
+    "checklists.progress": "/api/checklists/api/checklists/{checklist}/progress/",
+    "templates.list": "/api/checklists/api/templates/",
+    "teams.list": "/api/audits/teams/",
+    "notifications.list": "/api/notifications/",
+    "findings.analytics": "/api/audits/finding-analytics/",
+}
+
+
+class StatementRecorder:
+    """``execute_wrapper`` hook keeping the first SELECT of every fingerprint"""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            self.statements.setdefault(fingerprint(sql), (sql, params))
+        return execute(sql, params, many, context)
+
+
+def explain_sqlite(cursor, sql, params):
+    """``(plan lines, scanned tables, temporary sorts)`` from ``EXPLAIN QUERY PLAN``"""
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    lines = [row[-1] for row in cursor.fetchall()]
+    scans = set()
+    for line in lines:
+        words = line.split()
+        # "SCAN table" reads every row, "SCAN table USING INDEX" walks an index instead
+        if words[:1] == ["SCAN"] and len(words) > 1 and "USING" not in words:
+            scans.add(words[1])
+    sorts = sum(1 for line in lines if "TEMP B-TREE" in line)
+    return lines, scans, sorts
+
+
+def explain_postgresql(cursor, sql, params):
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lines, scans, sorts = [], set(), 0
+    stack = [(plan[0]["Plan"], 0)]
+    while stack:
+        node, depth = stack.pop()
+        relation = node.get("Relation Name")
+        lines.append("  " * depth + node["Node Type"] + (f" on {relation}" if relation else ""))
+        if node["Node Type"] == "Seq Scan":
+            scans.add(relation)
+        if node["Node Type"] in ("Sort", "Incremental Sort"):
+            sorts += 1
+        stack.extend((child, depth + 1) for child in reversed(node.get("Plans", [])))
+    return lines, scans, sorts
+
+
+EXPLAIN = {
+    "sqlite": explain_sqlite,
+    "postgresql": explain_postgresql,
+}
+
+
+class Command(BaseCommand):
+    help = "Replay the main API queries, EXPLAIN each one and flag full table scans on large tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", default="bench_admin", help="Username to run the requests as")
+        parser.add_argument("--only", nargs="*", choices=sorted(ENDPOINTS), help="Replay a subset of endpoints")
+        parser.add_argument("--repeat", type=int, default=20, help="Timed executions per query")
+        parser.add_argument(
+            "--min-rows", type=int, default=1000, help="Only flag full scans of tables with at least this many rows"
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file")
+        parser.add_argument("--compare", help="Earlier JSON report to print before/after timings against")
+        parser.add_argument("--no-assert", action="store_true", help="Report full scans without failing")
+
+    def handle(self, *args, **options):
+        explain = EXPLAIN.get(connection.vendor)
+        if explain is None:
+            raise CommandError(f"EXPLAIN is not supported for {connection.vendor}")
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' not found, run seed_benchmark_data first")
+
+        statements = self.replay(user, options["only"] or list(ENDPOINTS))
+        tables = set(connection.introspection.table_names())
+        row_counts = {}
+        results = {}
+        with connection.cursor() as cursor:
+            for name, queries in statements.items():
+                results[name] = []
+                for sql, params in queries:
+                    lines, scans, sorts = explain(cursor, sql, params)
+                    # Plans may name subquery aliases, only real tables are counted
+                    large = sorted(
+                        table for table in scans & tables
+                        if self.row_count(cursor, table, row_counts) >= options["min_rows"]
+                    )
+                    results[name].append(
+                        {
+                            "sql": fingerprint(sql),
+                            "plan": lines,
+                            "full_scans": large,
+                            "temp_sorts": sorts,
+                            "median_ms": self.time_query(cursor, sql, params, options["repeat"]),
+                        }
+                    )
+
+        previous = self.load_previous(options["compare"])
+        flagged = []
+        for name, queries in results.items():
+            for query in queries:
+                before = previous.get((name, query["sql"]))
+                timing = f"{query['median_ms']:>8.3f}ms"
+                if before is not None:
+                    timing = f"{before:>8.3f}ms -> {query['median_ms']:>8.3f}ms"
+                line = f"{name:<24} {timing}  {query['sql'][:90]}"
+                if query["full_scans"]:
+                    flagged.append((name, query))
+                    self.stdout.write(self.style.ERROR(f"{line}\n{'':<24} full scan: {', '.join(query['full_scans'])}"))
+                else:
+                    self.stdout.write(line)
+
+        report = {
+            "timestamp": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "dataset": {table: count for table, count in sorted(row_counts.items())},
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(json.dumps(report, indent=2))
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if flagged and not options["no_assert"]:
+            raise CommandError(f"{len(flagged)} queries scan large tables: {', '.join(sorted({n for n, _q in flagged}))}")
+
+    def replay(self, user, names):
+        """Run every endpoint once and return the distinct SELECTs each one issued"""
+        targets = self.get_targets(user)
+        client = APIClient(SERVER_NAME=request_host())
+        client.force_authenticate(user=user)
+        client.raise_request_exception = False
+        statements = {}
+        for name in names:
+            recorder = StatementRecorder()
+            with transaction.atomic(), connection.execute_wrapper(recorder):
+                response = client.get(ENDPOINTS[name].format(**targets))
+                transaction.set_rollback(True)
+            if response.status_code >= 400:
+                self.stderr.write(f"{name} returned {response.status_code}, its queries may be incomplete")
+            statements[name] = list(recorder.statements.values())
+        return statements
+
+    def get_targets(self, user):
+        audit = Audit.objects.annotate(task_count=Count("audit_tasks")).order_by("-task_count").first()
+        checklist = Checklist.objects.filter(audit_task__isnull=False).first()
+        if audit is None or checklist is None:
+            raise CommandError("No audits with checklists found, run seed_benchmark_data first")
+        return {"audit": audit.pk, "checklist": checklist.pk, "user": user.pk}
+
+    @staticmethod
+    def row_count(cursor, table, cache):
+        if table not in cache:
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+            cache[table] = cursor.fetchone()[0]
+        return cache[table]
+
+    @staticmethod
+    def time_query(cursor, sql, params, repeat):
+        timings = []
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return round(statistics.median(timings), 3)
+
+    @staticmethod
+    def load_previous(path):
+        if not path:
+            return {}
+        with open(path) as fh:
+            report = json.load(fh)
+        return {
+            (name, query["sql"]): query["median_ms"]
+            for name, queries in report["results"].items()
+            for query in queries
+        }
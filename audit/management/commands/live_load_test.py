@@ -0,0 +1,132 @@
+import asyncio
+import json
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+
+from apps.checklists.models import Checklist, ChecklistResponse
+from apps.user.models import User
+from audit.management.hosts import request_host
+
+from .run_benchmarks import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Subscribe many in-process websockets to one checklist, edit its responses "
+        "and report fan-out latency and coalescing. Writes to the checklist's responses."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=300)
+        parser.add_argument("--edits", type=int, default=200)
+        parser.add_argument("--interval", type=float, default=0.005, help="Seconds between edits")
+        parser.add_argument("--checklist", type=int, help="Checklist id, defaults to the one with most fields")
+        parser.add_argument("--user", default="bench_admin", help="Username the subscribers connect as")
+        parser.add_argument("--output", help="Write the JSON results to this file")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' not found, run seed_benchmark_data first")
+        checklists = Checklist.objects.annotate(field_count=Count("template__fields"))
+        if options["checklist"]:
+            checklist = checklists.filter(pk=options["checklist"]).first()
+        else:
+            checklist = checklists.filter(field_count__gt=0).order_by("-field_count").first()
+        if checklist is None:
+            raise CommandError("No checklist with fields found, run seed_benchmark_data first")
+        if not user.is_staff:
+            raise CommandError("The load test user must be staff to subscribe to any checklist")
+
+        token, _created = Token.objects.get_or_create(user=user)
+        field_ids = list(checklist.template.fields.values_list("id", flat=True))
+        report = asyncio.run(self.run(checklist, field_ids, user, token.key, options))
+
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload)
+            self.stdout.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+    async def run(self, checklist, field_ids, user, token, options):
+        from audit.asgi import application
+
+        host = request_host()
+        path = f"/ws/checklists/{checklist.pk}/?token={token}"
+        subscribers = []
+        started = time.perf_counter()
+        for _ in range(options["subscribers"]):
+            communicator = WebsocketCommunicator(application, path, headers=[(b"origin", f"http://{host}".encode())])
+            connected, _subprotocol = await communicator.connect()
+            if not connected:
+                raise CommandError("Websocket connection was refused")
+            subscribers.append(communicator)
+        connect_seconds = time.perf_counter() - started
+
+        stats = [{"frames": 0, "events": 0, "resyncs": 0, "latencies": []} for _ in subscribers]
+        readers = [asyncio.ensure_future(self.read(c, s)) for c, s in zip(subscribers, stats)]
+
+        save_response = sync_to_async(self.save_response)
+        started = time.perf_counter()
+        for i in range(options["edits"]):
+            await save_response(checklist.pk, field_ids[i % len(field_ids)], user, i)
+            await asyncio.sleep(options["interval"])
+        edit_seconds = time.perf_counter() - started
+
+        # Let the last coalescing window flush, cancelling a reader also stops its consumer
+        await asyncio.sleep(settings.LIVE_COALESCE_SECONDS + 1)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+        latencies = [latency for s in stats for latency in s["latencies"]] or [0]
+        events = [s["events"] for s in stats]
+        return {
+            "checklist": checklist.pk,
+            "subscribers": len(subscribers),
+            "edits": options["edits"],
+            "connect_seconds": round(connect_seconds, 3),
+            "edit_seconds": round(edit_seconds, 3),
+            "frames_per_subscriber": round(statistics.fmean(s["frames"] for s in stats), 2),
+            "events_per_subscriber": round(statistics.fmean(events), 2),
+            "min_events_per_subscriber": min(events),
+            "resyncs": sum(s["resyncs"] for s in stats),
+            "latency_p50_ms": round(percentile(latencies, 50), 3),
+            "latency_p95_ms": round(percentile(latencies, 95), 3),
+            "latency_p99_ms": round(percentile(latencies, 99), 3),
+            "latency_max_ms": round(max(latencies), 3),
+        }
+
+    @staticmethod
+    def save_response(checklist_id, field_id, user, i):
+        response, _created = ChecklistResponse.all_objects.all_with_deleted().get_or_create(
+            checklist_id=checklist_id, field_id=field_id
+        )
+        response.value = {"text": f"load test {i}", "sent": time.perf_counter()}
+        response.responded_by = user
+        response.is_deleted = False
+        response.save()
+
+    @staticmethod
+    async def read(communicator, stats):
+        while True:
+            message = await communicator.receive_json_from(timeout=None)
+            received = time.perf_counter()
+            stats["frames"] += 1
+            if message["type"] == "resync":
+                stats["resyncs"] += 1
+                continue
+            for event in message.get("events", []):
+                stats["events"] += 1
+                sent = event.get("value", {}).get("sent") if event["type"] == "response" else None
+                if sent:
+                    stats["latencies"].append((received - sent) * 1000)
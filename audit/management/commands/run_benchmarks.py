@@ -0,0 +1,172 @@
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.audits.models import Audit, Team
+from apps.checklists.models import Checklist
+from apps.user.models import User
+from apps.utils.instrumentation import collect
+from audit.management.hosts import request_host
+
+# name -> (method, url template, maximum queries per request)
+BENCHMARKS = {
+    "audits.list": ("get", "/api/audits/audits/", 30),
+    "audits.task_summary": ("get", "/api/audits/audits/{audit}/task_summary/", 20),
+    "checklists.list": ("get", "/api/checklists/api/checklists/", 30),
+    "checklists.progress": ("get", "/api/checklists/api/checklists/{checklist}/progress/", 20),
+    "checklists.update_responses": ("post", "/api/checklists/api/checklists/{checklist}/update_responses/", 60),
+    "teams.statistics": ("get", "/api/audits/teams/statistics/", 10),
+    "translation": ("get", "/api/translation/en", 5),
+    "users.whoami": ("get", "/api/users/whoami/", 10),
+}
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``"""
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Measure latency percentiles and query counts for the core API endpoints"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--user", default="bench_admin", help="Username to run the requests as")
+        parser.add_argument("--only", nargs="*", choices=sorted(BENCHMARKS), help="Run a subset of benchmarks")
+        parser.add_argument("--output", help="Write the JSON results to this file")
+        parser.add_argument(
+            "--no-assert",
+            action="store_true",
+            help="Report query budget overruns without failing",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options["user"]).first()
+        if user is None:
+            raise CommandError(f"User '{options['user']}' not found, run seed_benchmark_data first")
+
+        targets = self.get_targets(user)
+        client = APIClient(SERVER_NAME=request_host())
+        client.force_authenticate(user=user)
+        # Server errors are reported as failed samples instead of aborting the run
+        client.raise_request_exception = False
+
+        results = {}
+        for name in options["only"] or BENCHMARKS:
+            method, url, budget = BENCHMARKS[name]
+            results[name] = self.run_benchmark(
+                client, method, url.format(**targets), targets, budget, options["iterations"], options["warmup"]
+            )
+            result = results[name]
+            style = self.style.SUCCESS if result["within_budget"] else self.style.ERROR
+            self.stdout.write(
+                style(
+                    f"{name:<30} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                    f"p99 {result['p99_ms']:>8.2f}ms  queries {result['queries']:>4}/{budget}"
+                )
+            )
+
+        report = {
+            "timestamp": timezone.now().isoformat(),
+            "revision": git_revision(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "iterations": options["iterations"],
+            "dataset": {
+                "audits": Audit.objects.count(),
+                "checklists": Checklist.objects.count(),
+                "teams": Team.objects.count(),
+                "users": User.objects.count(),
+            },
+            "results": results,
+        }
+        payload = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                fh.write(payload)
+            self.stdout.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(payload)
+
+        over = [name for name, result in results.items() if not result["within_budget"]]
+        if over and not options["no_assert"]:
+            raise CommandError(f"Query budget exceeded: {', '.join(over)}")
+
+    def get_targets(self, user):
+        audit = Audit.objects.annotate(task_count=Count("audit_tasks")).order_by("-task_count").first()
+        checklist = (
+            Checklist.objects.filter(audit_task__isnull=False)
+            .annotate(field_count=Count("template__fields"))
+            .order_by("-field_count")
+            .first()
+        )
+        if audit is None or checklist is None:
+            raise CommandError("No audits with checklists found, run seed_benchmark_data first")
+        fields = list(checklist.template.fields.values_list("id", flat=True)[:10])
+        return {
+            "audit": audit.pk,
+            "checklist": checklist.pk,
+            "responses": [
+                {"field_id": field_id, "value": {"text": "Benchmark"}, "is_completed": True}
+                for field_id in fields
+            ],
+        }
+
+    def run_benchmark(self, client, method, url, targets, budget, iterations, warmup):
+        data = {"responses": targets["responses"]} if method == "post" else None
+        timings, queries, statuses = [], [], {}
+        for i in range(warmup + iterations):
+            # Writes are rolled back so every iteration sees the same data
+            with transaction.atomic():
+                started = time.perf_counter()
+                with collect() as metrics:
+                    response = getattr(client, method)(url, data, format="json")
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            if i < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(metrics.query_count)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        errors = sum(count for code, count in statuses.items() if code >= 400)
+        return {
+            "url": url,
+            "method": method.upper(),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3),
+            "queries": max(queries),
+            "query_budget": budget,
+            "within_budget": max(queries) <= budget and errors == 0,
+            "status_codes": {str(code): count for code, count in statuses.items()},
+            "error_rate": round(errors / iterations, 4),
+        }
@@ -0,0 +1,347 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.audits.assignments import sync_team_audits
+from apps.audits.deadlines import rebuild_deadlines
+from apps.audits.models import Audit, AuditTask, Team, TeamMember
+from apps.checklists.models import (
+    Checklist,
+    ChecklistField,
+    ChecklistResponse,
+    ChecklistTemplate,
+    FieldType,
+)
+from apps.checklists.rollups import compact_rollups
+from apps.checklists.snapshots import current_snapshot
+from apps.notifications.models import Notification
+from apps.translation.models import Translation
+from apps.user.models import User
+
+PREFIX = "bench"
+PASSWORD = "benchpass123"
+
+FIELD_TYPES = [
+    FieldType.TEXT,
+    FieldType.NUMBER,
+    FieldType.SELECT,
+    FieldType.CHECKBOX,
+    FieldType.TEXTAREA,
+    FieldType.EMAIL,
+    FieldType.RATING,
+]
+SELECT_OPTIONS = ["Compliant", "Partially compliant", "Non compliant", "Not applicable"]
+CONTROL_AREAS = ["Access Control", "Change Management", "Finance", "HR", "Operations", "Vendor Management"]
+LEVELS = ["low", "medium", "high", "critical"]
+CHECKLIST_STATUSES = ["draft", "in_progress", "in_progress", "completed", "on_hold"]
+
+
+def sample_value(field_type, rng):
+    """Return a response value in the shape the frontend stores for ``field_type``"""
+    if field_type == FieldType.NUMBER or field_type == FieldType.RATING:
+        return {"number": rng.randint(1, 5)}
+    if field_type == FieldType.SELECT:
+        return {"selected": rng.choice(SELECT_OPTIONS)}
+    if field_type == FieldType.CHECKBOX:
+        return {"checked": rng.random() < 0.7}
+    if field_type == FieldType.EMAIL:
+        return {"email": f"owner{rng.randint(1, 500)}@example.com"}
+    return {"text": "Reviewed and evidence attached."}
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic audits, checklists, teams and notifications for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--teams", type=int, default=10)
+        parser.add_argument("--members-per-team", type=int, default=8)
+        parser.add_argument("--templates", type=int, default=10)
+        parser.add_argument("--fields-per-template", type=int, default=25)
+        parser.add_argument("--audits", type=int, default=100)
+        parser.add_argument("--tasks-per-audit", type=int, default=20)
+        parser.add_argument(
+            "--fill-ratio",
+            type=float,
+            default=0.6,
+            help="Share of checklist fields that get a response",
+        )
+        parser.add_argument("--notifications-per-user", type=int, default=20)
+        parser.add_argument("--translations", type=int, default=500)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Remove previously seeded benchmark data before generating",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+
+        if options["clear"]:
+            self.clear()
+
+        with transaction.atomic():
+            admin, users = self.create_users(options["users"])
+            teams = self.create_teams(admin, users, options["teams"], options["members_per_team"])
+            templates = self.create_templates(admin, options["templates"], options["fields_per_template"])
+            audits = self.create_audits(admin, users, teams, options["audits"])
+            self.create_tasks(admin, users, audits, templates, options["tasks_per_audit"], options["fill_ratio"])
+            self.derive_state(teams)
+            self.create_notifications(users + [admin], options["notifications_per_user"])
+            self.create_translations(options["translations"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Benchmark data ready. Log in as '{admin.username}' / '{PASSWORD}'.")
+        )
+
+    def clear(self):
+        bench_users = User.objects.filter(username__startswith=f"{PREFIX}_")
+        Notification.objects.filter(user__in=bench_users).delete()
+        Team.all_objects.all_with_deleted().filter(owner__in=bench_users).hard_delete()
+        Audit.objects.filter(created_by__in=bench_users).delete()
+        Checklist.all_objects.all_with_deleted().filter(created_by__in=bench_users).hard_delete()
+        ChecklistTemplate.all_objects.all_with_deleted().filter(created_by__in=bench_users).hard_delete()
+        Translation.objects.filter(key__startswith=f"{PREFIX}.").delete()
+        deleted, _ = bench_users.delete()
+        self.stdout.write(f"Removed previous benchmark data ({deleted} rows)")
+
+    def create_users(self, count):
+        password = make_password(PASSWORD)
+        start = User.objects.filter(username__startswith=f"{PREFIX}_").count()
+        admin = User.objects.filter(username=f"{PREFIX}_admin").first()
+        if admin is None:
+            admin = User.objects.create_superuser(
+                username=f"{PREFIX}_admin",
+                email=f"{PREFIX}_admin@example.com",
+                password=PASSWORD,
+            )
+            start += 1
+        users = User.objects.bulk_create(
+            [
+                User(
+                    username=f"{PREFIX}_user_{i:06d}",
+                    email=f"{PREFIX}_user_{i:06d}@example.com",
+                    first_name="Bench",
+                    last_name=f"User {i}",
+                    department=self.rng.choice(CONTROL_AREAS),
+                    password=password,
+                )
+                for i in range(start, start + count)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.stdout.write(f"Created {len(users)} users")
+        return admin, users
+
+    def create_teams(self, admin, users, count, members_per_team):
+        teams = Team.objects.bulk_create(
+            [
+                Team(
+                    name=f"Bench Team {i}",
+                    type=self.rng.choice(Team.TEAM_TYPE_CHOICES)[0],
+                    owner=self.rng.choice(users) if users else admin,
+                    created_by=admin,
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        memberships = []
+        for team in teams:
+            for user in self.rng.sample(users, min(members_per_team, len(users))):
+                memberships.append(
+                    TeamMember(
+                        team=team,
+                        user=user,
+                        role=self.rng.choice(TeamMember.ROLE_CHOICES)[0],
+                        added_by=admin,
+                    )
+                )
+        TeamMember.objects.bulk_create(memberships, batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(teams)} teams with {len(memberships)} memberships")
+        return teams
+
+    def create_templates(self, admin, count, fields_per_template):
+        templates = ChecklistTemplate.objects.bulk_create(
+            [
+                ChecklistTemplate(
+                    name=f"Bench Template {i}",
+                    description="Synthetic template for benchmarking",
+                    category=self.rng.choice(CONTROL_AREAS),
+                    created_by=admin,
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        fields = []
+        for template in templates:
+            for order in range(fields_per_template):
+                field_type = FIELD_TYPES[order % len(FIELD_TYPES)]
+                fields.append(
+                    ChecklistField(
+                        template=template,
+                        label=f"Control {order + 1}",
+                        field_type=field_type,
+                        options=SELECT_OPTIONS if field_type == FieldType.SELECT else [],
+                        is_required=order % 3 == 0,
+                        order=order,
+                    )
+                )
+        fields = ChecklistField.objects.bulk_create(fields, batch_size=self.batch_size)
+        self.template_fields = {}
+        for field in fields:
+            self.template_fields.setdefault(field.template_id, []).append(field)
+        # Checklists pin the template version they are created from
+        self.snapshots = {template.pk: current_snapshot(template).id for template in templates}
+        self.stdout.write(f"Created {len(templates)} templates with {len(fields)} fields")
+        return templates
+
+    def create_audits(self, admin, users, teams, count):
+        latest = Audit.objects.order_by("-reference_number").values_list("reference_number", flat=True).first()
+        start = int(latest.split("-")[1]) + 1 if latest else 1
+        today = self.now.date()
+        audits = Audit.objects.bulk_create(
+            [
+                Audit(
+                    reference_number=f"AU-{start + i:04d}",
+                    title=f"Bench Audit {start + i}",
+                    audit_type=self.rng.choice(["internal", "compliance", "financial", "it"]),
+                    scope="Synthetic scope",
+                    objectives="Synthetic objectives",
+                    status=self.rng.choice(["Draft", "In Progress", "Review", "Closed"]),
+                    period_from=today - timedelta(days=90),
+                    period_to=today + timedelta(days=self.rng.randint(0, 90)),
+                    created_by=admin,
+                )
+                for i in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        AuditUsers = Audit.assigned_users.through
+        TeamAudits = Team.audits.through
+        assigned, team_links = [], []
+        for audit in audits:
+            for user in self.rng.sample(users, min(3, len(users))):
+                assigned.append(AuditUsers(audit_id=audit.pk, user_id=user.pk))
+            if teams:
+                team_links.append(TeamAudits(team_id=self.rng.choice(teams).pk, audit_id=audit.pk))
+        AuditUsers.objects.bulk_create(assigned, batch_size=self.batch_size)
+        TeamAudits.objects.bulk_create(team_links, batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(audits)} audits")
+        return audits
+
+    def create_tasks(self, admin, users, audits, templates, tasks_per_audit, fill_ratio):
+        if not templates:
+            return
+        plans, checklists = [], []
+        for audit in audits:
+            for i in range(tasks_per_audit):
+                template = self.rng.choice(templates)
+                fields = self.template_fields.get(template.pk, [])
+                answered = self.rng.sample(fields, int(len(fields) * fill_ratio))
+                completed = sum(1 for _ in answered if self.rng.random() < 0.8)
+                status = self.rng.choice(CHECKLIST_STATUSES)
+                assignee = self.rng.choice(users) if users else admin
+                checklist = Checklist(
+                    template=template,
+                    template_snapshot_id=self.snapshots[template.pk],
+                    name=f"{audit.reference_number} - {template.name} #{i + 1}",
+                    status=status,
+                    assigned_to=assignee,
+                    created_by=admin,
+                    due_date=self.now + timedelta(days=self.rng.randint(-15, 60)),
+                    # Progress counts the responses, seeded templates have no rules hiding any
+                    total_fields=len(answered),
+                    completed_fields=completed,
+                    priority=self.rng.choice(["low", "medium", "high", "urgent"]),
+                )
+                checklist.apply_derived_state()
+                checklists.append(checklist)
+                plans.append((audit, assignee, answered, completed))
+        checklists = Checklist.objects.bulk_create(checklists, batch_size=self.batch_size)
+
+        tasks, responses = [], []
+        ChecklistUsers = Checklist.assigned_users.through
+        checklist_users = []
+        for checklist, (audit, assignee, answered, completed) in zip(checklists, plans):
+            task = AuditTask(
+                audit=audit,
+                checklist=checklist,
+                task_name=checklist.name,
+                assigned_to=assignee,
+                due_date=checklist.due_date,
+                priority=self.rng.choice(LEVELS),
+                control_area=self.rng.choice(CONTROL_AREAS),
+                risk_level=self.rng.choice(LEVELS),
+                created_by=admin,
+            )
+            # Status, progress, completion time and overdue flag as AuditTask.save() sets them
+            task.apply_checklist_state(checklist)
+            tasks.append(task)
+            checklist_users.append(ChecklistUsers(checklist_id=checklist.pk, user_id=assignee.pk))
+            for index, field in enumerate(answered):
+                is_completed = index < completed
+                responses.append(
+                    ChecklistResponse(
+                        checklist=checklist,
+                        field=field,
+                        value=sample_value(field.field_type, self.rng),
+                        is_completed=is_completed,
+                        responded_by=assignee,
+                        responded_at=self.now if is_completed else None,
+                    )
+                )
+        tasks = AuditTask.objects.bulk_create(tasks, batch_size=self.batch_size)
+        ChecklistUsers.objects.bulk_create(checklist_users, batch_size=self.batch_size)
+        TaskUsers = AuditTask.assigned_users.through
+        TaskUsers.objects.bulk_create(
+            [TaskUsers(audittask_id=task.pk, user_id=task.assigned_to_id) for task in tasks],
+            batch_size=self.batch_size,
+        )
+        ChecklistResponse.objects.bulk_create(responses, batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(tasks)} tasks with {len(responses)} responses")
+
+    def derive_state(self, teams):
+        """Write what the save handlers would have, bulk inserts send no signals"""
+        for team in teams:
+            sync_team_audits(team.pk)
+        # Plans deadline entries and queues every dashboard scope
+        rebuild_deadlines()
+        while compact_rollups(self.batch_size) == self.batch_size:
+            pass
+        self.stdout.write("Derived team grants, deadlines and dashboard rollups")
+
+    def create_notifications(self, users, per_user):
+        notifications = [
+            Notification(
+                user=user,
+                title=f"Task update {i}",
+                message="A task assigned to you was updated",
+                read=self.rng.random() < 0.5,
+                type=self.rng.choice(["info", "warning", "success"]),
+            )
+            for user in users
+            for i in range(per_user)
+        ]
+        Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+        self.stdout.write(f"Created {len(notifications)} notifications")
+
+    def create_translations(self, count):
+        existing = Translation.objects.filter(key__startswith=f"{PREFIX}.").count()
+        translations = Translation.objects.bulk_create(
+            [
+                Translation(key=f"{PREFIX}.key_{i}", en=f"Label {i}", ar=f"تسمية {i}")
+                for i in range(existing, existing + count)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.stdout.write(f"Created {len(translations)} translations")
@@ -0,0 +1,15 @@
+from django.conf import settings
+
+
+def request_host():
+    """
+    A host name ``ALLOWED_HOSTS`` accepts, for the requests the benchmark
+    commands send to the project themselves. ``*`` and ``.domain`` entries
+    are patterns, not names, and are resolved to one they match.
+    """
+    if not settings.ALLOWED_HOSTS:
+        return "localhost"
+    host = settings.ALLOWED_HOSTS[0]
+    if host == "*":
+        return "localhost"
+    return host.lstrip(".")
@@ -38,6 +38,10 @@ CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
     "dnt",
+    "if-match",
+    "if-modified-since",
+    "if-none-match",
+    "if-unmodified-since",
     "origin",
     "user-agent",
     "x-csrftoken",
@@ -45,7 +49,10 @@ CORS_ALLOW_HEADERS = [
 ]
 CORS_EXPOSE_HEADERS = [
     "content-type",
+    "etag",
+    "last-modified",
     "x-csrftoken",
+    "server-timing",
 ]
 
 # CSRF Trusted Origins
@@ -94,6 +101,7 @@ AUTH_USER_MODEL = "user.User"
 
 # Application definition
 INSTALLED_APPS = [
+    "daphne",  # ASGI runserver, must come before staticfiles
     "corsheaders",
     "django.contrib.admin",
     "django.contrib.auth",
@@ -103,6 +111,7 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "django_filters",
     "django_celery_results",
+    "channels",
     "audit",
     "rest_framework",
     "rest_framework.authtoken",
@@ -114,6 +123,7 @@ INSTALLED_APPS = [
     "apps.translation",
     "apps.notifications",
     "apps.files",
+    "apps.activity.apps.ActivityConfig",
     "apps.audits.apps.AuditsConfig",
     "apps.checklists.apps.ChecklistsConfig",
     "roles.apps.RolesConfig",
@@ -122,6 +132,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # Must be at the top
+    "apps.utils.middlewares.RequestMetricsMiddleware",  # Times the rest of the stack
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",  # Must be before UserLanguageMiddleware
@@ -131,6 +142,7 @@ MIDDLEWARE = [
     "apps.user.middlewares.UserLanguageMiddleware",  # After LocaleMiddleware
     "django.contrib.messages.middleware.MessageMiddleware",
     "impersonate.middleware.ImpersonateMiddleware",
+    "apps.activity.middleware.ActivityMiddleware",  # After authentication, writes the buffered events
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -221,6 +233,10 @@ LOGGING = {
             "level": "DEBUG",
             "handlers": ["console"],
         },
+        "apps.utils": {
+            "level": "INFO",
+            "handlers": ["console"],
+        },
     },
 }
 
@@ -291,6 +307,18 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 EMAIL_USE_TLS = config("EMAIL_USE_TLS", cast=bool, default=False)
 EMAIL_USE_SSL = config("EMAIL_USE_SSL", cast=bool, default=False)
+DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL", default="no-reply@example.com")
+
+# Email outbox (apps.notifications.outbox), drained by a beat task
+EMAIL_OUTBOX_DRAIN_SECONDS = config("EMAIL_OUTBOX_DRAIN_SECONDS", cast=int, default=30)
+EMAIL_OUTBOX_BATCH_SIZE = config("EMAIL_OUTBOX_BATCH_SIZE", cast=int, default=200)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config("EMAIL_OUTBOX_MAX_ATTEMPTS", cast=int, default=5)
+# First retry delay, doubled on every further attempt
+EMAIL_OUTBOX_RETRY_SECONDS = config("EMAIL_OUTBOX_RETRY_SECONDS", cast=int, default=60)
+EMAIL_OUTBOX_DEDUPE_SECONDS = config("EMAIL_OUTBOX_DEDUPE_SECONDS", cast=int, default=300)
+# Messages claimed longer ago than this are assumed lost with their worker
+EMAIL_OUTBOX_CLAIM_TIMEOUT = config("EMAIL_OUTBOX_CLAIM_TIMEOUT", cast=int, default=600)
+EMAIL_DIGEST_SECONDS = config("EMAIL_DIGEST_SECONDS", cast=int, default=60 * 60)
 
 
 ROSETTA_ACCESS_CONTROL_FUNCTION = "apps.utils.permissions.is_translator"
@@ -315,6 +343,15 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.utils.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.utils.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     "DEFAULT_PAGINATION_CLASS": "apps.utils.pagination.CustomPagination",
     "PAGE_SIZE": 50,
     "SEARCH_PAGE_SIZE": 10,
@@ -323,6 +360,15 @@ REST_FRAMEWORK = {
 ADMIN_SITE_URL = config("ADMIN_SITE_URL", default="admin/")
 
 
+# Request metrics (Server-Timing header, slow/chatty request log, /metrics)
+REQUEST_METRICS_ENABLED = config("REQUEST_METRICS_ENABLED", cast=bool, default=True)
+REQUEST_METRICS_SERVER_TIMING = config("REQUEST_METRICS_SERVER_TIMING", cast=bool, default=True)
+REQUEST_METRICS_QUERY_BUDGET = config("REQUEST_METRICS_QUERY_BUDGET", cast=int, default=50)
+REQUEST_METRICS_TIME_BUDGET_MS = config("REQUEST_METRICS_TIME_BUDGET_MS", cast=int, default=1000)
+REQUEST_METRICS_TOP_QUERIES = 5
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", cast=Csv(), default="127.0.0.1")
+
+
 CELERY_BROKER_URL = config("CELERY_BROKER_URL", default="redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = config("CELERY_RESULT_BACKEND", default="django-db")
 
@@ -331,4 +377,114 @@ CELERY_BEAT_SCHEDULE = {
         "task": "my_custom_clear_sessions_task",
         "schedule": crontab(hour=0, minute=0),  # Run daily at midnight
     },
+    "drain-email-outbox": {
+        "task": "apps.notifications.tasks.drain_email_outbox",
+        "schedule": EMAIL_OUTBOX_DRAIN_SECONDS,
+    },
+    "fire-deadlines": {
+        "task": "apps.audits.tasks.fire_deadlines",
+        "schedule": 60,
+    },
+    "compact-dashboard-rollups": {
+        "task": "apps.checklists.tasks.compact_dashboard_rollups",
+        "schedule": 60,
+    },
+    # Catches changes made with update() or raw SQL that no signal saw
+    "rebuild-dashboard-rollups": {
+        "task": "apps.checklists.tasks.rebuild_dashboard_rollups",
+        "schedule": crontab(hour=2, minute=30),
+    },
+    "compact-findings-cube": {
+        "task": "apps.audits.tasks.compact_findings_cube",
+        "schedule": 60,
+    },
+    "rebuild-findings-cube": {
+        "task": "apps.audits.tasks.rebuild_findings_cube",
+        "schedule": crontab(hour=2, minute=45),
+    },
+    "prune-activity": {
+        "task": "apps.activity.tasks.prune_activity",
+        "schedule": crontab(hour=3, minute=0),
+    },
 }
+
+
+# Offline checklist sync, maximum rows per entity returned by one pull
+CHECKLIST_SYNC_PAGE_SIZE = config("CHECKLIST_SYNC_PAGE_SIZE", cast=int, default=500)
+
+
+# Live collaboration (Django Channels). Redis in production, without a URL
+# the in-process layer is used, which only reaches sockets of the same process
+ASGI_APPLICATION = "audit.asgi.application"
+CHANNEL_LAYER_REDIS_URL = config("CHANNEL_LAYER_REDIS_URL", default="")
+if CHANNEL_LAYER_REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [CHANNEL_LAYER_REDIS_URL], "capacity": 200, "expiry": 30},
+        },
+    }
+else:
+    CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+LIVE_UPDATES_ENABLED = config("LIVE_UPDATES_ENABLED", cast=bool, default=True)
+# Events for the same row arriving within this window reach a socket once
+LIVE_COALESCE_SECONDS = config("LIVE_COALESCE_SECONDS", cast=float, default=0.25)
+# Distinct events buffered per socket before it is told to resync instead
+LIVE_MAX_PENDING_EVENTS = config("LIVE_MAX_PENDING_EVENTS", cast=int, default=500)
+
+
+# Shared cache, Redis when configured so counters agree across workers
+CACHE_REDIS_URL = config("CACHE_REDIS_URL", default="")
+if CACHE_REDIS_URL:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_REDIS_URL}}
+else:
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Notifications, cached unread counters and the server-sent events stream
+NOTIFICATION_UNREAD_CACHE_TIMEOUT = config("NOTIFICATION_UNREAD_CACHE_TIMEOUT", cast=int, default=24 * 60 * 60)
+NOTIFICATION_STREAM_KEEPALIVE_SECONDS = config("NOTIFICATION_STREAM_KEEPALIVE_SECONDS", cast=float, default=15)
+# Streams are closed after this long, EventSource reconnects with Last-Event-ID
+NOTIFICATION_STREAM_MAX_SECONDS = config("NOTIFICATION_STREAM_MAX_SECONDS", cast=float, default=300)
+
+# Deadline timer wheel (apps.audits.deadlines)
+DEADLINE_REMINDER_LEAD_SECONDS = config("DEADLINE_REMINDER_LEAD_SECONDS", cast=int, default=24 * 60 * 60)
+DEADLINE_ESCALATION_AFTER_SECONDS = config("DEADLINE_ESCALATION_AFTER_SECONDS", cast=int, default=3 * 24 * 60 * 60)
+DEADLINE_BATCH_SIZE = config("DEADLINE_BATCH_SIZE", cast=int, default=1000)
+# Fired entries are kept this long so re-saving an item does not repeat them
+DEADLINE_RETENTION_DAYS = config("DEADLINE_RETENTION_DAYS", cast=int, default=30)
+
+# Findings analytics cube (apps.audits.findings_cube), answers are cached per filter set under a version
+# bumped on every change. The bump only reaches other workers through a shared cache, so without
+# CACHE_REDIS_URL their answers may be this old; keep it short there
+FINDINGS_CUBE_CACHE_TIMEOUT = config(
+    "FINDINGS_CUBE_CACHE_TIMEOUT", cast=int, default=10 * 60 if CACHE_REDIS_URL else 30
+)
+
+# Team membership sets (apps.audits.team_cache), invalidated by a version bump on every change. They
+# back access checks and the bump only reaches other workers through a shared cache, so without
+# CACHE_REDIS_URL a revoked membership lasts this long in them; keep it to seconds there
+TEAM_CACHE_TIMEOUT = config("TEAM_CACHE_TIMEOUT", cast=int, default=60 * 60 if CACHE_REDIS_URL else 5)
+# Team roles whose members assigning the team to an audit also puts on its tasks, "owner" covers owners
+TEAM_ASSIGNMENT_TASK_ROLES = config("TEAM_ASSIGNMENT_TASK_ROLES", cast=Csv(), default="member,lead")
+
+# Audit cloning (apps.audits.cloning), audits with more tasks are cloned by a Celery job
+AUDIT_CLONE_SYNC_MAX_TASKS = config("AUDIT_CLONE_SYNC_MAX_TASKS", cast=int, default=500)
+# How long the starter of a background clone can read its progress, in seconds
+AUDIT_CLONE_JOB_TIMEOUT = config("AUDIT_CLONE_JOB_TIMEOUT", cast=int, default=86400)
+
+# Assignment recommendations (apps.audits.workload), open tasks due within this many days weigh more
+WORKLOAD_DUE_SOON_DAYS = config("WORKLOAD_DUE_SOON_DAYS", cast=int, default=7)
+
+# Evaluated conditional logic per checklist (apps.checklists.logic), refreshed incrementally on response changes
+CHECKLIST_LOGIC_STATE_TIMEOUT = config("CHECKLIST_LOGIC_STATE_TIMEOUT", cast=int, default=60 * 60)
+# Template snapshots (apps.checklists.snapshots) never change, their cached data only expires to free memory
+TEMPLATE_SNAPSHOT_TIMEOUT = config("TEMPLATE_SNAPSHOT_TIMEOUT", cast=int, default=24 * 60 * 60)
+
+# Activity log (apps.activity), events are buffered per process and written in bulk
+ACTIVITY_LOG_ENABLED = config("ACTIVITY_LOG_ENABLED", cast=bool, default=True)
+ACTIVITY_BUFFER_SIZE = config("ACTIVITY_BUFFER_SIZE", cast=int, default=500)
+ACTIVITY_FLUSH_SECONDS = config("ACTIVITY_FLUSH_SECONDS", cast=float, default=5)
+# Hand the rows to a Celery task instead of inserting them in the web process
+ACTIVITY_ASYNC_WRITES = config("ACTIVITY_ASYNC_WRITES", cast=bool, default=False)
+# Events are dropped a month at a time once the whole month is older than this
+ACTIVITY_RETENTION_DAYS = config("ACTIVITY_RETENTION_DAYS", cast=int, default=365)
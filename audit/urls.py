@@ -26,6 +26,7 @@ from django.conf.urls import handler404
 import os
 
 from apps.user.admin_views import custom_dashboard
+from apps.utils.views import metrics_view
 from .views import (
     CustomLoginView,
     CustomLogoutView,
@@ -63,10 +64,12 @@ urlpatterns = [
     path("api/users/", include("apps.user.urls")),
     path("api/notifications/", include("apps.notifications.urls")),
     path("api/files/", include("apps.files.urls")),
+    path("api/activity/", include("apps.activity.urls")),
     path("api/roles/", include("roles.urls")),
     path("api/workflows/", include("workflows.urls")),
     path("api/audits/", include("apps.audits.urls")),
     path("api/checklists/", include("apps.checklists.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
@@ -100,5 +103,5 @@ if settings.DEBUG:
 
 # Catch-all route for React app - must be AFTER static file routes
 urlpatterns += [
-    re_path(r'^(?!api/|admin/|impersonate/|rosetta/|i18n/|login/|logout/|static/|assets/|media/).*$', ReactAppView.as_view(), name='react_app'),
+    re_path(r'^(?!api/|admin/|impersonate/|rosetta/|i18n/|login/|logout/|metrics|static/|assets/|media/).*$', ReactAppView.as_view(), name='react_app'),
 ]
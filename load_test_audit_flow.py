@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+"""
+Load generator that replays the audit lifecycle from test_audit_flow.py with
+many concurrent virtual auditors.
+
+Each virtual user logs in for a token and then loops over:
+create audit -> bulk create tasks -> fill checklists (update_responses) ->
+upload evidence -> submit for review -> approve.
+
+Run it against a local dev server seeded with seed_benchmark_data, e.g.:
+
+    python manage.py seed_benchmark_data --users 300
+    python manage.py runserver --noreload   # or gunicorn/uvicorn
+    python load_test_audit_flow.py --concurrency 300 --duration 120 \
+        --username "bench_user_{n:06d}" --user-offset 1 --password benchpass123
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import httpx
+
+STEPS = [
+    "login",
+    "create_audit",
+    "bulk_create_tasks",
+    "get_checklist",
+    "update_responses",
+    "complete_checklist",
+    "upload_evidence",
+    "submit_for_review",
+    "approve",
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def sample_value(field):
+    """Return a response value in the shape the frontend stores for ``field``"""
+    field_type = field.get("field_type")
+    if field_type in ("number", "rating"):
+        return {"number": random.randint(1, 5)}
+    if field_type in ("select", "radio"):
+        options = field.get("options") or ["Compliant"]
+        return {"selected": random.choice(options)}
+    if field_type == "multi_select":
+        return {"selected": (field.get("options") or ["Compliant"])[:1]}
+    if field_type == "checkbox":
+        return {"checked": True}
+    if field_type == "email":
+        return {"email": "owner@example.com"}
+    if field_type == "url":
+        return {"url": "https://example.com/evidence"}
+    return {"text": "Reviewed during load test"}
+
+
+class FlowFailed(Exception):
+    pass
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+        self.flows_completed = 0
+        self.flows_failed = 0
+
+    def record(self, step, elapsed, status_code, ok):
+        self.latencies[step].append(elapsed * 1000)
+        self.status_codes[step][str(status_code)] += 1
+        if not ok:
+            self.errors[step] += 1
+
+    def report(self, elapsed):
+        steps = {}
+        for step in STEPS:
+            samples = self.latencies.get(step, [])
+            if not samples:
+                continue
+            steps[step] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(max(samples), 2),
+                "error_rate": round(self.errors[step] / len(samples), 4),
+                "status_codes": dict(self.status_codes[step]),
+            }
+        total_requests = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "flows_completed": self.flows_completed,
+            "flows_failed": self.flows_failed,
+            "flows_per_s": round(self.flows_completed / elapsed, 3),
+            "requests": total_requests,
+            "requests_per_s": round(total_requests / elapsed, 2),
+            "steps": steps,
+        }
+
+
+class VirtualAuditor:
+    def __init__(self, index, client, options, stats):
+        self.index = index
+        self.client = client
+        self.options = options
+        self.stats = stats
+        self.headers = {}
+        self.username = options.username.format(n=options.user_offset + index % options.user_pool)
+
+    async def think(self):
+        if self.options.think_time > 0:
+            await asyncio.sleep(random.expovariate(1 / self.options.think_time))
+
+    async def request(self, step, method, url, expected=(200, 201), **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError as exc:
+            self.stats.record(step, time.perf_counter() - started, type(exc).__name__, False)
+            raise FlowFailed(f"{step}: {exc!r}")
+        ok = response.status_code in expected
+        self.stats.record(step, time.perf_counter() - started, response.status_code, ok)
+        if not ok:
+            raise FlowFailed(f"{step}: HTTP {response.status_code} {response.text[:200]}")
+        return response.json() if response.content else {}
+
+    async def login(self):
+        data = await self.request(
+            "login",
+            "POST",
+            "/api/users/api-token/",
+            data={"username": self.username, "password": self.options.password},
+        )
+        self.headers = {"Authorization": f"Token {data['token']}"}
+
+    async def run_flow(self, template_ids):
+        today = date.today()
+        audit = await self.request(
+            "create_audit",
+            "POST",
+            "/api/audits/audits/",
+            json={
+                "title": f"Load test audit {self.index}",
+                "audit_type": "internal",
+                "scope": "Load test scope",
+                "objectives": "Load test objectives",
+                "period_from": today.isoformat(),
+                "period_to": (today + timedelta(days=30)).isoformat(),
+            },
+        )
+        await self.think()
+
+        templates = [
+            {"template_id": random.choice(template_ids), "task_name": f"Task {i + 1}", "priority": "medium"}
+            for i in range(self.options.tasks_per_audit)
+        ]
+        created = await self.request(
+            "bulk_create_tasks",
+            "POST",
+            f"/api/audits/audits/{audit['id']}/bulk_create_tasks/",
+            json={"templates": templates},
+        )
+        await self.think()
+
+        for task in created["created_tasks"]:
+            checklist_id = task["checklist"]["id"] if isinstance(task["checklist"], dict) else task["checklist"]
+            checklist = await self.request("get_checklist", "GET", f"/api/checklists/api/checklists/{checklist_id}/")
+            fields = checklist.get("template", {}).get("fields") or [
+                response["field"] for response in checklist.get("responses", []) if isinstance(response.get("field"), dict)
+            ]
+            responses = [
+                {"field_id": field["id"], "value": sample_value(field), "is_completed": True}
+                for field in fields
+                if field.get("field_type") != "section"
+            ]
+            await self.think()
+            await self.request(
+                "update_responses",
+                "POST",
+                f"/api/checklists/api/checklists/{checklist_id}/update_responses/",
+                json={"responses": responses},
+            )
+            await self.request(
+                "complete_checklist",
+                "POST",
+                f"/api/checklists/api/checklists/{checklist_id}/change_status/",
+                json={"status": "completed"},
+            )
+            await self.think()
+
+            await self.request(
+                "upload_evidence",
+                "POST",
+                f"/api/audits/audit-tasks/{task['id']}/evidence/",
+                data={"title": "Load test evidence", "evidence_type": "document"},
+                files={"file": ("evidence.txt", b"x" * self.options.evidence_bytes, "text/plain")},
+            )
+            await self.think()
+
+            await self.request("submit_for_review", "POST", f"/api/audits/audit-tasks/{task['id']}/submit_for_review/")
+            await self.think()
+            await self.request(
+                "approve",
+                "POST",
+                f"/api/audits/audit-tasks/{task['id']}/approve/",
+                json={"notes": "Approved by load test"},
+            )
+
+    async def run(self, template_ids, deadline):
+        await asyncio.sleep(self.options.ramp_up * self.index / max(self.options.concurrency, 1))
+        try:
+            await self.login()
+        except FlowFailed as exc:
+            self.stats.flows_failed += 1
+            if self.options.verbose:
+                print(f"[vu {self.index}] {exc}", file=sys.stderr)
+            return
+
+        iterations = 0
+        while time.monotonic() < deadline and (not self.options.iterations or iterations < self.options.iterations):
+            iterations += 1
+            try:
+                await self.run_flow(template_ids)
+                self.stats.flows_completed += 1
+            except FlowFailed as exc:
+                self.stats.flows_failed += 1
+                if self.options.verbose:
+                    print(f"[vu {self.index}] {exc}", file=sys.stderr)
+            await self.think()
+
+
+async def fetch_template_ids(client, options):
+    if options.template:
+        return options.template
+    response = await client.post(
+        "/api/users/api-token/", data={"username": options.username.format(n=options.user_offset), "password": options.password}
+    )
+    response.raise_for_status()
+    headers = {"Authorization": f"Token {response.json()['token']}"}
+    response = await client.get("/api/checklists/api/templates/", headers=headers, params={"is_active": "true"})
+    response.raise_for_status()
+    data = response.json()
+    templates = data.get("results", data) if isinstance(data, dict) else data
+    ids = [template["id"] for template in templates]
+    if not ids:
+        raise SystemExit("No checklist templates found, run `manage.py seed_benchmark_data` first")
+    return ids
+
+
+def print_report(report):
+    print()
+    print(
+        f"{report['flows_completed']} flows completed, {report['flows_failed']} failed in {report['elapsed_s']}s "
+        f"({report['flows_per_s']} flows/s, {report['requests_per_s']} req/s)"
+    )
+    print(f"{'step':<20}{'reqs':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for step, data in report["steps"].items():
+        print(
+            f"{step:<20}{data['requests']:>8}{data['throughput_rps']:>9}{data['p50_ms']:>10}"
+            f"{data['p95_ms']:>10}{data['p99_ms']:>10}{data['error_rate'] * 100:>8.1f}%"
+        )
+
+
+async def main(options):
+    stats = Stats()
+    limits = httpx.Limits(max_connections=options.concurrency, max_keepalive_connections=options.concurrency)
+    async with httpx.AsyncClient(base_url=options.base_url, timeout=options.timeout, limits=limits) as client:
+        template_ids = await fetch_template_ids(client, options)
+        started = time.perf_counter()
+        deadline = time.monotonic() + options.duration
+        users = [VirtualAuditor(i, client, options, stats) for i in range(options.concurrency)]
+        await asyncio.gather(*(user.run(template_ids, deadline) for user in users))
+        elapsed = time.perf_counter() - started
+
+    report = stats.report(elapsed)
+    report["options"] = {
+        "concurrency": options.concurrency,
+        "think_time": options.think_time,
+        "tasks_per_audit": options.tasks_per_audit,
+        "duration": options.duration,
+        "iterations": options.iterations,
+    }
+    print_report(report)
+    if options.output:
+        with open(options.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"Results written to {options.output}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=50, help="Number of virtual auditors")
+    parser.add_argument("--duration", type=float, default=60, help="Stop starting new flows after N seconds")
+    parser.add_argument("--iterations", type=int, default=0, help="Flows per virtual user (0 = until --duration)")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which virtual users are started")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between steps in seconds")
+    parser.add_argument("--tasks-per-audit", type=int, default=3)
+    parser.add_argument("--evidence-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--template", type=int, action="append", help="Template id(s) to create tasks from")
+    parser.add_argument(
+        "--username",
+        default="bench_admin",
+        help="Username, may contain {n} to spread virtual users over several accounts",
+    )
+    parser.add_argument("--user-offset", type=int, default=1, help="First value of {n}")
+    parser.add_argument("--user-pool", type=int, default=300, help="Number of distinct accounts for {n}")
+    parser.add_argument("--password", default="benchpass123")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Print failed steps")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    options = parse_args()
+    report = asyncio.run(main(options))
+    sys.exit(1 if report["flows_failed"] and not report["flows_completed"] else 0)